@@ -0,0 +1,410 @@
+#!/usr/bin/env python
+"""
+Benchmark for controller build time and control cycle latency with the robots in test/urdfs.
+Runs without a ros master and a behavior tree, results are saved as json, such that they can be compared between
+commits.
+usage:
+    benchmark.py run [-o results.json] [--robots pr2 donbot] [--solvers qpSWIFT qpalm]
+                     [--goal_sets cartesian=2 joint=7 cartesian=2,self_collision=20,external_collision=8]
+    benchmark.py compare old.json new.json [--statistic mean] [--threshold 0.1]
+compare exits with 1, if any measurement got slower by more than threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from itertools import chain
+from time import perf_counter, time
+from typing import Dict, List, Optional, Tuple, Any
+
+import giskardpy.casadi_wrapper as w
+from giskardpy import identifier
+from giskardpy.configs.behavior_tree_config import StandAloneBTConfig
+from giskardpy.configs.collision_avoidance_config import CollisionAvoidanceConfig
+from giskardpy.configs.giskard import Giskard
+from giskardpy.configs.qp_controller_config import QPControllerConfig, SupportedQPSolver
+from giskardpy.configs.robot_interface_config import StandAloneRobotInterfaceConfig
+from giskardpy.configs.world_config import WorldConfig
+from giskardpy.exceptions import GiskardException
+from giskardpy.goals.cartesian_goals import CartesianPose
+from giskardpy.goals.collision_avoidance import ExternalCollisionAvoidance, SelfCollisionAvoidance
+from giskardpy.goals.goal import Goal
+from giskardpy.goals.joint_goals import JointPositionList
+from giskardpy.god_map import GodMap
+from giskardpy.my_types import PrefixName
+from giskardpy.qp.qp_controller import QPProblemBuilder, available_solvers
+from giskardpy.utils import logging
+from giskardpy.utils.profiling import Histogram
+
+repository_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+urdf_folder = os.path.join(repository_path, 'test', 'urdfs')
+srdf_folder = os.path.join(repository_path, 'self_collision_matrices', 'iai')
+
+# robot name -> (urdf in test/urdfs, self collision matrix in self_collision_matrices/iai)
+robots = {
+    'pr2': ('pr2.urdf', 'pr2.srdf'),
+    'donbot': ('iai_donbot.urdf', 'iai_donbot.srdf'),
+    'boxy': ('boxy.urdf', 'boxy_description.srdf'),
+    'hsr': ('hsr.urdf', 'hsrb.srdf'),
+    'tiago': ('tiago_dual.urdf', 'tiago_dual.srdf'),
+}
+
+goal_types = ('cartesian', 'joint', 'self_collision', 'external_collision')
+default_goal_sets = ['cartesian=1',
+                     'cartesian=2',
+                     'joint=-1',
+                     'cartesian=2,joint=-1,self_collision=20,external_collision=8']
+
+
+class BenchmarkWorldConfig(WorldConfig):
+    def __init__(self, urdf: str, group_name: str):
+        super().__init__()
+        self._urdf = urdf
+        self._group_name = group_name
+
+    def setup(self):
+        self.add_robot_urdf(self._urdf, self._group_name)
+
+
+class BenchmarkCollisionAvoidanceConfig(CollisionAvoidanceConfig):
+    def __init__(self, path_to_self_collision_matrix: Optional[str]):
+        super().__init__()
+        self._path_to_self_collision_matrix = path_to_self_collision_matrix
+
+    def setup(self):
+        if self._path_to_self_collision_matrix is not None:
+            self.load_self_collision_matrix(self._path_to_self_collision_matrix)
+
+
+def parse_goal_set(goal_set: str) -> Dict[str, int]:
+    """
+    :param goal_set: e.g. 'cartesian=2,joint=-1', -1 means as many as possible
+    :return: goal type -> number of goals
+    """
+    result = {}
+    for part in goal_set.split(','):
+        goal_type, number = part.split('=')
+        if goal_type not in goal_types:
+            raise KeyError(f'Unknown goal type \'{goal_type}\', use one of {goal_types}.')
+        result[goal_type] = int(number)
+    return result
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=repository_path,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class RobotBenchmark:
+    """
+    Sets up the god map with a world that only contains one robot, similar to Giskard.grow(), but without ros.
+    """
+
+    def __init__(self, robot_name: str, urdf: str, path_to_srdf: Optional[str], prediction_horizon: int,
+                 sample_period: float):
+        self.god_map = GodMap()
+        self.god_map.clear()
+        self.robot_name = robot_name
+        self.giskard = Giskard(world_config=BenchmarkWorldConfig(urdf, robot_name),
+                               collision_avoidance_config=BenchmarkCollisionAvoidanceConfig(path_to_srdf),
+                               robot_interface_config=StandAloneRobotInterfaceConfig([]),
+                               behavior_tree_config=StandAloneBTConfig(),
+                               qp_controller_config=QPControllerConfig(prediction_horizon=prediction_horizon,
+                                                                       sample_period=sample_period,
+                                                                       controller_cache_size=0,
+                                                                       persistent_controller_cache=False))
+        self.giskard.set_defaults()
+        self.world = self.god_map.get_data(identifier.world)
+        with self.world.modify_world():
+            self.giskard.world_config.setup()
+        self.collision_scene = self.god_map.get_data(identifier.collision_scene)
+        self.giskard.collision_avoidance_config.setup()
+        self.world.register_controlled_joints(self.world.groups[robot_name].movable_joint_names)
+        self.world.notify_model_change()
+        self.collision_scene.sync()
+        self.collision_matrix = self.compute_collision_matrix()
+        self.god_map.set_data(identifier.closest_point, self.collision_scene.collision_buffer)
+        self.initial_state = self.world.state.data.copy()
+
+    @property
+    def sample_period(self) -> float:
+        return self.god_map.get_data(identifier.sample_period)
+
+    @property
+    def collision_checking_enabled(self) -> bool:
+        return self.collision_scene.is_collision_checking_enabled
+
+    def reset(self):
+        self.god_map.set_data(identifier.goals, {})
+        self.world.state.data[:] = self.initial_state
+        self.world.notify_state_change()
+
+    def compute_collision_matrix(self) -> Dict[Tuple[PrefixName, PrefixName], float]:
+        group = self.world.groups[self.robot_name]
+        return {(link_a, link_b): 0.1 for link_a, link_b in sorted(group.possible_collision_combinations())
+                if (link_a, link_b) not in self.collision_scene.self_collision_matrix}
+
+    def tip_links(self, number: int) -> List[PrefixName]:
+        """
+        Links with collisions at the end of the longest controlled chains, one per chain.
+        """
+        root = self.world.groups[self.robot_name].root_link_name
+        chains = {}
+        for link_name in self.world.groups[self.robot_name].link_names_with_collisions:
+            joint_chain = tuple(self.world.compute_chain(root, link_name, add_joints=True, add_links=False,
+                                                         add_fixed_joints=False, add_non_controlled_joints=False))
+            if len(joint_chain) > 0 and (joint_chain not in chains or str(link_name) < str(chains[joint_chain])):
+                chains[joint_chain] = link_name
+        # drop chains that are the beginning of a longer one
+        tips = [(joint_chain, link_name) for joint_chain, link_name in chains.items()
+                if not any(other[:len(joint_chain)] == joint_chain and other != joint_chain for other in chains)]
+        tips = [link_name for joint_chain, link_name in sorted(tips, key=lambda x: (-len(x[0]), str(x[1])))]
+        if 0 <= number < len(tips):
+            return tips[:number]
+        return tips
+
+    def make_goals(self, goal_set: Dict[str, int]) -> List[Goal]:
+        goals = []
+        root = self.world.groups[self.robot_name].root_link_name
+        for i, tip in enumerate(self.tip_links(goal_set.get('cartesian', 0))):
+            goal_pose = self.world.compute_fk_pose(root, tip)
+            goal_pose.pose.position.x += 0.05 if i % 2 == 0 else -0.05
+            goal_pose.pose.position.z += 0.05
+            goals.append(CartesianPose(root_link=root, tip_link=tip, goal_pose=goal_pose))
+
+        number_of_joints = goal_set.get('joint', 0)
+        if number_of_joints != 0:
+            joint_names = [j for j in sorted(self.world.controlled_joints) if self.world.is_joint_revolute(j)
+                           or self.world.is_joint_prismatic(j)]
+            if number_of_joints > 0:
+                joint_names = joint_names[:number_of_joints]
+            goal_state = {}
+            for joint_name in joint_names:
+                lower_limit, upper_limit = self.world.get_joint_position_limits(joint_name)
+                if lower_limit is None or upper_limit is None:
+                    goal_state[joint_name] = self.world.state[joint_name].position + 0.1
+                else:
+                    goal_state[joint_name] = (lower_limit + upper_limit) / 2
+            goals.append(JointPositionList(goal_state=goal_state))
+
+        self_collision_pairs = set()
+        for link_a, link_b in self.collision_matrix:
+            try:
+                link_a, link_b = self.world.compute_chain_reduced_to_controlled_joints(link_a, link_b)
+                self_collision_pairs.add(self.world.sort_links(link_a, link_b))
+            except KeyError:
+                # no controlled joint between both links
+                pass
+        self_collision_pairs = sorted(self_collision_pairs)
+        number_of_pairs = goal_set.get('self_collision', 0)
+        if number_of_pairs > 0:
+            self_collision_pairs = self_collision_pairs[:number_of_pairs]
+        elif number_of_pairs == 0:
+            self_collision_pairs = []
+        for link_a, link_b in self_collision_pairs:
+            goals.append(SelfCollisionAvoidance(link_a=link_a, link_b=link_b, robot_name=self.robot_name))
+
+        external_links = [self.world.joints[j].child_link_name for j in sorted(self.world.controlled_joints)
+                          if self.world.get_directly_controlled_child_links_with_collisions(j)]
+        number_of_links = goal_set.get('external_collision', 0)
+        if number_of_links > 0:
+            external_links = external_links[:number_of_links]
+        elif number_of_links == 0:
+            external_links = []
+        for link_name in external_links:
+            goals.append(ExternalCollisionAvoidance(link_name=link_name, robot_name=self.robot_name,
+                                                    soft_thresholds={}))
+        return goals
+
+    def get_constraints(self, goals: List[Goal]) -> Dict[str, Any]:
+        """
+        Like InitQPController.
+        """
+        constraints = {'equality_constraints': {},
+                       'inequality_constraints': {},
+                       'derivative_constraints': {},
+                       'debug_expressions': {}}
+        for goal in goals:
+            goal._save_self_on_god_map()
+            for key, new_constraints in zip(constraints, goal.get_constraints()):
+                constraints[key].update(new_constraints)
+        symbols = set()
+        for c in chain(constraints['equality_constraints'].values(),
+                       constraints['inequality_constraints'].values(),
+                       constraints['derivative_constraints'].values()):
+            symbols.update(str(s) for s in w.free_symbols(c.expression))
+        free_variables = list(sorted([v for v in self.world.free_variables.values() if v.position_name in symbols],
+                                     key=lambda x: x.position_name))
+        return {'free_variables': free_variables,
+                'equality_constraints': list(constraints['equality_constraints'].values()),
+                'inequality_constraints': list(constraints['inequality_constraints'].values()),
+                'derivative_constraints': list(constraints['derivative_constraints'].values()),
+                'debug_expressions': constraints['debug_expressions']}
+
+    def build(self, solver_id: SupportedQPSolver, constraints: Dict[str, Any], repeats: int) \
+            -> Tuple[QPProblemBuilder, Histogram]:
+        histogram = Histogram()
+        controller = None
+        for _ in range(repeats):
+            start = perf_counter()
+            controller = QPProblemBuilder(sample_period=self.sample_period,
+                                          prediction_horizon=self.god_map.get_data(identifier.prediction_horizon),
+                                          solver_id=solver_id,
+                                          **constraints)
+            histogram.add(perf_counter() - start)
+        return controller, histogram
+
+    def control_loop(self, controller: QPProblemBuilder, ticks: int) -> Dict[str, Any]:
+        """
+        Runs the controller like the StandAlone tree does, without the behaviors around it.
+        """
+        histograms = {'substitution': Histogram(),
+                      'get_cmd': Histogram(),
+                      'fk': Histogram(),
+                      'collision_check': Histogram()}
+        failed_ticks = 0
+        parameters = controller.get_parameter_names()
+        collision_list_size = 1
+        for _ in range(ticks):
+            if self.collision_checking_enabled:
+                start = perf_counter()
+                self.collision_scene.sync()
+                self.collision_scene.update_collision_buffer(self.collision_matrix, collision_list_size)
+                histograms['collision_check'].add(perf_counter() - start)
+
+            start = perf_counter()
+            substitutions = self.god_map.get_values(parameters)
+            histograms['substitution'].add(perf_counter() - start)
+
+            start = perf_counter()
+            try:
+                next_cmds = controller.get_cmd(substitutions)
+            except GiskardException:
+                failed_ticks += 1
+                continue
+            finally:
+                histograms['get_cmd'].add(perf_counter() - start)
+
+            self.world.update_state(next_cmds, self.sample_period)
+            start = perf_counter()
+            self.world.notify_state_change()
+            histograms['fk'].add(perf_counter() - start)
+        result = {name: histogram.to_dict() for name, histogram in histograms.items() if len(histogram) > 0}
+        result['failed_ticks'] = failed_ticks
+        return result
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    if args.solvers:
+        solver_ids = [SupportedQPSolver[name] for name in args.solvers]
+    else:
+        solver_ids = [solver_id for solver_id in SupportedQPSolver if solver_id in available_solvers]
+    goal_sets = {goal_set: parse_goal_set(goal_set) for goal_set in args.goal_sets}
+    results = {}
+    for robot_name in args.robots:
+        urdf_file_name, srdf_file_name = robots[robot_name]
+        path_to_urdf = os.path.join(urdf_folder, urdf_file_name)
+        if not os.path.isfile(path_to_urdf):
+            logging.logwarn(f'Skipping {robot_name}, {path_to_urdf} does not exist.')
+            continue
+        path_to_srdf = os.path.join(srdf_folder, srdf_file_name)
+        if not os.path.isfile(path_to_srdf):
+            path_to_srdf = None
+        with open(path_to_urdf, 'r') as f:
+            urdf = f.read()
+        benchmark = RobotBenchmark(robot_name, urdf, path_to_srdf,
+                                   prediction_horizon=args.prediction_horizon,
+                                   sample_period=args.sample_period)
+        for goal_set_name, goal_set in goal_sets.items():
+            benchmark.reset()
+            goals = benchmark.make_goals(goal_set)
+            constraints = benchmark.get_constraints(goals)
+            for solver_id in solver_ids:
+                key = f'{robot_name}/{goal_set_name}/{solver_id.name}'
+                logging.loginfo(f'Benchmarking {key}')
+                benchmark.reset()
+                controller, compile_histogram = benchmark.build(solver_id, constraints, args.compile_repeats)
+                result = {'free_variables': len(constraints['free_variables']),
+                          'equality_constraints': len(constraints['equality_constraints']),
+                          'inequality_constraints': len(constraints['inequality_constraints']),
+                          'derivative_constraints': len(constraints['derivative_constraints']),
+                          'compile': compile_histogram.to_dict()}
+                result.update(benchmark.control_loop(controller, args.ticks))
+                results[key] = result
+    return {'meta': {'git_commit': git_commit(),
+                     'time': time(),
+                     'python': platform.python_version(),
+                     'machine': platform.machine(),
+                     'prediction_horizon': args.prediction_horizon,
+                     'sample_period': args.sample_period,
+                     'ticks': args.ticks,
+                     'compile_repeats': args.compile_repeats},
+            'results': results}
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], statistic: str, threshold: float) -> bool:
+    """
+    Prints the relative change of statistic for every measurement that is in old and new.
+    :return: True if a measurement got slower by more than threshold
+    """
+    regression = False
+    print(f'{"measurement":<70} {"old":>10} {"new":>10} {"change":>8}')
+    for key in sorted(set(old['results']).intersection(new['results'])):
+        for measurement, old_value in sorted(old['results'][key].items()):
+            new_value = new['results'][key].get(measurement)
+            if not isinstance(old_value, dict) or not isinstance(new_value, dict):
+                continue
+            old_time, new_time = old_value[statistic], new_value[statistic]
+            if old_time <= 0:
+                continue
+            change = new_time / old_time - 1
+            flag = ''
+            if change > threshold:
+                flag = ' <- regression'
+                regression = True
+            print(f'{f"{key}/{measurement}":<70} {old_time * 1000:>8.3f}ms {new_time * 1000:>8.3f}ms '
+                  f'{change * 100:>+7.1f}%{flag}')
+    for key in sorted(set(old['results']).symmetric_difference(new['results'])):
+        print(f'{key} is only in {"old" if key in old["results"] else "new"}')
+    return regression
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run')
+    run_parser.add_argument('-o', '--output', default='benchmark.json')
+    run_parser.add_argument('--robots', nargs='+', default=list(robots), choices=list(robots))
+    run_parser.add_argument('--solvers', nargs='+', choices=[s.name for s in SupportedQPSolver],
+                            help='default is all installed solvers')
+    run_parser.add_argument('--goal_sets', nargs='+', default=default_goal_sets,
+                            help=f'comma separated <goal type>=<number>, goal types: {goal_types}, '
+                                 f'-1 means as many as possible')
+    run_parser.add_argument('--ticks', type=int, default=200)
+    run_parser.add_argument('--compile_repeats', type=int, default=3)
+    run_parser.add_argument('--prediction_horizon', type=int, default=9)
+    run_parser.add_argument('--sample_period', type=float, default=0.05)
+    compare_parser = subparsers.add_parser('compare')
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--statistic', default='mean', choices=['mean', 'min', 'p50', 'p90', 'p99', 'max'])
+    compare_parser.add_argument('--threshold', type=float, default=0.1,
+                                help='relative slow down that counts as regression')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        results = run(args)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'Saved results to {args.output}')
+    else:
+        with open(args.old, 'r') as f:
+            old_results = json.load(f)
+        with open(args.new, 'r') as f:
+            new_results = json.load(f)
+        sys.exit(int(compare(old_results, new_results, args.statistic, args.threshold)))
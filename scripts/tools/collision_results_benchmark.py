@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""
+Micro benchmark for SortedCollisionResults, compares the bounded insertion with sorting on every insert.
+usage: collision_results_benchmark.py [number of contacts ...]
+"""
+import sys
+import timeit
+
+import numpy as np
+
+from giskardpy.model.collision_world_syncer import Collision, SortedCollisionResults
+
+
+class SortOnInsert(SortedCollisionResults):
+    """
+    The old behavior, every contact is kept and the list is sorted after each insert.
+    """
+
+    def add(self, element):
+        self.data.append(element)
+        self.data = list(sorted(self.data, key=self.key))
+        return True
+
+
+def random_contacts(number_of_contacts: int, seed: int = 1337):
+    rng = np.random.default_rng(seed)
+    return [Collision(link_a='a', link_b=f'b{i}', contact_distance=d)
+            for i, d in enumerate(rng.uniform(-0.01, 0.2, number_of_contacts))]
+
+
+def fill(results: SortedCollisionResults, contacts):
+    for contact in contacts:
+        results.add(contact)
+
+
+if __name__ == '__main__':
+    contact_counts = [int(x) for x in sys.argv[1:]] or [10, 100, 500, 1000]
+    max_size = 4
+    print(f'{"contacts":>8} {"sort on insert":>16} {"top k":>10} {"speed up":>9}')
+    for number_of_contacts in contact_counts:
+        contacts = random_contacts(number_of_contacts)
+        expected = sorted(contacts, key=lambda c: c.contact_distance)[:max_size]
+        top_k = SortedCollisionResults(max_size)
+        fill(top_k, contacts)
+        assert top_k.data == expected
+        repeat = max(1, 2000 // number_of_contacts)
+        old = min(timeit.repeat(lambda: fill(SortOnInsert(), contacts), number=repeat, repeat=3)) / repeat
+        new = min(timeit.repeat(lambda: fill(SortedCollisionResults(max_size), contacts), number=repeat,
+                                repeat=3)) / repeat
+        print(f'{number_of_contacts:>8} {old * 1000:>14.3f}ms {new * 1000:>8.3f}ms {old / new:>8.1f}x')
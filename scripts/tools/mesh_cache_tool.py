@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+"""
+Fills the mesh cache offline, such that Giskard doesn't have to convert and decompose meshes on startup.
+usage: mesh_cache_tool.py [-j processes] [--cache_dir dir] urdf_or_mesh [urdf_or_mesh ...]
+"""
+import argparse
+import os
+import xml.etree.ElementTree as ET
+from typing import List
+
+from giskardpy.configs.giskard import Giskard
+from giskardpy.model.bpb_wrapper import preprocess_meshes, mesh_cache_folder_name
+from giskardpy.utils.utils import resolve_ros_iris
+
+
+def collision_meshes_of_urdf(file_name: str) -> List[str]:
+    root = ET.parse(file_name).getroot()
+    return [mesh.attrib['filename'] for mesh in root.iterfind('.//collision/geometry/mesh')]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+', help='urdfs, whose collision meshes will be processed, or meshes')
+    parser.add_argument('-j', '--processes', type=int, default=None, help='default is number of cpus')
+    parser.add_argument('--cache_dir', default=os.path.join(Giskard.path_to_data_folder, mesh_cache_folder_name))
+    args = parser.parse_args()
+
+    mesh_file_names = []
+    for file_name in args.files:
+        file_name = resolve_ros_iris(file_name)
+        if file_name.endswith('.urdf'):
+            mesh_file_names.extend(collision_meshes_of_urdf(file_name))
+        else:
+            mesh_file_names.append(file_name)
+    number_of_new_meshes = preprocess_meshes(mesh_file_names, number_of_processes=args.processes,
+                                             cache_dir=args.cache_dir)
+    print(f'Processed {number_of_new_meshes} of {len(set(mesh_file_names))} meshes, the others were already in '
+          f'{args.cache_dir}.')
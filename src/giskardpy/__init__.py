@@ -3,8 +3,13 @@ import builtins
 try:
     builtins.profile  #type: ignore
 except AttributeError:
-    # No line profiler, provide a pass-through version
-    def profile(func): return func
+    import os
+    if 'GISKARDPY_PROFILE' in os.environ:
+        # No line profiler, time every call with giskardpy.utils.profiling.Profiler
+        from giskardpy.utils.profiling import profile
+    else:
+        # No line profiler, provide a pass-through version
+        def profile(func): return func
     builtins.profile = profile #type: ignore
 
 DEBUG = 0
@@ -10,7 +10,7 @@ import geometry_msgs.msg as geometry_msgs
 import rospy
 from scipy import sparse as sp
 from giskardpy.my_types import PrefixName, Derivatives
-from giskardpy.utils import logging
+from giskardpy.utils import logging, codegen
 
 builtin_max = builtins.max
 builtin_min = builtins.min
@@ -24,17 +24,30 @@ class StackedCompiledFunction:
     def __init__(self, expressions, parameters=None, additional_views=None):
         combined_expression = vstack(expressions)
         self.compiled_f = combined_expression.compile(parameters=parameters)
-        slices = []
+        self.slices = []
         start = 0
         for expression in expressions[:-1]:
             end = start + expression.shape[0]
-            slices.append(end)
+            self.slices.append(end)
             start = end
-        self.split_out_view = np.split(self.compiled_f.out, slices)
-        if additional_views is not None:
-            for expression_slice in additional_views:
+        self.additional_views = additional_views
+        self._create_views()
+
+    def _create_views(self):
+        self.split_out_view = np.split(self.compiled_f.out, self.slices)
+        if self.additional_views is not None:
+            for expression_slice in self.additional_views:
                 self.split_out_view.append(self.compiled_f.out[expression_slice])
 
+    def __getstate__(self):
+        return {'compiled_f': self.compiled_f,
+                'slices': self.slices,
+                'additional_views': self.additional_views}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._create_views()
+
     @profile
     def fast_call(self, filtered_args):
         self.compiled_f.fast_call(filtered_args)
@@ -44,6 +57,7 @@ class StackedCompiledFunction:
 class CompiledFunction:
     def __init__(self, expression, parameters=None, sparse=False):
         self.sparse = sparse
+        self.code_generation = codegen.enabled
         if len(expression) == 0:
             self.sparse = False
         if parameters is None:
@@ -55,35 +69,87 @@ class CompiledFunction:
 
         if self.sparse:
             expression.s = ca.sparsify(expression.s)
-            try:
-                self.compiled_f = ca.Function('f', parameters, [expression.s])
-            except Exception:
-                self.compiled_f = ca.Function('f', parameters, expression.s)
-            self.buf, self.f_eval = self.compiled_f.buffer()
-            self.csc_indices, self.csc_indptr = expression.s.sparsity().get_ccs()
-            self.out = sp.csc_matrix((np.zeros(expression.s.nnz()), self.csc_indptr, self.csc_indices))
-            self.buf.set_res(0, memoryview(self.out.data))
+            self._split_constant_nonzeros(expression.s)
+            parametric_nonzeros = expression.s.nz[self.parametric_indices.tolist()]
+            self.expression_f = ca.Function('f', parameters, [parametric_nonzeros])
         else:
             try:
-                self.compiled_f = ca.Function('f', parameters, [ca.densify(expression.s)])
+                self.expression_f = ca.Function('f', parameters, [ca.densify(expression.s)])
             except Exception:
-                self.compiled_f = ca.Function('f', parameters, ca.densify(expression.s))
-            self.buf, self.f_eval = self.compiled_f.buffer()
-            if expression.shape[1] == 1:
-                shape = expression.shape[0]
+                self.expression_f = ca.Function('f', parameters, ca.densify(expression.s))
+        self._setup_buffer()
+
+    def _split_constant_nonzeros(self, expression: ca.SX):
+        """
+        Partitions the nonzeros of a sparse expression into constant and parametric ones.
+        The constant ones are evaluated once here, only the parametric ones are part of expression_f.
+        """
+        self.shape = expression.shape
+        self.csc_indices, self.csc_indptr = expression.sparsity().get_ccs()
+        constant_filter = np.array([nonzero.is_constant() for nonzero in expression.nonzeros()], dtype=bool)
+        self.parametric_indices = np.where(~constant_filter)[0]
+        self.constant_data = np.zeros(expression.nnz())
+        constant_indices = np.where(constant_filter)[0]
+        if len(constant_indices) > 0:
+            constant_nonzeros = expression.nz[constant_indices.tolist()]
+            self.constant_data[constant_indices] = np.array(ca.evalf(constant_nonzeros)).reshape(-1)
+
+    def _setup_buffer(self):
+        self.compiled_f = self.expression_f
+        if self.code_generation and len(self.str_params) > 0:
+            self.compiled_f = codegen.compile_function(self.compiled_f)
+        self.buf, self.f_eval = self.compiled_f.buffer()
+        if self.sparse:
+            # constant nonzeros are written once, fast_call only scatters the parametric ones into out.data
+            self.out = sp.csc_matrix((self.constant_data.copy(), self.csc_indptr, self.csc_indices), shape=self.shape)
+            self.parametric_out = np.zeros(len(self.parametric_indices))
+            self.buf.set_res(0, memoryview(self.parametric_out))
+        else:
+            if self.compiled_f.size2_out(0) == 1:
+                shape = self.compiled_f.size1_out(0)
             else:
-                shape = expression.shape
+                shape = self.compiled_f.size_out(0)
             self.out = np.zeros(shape, order='F')
             self.buf.set_res(0, memoryview(self.out))
         if len(self.str_params) == 0:
             self.f_eval()
             if self.sparse:
+                self.out.data[self.parametric_indices] = self.parametric_out
                 result = self.out.toarray()
             else:
                 result = self.out
             self.__call__ = lambda **kwargs: result
             self.fast_call = lambda filtered_args: result
 
+    def __getstate__(self):
+        """
+        casadi buffers can't be pickled, only the function itself, which is serialized and recompiled on load.
+        """
+        state = {'expression_f': self.expression_f.serialize(),
+                 'str_params': self.str_params,
+                 'sparse': self.sparse,
+                 'code_generation': self.code_generation}
+        if self.sparse:
+            state.update({'shape': self.shape,
+                          'csc_indices': self.csc_indices,
+                          'csc_indptr': self.csc_indptr,
+                          'parametric_indices': self.parametric_indices,
+                          'constant_data': self.constant_data})
+        return state
+
+    def __setstate__(self, state):
+        self.sparse = state['sparse']
+        self.str_params = state['str_params']
+        self.code_generation = state['code_generation']
+        self.expression_f = ca.Function.deserialize(state['expression_f'])
+        if self.sparse:
+            self.shape = state['shape']
+            self.csc_indices = state['csc_indices']
+            self.csc_indptr = state['csc_indptr']
+            self.parametric_indices = state['parametric_indices']
+            self.constant_data = state['constant_data']
+        self._setup_buffer()
+
     def __call__(self, **kwargs):
         filtered_args = [kwargs[k] for k in self.str_params]
         filtered_args = np.array(filtered_args, dtype=float)
@@ -96,6 +162,8 @@ class CompiledFunction:
         """
         self.buf.set_arg(0, memoryview(filtered_args))
         self.f_eval()
+        if self.sparse:
+            self.out.data[self.parametric_indices] = self.parametric_out
         return self.out
 
 
@@ -106,6 +174,8 @@ def _operation_type_error(arg1, operation, arg2):
 
 class Symbol_:
     s: ca.SX
+    # True, if s may be referenced by other expressions, it is copied before it is modified
+    _shared: bool = False
 
     def __str__(self):
         return str(self.s)
@@ -129,8 +199,20 @@ class Symbol_:
             value = value.s
         except AttributeError:
             pass
+        if self._shared:
+            self.s = copy(self.s)
+            self._shared = False
         self.s[key] = value
 
+    def view(self):
+        """
+        A cheap copy, that shares the casadi matrix with this expression, until one of them is modified.
+        """
+        result = copy(self)
+        self._shared = True
+        result._shared = True
+        return result
+
     @property
     def shape(self):
         return self.s.shape
@@ -1433,6 +1515,13 @@ def zeros(x, y):
     return Expression(ca.SX.zeros(x, y))
 
 
+def sparse_zeros(x, y):
+    """
+    Like zeros, but without structural nonzeros, assigning a block only adds the nonzeros of that block.
+    """
+    return Expression(ca.SX(x, y))
+
+
 def ones(x, y):
     return Expression(ca.SX.ones(x, y))
 
@@ -1720,7 +1809,7 @@ def hstack(list_of_matrices):
 def diag_stack(list_of_matrices):
     num_rows = int(math.fsum(e.shape[0] for e in list_of_matrices))
     num_columns = int(math.fsum(e.shape[1] for e in list_of_matrices))
-    combined_matrix = zeros(num_rows, num_columns)
+    combined_matrix = sparse_zeros(num_rows, num_columns)
     row_counter = 0
     column_counter = 0
     for matrix in list_of_matrices:
@@ -22,6 +22,8 @@ def _operation_type_error(arg1: object, operation: str, arg2: object) -> TypeErr
 class StackedCompiledFunction:
     compiled_f: CompiledFunction
     split_out_view: List[np.ndarray]
+    slices: List[int]
+    additional_views: Optional[List[slice]]
 
     def __init__(self, expressions: List[Expression], parameters: Optional[List[str]] = None,
                  additional_views: Optional[List[slice]] = None): ...
@@ -31,11 +33,13 @@ class StackedCompiledFunction:
 
 class CompiledFunction:
     str_params: List[str]
+    expression_f: ca.Function
     compiled_f: ca.Function
     buf: ca.FunctionBuffer
     f_eval: functools.partial
     out: Union[np.ndarray, sp.csc_matrix]
     sparse: bool
+    code_generation: bool
 
     def __init__(self,  expression: Symbol_, parameters: Optional[List[str]] = None, sparse: bool = False): ...
 
@@ -1,10 +1,15 @@
+import os
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Optional, Type
 
 from giskardpy import identifier
 from giskardpy.god_map import GodMap
+from giskardpy.model.trajectory import Trajectory
+from giskardpy.tree.behaviors.collision_checker import CollisionChecker
+from giskardpy.tree.behaviors.plugin import GiskardBehavior
 from giskardpy.tree.behaviors.tf_publisher import TfPublishingModes
 from giskardpy.tree.garden import OpenLoop, ClosedLoop, StandAlone, ControlModes, TreeManager
+from giskardpy.utils.profiling import Profiler
 
 
 class BehaviorTreeConfig(ABC):
@@ -115,12 +120,53 @@ class BehaviorTreeConfig(ABC):
         """
         self.tree_manager.add_tf_publisher(include_prefix=include_prefix, tf_topic=tf_topic, mode=mode)
 
+    def enable_profiling(self, sample_rate: int = 1, dump_at_goal_end: bool = True):
+        """
+        Records timing histograms of behaviors and of the phases of each control cycle, e.g. substitution,
+        function evaluation, filtering, solver call, collision check and fk.
+        Use Profiler().query() to get them at runtime.
+        :param sample_rate: only every sample_rate-th call is timed
+        :param dump_at_goal_end: save the histograms of each goal in <path_to_data_folder>/profiling/
+        """
+        dump_folder = None
+        if dump_at_goal_end:
+            dump_folder = os.path.join(self.god_map.get_data(identifier.tmp_folder), 'profiling')
+        Profiler().configure(enabled=True, sample_rate=sample_rate, dump_folder=dump_folder)
+
+    def spill_trajectories_to_disk(self, threshold: float = 100, folder: Optional[str] = None):
+        """
+        Trajectories that need more than threshold MB are moved into memory mapped temporary files.
+        Useful for very long executions.
+        :param folder: where the temporary files are created, default is <path_to_data_folder>/trajectories/
+        """
+        if folder is None:
+            folder = os.path.join(self.god_map.get_data(identifier.tmp_folder), 'trajectories')
+        os.makedirs(folder, exist_ok=True)
+        Trajectory.spill_threshold = int(threshold * 1e6)
+        Trajectory.spill_folder = folder
+
     def add_js_publisher(self, include_prefix: bool = True, js_topic: str = 'joint_states'):
         """
         Publishes joint states for Giskard's internal state.
         """
         self.tree_manager.add_js_publisher(include_prefix=include_prefix, js_topic=js_topic)
 
+    def set_behavior_rate(self, behavior_type: Type[GiskardBehavior], rate: Optional[float] = None,
+                          deadline: Optional[float] = None):
+        """
+        Ticks behaviors of this type in the control loop with a lower rate than the controller.
+        The rate is rounded to a multiple of the control cycle. Only affects behaviors that were already added.
+        :param rate: in Hz, None to tick them in every control cycle
+        :param deadline: maximum time of one tick in s, missed deadlines and jitter are reported at the end of a goal
+        """
+        self.tree_manager.set_behavior_rate(behavior_type, rate=rate, deadline=deadline)
+
+    def set_collision_checking_rate(self, rate: Optional[float] = None, deadline: Optional[float] = None):
+        """
+        Check for collisions less often than the controller runs, e.g. 10Hz while the control loop runs at 20Hz.
+        """
+        self.set_behavior_rate(CollisionChecker, rate=rate, deadline=deadline)
+
 
 class StandAloneBTConfig(BehaviorTreeConfig):
     def __init__(self, planning_sleep: Optional[float] = None, publish_js=False):
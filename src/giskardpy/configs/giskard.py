@@ -15,7 +15,7 @@ from giskardpy.goals.goal import Goal
 from giskardpy.god_map import GodMap
 from giskardpy.god_map_user import GodMapWorshipper
 from giskardpy.utils import logging
-from giskardpy.utils.utils import resolve_ros_iris, get_all_classes_in_package
+from giskardpy.utils.utils import resolve_ros_iris, LazyClassRegistry
 
 
 class Giskard(GodMapWorshipper):
@@ -97,7 +97,8 @@ class Giskard(GodMapWorshipper):
             logging.loginfo('No cmd_vel topic has been registered.')
 
     def add_goal_package_name(self, package_name: str):
-        new_goals = get_all_classes_in_package(package_name, Goal)
+        # the known packages are needed to recognize goals that inherit from goals in other packages
+        new_goals = LazyClassRegistry(Goal, self.goal_package_paths).add_package(package_name)
         if len(new_goals) == 0:
             raise GiskardException(f'No classes of type \'{Goal.__name__}\' found in {package_name}.')
         logging.loginfo(f'Made goal classes {new_goals} available Giskard.')
@@ -8,6 +8,8 @@ from giskardpy.my_types import Derivatives
 
 
 class SupportedQPSolver(IntEnum):
+    # benchmarks the installed solvers on the first control cycles, see qp/solver_selection.py
+    auto = 0
     qpSWIFT = 1
     qpalm = 2
     gurobi = 3
@@ -34,6 +36,12 @@ class QPControllerConfig:
     retries_with_relaxed_constraints: int = 5
     added_slack: float = 100
     weight_factor: float = 100
+    controller_cache_size: int = 10
+    persistent_controller_cache: bool = False
+    code_generation: bool = False
+    warm_start: bool = False
+    incremental_compilation: bool = False
+    reuse_buffers: bool = False
 
     def __init__(self,
                  qp_solver: Optional[SupportedQPSolver] = None,
@@ -42,9 +50,17 @@ class QPControllerConfig:
                  max_trajectory_length: Optional[float] = 30,
                  retries_with_relaxed_constraints: int = 5,
                  added_slack: float = 100,
-                 weight_factor: float = 100):
+                 weight_factor: float = 100,
+                 controller_cache_size: int = 10,
+                 persistent_controller_cache: bool = False,
+                 code_generation: bool = False,
+                 warm_start: bool = False,
+                 incremental_compilation: bool = False,
+                 reuse_buffers: bool = False):
         """
         :param qp_solver: if not set, Giskard will search for the fasted installed solver.
+                          If set to auto, Giskard measures all installed solvers on the first control cycles of a goal
+                          and uses the fastest. The decision is saved per problem size in the data folder.
         :param prediction_horizon: Giskard uses MPC and this is the length of the horizon. You usually don't need to change this.
         :param sample_period: time (s) difference between commands in the MPC horizon.
         :param max_trajectory_length: Giskard will stop planning/controlling the robot until this amount of s has passed.
@@ -52,6 +68,21 @@ class QPControllerConfig:
         :param retries_with_relaxed_constraints: don't change, only for the pros.
         :param added_slack: don't change, only for the pros.
         :param weight_factor: don't change, only for the pros.
+        :param controller_cache_size: number of compiled controllers that are kept in memory, such that goals
+                                      with the same structure don't have to be compiled again. 0 disables the cache.
+        :param persistent_controller_cache: if True, compiled controllers are also saved in the data folder and
+                                            reused after restarts. Each controller takes a few MB and at most 100
+                                            are kept.
+        :param code_generation: if True, the qp matrices are compiled to C with the system compiler, which makes
+                                their evaluation faster, but the first compilation of a controller slower.
+                                Falls back to interpreted casadi functions, if no compiler is found.
+        :param warm_start: if True, the solution of the last control cycle is used as initial guess for the next one.
+                           Only supported by qpalm and gurobi.
+        :param incremental_compilation: if True, the jacobians of constraints are cached, such that only constraints
+                                        of goals that changed since the last controller have to be derived again.
+        :param reuse_buffers: if True, the qp solver filters and formats the problem in buffers that are allocated once,
+                              instead of allocating new arrays every control cycle, which reduces latency jitter.
+                              Only supported by qpalm, qpSWIFT and gurobi.
         """
         self.__qp_solver = qp_solver
         if prediction_horizon < 7:
@@ -62,6 +93,12 @@ class QPControllerConfig:
         self.__retries_with_relaxed_constraints = retries_with_relaxed_constraints
         self.__added_slack = added_slack
         self.__weight_factor = weight_factor
+        self.__controller_cache_size = controller_cache_size
+        self.__persistent_controller_cache = persistent_controller_cache
+        self.__code_generation = code_generation
+        self.__warm_start = warm_start
+        self.__incremental_compilation = incremental_compilation
+        self.__reuse_buffers = reuse_buffers
         self.__endless_mode = self.__max_trajectory_length is None
         self.set_defaults()
 
@@ -72,6 +109,12 @@ class QPControllerConfig:
         self.retries_with_relaxed_constraints = self.__retries_with_relaxed_constraints
         self.added_slack = self.__added_slack
         self.weight_factor = self.__weight_factor
+        self.controller_cache_size = self.__controller_cache_size
+        self.persistent_controller_cache = self.__persistent_controller_cache
+        self.code_generation = self.__code_generation
+        self.warm_start = self.__warm_start
+        self.incremental_compilation = self.__incremental_compilation
+        self.reuse_buffers = self.__reuse_buffers
         self.endless_mode = self.__endless_mode
         self.max_trajectory_length = self.__max_trajectory_length
 
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from collections import defaultdict, deque
 from copy import deepcopy
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Sequence
 
 import numpy as np
 from sensor_msgs.msg import JointState
@@ -55,9 +55,14 @@ class _JointState:
                  snap: float = 0,
                  crackle: float = 0,
                  pop: float = 0):
-        self.state: np.ndarray = [position, velocity, acceleration, jerk, snap, crackle, pop]
+        self.state: np.ndarray = np.array([position, velocity, acceleration, jerk, snap, crackle, pop], dtype=float)
+        # the JointStates whose buffer self.state is a view of, None if self owns its state
+        self._owner: Optional[JointStates] = None
 
     def __getitem__(self, derivative):
+        if isinstance(derivative, str):
+            # like a list, such that the god map falls back to getattr for e.g. 'position'
+            raise TypeError(f'{self.__class__.__name__} indices must be derivatives, not str')
         return self.state[derivative]
 
     def __setitem__(self, derivative, value):
@@ -131,10 +136,142 @@ class _JointState:
     def __deepcopy__(self, memodict=None):
         return _JointState(*self.state)
 
+    def __reduce__(self):
+        return _JointState, tuple(self.state)
+
 
 class JointStates(defaultdict):
+    """
+    Maps joint names to _JointStates, whose values are stored in one contiguous array with one row per joint.
+    The _JointStates are views into that array, such that all values can be read with a single gather,
+    see flat_buffer and GodMap.unsafe_get_values.
+    Assigning a _JointState that is not part of a JointStates adopts it, others are copied.
+    """
+    initial_capacity = 16
+
     def __init__(self, *args, **kwargs):
-        super().__init__(_JointState, *args, **kwargs)
+        super().__init__(_JointState)
+        self._data = np.zeros((self.initial_capacity, len(Derivatives)))
+        self.flat_buffer = self._data.reshape(-1)
+        self._rows: Dict[str, int] = {}
+        self._msg_rows: Dict[tuple, np.ndarray] = {}
+        # changes whenever a row is moved or flat_buffer is replaced
+        self.layout_version = 0
+        self.update(*args, **kwargs)
+
+    @property
+    def data(self) -> np.ndarray:
+        """
+        The used part of the state buffer, a view of shape (number of joints, number of derivatives).
+        """
+        return self._data[:len(self._rows)]
+
+    def row(self, joint_name: str) -> int:
+        if joint_name not in self._rows:
+            # creates the joint state
+            self[joint_name]
+        return self._rows[joint_name]
+
+    def rows(self, joint_names: List[str]) -> np.ndarray:
+        return np.array([self.row(joint_name) for joint_name in joint_names], dtype=int)
+
+    def msg_rows(self, joint_names: Sequence[str], prefix: Optional[str] = None) -> np.ndarray:
+        """
+        Like rows, but for the names in a JointState msg. Cached until the layout changes.
+        """
+        key = (tuple(joint_names), prefix)
+        if key not in self._msg_rows:
+            rows = self.rows([PrefixName(joint_name, prefix) for joint_name in joint_names])
+            self._msg_rows[key] = rows
+        return self._msg_rows[key]
+
+    def flat_buffer_index(self, identifier: Sequence) -> Optional[int]:
+        """
+        :param identifier: the part of a god map identifier after this JointStates, e.g. (joint_name, 0) or
+                            (joint_name, 'position')
+        :return: index of the value in flat_buffer or None, if it is not in the buffer
+        """
+        if len(identifier) != 2 or identifier[0] not in self._rows:
+            return None
+        derivative = identifier[1]
+        try:
+            if isinstance(derivative, str):
+                derivative = Derivatives[derivative]
+            derivative = Derivatives(derivative)
+        except (KeyError, ValueError):
+            return None
+        return self._rows[identifier[0]] * len(Derivatives) + derivative
+
+    def _resize(self, capacity: int):
+        data = np.zeros((capacity, len(Derivatives)))
+        data[:len(self._rows)] = self._data[:len(self._rows)]
+        self._data = data
+        self.flat_buffer = self._data.reshape(-1)
+        for joint_name, row in self._rows.items():
+            super().__getitem__(joint_name).state = self._data[row]
+        self._layout_changed()
+
+    def _layout_changed(self):
+        self.layout_version += 1
+        self._msg_rows = {}
+
+    def __setitem__(self, joint_name: str, joint_state: _JointState):
+        if joint_name in self._rows:
+            old_joint_state = super().__getitem__(joint_name)
+            if old_joint_state is joint_state:
+                return
+            row = self._rows[joint_name]
+            self._data[row] = joint_state.state
+            if joint_state._owner is not None:
+                # keep the existing view, such that the value isn't shared between two buffers
+                return
+            old_joint_state.state = old_joint_state.state.copy()
+            old_joint_state._owner = None
+        else:
+            if len(self._rows) == self._data.shape[0]:
+                self._resize(self._data.shape[0] * 2)
+            row = len(self._rows)
+            self._rows[joint_name] = row
+            self._data[row] = joint_state.state
+            if joint_state._owner is not None:
+                joint_state = _JointState()
+        joint_state.state = self._data[row]
+        joint_state._owner = self
+        super().__setitem__(joint_name, joint_state)
+
+    def __delitem__(self, joint_name: str):
+        joint_state = super().__getitem__(joint_name)
+        super().__delitem__(joint_name)
+        joint_state.state = joint_state.state.copy()
+        joint_state._owner = None
+        # fill the gap with the last row, to keep the buffer contiguous
+        row = self._rows.pop(joint_name)
+        last_row = len(self._rows)
+        if row != last_row:
+            last_joint_name = next(k for k, v in self._rows.items() if v == last_row)
+            self._data[row] = self._data[last_row]
+            self._rows[last_joint_name] = row
+            super().__getitem__(last_joint_name).state = self._data[row]
+        self._data[last_row] = 0
+        self._layout_changed()
+
+    def update(self, *args, **kwargs):
+        for joint_name, joint_state in dict(*args, **kwargs).items():
+            self[joint_name] = joint_state
+
+    def pop(self, joint_name: str, *default):
+        if joint_name not in self and default:
+            return default[0]
+        joint_state = self[joint_name]
+        del self[joint_name]
+        return joint_state
+
+    def clear(self):
+        for joint_name in list(self.keys()):
+            del self[joint_name]
+
+    def __reduce__(self):
+        return self.__class__, (), None, None, iter(self.items())
 
     @classmethod
     def from_msg(cls, msg: JointState, prefix: Optional[str] = None) -> JointStates:
@@ -153,8 +290,9 @@ class JointStates(defaultdict):
 
     def __deepcopy__(self, memodict={}):
         new_js = JointStates()
+        new_js._resize(self._data.shape[0])
         for joint_name, joint_state in self.items():
-            new_js[joint_name] = deepcopy(joint_state)
+            new_js[joint_name] = joint_state
         return new_js
 
     def to_position_dict(self):
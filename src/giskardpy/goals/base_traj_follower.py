@@ -145,7 +145,7 @@ class BaseTrajFollower(Goal):
     @profile
     def make_constraints(self):
         trajectory = self.god_map.get_data(identifier.trajectory)
-        self.trajectory_length = len(trajectory.items())
+        self.trajectory_length = len(trajectory)
         self.add_trans_constraints()
         self.add_rot_constraints()
 
@@ -3,7 +3,7 @@ import numbers
 from collections import defaultdict
 from copy import copy, deepcopy
 from multiprocessing import RLock
-from typing import Sequence, Union, Any, List
+from typing import Sequence, Union, Any, List, Dict, Tuple, Optional
 
 import numpy as np
 from geometry_msgs.msg import Pose, Point, Vector3, PoseStamped, PointStamped, Vector3Stamped, QuaternionStamped, \
@@ -183,6 +183,71 @@ def get_data(identifier: Sequence[Union[str, int, Sequence[Union[str, int]]]], d
     return result, shortcut
 
 
+class GatherPlan:
+    """
+    Precomputed lookup for GodMap.unsafe_get_values.
+    Values of identifiers that point into an object with a flat buffer, e.g. JointStates, are copied with one
+    numpy gather per object instead of resolving every identifier individually.
+    Such objects have to provide:
+        flat_buffer: a 1d np.ndarray with the values
+        layout_version: has to change whenever flat_buffer is replaced or values are moved
+        flat_buffer_index(identifier_suffix) -> Optional[int]: index of the value at the identifier in flat_buffer
+    All other identifiers are resolved with GodMap.unsafe_get_data.
+    """
+
+    def __init__(self, god_map: 'GodMap', symbols: List[str]):
+        self.size = len(symbols)
+        # prefix -> [buffer object, layout_version, positions in result, indices in flat_buffer]
+        self.sources: Dict[Tuple, list] = {}
+        self.fallback: List[Tuple[int, Tuple]] = []
+        resolved_prefixes: Dict[Tuple, Any] = {}
+        for position, expr in enumerate(symbols):
+            key = god_map.expr_to_key[expr]
+            for prefix_length in range(1, len(key)):
+                prefix = key[:prefix_length]
+                if prefix not in resolved_prefixes:
+                    try:
+                        resolved_prefixes[prefix] = god_map.unsafe_get_data(prefix)
+                    except Exception:
+                        resolved_prefixes[prefix] = None
+                obj = resolved_prefixes[prefix]
+                if hasattr(obj, 'flat_buffer_index'):
+                    index = obj.flat_buffer_index(key[prefix_length:])
+                    if index is not None:
+                        if prefix not in self.sources:
+                            self.sources[prefix] = [obj, obj.layout_version, [], []]
+                        self.sources[prefix][2].append(position)
+                        self.sources[prefix][3].append(index)
+                        break
+            else:
+                self.fallback.append((position, key))
+        for source in self.sources.values():
+            source[2] = np.array(source[2], dtype=int)
+            source[3] = np.array(source[3], dtype=int)
+
+    def is_valid(self, god_map: 'GodMap') -> bool:
+        for prefix, (obj, layout_version, _, _) in self.sources.items():
+            try:
+                if god_map.unsafe_get_data(prefix) is not obj or obj.layout_version != layout_version:
+                    return False
+            except KeyError:
+                return False
+        return True
+
+    def gather(self, god_map: 'GodMap') -> np.ndarray:
+        result = np.empty(self.size, dtype=float)
+        for obj, _, positions, indices in self.sources.values():
+            result[positions] = obj.flat_buffer[indices]
+        for position, key in self.fallback:
+            value = god_map.unsafe_get_data(key)
+            try:
+                result[position] = value
+            except (ValueError, TypeError):
+                logging.logerr(f'{key} has wrong dimensions: {value}')
+                raise
+        return result
+
+
 class GodMap(metaclass=SingletonMeta):
     """
     Data structure used by tree to exchange information.
@@ -193,6 +258,7 @@ class GodMap(metaclass=SingletonMeta):
     expr_to_key: dict
     last_expr_values: dict
     shortcuts: dict
+    gather_plans: Dict[Tuple[str, ...], GatherPlan]
 
     def __init__(self):
         self.clear()
@@ -205,6 +271,7 @@ class GodMap(metaclass=SingletonMeta):
         self.expr_to_key = {}
         self.last_expr_values = {}
         self.shortcuts = {}
+        self.gather_plans = {}
 
     def __enter__(self):
         self.lock.acquire()
@@ -256,6 +323,7 @@ class GodMap(metaclass=SingletonMeta):
 
     def clear_cache(self):
         self.shortcuts = {}
+        self.gather_plans = {}
 
     def to_symbol(self, identifier) -> w.Symbol:
         """
@@ -408,20 +476,12 @@ class GodMap(metaclass=SingletonMeta):
         """
         :return: an array which maps all registered expressions to their values or 0 if there is no number entry
         """
-        try:
-            return np.array([self.unsafe_get_data(self.expr_to_key[expr]) for expr in symbols], dtype=float)
-        except ValueError as e:
-            data = []
-            for expr in symbols:
-                key = self.expr_to_key[expr]
-                value = self.unsafe_get_data(key)
-                data.append(value)
-                try:
-                    np.array(data, dtype=float)
-                except:
-                    logging.logerr(f'{key} has wrong dimensions: {value}')
-                    raise e
-            raise e
+        plan_key = tuple(symbols)
+        plan = self.gather_plans.get(plan_key)
+        if plan is None or not plan.is_valid(self):
+            plan = GatherPlan(self, symbols)
+            self.gather_plans[plan_key] = plan
+        return plan.gather(self)
 
 
     def evaluate_expr(self, expr: w.Expression):
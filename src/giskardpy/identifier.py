@@ -59,6 +59,12 @@ prediction_horizon = qp_controller_config + ['prediction_horizon']
 retries_with_relaxed_constraints = qp_controller_config + ['retries_with_relaxed_constraints']
 retry_added_slack = qp_controller_config + ['added_slack']
 retry_weight_factor = qp_controller_config + ['weight_factor']
+controller_cache_size = qp_controller_config + ['controller_cache_size']
+persistent_controller_cache = qp_controller_config + ['persistent_controller_cache']
+code_generation = qp_controller_config + ['code_generation']
+warm_start = qp_controller_config + ['warm_start']
+incremental_compilation = qp_controller_config + ['incremental_compilation']
+reuse_buffers = qp_controller_config + ['reuse_buffers']
 
 # behavior tree
 tree_manager = ['behavior_tree']
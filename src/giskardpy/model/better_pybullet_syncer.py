@@ -1,5 +1,6 @@
+from bisect import bisect_left
 from collections import defaultdict
-from typing import Dict, Tuple, DefaultDict, List, Set, Optional, Iterable
+from typing import Dict, Tuple, DefaultDict, List, Set, Optional, Iterable, Callable
 
 import betterpybullet as bpb
 import numpy as np
@@ -11,9 +12,11 @@ from sortedcontainers import SortedDict
 from giskardpy import identifier
 from giskardpy.configs.collision_avoidance_config import CollisionCheckerLib
 from giskardpy.model.bpb_wrapper import create_cube_shape, create_object, create_sphere_shape, create_cylinder_shape, \
-    load_convex_mesh_shape, create_shape_from_link, to_giskard_collision
-from giskardpy.model.collision_world_syncer import CollisionWorldSynchronizer, Collision, Collisions
-from giskardpy.model.links import BoxGeometry, SphereGeometry, CylinderGeometry, MeshGeometry, Link
+    load_convex_mesh_shape, create_shape_from_link, to_giskard_collision, preprocess_meshes, \
+    create_object_from_geometries
+from giskardpy.model.collision_world_syncer import CollisionWorldSynchronizer, Collision, Collisions, \
+    CollisionBuffer
+from giskardpy.model.links import BoxGeometry, SphereGeometry, CylinderGeometry, MeshGeometry, Link, LinkGeometry
 from giskardpy.my_types import PrefixName
 from giskardpy.utils import logging
 from giskardpy.utils.tfwrapper import np_to_pose
@@ -25,7 +28,14 @@ class BetterPyBulletSyncer(CollisionWorldSynchronizer):
     def __init__(self,):
         self.kw = bpb.KineverseWorld()
         self.object_name_to_id: Dict[PrefixName, bpb.CollisionObject] = {}
-        self.query: Optional[DefaultDict[PrefixName, Set[Tuple[bpb.CollisionObject, float]]]] = None
+        # link name -> (link, collision geometries) at the time its collision object was created
+        self.object_sources: Dict[PrefixName, Tuple[Link, Tuple]] = {}
+        # objects sorted by link name, the order of compute_all_collision_fks
+        self.link_names_in_order: List[PrefixName] = []
+        self.objects_in_order: List[bpb.CollisionObject] = []
+        self.query: Optional[Dict[Tuple[bpb.CollisionObject, bpb.CollisionObject], float]] = None
+        # link name -> keys of self.query that contain the link
+        self.query_keys_of_link: DefaultDict[PrefixName, Set[Tuple[PrefixName, PrefixName]]] = defaultdict(set)
         super().__init__()
 
     @classmethod
@@ -41,9 +51,39 @@ class BetterPyBulletSyncer(CollisionWorldSynchronizer):
         o = create_shape_from_link(link)
         self.kw.add_collision_object(o)
         self.object_name_to_id[link.name] = o
+        self.object_sources[link.name] = (link, tuple(link.collisions))
+        i = bisect_left(self.link_names_in_order, link.name)
+        self.link_names_in_order.insert(i, link.name)
+        self.objects_in_order.insert(i, o)
+
+    @profile
+    def remove_object(self, link_name: PrefixName):
+        o = self.object_name_to_id.pop(link_name)
+        del self.object_sources[link_name]
+        self.kw.remove_collision_object(o)
+        i = bisect_left(self.link_names_in_order, link_name)
+        del self.link_names_in_order[i]
+        del self.objects_in_order[i]
+
+    def is_object_outdated(self, link_name: PrefixName) -> bool:
+        """
+        :return: True if the link was removed from the world or its collision geometries changed since its
+                    collision object was created. Reparented links are not outdated, they only move.
+        """
+        if link_name not in self.world.links:
+            return True
+        link = self.world.links[link_name]
+        old_link, old_collisions = self.object_sources[link_name]
+        return link is not old_link \
+               or len(link.collisions) != len(old_collisions) \
+               or any(a is not b for a, b in zip(link.collisions, old_collisions))
 
     def reset_cache(self):
         self.query = None
+        self.query_keys_of_link = defaultdict(set)
+        self.clear_memos()
+
+    def clear_memos(self):
         for method_name in dir(self):
             try:
                 getattr(self, method_name).memo.clear()
@@ -54,9 +94,37 @@ class BetterPyBulletSyncer(CollisionWorldSynchronizer):
     def cut_off_distances_to_query(self, cut_off_distances: Dict[Tuple[PrefixName, PrefixName], float],
                                    buffer: float = 0.05) -> DefaultDict[PrefixName, Set[Tuple[bpb.CollisionObject, float]]]:
         if self.query is None:
-            self.query = {(self.object_name_to_id[a], self.object_name_to_id[b]): v + buffer for (a, b), v in cut_off_distances.items()}
+            self.query = {}
+            self.query_keys_of_link = defaultdict(set)
+            for (a, b), v in cut_off_distances.items():
+                self.query[self.object_name_to_id[a], self.object_name_to_id[b]] = v + buffer
+                self.query_keys_of_link[a].add((a, b))
+                self.query_keys_of_link[b].add((a, b))
         return self.query
 
+    @profile
+    def update_query(self, old_objects: Dict[PrefixName, bpb.CollisionObject]):
+        """
+        Replaces the collision objects of changed links in the cached query and removes the entries of deleted links.
+        :param old_objects: link name -> collision object that got removed
+        """
+        if self.query is None:
+            return
+        changed_keys = set()
+        for link_name in old_objects:
+            changed_keys.update(self.query_keys_of_link[link_name])
+        for a, b in changed_keys:
+            old_key = tuple(old_objects[x] if x in old_objects else self.object_name_to_id[x] for x in (a, b))
+            distance = self.query.pop(old_key)
+            if a in self.object_name_to_id and b in self.object_name_to_id:
+                self.query[self.object_name_to_id[a], self.object_name_to_id[b]] = distance
+            else:
+                self.query_keys_of_link[a].discard((a, b))
+                self.query_keys_of_link[b].discard((a, b))
+        for link_name in old_objects:
+            if link_name not in self.object_name_to_id:
+                self.query_keys_of_link.pop(link_name, None)
+
     @profile
     def check_collisions(self, cut_off_distances: Dict[Tuple[PrefixName, PrefixName], float],
                          collision_list_sizes: int, buffer: float = 0.05) -> Collisions:
@@ -70,21 +138,37 @@ class BetterPyBulletSyncer(CollisionWorldSynchronizer):
         result: List[bpb.Collision] = self.kw.get_closest_filtered_map_batch(query)
         return self.bpb_result_to_collisions(result, collision_list_sizes)
 
+    @profile
+    def update_collision_buffer(self, cut_off_distances: Dict[Tuple[PrefixName, PrefixName], float],
+                                collision_list_size: int = 15, buffer: float = 0.05) -> CollisionBuffer:
+        query = self.cut_off_distances_to_query(cut_off_distances, buffer=buffer)
+        result: List[bpb.Collision] = self.kw.get_closest_filtered_map_batch(query)
+        self.collision_buffer.configure(collision_list_size)
+        return self.bpb_result_to_buffer(result)
+
     @profile
     def find_colliding_combinations(self, link_combinations: Iterable[Tuple[PrefixName, PrefixName]],
                                     distance: float,
-                                    update_query: bool) -> Set[Tuple[PrefixName, PrefixName, float]]:
+                                    update_query: bool,
+                                    collision_fks: Optional[np.ndarray] = None) \
+            -> Set[Tuple[PrefixName, PrefixName, float]]:
         if update_query:
             self.query = None
             cut_off_distance = {link_combination: distance for link_combination in link_combinations}
         else:
             cut_off_distance = {}
-        self.sync()
+        self.sync(collision_fks)
         collisions = self.check_collisions(cut_off_distance, 15, buffer=0.0)
         colliding_combinations = {(c.original_link_a, c.original_link_b, c.contact_distance) for c in collisions.all_collisions
                                   if c.contact_distance <= distance}
         return colliding_combinations
 
+    def self_collision_matrix_worker(self) -> Tuple[Callable, tuple]:
+        self.sync()
+        collision_geometries = [(link_name, list(self.object_sources[link_name][1]))
+                                for link_name in self.link_names_in_order]
+        return BetterPyBulletWorker, (collision_geometries,)
+
     @profile
     def bpb_result_to_collisions(self, result: List[bpb.Collision],
                                  collision_list_size: int) -> Collisions:
@@ -95,6 +179,20 @@ class BetterPyBulletSyncer(CollisionWorldSynchronizer):
             collisions.add(giskard_collision)
         return collisions
 
+    @profile
+    def bpb_result_to_buffer(self, result: List[bpb.Collision]) -> CollisionBuffer:
+        n = len(result)
+        if n == 0:
+            self.collision_buffer.reset()
+            return self.collision_buffer
+        self.collision_buffer.fill(link_a=[c.obj_a.name for c in result],
+                                   link_b=[c.obj_b.name for c in result],
+                                   contact_distance=np.fromiter((c.contact_distance for c in result), float, n),
+                                   map_P_pa=np.array([c.map_P_pa for c in result], dtype=float).reshape(n, -1),
+                                   map_P_pb=np.array([c.map_P_pb for c in result], dtype=float).reshape(n, -1),
+                                   map_V_n=np.array([c.world_V_n for c in result], dtype=float).reshape(n, -1))
+        return self.collision_buffer
+
     def check_collision(self, link_a, link_b, distance):
         self.sync()
         query = defaultdict(set)
@@ -111,26 +209,61 @@ class BetterPyBulletSyncer(CollisionWorldSynchronizer):
         return result
 
     @profile
-    def sync(self):
-        super().sync()
+    def sync(self, collision_fks: Optional[np.ndarray] = None):
+        super().sync(collision_fks)
         if self.has_world_changed():
             self.sync_links_with_world()
-            self.reset_cache()
-            logging.logdebug('hard sync')
-            for o in self.kw.collision_objects:
-                self.kw.remove_collision_object(o)
-            self.object_name_to_id = {}
-            self.objects_in_order = []
-
-            for link_name in sorted(self.world.link_names_with_collisions):
-                link = self.world.links[link_name]
-                self.add_object(link)
-                self.objects_in_order.append(self.object_name_to_id[link_name])
-            bpb.batch_set_transforms(self.objects_in_order, self.world.compute_all_collision_fks())
-        else:
-            bpb.batch_set_transforms(self.objects_in_order, self.world.compute_all_collision_fks())
+            self.clear_memos()
+            old_objects = self.sync_collision_objects()
+            self.update_query(old_objects)
+        if collision_fks is None:
+            collision_fks = self.world.compute_all_collision_fks()
+        bpb.batch_set_transforms(self.objects_in_order, collision_fks)
+
+    @profile
+    def sync_collision_objects(self) -> Dict[PrefixName, bpb.CollisionObject]:
+        """
+        Only creates collision objects for new links and links whose collision geometries changed and removes
+        those of deleted links, the shapes of all other links are reused.
+        :return: link name -> removed collision object
+        """
+        old_objects = {}
+        for link_name in list(self.object_name_to_id):
+            if self.is_object_outdated(link_name):
+                old_objects[link_name] = self.object_name_to_id[link_name]
+                self.remove_object(link_name)
+        new_links = [self.world.links[link_name] for link_name in sorted(self.world.link_names_with_collisions)
+                     if link_name not in self.object_name_to_id]
+        preprocess_meshes(geometry.file_name_absolute for link in new_links for geometry in link.collisions
+                          if isinstance(geometry, MeshGeometry))
+        for link in new_links:
+            self.add_object(link)
+        logging.logdebug(f'synced collision objects, removed {len(old_objects)}, created {len(new_links)}')
+        return old_objects
 
     @profile
     def get_map_T_geometry(self, link_name: PrefixName, collision_id: int = 0) -> Pose:
         collision_object = self.object_name_to_id[link_name]
         return collision_object.compound_transform(collision_id)
+
+
+class BetterPyBulletWorker(BetterPyBulletSyncer):
+    """
+    A copy of the collision objects of a BetterPyBulletSyncer without a world, such that collision checks can run in
+    a spawned process. It can only be synced with collision fks.
+    """
+
+    def __init__(self, collision_geometries: List[Tuple[PrefixName, List[LinkGeometry]]]):
+        """
+        :param collision_geometries: link name -> collision geometries, sorted by link name
+        """
+        super().__init__()
+        for link_name, geometries in collision_geometries:
+            o = create_object_from_geometries(link_name, geometries)
+            self.kw.add_collision_object(o)
+            self.object_name_to_id[link_name] = o
+            self.link_names_in_order.append(link_name)
+            self.objects_in_order.append(o)
+
+    def has_world_changed(self) -> bool:
+        return False
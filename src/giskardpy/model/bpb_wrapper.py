@@ -1,18 +1,19 @@
+import multiprocessing
 import os
-from typing import List, Tuple, Optional
+import shutil
+import tempfile
+from typing import List, Tuple, Optional, Dict, Iterable
 
 import betterpybullet as pb
 import numpy as np
 import trimesh
 
-from giskardpy import identifier
-from giskardpy.god_map import GodMap
 from giskardpy.model.collision_world_syncer import Collision
 from giskardpy.model.links import Link, LinkGeometry, BoxGeometry, SphereGeometry, CylinderGeometry, MeshGeometry
 from giskardpy.my_types import my_string, PrefixName
 from giskardpy.utils import logging
 from giskardpy.utils.math import inverse_frame
-from giskardpy.utils.utils import resolve_ros_iris, to_tmp_path, write_to_tmp, suppress_stdout
+from giskardpy.utils.utils import resolve_ros_iris, to_tmp_path, suppress_stdout, get_file_hash, create_path
 
 CollisionObject = pb.CollisionObject
 
@@ -103,20 +104,17 @@ def create_shape_from_geometry(geometry: LinkGeometry) -> pb.CollisionShape:
 
 
 def create_shape_from_link(link: Link, collision_id: int = 0) -> pb.CollisionObject:
-    # if len(link.collisions) > 1:
+    return create_object_from_geometries(link.name, link.collisions)
+
+
+def create_object_from_geometries(name: PrefixName, geometries: List[LinkGeometry]) -> pb.CollisionObject:
     shapes = []
-    map_T_o = None
-    for collision_id, geometry in enumerate(link.collisions):
-        if map_T_o is None:
-            shape = create_shape_from_geometry(geometry)
-        else:
-            shape = create_shape_from_geometry(geometry)
+    for geometry in geometries:
+        shape = create_shape_from_geometry(geometry)
         link_T_geometry = pb.Transform.from_np(geometry.link_T_geometry.evaluate())
         shapes.append((link_T_geometry, shape))
     shape = create_compound_shape(shapes_poses=shapes)
-    # else:
-    #     shape = create_shape_from_geometry(link.collisions[0])
-    return create_object(link.name, shape, pb.Transform.identity())
+    return create_object(name, shape, pb.Transform.identity())
 
 
 def create_compound_shape(shapes_poses: List[Tuple[pb.Transform, pb.CollisionShape]] = None) -> pb.CompoundShape:
@@ -138,31 +136,119 @@ def load_convex_mesh_shape(pkg_filename: str, single_shape=False, scale=(1, 1, 1
                                 scaling=pb.Vector3(scale[0], scale[1], scale[2]))
 
 
-def convert_to_decomposed_obj_and_save_in_tmp(file_name: str, log_path='/tmp/giskardpy/vhacd.log'):
-    first_group_name = list(GodMap().get_data(identifier.world).groups.keys())[0]
-    resolved_old_path = resolve_ros_iris(file_name)
-    short_file_name = file_name.split('/')[-1][:-3]
-    obj_file_name = f'{first_group_name}/{short_file_name}obj'
-    new_path_original = to_tmp_path(obj_file_name)
-    if not os.path.exists(new_path_original):
-        mesh = trimesh.load(resolved_old_path, force='mesh')
-        obj_str = trimesh.exchange.obj.export_obj(mesh)
-        write_to_tmp(obj_file_name, obj_str)
-        logging.loginfo(f'Converted {file_name} to obj and saved in {new_path_original}.')
-    new_path = new_path_original
-
-    new_path_decomposed = new_path_original.replace('.obj', '_decomposed.obj')
-    if not os.path.exists(new_path_decomposed):
-        mesh = trimesh.load(new_path_original, force='mesh')
-        if not trimesh.convex.is_convex(mesh):
-            logging.loginfo(f'{file_name} is not convex, applying vhacd.')
-            with suppress_stdout():
-                pb.vhacd(new_path_original, new_path_decomposed, log_path)
-            new_path = new_path_decomposed
+mesh_cache_folder_name = 'mesh_cache'
+# (file name, modification time, size) -> content hash, such that meshes are only hashed once
+_mesh_hashes: Dict[Tuple[str, int, int], str] = {}
+
+
+def get_mesh_hash(file_name: str) -> Optional[str]:
+    """
+    :return: content hash of file_name, None if it can't be read
+    """
+    stat = os.stat(file_name)
+    key = (file_name, stat.st_mtime_ns, stat.st_size)
+    if key not in _mesh_hashes:
+        file_hash = get_file_hash(file_name)
+        if file_hash is None:
+            return None
+        _mesh_hashes[key] = file_hash
+    return _mesh_hashes[key]
+
+
+def get_mesh_cache_paths(file_name: str, cache_dir: Optional[str] = None) -> Optional[Tuple[str, str]]:
+    """
+    Converted and decomposed meshes are saved under the content hash of the original mesh, such that they are shared
+    between robots and don't go stale, when the mesh changes.
+    The scale is not part of the key, because it is applied when the shape is loaded and scaling a convex mesh keeps
+    it convex.
+    :param file_name: absolute path of the original mesh
+    :param cache_dir: default is <tmp folder>/mesh_cache
+    :return: path of the converted obj, path of its convex decomposition,
+                None if the mesh can't be hashed and therefore not be cached
+    """
+    if cache_dir is None:
+        cache_dir = to_tmp_path(mesh_cache_folder_name)
+    file_hash = get_mesh_hash(file_name)
+    if file_hash is None:
+        return None
+    return os.path.join(cache_dir, f'{file_hash}.obj'), os.path.join(cache_dir, f'{file_hash}_decomposed.obj')
+
+
+def convert_and_decompose_mesh(file_name: str, obj_path: str, decomposed_path: str, log_path: str):
+    """
+    Converts file_name to obj and applies vhacd, if it is not convex. A convex mesh is its own decomposition.
+    Files are written to a temporary name first, such that multiple processes can fill the cache at the same time.
+    Doesn't use the god map, such that it can run in a process pool.
+    """
+    create_path(obj_path)
+    tmp_suffix = f'.tmp{os.getpid()}.obj'
+    if not os.path.exists(obj_path):
+        mesh = trimesh.load(file_name, force='mesh')
+        with open(obj_path + tmp_suffix, 'w') as f:
+            f.write(trimesh.exchange.obj.export_obj(mesh))
+        os.replace(obj_path + tmp_suffix, obj_path)
+        logging.loginfo(f'Converted {file_name} to obj and saved in {obj_path}.')
+    mesh = trimesh.load(obj_path, force='mesh')
+    if trimesh.convex.is_convex(mesh):
+        shutil.copyfile(obj_path, decomposed_path + tmp_suffix)
     else:
-        new_path = new_path_decomposed
-
-    return new_path
+        logging.loginfo(f'{file_name} is not convex, applying vhacd.')
+        with suppress_stdout():
+            pb.vhacd(obj_path, decomposed_path + tmp_suffix, log_path)
+    os.replace(decomposed_path + tmp_suffix, decomposed_path)
+
+
+def convert_to_decomposed_obj_and_save_in_tmp(file_name: str, log_path: str = '/tmp/giskardpy/vhacd.log',
+                                              cache_dir: Optional[str] = None) -> str:
+    """
+    :return: path to the convex decomposition of file_name, it is computed if it is not in the cache yet.
+    """
+    resolved_path = resolve_ros_iris(file_name)
+    cache_paths = get_mesh_cache_paths(resolved_path, cache_dir)
+    if cache_paths is None:
+        logging.logwarn(f'Failed to hash {file_name}, its convex decomposition will not be cached.')
+        tmp_dir = tempfile.mkdtemp(prefix='giskardpy_mesh_')
+        obj_path, decomposed_path = os.path.join(tmp_dir, 'mesh.obj'), os.path.join(tmp_dir, 'mesh_decomposed.obj')
+        convert_and_decompose_mesh(resolved_path, obj_path, decomposed_path, log_path)
+        return decomposed_path
+    obj_path, decomposed_path = cache_paths
+    if not os.path.exists(decomposed_path):
+        convert_and_decompose_mesh(resolved_path, obj_path, decomposed_path, log_path)
+    return decomposed_path
+
+
+def preprocess_meshes(file_names: Iterable[str], number_of_processes: Optional[int] = None,
+                      log_path: str = '/tmp/giskardpy/vhacd.log', cache_dir: Optional[str] = None) -> int:
+    """
+    Fills the mesh cache for all meshes that are not in it yet, in parallel.
+    :param file_names: meshes, obj files are skipped because they are loaded directly. Meshes that can't be hashed
+                        are skipped too, they are processed without cache when they are loaded.
+    :param number_of_processes: None to use all cpus
+    :return: number of meshes that had to be processed
+    """
+    jobs = {}
+    for file_name in file_names:
+        if file_name.endswith('.obj'):
+            continue
+        resolved_path = resolve_ros_iris(file_name)
+        cache_paths = get_mesh_cache_paths(resolved_path, cache_dir)
+        if cache_paths is None:
+            continue
+        obj_path, decomposed_path = cache_paths
+        if not os.path.exists(decomposed_path):
+            jobs[decomposed_path] = (resolved_path, obj_path, decomposed_path, log_path)
+    if number_of_processes is None:
+        number_of_processes = multiprocessing.cpu_count()
+    number_of_processes = min(number_of_processes, len(jobs))
+    if number_of_processes > 1:
+        logging.loginfo(f'Preprocessing {len(jobs)} meshes with {number_of_processes} processes.')
+        # forking a process with ros threads is not safe
+        with multiprocessing.get_context('spawn').Pool(number_of_processes) as pool:
+            pool.starmap(convert_and_decompose_mesh, jobs.values())
+    else:
+        for job in jobs.values():
+            convert_and_decompose_mesh(*job)
+    return len(jobs)
 
 
 def create_object(name: PrefixName, shape: pb.CollisionShape, transform: Optional[pb.Transform] = None) \
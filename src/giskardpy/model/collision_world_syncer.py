@@ -1,11 +1,14 @@
 import os
 import itertools
-from collections import defaultdict
+import multiprocessing
+from bisect import bisect_right
+from collections import defaultdict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from enum import Enum
 from copy import deepcopy
 from itertools import product, combinations_with_replacement, combinations
 from time import time
-from typing import List, Dict, Optional, Tuple, Iterable, Set, DefaultDict, Callable, Union
+from typing import List, Dict, Optional, Tuple, Iterable, Set, DefaultDict, Callable, Union, Any, Sequence
 
 from geometry_msgs.msg import Pose
 from lxml import etree
@@ -145,17 +148,37 @@ class SortedCollisionResults:
     default_result.new_b_P_pb = [0, 0, 0, 1]
     default_result.new_b_V_n = [0, 0, 1, 0]
 
-    def __init__(self):
+    def __init__(self, max_size: Optional[int] = None):
+        """
+        :param max_size: only the max_size closest collisions are kept, None to keep all of them
+        """
         self.data = []
+        self.distances = []
+        self.max_size = max_size
 
         def sort(x):
             return x.contact_distance
 
         self.key = sort
 
-    def add(self, element):
-        self.data.append(element)
-        self.data = list(sorted(self.data, key=self.key))
+    def add(self, element: Collision) -> bool:
+        """
+        :return: whether element was kept
+        """
+        distance = self.key(element)
+        # bisect_right keeps the insertion order of equal distances, like sorted did
+        i = bisect_right(self.distances, distance)
+        if self.max_size is not None and i >= self.max_size:
+            return False
+        self.data.insert(i, element)
+        self.distances.insert(i, distance)
+        if self.max_size is not None and len(self.data) > self.max_size:
+            self.data.pop()
+            self.distances.pop()
+        return True
+
+    def __len__(self):
+        return len(self.data)
 
     def __getitem__(self, item):
         try:
@@ -175,8 +198,8 @@ class Collisions:
         self.world: WorldTree = self.god_map.get_data(identifier.world)
         self.collision_list_size = collision_list_size
 
-        self.self_collisions = defaultdict(SortedCollisionResults)
-        self.external_collision = defaultdict(SortedCollisionResults)
+        self.self_collisions = defaultdict(lambda: SortedCollisionResults(self.collision_list_size))
+        self.external_collision = defaultdict(lambda: SortedCollisionResults(self.collision_list_size))
         self.external_collision_long_key = defaultdict(lambda: SortedCollisionResults.default_result)
         self.all_collisions = set()
         self.number_of_self_collisions = defaultdict(int)
@@ -196,8 +219,7 @@ class Collisions:
             collision = self.transform_external_collision(collision)
             key = collision.link_a
             self.external_collision[key].add(collision)
-            self.number_of_external_collisions[key] = min(self.collision_list_size,
-                                                          self.number_of_external_collisions[key] + 1)
+            self.number_of_external_collisions[key] = len(self.external_collision[key])
             key_long = (collision.original_link_a, collision.original_link_b)
             if key_long not in self.external_collision_long_key:
                 self.external_collision_long_key[key_long] = collision
@@ -208,8 +230,7 @@ class Collisions:
             collision = self.transform_self_collision(collision, robot)
             key = collision.link_a, collision.link_b
             self.self_collisions[key].add(collision)
-            self.number_of_self_collisions[key] = min(self.collision_list_size,
-                                                      self.number_of_self_collisions[key] + 1)
+            self.number_of_self_collisions[key] = len(self.self_collisions[key])
         self.all_collisions.add(collision)
 
     @profile
@@ -244,17 +265,7 @@ class Collisions:
 
     @profile
     def transform_external_collision(self, collision: Collision) -> Collision:
-        link_name = collision.original_link_a
-        joint = self.world.links[link_name].parent_joint_name
-
-        def stopper(joint_name):
-            return self.world.is_joint_controlled(joint_name) and joint_name not in self.fixed_joints
-
-        try:
-            movable_joint = self.world.search_for_parent_joint(joint, stopper)
-        except KeyError as e:
-            movable_joint = joint
-        new_a = self.world.joints[movable_joint].child_link_name
+        new_a = external_collision_link(self.world, collision.original_link_a, self.fixed_joints)
         collision.link_a = new_a
         if collision.map_P_pa is not None:
             new_a_T_map = self.world.compute_fk_np(new_a, self.world.root_link_name)
@@ -303,6 +314,374 @@ class Collisions:
         return item in self.self_collisions or item in self.external_collision
 
 
+class CollisionBuffer:
+    """
+    Preallocated replacement for Collisions, that is used by the collision avoidance goals.
+    Every checked link (pair) owns a fixed number of consecutive rows in a structured numpy array, one per
+    repeller, sorted by contact distance. Unused rows hold the values of SortedCollisionResults.default_result.
+    The rows are filled with vectorized transforms and the goal symbols are gathered directly from flat_buffer,
+    see GodMap.GatherPlan.
+    The identifiers of Collisions still work, e.g. ['get_external_collisions', (link_name,), idx, 'new_a_P_pa', 0].
+    """
+    dtype = np.dtype([('contact_distance', float),
+                      ('link_b_hash', float),
+                      ('number_of_collisions', float),
+                      ('original_link_a_id', float),
+                      ('original_link_b_id', float),
+                      ('link_a_id', float),
+                      ('map_P_pa', float, 4),
+                      ('map_P_pb', float, 4),
+                      ('map_V_n', float, 4),
+                      ('new_a_P_pa', float, 4),
+                      ('new_b_P_pb', float, 4),
+                      ('new_b_V_n', float, 4)])
+    row_size = dtype.itemsize // np.dtype(float).itemsize
+    external = 'get_external_collisions'
+    self_ = 'get_self_collisions'
+    long_key = 'get_external_collisions_long_key'
+    _number_of = {'get_number_of_external_collisions': external,
+                  'get_number_of_self_collisions': self_}
+
+    def __init__(self, collision_list_size: int = 1):
+        self.god_map = GodMap()
+        self.layout_version = 0
+        self.collision_list_size = max(collision_list_size, 1)
+        self.default_row = np.zeros(1, dtype=self.dtype)[0]
+        default = SortedCollisionResults.default_result
+        self.default_row['contact_distance'] = default.contact_distance
+        self.default_row['link_b_hash'] = default.link_b_hash
+        self.default_row['original_link_a_id'] = -1
+        self.default_row['original_link_b_id'] = -1
+        self.default_row['link_a_id'] = -1
+        for field in ['map_P_pa', 'map_P_pb', 'map_V_n']:
+            self.default_row[field] = getattr(default, field)
+        for field in ['new_a_P_pa', 'new_b_P_pb', 'new_b_V_n']:
+            self.default_row[field] = getattr(default, field)
+        self.link_names: List[PrefixName] = []
+        self.link_hashes: List[int] = []
+        self.link_ids: Dict[PrefixName, int] = {}
+        self.free_link_ids: List[int] = []
+        self.clear()
+
+    def clear(self):
+        """
+        Forgets all slots.
+        """
+        self.slots: Dict[str, Dict[Any, int]] = {self.external: {}, self.self_: {}, self.long_key: {}}
+        # slot size -> first rows of released slots, they are reused before the buffer grows
+        self.free_slots: Dict[int, List[int]] = defaultdict(list)
+        self.number_of_rows = 0
+        self.data = np.empty(16, dtype=self.dtype)
+        self.flat_buffer = self.data.view(float)
+        self.data[:] = self.default_row
+        self._contact_info = {}
+        self._contact_info_version = None
+        self.layout_version += 1
+
+    def configure(self, collision_list_size: int):
+        """
+        :param collision_list_size: rows per external link or self collision pair
+        """
+        collision_list_size = max(collision_list_size, 1)
+        if collision_list_size != self.collision_list_size:
+            self.collision_list_size = collision_list_size
+            self.clear()
+
+    def reset(self):
+        """
+        Sets all rows back to the default values.
+        """
+        self.data[:self.number_of_rows] = self.default_row
+
+    def slot(self, kind: str, key: Any) -> int:
+        """
+        :param kind: CollisionBuffer.external, CollisionBuffer.self_ or CollisionBuffer.long_key
+        :return: the first row of the slot for key, a new slot is created, if key doesn't have one.
+        """
+        slots = self.slots[kind]
+        if key not in slots:
+            size = self._slot_size(kind)
+            if len(self.free_slots[size]) > 0:
+                slots[key] = self.free_slots[size].pop()
+            else:
+                if self.number_of_rows + size > len(self.data):
+                    self._resize(max(len(self.data) * 2, self.number_of_rows + size))
+                slots[key] = self.number_of_rows
+                self.number_of_rows += size
+        return slots[key]
+
+    def _slot_size(self, kind: str) -> int:
+        return 1 if kind == self.long_key else self.collision_list_size
+
+    def release_removed_links(self, link_names: Set[PrefixName]):
+        """
+        Frees the slots of all keys that contain a link, which is not in link_names anymore, e.g. because an object
+        was deleted, and the ids of these links. Freed slots and ids are reused for new keys and links.
+        :param link_names: all links of the world
+        """
+        released = False
+        for kind, slots in self.slots.items():
+            size = self._slot_size(kind)
+            for key in list(slots):
+                key_link_names = (key,) if kind == self.external else key
+                if any(link_name not in link_names for link_name in key_link_names):
+                    start = slots.pop(key)
+                    self.data[start:start + size] = self.default_row
+                    self.free_slots[size].append(start)
+                    released = True
+        for link_name in [link_name for link_name in self.link_ids if link_name not in link_names]:
+            self.free_link_ids.append(self.link_ids.pop(link_name))
+            released = True
+        if released:
+            # contact infos and gather plans may point to released slots
+            self._contact_info = {}
+            self._contact_info_version = None
+            self.layout_version += 1
+
+    def _resize(self, capacity: int):
+        data = np.empty(capacity, dtype=self.dtype)
+        data[:] = self.default_row
+        data[:self.number_of_rows] = self.data[:self.number_of_rows]
+        self.data = data
+        # row indices don't change, so there is no need to increase layout_version
+        self.flat_buffer = self.data.view(float)
+
+    def link_id(self, link_name: PrefixName) -> int:
+        if link_name not in self.link_ids:
+            if len(self.free_link_ids) > 0:
+                link_id = self.free_link_ids.pop()
+                self.link_names[link_id] = link_name
+                self.link_hashes[link_id] = link_name.__hash__()
+            else:
+                link_id = len(self.link_names)
+                self.link_names.append(link_name)
+                self.link_hashes.append(link_name.__hash__())
+            self.link_ids[link_name] = link_id
+        return self.link_ids[link_name]
+
+    def get_external_collisions(self, link_name: PrefixName) -> np.ndarray:
+        """
+        :return: the rows of link_name, sorted by contact distance
+        """
+        start = self.slot(self.external, link_name)
+        return self.data[start:start + self.collision_list_size]
+
+    def get_number_of_external_collisions(self, link_name: PrefixName) -> float:
+        return self.get_external_collisions(link_name)[0]['number_of_collisions']
+
+    def get_self_collisions(self, link_a: PrefixName, link_b: PrefixName) -> np.ndarray:
+        """
+        Make sure that link_a < link_b, the reverse collision is not saved.
+        """
+        start = self.slot(self.self_, (link_a, link_b))
+        return self.data[start:start + self.collision_list_size]
+
+    def get_number_of_self_collisions(self, link_a: PrefixName, link_b: PrefixName) -> float:
+        return self.get_self_collisions(link_a, link_b)[0]['number_of_collisions']
+
+    def get_external_collisions_long_key(self, link_a: PrefixName, link_b: PrefixName) -> np.void:
+        return self.data[self.slot(self.long_key, (link_a, link_b))]
+
+    def flat_buffer_index(self, identifier: Sequence) -> Optional[int]:
+        """
+        :param identifier: the part of a god map identifier after this buffer, e.g.
+                            ('get_external_collisions', (link_name,), idx, 'new_a_P_pa', 0)
+        :return: index of the value in flat_buffer or None, if it is not in the buffer
+        """
+        try:
+            kind, key, *rest = identifier
+            if kind in self._number_of:
+                if len(rest) > 0:
+                    return None
+                row = self.slot(self._number_of[kind], self._slot_key(self._number_of[kind], key))
+                return row * self.row_size + self._field_offset('number_of_collisions')
+            if kind == self.long_key:
+                idx = 0
+            elif kind in (self.external, self.self_):
+                idx, *rest = rest
+                if not 0 <= int(idx) < self.collision_list_size:
+                    return None
+            else:
+                return None
+            field, *component = rest
+            if field not in self.dtype.names:
+                return None
+            shape = self.dtype.fields[field][0].shape
+            if len(component) != len(shape):
+                return None
+            offset = self._field_offset(field)
+            if len(shape) > 0:
+                if not 0 <= int(component[0]) < shape[0]:
+                    return None
+                offset += int(component[0])
+            row = self.slot(kind, self._slot_key(kind, key)) + int(idx)
+            return row * self.row_size + offset
+        except (TypeError, ValueError):
+            return None
+
+    def _slot_key(self, kind: str, key: tuple) -> Any:
+        if kind == self.external:
+            link_name, = key
+            return link_name
+        link_a, link_b = key
+        return link_a, link_b
+
+    def _field_offset(self, field: str) -> int:
+        return self.dtype.fields[field][1] // np.dtype(float).itemsize
+
+    def contact_info(self, link_a: PrefixName, link_b: PrefixName) -> Tuple[int, int, bool, int, int, int, int]:
+        """
+        Classifies a contact between link_a and link_b like Collisions.add.
+        :return: (slot, long key slot or -1, reverse, original link a id, original link b id,
+                  new link a id, new link b id or -1)
+        """
+        world: WorldTree = self.god_map.unsafe_get_data(identifier.world)
+        if self._contact_info_version != world.model_version:
+            self._contact_info = {}
+            self._contact_info_version = world.model_version
+        key = link_a, link_b
+        if key not in self._contact_info:
+            collision_scene: CollisionWorldSynchronizer = self.god_map.unsafe_get_data(identifier.collision_scene)
+            robot = None
+            for r in collision_scene.robots:
+                if link_a in r.link_names_as_set and link_b in r.link_names_as_set:
+                    robot = r
+                    break
+            if robot is None:
+                new_a = external_collision_link(world, link_a, collision_scene.fixed_joints)
+                info = (self.slot(self.external, new_a), self.slot(self.long_key, key), False,
+                        self.link_id(link_a), self.link_id(link_b), self.link_id(new_a), -1)
+            else:
+                new_a, new_b = world.compute_chain_reduced_to_controlled_joints(link_a, link_b,
+                                                                                collision_scene.fixed_joints)
+                reverse = not world.link_order(new_a, new_b)
+                if reverse:
+                    new_a, new_b = new_b, new_a
+                    link_a, link_b = link_b, link_a
+                info = (self.slot(self.self_, (new_a, new_b)), -1, reverse,
+                        self.link_id(link_a), self.link_id(link_b), self.link_id(new_a), self.link_id(new_b))
+            self._contact_info[key] = info
+        return self._contact_info[key]
+
+    @profile
+    def fill(self,
+             link_a: Sequence[PrefixName],
+             link_b: Sequence[PrefixName],
+             contact_distance: np.ndarray,
+             map_P_pa: np.ndarray,
+             map_P_pb: np.ndarray,
+             map_V_n: np.ndarray):
+        """
+        Replaces the content of the buffer with new contacts.
+        :param link_a: original link a of each contact
+        :param link_b: original link b of each contact
+        :param contact_distance: shape (n,)
+        :param map_P_pa: shape (n, 3) or (n, 4)
+        :param map_P_pb: shape (n, 3) or (n, 4)
+        :param map_V_n: contact normal pointing from b to a, shape (n, 3) or (n, 4)
+        """
+        self.reset()
+        n = len(link_a)
+        if n == 0:
+            return
+        info = np.array([self.contact_info(a, b) for a, b in zip(link_a, link_b)], dtype=int).reshape(n, 7)
+        slot, long_slot, reverse, original_a_id, original_b_id, new_a_id, new_b_id = info.T
+        reverse = reverse.astype(bool)
+
+        contacts = np.empty(n, dtype=self.dtype)
+        contacts[:] = self.default_row
+        contacts['contact_distance'] = contact_distance
+        contacts['original_link_a_id'] = original_a_id
+        contacts['original_link_b_id'] = original_b_id
+        contacts['link_a_id'] = new_a_id
+        contacts['link_b_hash'] = np.array(self.link_hashes, dtype=float)[original_b_id]
+        map_P_pa = np.asarray(map_P_pa, dtype=float)[:, :3]
+        map_P_pb = np.asarray(map_P_pb, dtype=float)[:, :3]
+        map_V_n = np.asarray(map_V_n, dtype=float)[:, :3]
+        contacts['map_P_pa'][:, :3] = np.where(reverse[:, None], map_P_pb, map_P_pa)
+        contacts['map_P_pb'][:, :3] = np.where(reverse[:, None], map_P_pa, map_P_pb)
+        contacts['map_V_n'][:, :3] = np.where(reverse[:, None], -map_V_n, map_V_n)
+        contacts['map_P_pa'][:, 3] = 1
+        contacts['map_P_pb'][:, 3] = 1
+        contacts['map_V_n'][:, 3] = 0
+
+        # one fk per link instead of several per contact
+        world: WorldTree = self.god_map.unsafe_get_data(identifier.world)
+        used_link_ids, inverse = np.unique(np.concatenate((new_a_id, new_b_id)), return_inverse=True)
+        link_T_map = np.array([np.eye(4) if link_id < 0
+                               else world.compute_fk_np(self.link_names[link_id], world.root_link_name)
+                               for link_id in used_link_ids])
+        new_a_T_map = link_T_map[inverse[:n]]
+        new_b_T_map = link_T_map[inverse[n:]]
+        contacts['new_a_P_pa'] = np.einsum('nij,nj->ni', new_a_T_map, contacts['map_P_pa'])
+        is_self = new_b_id >= 0
+        contacts['new_b_P_pb'][is_self] = np.einsum('nij,nj->ni', new_b_T_map[is_self],
+                                                    contacts['map_P_pb'][is_self])
+        contacts['new_b_V_n'][is_self] = np.einsum('nij,nj->ni', new_b_T_map[is_self],
+                                                   contacts['map_V_n'][is_self])
+
+        # the collision_list_size closest contacts of each slot
+        order = np.lexsort((contact_distance, slot))
+        sorted_slot = slot[order]
+        group_starts = np.flatnonzero(np.r_[True, sorted_slot[1:] != sorted_slot[:-1]])
+        group_sizes = np.diff(np.r_[group_starts, n])
+        rank = np.arange(n) - np.repeat(group_starts, group_sizes)
+        keep = rank < self.collision_list_size
+        self.data[sorted_slot[keep] + rank[keep]] = contacts[order[keep]]
+        self.data['number_of_collisions'][sorted_slot[group_starts]] = np.minimum(group_sizes,
+                                                                                  self.collision_list_size)
+
+        # closest contact for each external link pair
+        external = np.flatnonzero(long_slot >= 0)
+        if len(external) > 0:
+            order = external[np.lexsort((contact_distance[external], long_slot[external]))]
+            sorted_slot = long_slot[order]
+            first = np.r_[True, sorted_slot[1:] != sorted_slot[:-1]]
+            self.data[sorted_slot[first]] = contacts[order[first]]
+
+    def fill_from_collisions(self, collisions: Iterable[Collision]):
+        """
+        Fills the buffer with untransformed Collisions, e.g. the results of a collision checker.
+        """
+        collisions = list(collisions)
+        self.fill(link_a=[c.original_link_a for c in collisions],
+                  link_b=[c.original_link_b for c in collisions],
+                  contact_distance=np.array([c.contact_distance for c in collisions], dtype=float),
+                  map_P_pa=np.array([c.map_P_pa for c in collisions], dtype=float).reshape(-1, 4),
+                  map_P_pb=np.array([c.map_P_pb for c in collisions], dtype=float).reshape(-1, 4),
+                  map_V_n=np.array([c.map_V_n for c in collisions], dtype=float).reshape(-1, 4))
+
+    def active_rows(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: rows that contain a contact and whether they belong to an external collision
+        """
+        rows = self.data[:self.number_of_rows]
+        is_external = np.zeros(self.number_of_rows, dtype=bool)
+        for start in self.slots[self.external].values():
+            is_external[start:start + self.collision_list_size] = True
+        active = rows['link_a_id'] >= 0
+        for start in self.slots[self.long_key].values():
+            # long key rows are copies of rows in the external slots
+            active[start] = False
+        return rows[active], is_external[active]
+
+
+def external_collision_link(world: WorldTree, link_name: PrefixName, fixed_joints: Tuple[PrefixName]) -> PrefixName:
+    """
+    :return: the child link of the first movable joint above link_name, which is used as key for external collisions
+    """
+    joint = world.links[link_name].parent_joint_name
+
+    def stopper(joint_name):
+        return world.is_joint_controlled(joint_name) and joint_name not in fixed_joints
+
+    try:
+        movable_joint = world.search_for_parent_joint(joint, stopper)
+    except KeyError as e:
+        movable_joint = joint
+    return world.joints[movable_joint].child_link_name
+
+
 class DisableCollisionReason(Enum):
     Unknown = -1
     Never = 1
@@ -311,6 +690,20 @@ class DisableCollisionReason(Enum):
     AlmostAlways = 4
 
 
+_self_collision_matrix_worker: Optional['CollisionWorldSynchronizer'] = None
+
+
+def _init_self_collision_matrix_worker(factory: Callable[..., 'CollisionWorldSynchronizer'], args: tuple):
+    global _self_collision_matrix_worker
+    _self_collision_matrix_worker = factory(*args)
+
+
+def _check_never_in_collision_chunk(*args) -> Tuple[Set[Tuple[PrefixName, PrefixName]],
+                                                     Dict[Tuple[PrefixName, PrefixName], Tuple[float, float]],
+                                                     Set[Tuple[PrefixName, PrefixName]]]:
+    return _self_collision_matrix_worker.check_never_in_collision_fks(*args)
+
+
 class CollisionWorldSynchronizer(GodMapWorshipper):
     self_collision_matrix: Dict[Tuple[PrefixName, PrefixName], DisableCollisionReason]
     self_collision_matrix_paths: Dict[str, str]
@@ -322,6 +715,10 @@ class CollisionWorldSynchronizer(GodMapWorshipper):
     srdf_moveit_disable_collisions = 'disable_collisions'
     collision_checker_id = CollisionCheckerLib.none
     _fixed_joints: Tuple[PrefixName]
+    # number of random samples, whose collision fks are computed at once
+    fk_batch_size = 100
+    # upper bound for the number of processes of the self collision matrix computation
+    max_number_of_processes = 8
 
     def __init__(self):
         self.self_collision_matrix = {}
@@ -330,6 +727,7 @@ class CollisionWorldSynchronizer(GodMapWorshipper):
         self.collision_avoidance_configs = defaultdict(CollisionAvoidanceGroupThresholds)
         self._fixed_joints = tuple()
         self.world_version = -1
+        self.collision_buffer = CollisionBuffer()
 
     @property
     def fixed_joints(self) -> Tuple[PrefixName]:
@@ -481,13 +879,19 @@ class CollisionWorldSynchronizer(GodMapWorshipper):
                                       almost_percentage: float = 0.95,
                                       number_of_tries_never: int = 10000,
                                       save_to_tmp: bool = True,
-                                      progress_callback: Optional[Callable[[int, str], None]] = None) \
+                                      progress_callback: Optional[Callable[[int, str], None]] = None,
+                                      number_of_processes: Optional[int] = None,
+                                      seed: int = 1337) \
             -> Dict[Tuple[PrefixName, PrefixName], DisableCollisionReason]:
+        """
+        :param number_of_processes: for the random samples of the never check, None to use all cpus
+        :param seed: the result is the same for the same seed, independent of number_of_processes
+        """
         if progress_callback is None:
             progress_callback = lambda value, text: None
         if not self.is_collision_checking_enabled:
             return {}
-        np.random.seed(1337)
+        rng = np.random.default_rng(seed)
         remaining_pairs = set()
         self_collision_matrix = {}
         group = self.world.groups[group_name]
@@ -514,7 +918,8 @@ class CollisionWorldSynchronizer(GodMapWorshipper):
             group=group,
             distance_threshold_always=distance_threshold_always,
             number_of_tries=number_of_tries_always,
-            almost_percentage=almost_percentage)
+            almost_percentage=almost_percentage,
+            rng=rng)
         self_collision_matrix.update(matrix_updates)
 
         # %%
@@ -526,7 +931,9 @@ class CollisionWorldSynchronizer(GodMapWorshipper):
             distance_threshold_never_range=distance_threshold_never_range,
             distance_threshold_never_zero=distance_threshold_never_zero,
             number_of_tries=number_of_tries_never,
-            progress_callback=progress_callback)
+            progress_callback=progress_callback,
+            number_of_processes=number_of_processes,
+            rng=rng)
         self_collision_matrix.update(matrix_updates)
 
         if save_to_tmp:
@@ -580,17 +987,22 @@ class CollisionWorldSynchronizer(GodMapWorshipper):
                                              group: WorldBranch,
                                              distance_threshold_always: float,
                                              number_of_tries: int = 200,
-                                             almost_percentage: float = 0.95) \
+                                             almost_percentage: float = 0.95,
+                                             rng: Optional[np.random.Generator] = None) \
             -> Tuple[Set[Tuple[PrefixName, PrefixName]], Dict[Tuple[PrefixName, PrefixName], DisableCollisionReason]]:
         """
         Disable link pairs that are (almost) always in collision.
         """
+        if rng is None:
+            rng = np.random.default_rng()
         with self.world.reset_joint_state_context():
             self_collision_matrix = {}
             remaining_pairs = deepcopy(link_combinations)
             counts: DefaultDict[Tuple[PrefixName, PrefixName], int] = defaultdict(int)
-            for try_id in range(int(number_of_tries)):
-                self.set_rnd_joint_state(group)
+            free_variable_names, samples = self.sample_joint_states(group, int(number_of_tries), rng)
+            rows = self.world.state.rows(free_variable_names)
+            for sample in samples:
+                self.world.state.data[rows, Derivatives.position] = sample
                 for link_a, link_b, _ in self.find_colliding_combinations(remaining_pairs, distance_threshold_always,
                                                                           True):
                     link_combination = self.world.sort_links(link_a, link_b)
@@ -609,39 +1021,46 @@ class CollisionWorldSynchronizer(GodMapWorshipper):
                                             distance_threshold_never_range: float,
                                             distance_threshold_never_zero: float,
                                             number_of_tries: int = 10000,
-                                            progress_callback: Optional[Callable[[int, str], None]] = None) \
+                                            progress_callback: Optional[Callable[[int, str], None]] = None,
+                                            number_of_processes: Optional[int] = None,
+                                            rng: Optional[np.random.Generator] = None) \
             -> Tuple[Set[Tuple[PrefixName, PrefixName]], Dict[Tuple[PrefixName, PrefixName], DisableCollisionReason]]:
         """
         Disable link pairs that are never in collision.
+        The random samples are split into chunks, which are checked in parallel by spawned processes,
+        each with its own copy of the collision objects, see self_collision_matrix_worker.
+        :param number_of_processes: None to use all cpus, but at most max_number_of_processes
         """
+        if progress_callback is None:
+            progress_callback = lambda value, text: None
+        if rng is None:
+            rng = np.random.default_rng()
+        if number_of_processes is None:
+            number_of_processes = min(os.cpu_count() or 1, self.max_number_of_processes)
         with self.world.reset_joint_state_context():
-            one_percent = number_of_tries // 100
             self_collision_matrix = {}
             remaining_pairs = deepcopy(link_combinations)
-            update_query = True
-            distance_ranges: Dict[Tuple[PrefixName, PrefixName], Tuple[float, float]] = {}
-            once_without_contact = set()
-            for try_id in range(int(number_of_tries)):
-                self.set_rnd_joint_state(group)
-                contacts = self.find_colliding_combinations(remaining_pairs, distance_threshold_never_initial,
-                                                            update_query)
-                update_query = False
-                contact_keys = set()
-                for link_a, link_b, distance in contacts:
-                    key = self.world.sort_links(link_a, link_b)
-                    contact_keys.add(key)
-                    if key in distance_ranges:
-                        old_min, old_max = distance_ranges[key]
-                        distance_ranges[key] = (min(old_min, distance), max(old_max, distance))
-                    else:
-                        distance_ranges[key] = (distance, distance)
-                    if distance < distance_threshold_never_min:
-                        remaining_pairs.remove(key)
-                        update_query = True
-                        del distance_ranges[key]
-                once_without_contact.update(remaining_pairs.difference(contact_keys))
-                if try_id % one_percent == 0:
-                    progress_callback(try_id // one_percent, 'checking collisions')
+            free_variable_names, samples = self.sample_joint_states(group, int(number_of_tries), rng)
+            worker = self.self_collision_matrix_worker()
+            if number_of_processes > 1 and len(samples) > self.fk_batch_size and worker is not None:
+                removed_pairs, distance_ranges, once_without_contact = self.check_never_in_collision_in_parallel(
+                    link_combinations=remaining_pairs,
+                    free_variable_names=free_variable_names,
+                    samples=samples,
+                    distance_threshold_never_initial=distance_threshold_never_initial,
+                    distance_threshold_never_min=distance_threshold_never_min,
+                    number_of_processes=number_of_processes,
+                    worker=worker,
+                    progress_callback=progress_callback)
+            else:
+                removed_pairs, distance_ranges, once_without_contact = self.check_never_in_collision(
+                    link_combinations=remaining_pairs,
+                    free_variable_names=free_variable_names,
+                    samples=samples,
+                    distance_threshold_never_initial=distance_threshold_never_initial,
+                    distance_threshold_never_min=distance_threshold_never_min,
+                    progress_callback=progress_callback)
+            remaining_pairs.difference_update(removed_pairs)
             never_in_contact = remaining_pairs
             for key in once_without_contact:
                 if key in distance_ranges:
@@ -656,6 +1075,139 @@ class CollisionWorldSynchronizer(GodMapWorshipper):
                 self_collision_matrix[combi] = DisableCollisionReason.Never
         return remaining_pairs, self_collision_matrix
 
+    def check_never_in_collision(self,
+                                 link_combinations: Set[Tuple[PrefixName, PrefixName]],
+                                 free_variable_names: List[PrefixName],
+                                 samples: np.ndarray,
+                                 distance_threshold_never_initial: float,
+                                 distance_threshold_never_min: float,
+                                 progress_callback: Optional[Callable[[int, str], None]] = None) \
+            -> Tuple[Set[Tuple[PrefixName, PrefixName]],
+                     Dict[Tuple[PrefixName, PrefixName], Tuple[float, float]],
+                     Set[Tuple[PrefixName, PrefixName]]]:
+        """
+        Checks link_combinations in every joint state of samples.
+        :param samples: shape (number of samples, len(free_variable_names)), positions of the free variables
+        :return: see check_never_in_collision_fks
+        """
+        def collision_fks() -> Iterable[np.ndarray]:
+            for i in range(0, len(samples), self.fk_batch_size):
+                yield from self.world.compute_collision_fks_batch(free_variable_names,
+                                                                  samples[i:i + self.fk_batch_size])
+
+        return self.check_never_in_collision_fks(link_combinations=link_combinations,
+                                                 collision_fks=collision_fks(),
+                                                 distance_threshold_never_initial=distance_threshold_never_initial,
+                                                 distance_threshold_never_min=distance_threshold_never_min,
+                                                 number_of_samples=len(samples),
+                                                 progress_callback=progress_callback)
+
+    @profile
+    def check_never_in_collision_fks(self,
+                                     link_combinations: Set[Tuple[PrefixName, PrefixName]],
+                                     collision_fks: Iterable[np.ndarray],
+                                     distance_threshold_never_initial: float,
+                                     distance_threshold_never_min: float,
+                                     number_of_samples: int = 1,
+                                     progress_callback: Optional[Callable[[int, str], None]] = None) \
+            -> Tuple[Set[Tuple[PrefixName, PrefixName]],
+                     Dict[Tuple[PrefixName, PrefixName], Tuple[float, float]],
+                     Set[Tuple[PrefixName, PrefixName]]]:
+        """
+        Checks link_combinations for every sample of collision_fks. Doesn't use the world, such that it can run in
+        the processes of check_never_in_collision_in_parallel.
+        :param collision_fks: collision fks of each sample, see sync
+        :param number_of_samples: only used for the progress
+        :return: pairs that got closer than distance_threshold_never_min,
+                 (min, max) distance of the other pairs that were in contact,
+                 other pairs that were at least once not in contact
+        """
+        remaining_pairs = deepcopy(link_combinations)
+        one_percent = max(number_of_samples // 100, 1)
+        update_query = True
+        distance_ranges: Dict[Tuple[PrefixName, PrefixName], Tuple[float, float]] = {}
+        once_without_contact = set()
+        for try_id, sample_collision_fks in enumerate(collision_fks):
+            contacts = self.find_colliding_combinations(remaining_pairs, distance_threshold_never_initial,
+                                                        update_query, collision_fks=sample_collision_fks)
+            update_query = False
+            contact_keys = set()
+            for link_a, link_b, distance in contacts:
+                key = (link_a, link_b) if (link_a, link_b) in link_combinations else (link_b, link_a)
+                contact_keys.add(key)
+                if key in distance_ranges:
+                    old_min, old_max = distance_ranges[key]
+                    distance_ranges[key] = (min(old_min, distance), max(old_max, distance))
+                else:
+                    distance_ranges[key] = (distance, distance)
+                if distance < distance_threshold_never_min:
+                    remaining_pairs.remove(key)
+                    update_query = True
+                    del distance_ranges[key]
+            once_without_contact.update(remaining_pairs.difference(contact_keys))
+            if progress_callback is not None and try_id % one_percent == 0:
+                progress_callback(try_id // one_percent, 'checking collisions')
+        removed_pairs = link_combinations.difference(remaining_pairs)
+        return removed_pairs, distance_ranges, once_without_contact.difference(removed_pairs)
+
+    def check_never_in_collision_in_parallel(self,
+                                             link_combinations: Set[Tuple[PrefixName, PrefixName]],
+                                             free_variable_names: List[PrefixName],
+                                             samples: np.ndarray,
+                                             distance_threshold_never_initial: float,
+                                             distance_threshold_never_min: float,
+                                             number_of_processes: int,
+                                             worker: Tuple[Callable[..., 'CollisionWorldSynchronizer'], tuple],
+                                             progress_callback: Callable[[int, str], None]) \
+            -> Tuple[Set[Tuple[PrefixName, PrefixName]],
+                     Dict[Tuple[PrefixName, PrefixName], Tuple[float, float]],
+                     Set[Tuple[PrefixName, PrefixName]]]:
+        """
+        Like check_never_in_collision, but the samples are split into chunks, which are checked by a process pool.
+        The collision fks are computed in this process, the workers only check collisions.
+        The results of the chunks are merged, such that they are the same as checking all samples in one process.
+        :param worker: see self_collision_matrix_worker
+        """
+        chunk_starts = range(0, len(samples), self.fk_batch_size)
+        removed_pairs = set()
+        distance_ranges: Dict[Tuple[PrefixName, PrefixName], Tuple[float, float]] = {}
+        once_without_contact = set()
+        number_of_done_chunks = 0
+
+        def merge(future: Future):
+            nonlocal number_of_done_chunks
+            chunk_removed_pairs, chunk_distance_ranges, chunk_once_without_contact = future.result()
+            removed_pairs.update(chunk_removed_pairs)
+            for key, (min_, max_) in chunk_distance_ranges.items():
+                if key in distance_ranges:
+                    old_min, old_max = distance_ranges[key]
+                    distance_ranges[key] = (min(old_min, min_), max(old_max, max_))
+                else:
+                    distance_ranges[key] = (min_, max_)
+            once_without_contact.update(chunk_once_without_contact)
+            number_of_done_chunks += 1
+            progress_callback(int(number_of_done_chunks * 100 / len(chunk_starts)), 'checking collisions')
+
+        # forking a process with ros threads is not safe
+        with ProcessPoolExecutor(max_workers=number_of_processes,
+                                 mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_self_collision_matrix_worker,
+                                 initargs=worker) as executor:
+            # only a few chunks are queued at a time, such that not all collision fks are in memory at once
+            pending = deque()
+            for i in chunk_starts:
+                collision_fks = self.world.compute_collision_fks_batch(free_variable_names,
+                                                                       samples[i:i + self.fk_batch_size])
+                pending.append(executor.submit(_check_never_in_collision_chunk, link_combinations, collision_fks,
+                                               distance_threshold_never_initial, distance_threshold_never_min))
+                if len(pending) >= 2 * number_of_processes:
+                    merge(pending.popleft())
+            while pending:
+                merge(pending.popleft())
+        for key in removed_pairs:
+            distance_ranges.pop(key, None)
+        return removed_pairs, distance_ranges, once_without_contact.difference(removed_pairs)
+
     def save_self_collision_matrix(self,
                                    group: WorldBranch,
                                    self_collision_matrix: Dict[Tuple[PrefixName, PrefixName], DisableCollisionReason],
@@ -741,25 +1293,44 @@ class CollisionWorldSynchronizer(GodMapWorshipper):
                     upper_limit = free_variable.get_upper_limit(Derivatives.position)
                     self.world.state[free_variable.name].position = (upper_limit + lower_limit) / 2
 
-    @profile
-    def set_rnd_joint_state(self, group: WorldBranch):
+    def sample_joint_states(self, group: WorldBranch, number_of_samples: int, rng: np.random.Generator) \
+            -> Tuple[List[PrefixName], np.ndarray]:
+        """
+        Creates number_of_samples random joint states of the movable joints of group at once.
+        Positions are uniformly sampled between the limits or in [0, 2pi) for joints without limits.
+        :return: free variable names, positions of shape (number_of_samples, number of free variables)
+        """
+        free_variables: Dict[PrefixName, FreeVariable] = {}
         for joint_name in group.movable_joint_names:
-            free_variable: FreeVariable
             for free_variable in group.joints[joint_name].free_variables:
-                if free_variable.has_position_limits():
-                    lower_limit = free_variable.get_lower_limit(Derivatives.position)
-                    upper_limit = free_variable.get_upper_limit(Derivatives.position)
-                    rnd_position = (np.random.random() * (upper_limit - lower_limit)) + lower_limit
-                else:
-                    rnd_position = np.random.random() * np.pi * 2
-                self.world.state[joint_name].position = rnd_position
+                free_variables[free_variable.name] = free_variable
+        lower_limits = np.zeros(len(free_variables))
+        upper_limits = np.full(len(free_variables), np.pi * 2)
+        for i, free_variable in enumerate(free_variables.values()):
+            if free_variable.has_position_limits():
+                lower_limits[i] = free_variable.get_lower_limit(Derivatives.position)
+                upper_limits[i] = free_variable.get_upper_limit(Derivatives.position)
+        samples = rng.random((number_of_samples, len(free_variables))) * (upper_limits - lower_limits) + lower_limits
+        return list(free_variables), samples
 
     def has_self_collision_matrix(self):
         return len(self.self_collision_matrix_paths) > 0
 
+    def self_collision_matrix_worker(self) -> Optional[Tuple[Callable[..., 'CollisionWorldSynchronizer'], tuple]]:
+        """
+        :return: a picklable factory and its arguments, that create a copy of the collision objects of this
+                    collision world in another process, which can run check_never_in_collision_fks.
+                    None, if this collision checker can't be used in other processes.
+        """
+        return None
+
     def find_colliding_combinations(self, link_combinations: Iterable[Tuple[PrefixName, PrefixName]],
                                     distance: float,
-                                    update_query: bool) -> Set[Tuple[PrefixName, PrefixName]]:
+                                    update_query: bool,
+                                    collision_fks: Optional[np.ndarray] = None) -> Set[Tuple[PrefixName, PrefixName]]:
+        """
+        :param collision_fks: see sync
+        """
         raise NotImplementedError('Collision checking is turned off.')
 
     def check_collisions(self, cut_off_distances: dict, collision_list_size: float = 15, buffer: float = 0.05) \
@@ -770,10 +1341,28 @@ class CollisionWorldSynchronizer(GodMapWorshipper):
         """
         pass
 
+    def update_collision_buffer(self, cut_off_distances: dict, collision_list_size: int = 15,
+                                buffer: float = 0.05) -> CollisionBuffer:
+        """
+        Like check_collisions, but the results are written into self.collision_buffer.
+        :param collision_list_size: max number of collisions per link or link pair
+        """
+        self.collision_buffer.configure(collision_list_size)
+        collisions = self.check_collisions(cut_off_distances, collision_list_size, buffer=buffer)
+        if collisions is None:
+            self.collision_buffer.reset()
+        else:
+            self.collision_buffer.fill_from_collisions(collisions.all_collisions)
+        return self.collision_buffer
+
     def in_collision(self, link_a: my_string, link_b: my_string, distance: float) -> bool:
         return False
 
-    def sync(self):
+    def sync(self, collision_fks: Optional[np.ndarray] = None):
+        """
+        :param collision_fks: poses of the links with collisions in the layout of world.compute_all_collision_fks,
+                                None to compute them for the current joint state
+        """
         pass
 
     def sync_links_with_world(self):
@@ -784,6 +1373,7 @@ class CollisionWorldSynchronizer(GodMapWorshipper):
             link1, link2 = key
             if link1 not in self.world.link_names or link2 not in self.world.link_names:
                 del self.self_collision_matrix[key]
+        self.collision_buffer.release_removed_links(self.world.link_names_as_set)
 
     def collision_goals_to_collision_matrix(self,
                                             collision_goals: List[CollisionEntry],
@@ -0,0 +1,700 @@
+from __future__ import annotations
+
+import abc
+from abc import ABC
+from typing import Dict, List, Optional, Set, Tuple, Type, TYPE_CHECKING
+
+import numpy as np
+
+import giskardpy.utils.math as mymath
+from giskardpy import casadi_wrapper as w
+from giskardpy.casadi_wrapper import CompiledFunction
+from giskardpy.god_map import GodMap
+from giskardpy.model.joints import Joint, FixedJoint, RevoluteJoint, PrismaticJoint, Joint6DOF, OmniDrive
+from giskardpy.my_types import PrefixName, Derivatives
+from giskardpy.utils import logging
+from giskardpy.utils.decorators import memoize
+
+if TYPE_CHECKING:
+    from giskardpy.model.world import WorldTree
+
+
+def collect_block(world: WorldTree, root_link_name: PrefixName, block_roots: Set[PrefixName]) \
+        -> Tuple[List[PrefixName], List[Joint]]:
+    """
+    :return: links below root_link_name, until another block root is reached, in depth first order and the joints
+                between them, starting with the joint above root_link_name, if there is one.
+    """
+    link_names = []
+    joints = []
+    if root_link_name != world.root_link_name:
+        joints.append(world.joints[world.links[root_link_name].parent_joint_name])
+    stack = [root_link_name]
+    while stack:
+        link_name = stack.pop()
+        link_names.append(link_name)
+        for child_joint_name in world.links[link_name].child_joint_names:
+            joint = world.joints[child_joint_name]
+            if joint.child_link_name not in block_roots:
+                joints.append(joint)
+                stack.append(joint.child_link_name)
+    return link_names, joints
+
+
+class CompiledFKBlock:
+    """
+    Forward kinematics of the links of a connected part of the world, relative to the parent link of the joint above
+    its root link.
+    """
+    compiled_fks: Optional[CompiledFunction]
+    constant_fks: Optional[np.ndarray]
+
+    def __init__(self, root_link_name: PrefixName, link_names: List[PrefixName], joints: List[Joint]):
+        self.root_link_name = root_link_name
+        self.link_names = link_names
+        self.joints = joints
+        self.parent_T_childs = [joint.parent_T_child for joint in joints]
+        self.parent_link_names = [joint.parent_link_name for joint in joints]
+        if len(joints) > 0 and joints[0].child_link_name == root_link_name:
+            self.parent_link_name = joints[0].parent_link_name
+        else:
+            self.parent_link_name = None
+        self.compile()
+
+    @profile
+    def compile(self):
+        if self.parent_link_name is None:
+            fks = {self.root_link_name: w.TransMatrix()}
+        else:
+            fks = {self.parent_link_name: w.TransMatrix()}
+        for joint in self.joints:
+            fks[joint.child_link_name] = fks[joint.parent_link_name].dot(joint.parent_T_child)
+        all_fks = w.vstack([fks[link_name] for link_name in self.link_names])
+        params = list(all_fks.free_symbols())
+        self.str_params = [str(v) for v in params]
+        if len(params) == 0:
+            # e.g. objects that are only connected with fixed joints
+            self.compiled_fks = None
+            self.constant_fks = all_fks.evaluate()
+        else:
+            self.compiled_fks = all_fks.compile(parameters=params)
+            self.constant_fks = None
+
+    def is_up_to_date(self, link_names: List[PrefixName], joints: List[Joint]) -> bool:
+        """
+        Joints are compared by identity, because moving a branch changes their parent_T_child and parent_link_name
+        in place.
+        """
+        return self.link_names == link_names \
+               and len(self.joints) == len(joints) \
+               and all(old is new
+                       and old.parent_T_child is parent_T_child
+                       and old.parent_link_name == parent_link_name
+                       for old, new, parent_T_child, parent_link_name in zip(self.joints, joints,
+                                                                             self.parent_T_childs,
+                                                                             self.parent_link_names))
+
+    def evaluate(self, god_map: GodMap) -> np.ndarray:
+        if self.compiled_fks is None:
+            return self.constant_fks
+        return self.compiled_fks.fast_call(god_map.unsafe_get_values(self.str_params))
+
+
+def identity_frames(shape: Tuple[int, ...]) -> np.ndarray:
+    """
+    :return: identity matrices of shape shape + (4, 4)
+    """
+    return np.broadcast_to(np.eye(4), shape + (4, 4)).copy()
+
+
+def translation_frames(x: np.ndarray, y: np.ndarray, z: np.ndarray) -> np.ndarray:
+    """
+    Batched version of w.TransMatrix.from_xyz_rpy(x, y, z).
+    """
+    x, y, z = np.broadcast_arrays(x, y, z)
+    frames = identity_frames(x.shape)
+    frames[..., 0, 3] = x
+    frames[..., 1, 3] = y
+    frames[..., 2, 3] = z
+    return frames
+
+
+def rotation_frames_from_axis_angle(axis: np.ndarray, angle: np.ndarray) -> np.ndarray:
+    """
+    Batched version of w.RotationMatrix.from_axis_angle.
+    :param axis: shape (k, 3)
+    :param angle: shape (n, k)
+    :return: shape (n, k, 4, 4)
+    """
+    ct = np.cos(angle)[..., None, None]
+    st = np.sin(angle)
+    frames = identity_frames(angle.shape)
+    frames[..., :3, :3] = ct * np.eye(3) + (1 - ct) * (axis[:, :, None] * axis[:, None, :])
+    x, y, z = axis.T
+    frames[..., 0, 1] -= st * z
+    frames[..., 0, 2] += st * y
+    frames[..., 1, 0] += st * z
+    frames[..., 1, 2] -= st * x
+    frames[..., 2, 0] -= st * y
+    frames[..., 2, 1] += st * x
+    return frames
+
+
+def rotation_frames_from_rpy(roll: np.ndarray, pitch: np.ndarray, yaw: np.ndarray) -> np.ndarray:
+    """
+    Batched version of w.RotationMatrix.from_rpy.
+    """
+    roll, pitch, yaw = np.broadcast_arrays(roll, pitch, yaw)
+    cr, sr = np.cos(roll), np.sin(roll)
+    cp, sp = np.cos(pitch), np.sin(pitch)
+    cy, sy = np.cos(yaw), np.sin(yaw)
+    frames = identity_frames(roll.shape)
+    frames[..., 0, 0] = cy * cp
+    frames[..., 0, 1] = cy * sp * sr - sy * cr
+    frames[..., 0, 2] = sy * sr + cy * sp * cr
+    frames[..., 1, 0] = sy * cp
+    frames[..., 1, 1] = cy * cr + sy * sp * sr
+    frames[..., 1, 2] = sy * sp * cr - cy * sr
+    frames[..., 2, 0] = -sp
+    frames[..., 2, 1] = cp * sr
+    frames[..., 2, 2] = cp * cr
+    return frames
+
+
+def rotation_frames_from_quaternion(x: np.ndarray, y: np.ndarray, z: np.ndarray, w_: np.ndarray) -> np.ndarray:
+    """
+    Batched version of w.RotationMatrix.from_quaternion.
+    """
+    x, y, z, w_ = np.broadcast_arrays(x, y, z, w_)
+    x2, y2, z2, w2 = x * x, y * y, z * z, w_ * w_
+    frames = identity_frames(x.shape)
+    frames[..., 0, 0] = w2 + x2 - y2 - z2
+    frames[..., 0, 1] = 2 * x * y - 2 * w_ * z
+    frames[..., 0, 2] = 2 * x * z + 2 * w_ * y
+    frames[..., 1, 0] = 2 * x * y + 2 * w_ * z
+    frames[..., 1, 1] = w2 - x2 + y2 - z2
+    frames[..., 1, 2] = 2 * y * z - 2 * w_ * x
+    frames[..., 2, 0] = 2 * x * z - 2 * w_ * y
+    frames[..., 2, 1] = 2 * y * z + 2 * w_ * x
+    frames[..., 2, 2] = w2 - x2 - y2 + z2
+    return frames
+
+
+def is_constant(expression: w.Symbol_) -> bool:
+    return len(w.free_symbols(expression)) == 0
+
+
+class JointKernel(ABC):
+    """
+    Computes parent_T_child of all joints of one type for a batch of joint states with numpy.
+    """
+    link_ids: np.ndarray
+    # columns of the free variables in the positions array, one list per joint
+    columns: List[List[int]]
+    # joints that also depend on other values than the positions, they are recomputed every time
+    volatile_ids: List[int]
+
+    def __init__(self, fk_computer: NumpyFKComputer):
+        self.fk_computer = fk_computer
+        self.link_ids = np.zeros(0, dtype=int)
+        self.columns = []
+        self.volatile_ids = []
+
+    @classmethod
+    @abc.abstractmethod
+    def can_handle(cls, joint: Joint) -> bool: ...
+
+    def add(self, link_id: int, joint: Joint):
+        self.link_ids = np.append(self.link_ids, link_id)
+        self.columns.append(self._add(joint))
+
+    @abc.abstractmethod
+    def _add(self, joint: Joint) -> List[int]:
+        """
+        :return: columns of the free variables that joint depends on
+        """
+
+    @abc.abstractmethod
+    def compute(self, positions: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        """
+        :param positions: shape (n, number of free variables)
+        :param ids: which of the joints of this kernel should be computed
+        :return: shape (n, len(ids), 4, 4)
+        """
+
+
+class ConstantJointKernel(JointKernel):
+    """
+    Fixed joints or any other joint, whose parent_T_child has no free symbols.
+    """
+
+    def __init__(self, fk_computer: NumpyFKComputer):
+        super().__init__(fk_computer)
+        self.parent_T_childs = np.zeros((0, 4, 4))
+
+    @classmethod
+    def can_handle(cls, joint: Joint) -> bool:
+        return is_constant(joint.parent_T_child)
+
+    def _add(self, joint: Joint) -> List[int]:
+        self.parent_T_childs = np.append(self.parent_T_childs, joint.parent_T_child.evaluate()[None], axis=0)
+        return []
+
+    def compute(self, positions: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        return np.broadcast_to(self.parent_T_childs[ids], (positions.shape[0], len(ids), 4, 4))
+
+
+class OneDofJointKernel(JointKernel):
+    joint_type: Type[Joint]
+
+    def __init__(self, fk_computer: NumpyFKComputer):
+        super().__init__(fk_computer)
+        self.origins = np.zeros((0, 4, 4))
+        self.axes = np.zeros((0, 3))
+        self.multipliers = np.zeros(0)
+        self.offsets = np.zeros(0)
+        self.joint_columns = np.zeros(0, dtype=int)
+
+    @classmethod
+    def can_handle(cls, joint: Joint) -> bool:
+        return type(joint) is cls.joint_type and is_constant(joint.origin)
+
+    def _add(self, joint: RevoluteJoint) -> List[int]:
+        column = self.fk_computer.column(joint.free_variable.name)
+        self.origins = np.append(self.origins, joint.origin.evaluate()[None], axis=0)
+        self.axes = np.append(self.axes, np.array(joint.axis, dtype=float)[None], axis=0)
+        self.multipliers = np.append(self.multipliers, joint.multiplier)
+        self.offsets = np.append(self.offsets, joint.offset)
+        self.joint_columns = np.append(self.joint_columns, column)
+        return [column]
+
+    def motor_positions(self, positions: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        return positions[:, self.joint_columns[ids]] * self.multipliers[ids] + self.offsets[ids]
+
+
+class RevoluteJointKernel(OneDofJointKernel):
+    joint_type = RevoluteJoint
+
+    def compute(self, positions: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        parent_R_child = rotation_frames_from_axis_angle(self.axes[ids], self.motor_positions(positions, ids))
+        return np.matmul(self.origins[ids], parent_R_child)
+
+
+class PrismaticJointKernel(OneDofJointKernel):
+    joint_type = PrismaticJoint
+
+    def compute(self, positions: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        translation = self.axes[ids] * self.motor_positions(positions, ids)[..., None]
+        parent_T_child = translation_frames(translation[..., 0], translation[..., 1], translation[..., 2])
+        return np.matmul(self.origins[ids], parent_T_child)
+
+
+class VirtualJointKernel(JointKernel):
+    """
+    For joints whose parent_T_child only depends on a fixed list of free variables.
+    """
+    joint_type: Type[Joint]
+    free_variable_attributes: Tuple[str, ...]
+
+    def __init__(self, fk_computer: NumpyFKComputer):
+        super().__init__(fk_computer)
+        self.joint_columns = np.zeros((0, len(self.free_variable_attributes)), dtype=int)
+
+    @classmethod
+    def can_handle(cls, joint: Joint) -> bool:
+        return type(joint) is cls.joint_type
+
+    def _add(self, joint: Joint) -> List[int]:
+        columns = [self.fk_computer.column(getattr(joint, attribute).name)
+                   for attribute in self.free_variable_attributes]
+        self.joint_columns = np.append(self.joint_columns, np.array(columns)[None], axis=0)
+        return columns
+
+    def variables(self, positions: np.ndarray, ids: np.ndarray) -> List[np.ndarray]:
+        """
+        :return: one array of shape (n, len(ids)) per free variable attribute
+        """
+        return list(np.moveaxis(positions[:, self.joint_columns[ids]], -1, 0))
+
+
+class Joint6DOFKernel(VirtualJointKernel):
+    joint_type = Joint6DOF
+    free_variable_attributes = ('x', 'y', 'z', 'qx', 'qy', 'qz', 'qw')
+
+    def compute(self, positions: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        x, y, z, qx, qy, qz, qw = self.variables(positions, ids)
+        parent_T_child = rotation_frames_from_quaternion(qx, qy, qz, qw)
+        parent_T_child[..., 0, 3] = x
+        parent_T_child[..., 1, 3] = y
+        parent_T_child[..., 2, 3] = z
+        return parent_T_child
+
+
+class OmniDriveKernel(VirtualJointKernel):
+    joint_type = OmniDrive
+    free_variable_attributes = ('x', 'y', 'z', 'roll', 'pitch', 'yaw', 'x_vel', 'y_vel')
+
+    def compute(self, positions: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        x, y, z, roll, pitch, yaw, x_vel, y_vel = self.variables(positions, ids)
+        zeros = np.zeros_like(x)
+        odom_T_bf = rotation_frames_from_rpy(zeros, zeros, yaw)
+        odom_T_bf[..., 0, 3] = x
+        odom_T_bf[..., 1, 3] = y
+        bf_T_bf_vel = translation_frames(x_vel, y_vel, zeros)
+        bf_vel_T_bf = rotation_frames_from_rpy(roll, pitch, zeros)
+        bf_vel_T_bf[..., 2, 3] = z
+        return np.matmul(np.matmul(odom_T_bf, bf_T_bf_vel), bf_vel_T_bf)
+
+
+class CompiledJointKernel(JointKernel):
+    """
+    Fallback for joints without a numpy kernel, evaluates the compiled parent_T_child of each joint.
+    """
+
+    def __init__(self, fk_computer: NumpyFKComputer):
+        super().__init__(fk_computer)
+        self.functions: List[CompiledFunction] = []
+        # columns of positions and the parameters they are written to, the other parameters are read from the god map
+        self.parameter_ids: List[np.ndarray] = []
+        self.joint_columns: List[np.ndarray] = []
+
+    @classmethod
+    def can_handle(cls, joint: Joint) -> bool:
+        return True
+
+    def _add(self, joint: Joint) -> List[int]:
+        function = self.fk_computer.compile_parent_T_child(joint)
+        parameter_ids = []
+        columns = []
+        for i, str_param in enumerate(function.str_params):
+            variable_name = self.fk_computer.position_symbol_to_variable.get(str_param)
+            if variable_name is not None:
+                parameter_ids.append(i)
+                columns.append(self.fk_computer.column(variable_name))
+        if len(parameter_ids) < len(function.str_params):
+            self.volatile_ids.append(len(self.functions))
+        self.functions.append(function)
+        self.parameter_ids.append(np.array(parameter_ids, dtype=int))
+        self.joint_columns.append(np.array(columns, dtype=int))
+        return columns
+
+    def compute(self, positions: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        parent_T_childs = np.empty((positions.shape[0], len(ids), 4, 4))
+        for i, joint_id in enumerate(ids):
+            function = self.functions[joint_id]
+            values = self.fk_computer.god_map.unsafe_get_values(function.str_params)
+            for sample_id, sample in enumerate(positions):
+                values[self.parameter_ids[joint_id]] = sample[self.joint_columns[joint_id]]
+                parent_T_childs[sample_id, i] = function.fast_call(values)
+        return parent_T_childs
+
+
+class NumpyFKComputer:
+    """
+    Forward kinematics of all links with numpy, without compiling anything for the supported joint types.
+    The tree is stored as an array of parent link indices and every joint type has a kernel, which computes
+    parent_T_child of all joints of that type at once. Links are chained level by level, starting at the root.
+    Can evaluate a batch of joint states at once and, for a single joint state, only recomputes the subtrees below
+    joints whose free variables have changed since the last call.
+    """
+    kernel_classes: List[Type[JointKernel]] = [ConstantJointKernel,
+                                               RevoluteJointKernel,
+                                               PrismaticJointKernel,
+                                               Joint6DOFKernel,
+                                               OmniDriveKernel,
+                                               CompiledJointKernel]
+    link_names: List[PrefixName]
+    parent_ids: np.ndarray
+    # (link ids, their parent ids) for every depth of the tree, except the root
+    levels: List[Tuple[np.ndarray, np.ndarray]]
+    kernels: List[JointKernel]
+    variable_names: List[PrefixName]
+    # last computed single joint state
+    positions: Optional[np.ndarray]
+    parent_T_childs: np.ndarray
+    fks: np.ndarray
+
+    def __init__(self, world: WorldTree):
+        self.world = world
+        self.god_map = GodMap()
+        self.compiled_parent_T_childs: Dict[PrefixName, Tuple[Joint, w.TransMatrix, CompiledFunction]] = {}
+        self.link_names = []
+        self.kernels = []
+        self.levels = []
+        self.variable_names = []
+        self.variable_columns: Dict[PrefixName, int] = {}
+        self.positions = None
+        self.fks = identity_frames((0,))
+
+    def column(self, variable_name: PrefixName) -> int:
+        if variable_name not in self.variable_columns:
+            self.variable_columns[variable_name] = len(self.variable_names)
+            self.variable_names.append(variable_name)
+        return self.variable_columns[variable_name]
+
+    def compile_parent_T_child(self, joint: Joint) -> CompiledFunction:
+        """
+        Compiled functions are reused, as long as the joint and its parent_T_child didn't change.
+        """
+        if joint.name in self.compiled_parent_T_childs:
+            old_joint, old_parent_T_child, function = self.compiled_parent_T_childs[joint.name]
+            if old_joint is joint and old_parent_T_child is joint.parent_T_child:
+                return function
+        parent_T_child = w.Expression(joint.parent_T_child)
+        function = parent_T_child.compile(parameters=list(parent_T_child.free_symbols()))
+        self.compiled_parent_T_childs[joint.name] = (joint, joint.parent_T_child, function)
+        return function
+
+    @profile
+    def update(self, link_names: List[PrefixName]):
+        """
+        :param link_names: all links of the world, parents have to come before their children
+        """
+        world = self.world
+        self.link_names = link_names
+        link_ids = {link_name: i for i, link_name in enumerate(link_names)}
+        self.variable_names = []
+        self.variable_columns = {}
+        self.position_symbol_to_variable = {free_variable.position_name: free_variable.name
+                                            for free_variables in (world.free_variables, world.virtual_free_variables)
+                                            for free_variable in free_variables.values()}
+        self.kernels = [kernel_class(self) for kernel_class in self.kernel_classes]
+        self.parent_ids = np.full(len(link_names), -1, dtype=int)
+        depths = np.zeros(len(link_names), dtype=int)
+        for link_id, link_name in enumerate(link_names):
+            if link_name == world.root_link_name:
+                continue
+            joint = world.joints[world.links[link_name].parent_joint_name]
+            parent_id = link_ids[joint.parent_link_name]
+            self.parent_ids[link_id] = parent_id
+            depths[link_id] = depths[parent_id] + 1
+            for kernel in self.kernels:
+                if kernel.can_handle(joint):
+                    kernel.add(link_id, joint)
+                    break
+        self.kernels = [kernel for kernel in self.kernels if len(kernel.link_ids) > 0]
+        self.levels = []
+        for depth in range(1, depths.max(initial=0) + 1):
+            level_link_ids = np.flatnonzero(depths == depth)
+            self.levels.append((level_link_ids, self.parent_ids[level_link_ids]))
+        self.root_ids = np.flatnonzero(self.parent_ids == -1)
+        # links whose parent_T_child depends on a free variable
+        self.link_ids_of_column: List[List[int]] = [[] for _ in self.variable_names]
+        for kernel in self.kernels:
+            for link_id, columns in zip(kernel.link_ids, kernel.columns):
+                for column in columns:
+                    self.link_ids_of_column[column].append(link_id)
+        self.volatile_link_ids = np.array([link_id for kernel in self.kernels
+                                           for link_id in kernel.link_ids[kernel.volatile_ids]], dtype=int)
+        self._state_rows_key = None
+        self.positions = None
+        self.parent_T_childs = identity_frames((len(link_names),))
+        self.fks = identity_frames((len(link_names),))
+
+    def state_positions(self) -> np.ndarray:
+        """
+        :return: current positions of all free variables, that the fk depends on
+        """
+        state = self.world.state
+        key = (id(state), state.layout_version, id(self.variable_names))
+        if key != self._state_rows_key:
+            self._state_rows = state.rows(self.variable_names)
+            # rows can add joint states and change the layout
+            self._state_rows_key = (id(state), state.layout_version, id(self.variable_names))
+        return state.data[self._state_rows, Derivatives.position]
+
+    def compute_parent_T_childs(self, positions: np.ndarray) -> np.ndarray:
+        """
+        :param positions: shape (n, number of free variables)
+        :return: shape (n, number of links, 4, 4)
+        """
+        parent_T_childs = identity_frames((positions.shape[0], len(self.link_names)))
+        for kernel in self.kernels:
+            parent_T_childs[:, kernel.link_ids] = kernel.compute(positions, np.arange(len(kernel.link_ids)))
+        return parent_T_childs
+
+    @profile
+    def compute_fks(self, variable_names: Optional[List[PrefixName]] = None,
+                    positions: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Computes the fk of a batch of joint states, e.g. for sampling.
+        :param variable_names: free variables of the columns of positions, the others keep their current position
+        :param positions: shape (n, len(variable_names)), None for the current joint state
+        :return: map_T_link of all links, shape (n, number of links, 4, 4)
+        """
+        all_positions = self.state_positions()[None]
+        if positions is not None:
+            positions = np.atleast_2d(np.asarray(positions, dtype=float))
+            all_positions = np.repeat(all_positions, positions.shape[0], axis=0)
+            ids, columns = [], []
+            for i, variable_name in enumerate(variable_names):
+                if variable_name in self.variable_columns:
+                    ids.append(i)
+                    columns.append(self.variable_columns[variable_name])
+            all_positions[:, columns] = positions[:, ids]
+        parent_T_childs = self.compute_parent_T_childs(all_positions)
+        fks = np.empty_like(parent_T_childs)
+        fks[:, self.root_ids] = parent_T_childs[:, self.root_ids]
+        for link_ids, parent_ids in self.levels:
+            fks[:, link_ids] = np.matmul(fks[:, parent_ids], parent_T_childs[:, link_ids])
+        return fks
+
+    @profile
+    def recompute(self) -> np.ndarray:
+        """
+        Updates the fk of the current joint state, only the subtrees below changed joints are recomputed.
+        :return: map_T_link of all links, shape (number of links, 4, 4)
+        """
+        positions = self.state_positions()
+        if self.positions is None:
+            self.parent_T_childs = self.compute_parent_T_childs(positions[None])[0]
+            dirty_joints = np.ones(len(self.link_names), dtype=bool)
+        else:
+            changed_columns = np.flatnonzero(positions != self.positions)
+            if len(changed_columns) == 0 and len(self.volatile_link_ids) == 0:
+                return self.fks
+            dirty_joints = np.zeros(len(self.link_names), dtype=bool)
+            dirty_joints[self.volatile_link_ids] = True
+            for column in changed_columns:
+                dirty_joints[self.link_ids_of_column[column]] = True
+            for kernel in self.kernels:
+                ids = np.flatnonzero(dirty_joints[kernel.link_ids])
+                if len(ids) > 0:
+                    self.parent_T_childs[kernel.link_ids[ids]] = kernel.compute(positions[None], ids)[0]
+        self.positions = positions
+        fks = self.fks
+        dirty = dirty_joints
+        fks[self.root_ids] = self.parent_T_childs[self.root_ids]
+        for link_ids, parent_ids in self.levels:
+            level_dirty = dirty[link_ids] | dirty[parent_ids]
+            dirty[link_ids] = level_dirty
+            if level_dirty.any():
+                link_ids = link_ids[level_dirty]
+                fks[link_ids] = np.matmul(fks[parent_ids[level_dirty]], self.parent_T_childs[link_ids])
+        return fks
+
+
+class IncrementalFKComputer:
+    """
+    Computes the forward kinematics of all links in the world with one compiled function per block.
+    A block starts at the world root and at the root link of every group, such that adding, removing or attaching a
+    group only requires compiling the fk of that group, instead of the whole world.
+    Blocks are evaluated in topological order and chained with a matrix product.
+    The fks of the current joint state, used by compute_fk_np, are updated with a NumpyFKComputer, that only
+    recomputes what has changed.
+    """
+    order: List[CompiledFKBlock]
+    idx_start: Dict[PrefixName, int]
+    fks: np.ndarray
+
+    def __init__(self, world: WorldTree):
+        self.world = world
+        self.god_map = GodMap()
+        self.blocks: Dict[PrefixName, CompiledFKBlock] = {}
+        self.order = []
+        self.idx_start = {}
+        self.fks = np.zeros((0, 4))
+        self.numpy_fk_computer = NumpyFKComputer(world)
+
+    @profile
+    def update(self):
+        """
+        Reuses the blocks that didn't change since the last call and compiles the others.
+        """
+        world = self.world
+        block_roots = {world.root_link_name}
+        block_roots.update(group.root_link_name for group in world.groups.values())
+        blocks = {}
+        order = []
+        number_of_compiled_blocks = 0
+        queue = [world.root_link_name]
+        while queue:
+            root_link_name = queue.pop(0)
+            link_names, joints = collect_block(world, root_link_name, block_roots)
+            block = self.blocks.get(root_link_name)
+            if block is None or not block.is_up_to_date(link_names, joints):
+                block = CompiledFKBlock(root_link_name, link_names, joints)
+                number_of_compiled_blocks += 1
+            blocks[root_link_name] = block
+            order.append(block)
+            for link_name in link_names:
+                for child_joint_name in world.links[link_name].child_joint_names:
+                    child_link_name = world.joints[child_joint_name].child_link_name
+                    if child_link_name in block_roots:
+                        queue.append(child_link_name)
+        self.blocks = blocks
+        self.order = order
+        logging.logdebug(f'Compiled fk of {number_of_compiled_blocks}/{len(order)} blocks.')
+
+        self.idx_start = {}
+        row = 0
+        for block in order:
+            block.rows = slice(row, row + 4 * len(block.link_names))
+            for link_name in block.link_names:
+                self.idx_start[link_name] = row
+                row += 4
+        for block in order:
+            if block.parent_link_name is None:
+                block.parent_row = None
+            else:
+                block.parent_row = self.idx_start[block.parent_link_name]
+        collision_link_names = [link_name for link_name in sorted(world.link_names_with_collisions)
+                                if link_name != world.root_link_name]
+        self.collision_link_ids = np.array([self.idx_start[link_name] // 4 for link_name in collision_link_names],
+                                           dtype=int)
+        self.collision_rows = np.array([self.idx_start[link_name] + i for link_name in collision_link_names
+                                        for i in range(4)], dtype=int)
+        self.fks = np.zeros((row, 4))
+        self.numpy_fk_computer.update([link_name for block in order for link_name in block.link_names])
+        self.compute_fk_np.memo.clear()
+
+    @profile
+    def compute_all_fks(self) -> np.ndarray:
+        """
+        :return: map_T_link of all links stacked, link_name starts at row self.idx_start[link_name]
+        """
+        fks = np.empty_like(self.fks)
+        for block in self.order:
+            block_fks = block.evaluate(self.god_map)
+            if block.parent_row is None:
+                fks[block.rows] = block_fks
+            else:
+                map_T_parent = fks[block.parent_row:block.parent_row + 4]
+                fks[block.rows] = np.matmul(map_T_parent, block_fks.reshape(-1, 4, 4)).reshape(-1, 4)
+        return fks
+
+    def compute_all_collision_fks(self) -> np.ndarray:
+        """
+        :return: map_T_link of all links with collisions, sorted by name, stacked
+        """
+        return self.compute_all_fks()[self.collision_rows]
+
+    def compute_collision_fks_batch(self, variable_names: List[PrefixName], positions: np.ndarray) -> np.ndarray:
+        """
+        Like compute_all_collision_fks, but for a batch of joint states.
+        :param variable_names: free variables of the columns of positions, the others keep their current position
+        :param positions: shape (n, len(variable_names))
+        :return: shape (n, 4 * number of links with collisions, 4)
+        """
+        fks = self.numpy_fk_computer.compute_fks(variable_names, positions)[:, self.collision_link_ids]
+        return fks.reshape(fks.shape[0], -1, 4)
+
+    @profile
+    def recompute(self):
+        self.compute_fk_np.memo.clear()
+        self.fks = self.numpy_fk_computer.recompute().reshape(-1, 4)
+
+    @memoize
+    @profile
+    def compute_fk_np(self, root: PrefixName, tip: PrefixName) -> np.ndarray:
+        if root == self.world.root_link_name:
+            map_T_root = np.eye(4)
+        else:
+            map_T_root = self.fks[self.idx_start[root]:self.idx_start[root] + 4]
+        if tip == self.world.root_link_name:
+            map_T_tip = np.eye(4)
+        else:
+            map_T_tip = self.fks[self.idx_start[tip]:self.idx_start[tip] + 4]
+        root_T_map = mymath.inverse_frame(map_T_root)
+        root_T_tip = np.dot(root_T_map, map_T_tip)
+        return root_T_tip
@@ -232,6 +232,8 @@ class OneDofJoint(MovableJoint):
         self.name = name
         self.parent_link_name = parent_link_name
         self.child_link_name = child_link_name
+        # parent_T_child without the motion of the joint, subclasses append it to parent_T_child
+        self.origin = parent_T_child
         self.parent_T_child = parent_T_child
         if multiplier is None:
             self.multiplier = 1
@@ -31,6 +31,16 @@ class LinkGeometry:
             self.color = color
         self.link_T_geometry = w.TransMatrix(link_T_geometry)
 
+    def __getstate__(self):
+        # casadi expressions can't be pickled without a casadi context, link_T_geometry is constant anyway
+        state = self.__dict__.copy()
+        state['link_T_geometry'] = self.link_T_geometry.evaluate()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.link_T_geometry = w.TransMatrix(self.link_T_geometry)
+
     def to_hash(self) -> str:
         return ''
 
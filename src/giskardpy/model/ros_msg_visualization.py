@@ -8,7 +8,7 @@ from visualization_msgs.msg import MarkerArray, Marker
 
 from giskardpy import identifier
 from giskardpy.god_map import GodMap
-from giskardpy.model.collision_world_syncer import Collisions, Collision
+from giskardpy.model.collision_world_syncer import CollisionBuffer
 
 
 class ROSMsgVisualization:
@@ -52,7 +52,7 @@ class ROSMsgVisualization:
     @profile
     def create_collision_markers(self, name_space: str = 'collisions') -> List[Marker]:
         try:
-            collisions: Collisions = self.god_map.get_data(identifier.closest_point)
+            collisions: CollisionBuffer = self.god_map.get_data(identifier.closest_point)
         except KeyError as e:
             # no collisions
             return []
@@ -65,28 +65,21 @@ class ROSMsgVisualization:
         m.ns = name_space
         m.scale = Vector3(0.003, 0, 0)
         m.pose.orientation.w = 1
-        if len(collisions.all_collisions) > 0:
-            for collision in collisions.all_collisions:
-                group_name = collision.link_a.prefix
+        rows, is_external = collisions.active_rows()
+        if len(rows) > 0:
+            for collision, external in zip(rows, is_external):
+                link_a = collisions.link_names[int(collision['link_a_id'])]
+                group_name = link_a.prefix
                 config = collision_avoidance_configs[group_name]
-                if collision.is_external:
-                    thresholds = config.external_collision_avoidance[collision.link_a]
+                if external:
+                    thresholds = config.external_collision_avoidance[link_a]
                 else:
-                    thresholds = config.self_collision_avoidance[collision.link_a]
+                    thresholds = config.self_collision_avoidance[link_a]
                 red_threshold = thresholds.hard_threshold
                 yellow_threshold = thresholds.soft_threshold
-                contact_distance = collision.contact_distance
-                if collision.map_P_pa is None:
-                    map_T_a = self.world.compute_fk_np(self.world.root_link_name, collision.original_link_a)
-                    map_P_pa = np.dot(map_T_a, collision.a_P_pa)
-                else:
-                    map_P_pa = collision.map_P_pa
-
-                if collision.map_P_pb is None:
-                    map_T_b = self.world.compute_fk_np(self.world.root_link_name, collision.original_link_b)
-                    map_P_pb = np.dot(map_T_b, collision.b_P_pb)
-                else:
-                    map_P_pb = collision.map_P_pb
+                contact_distance = collision['contact_distance']
+                map_P_pa = collision['map_P_pa']
+                map_P_pb = collision['map_P_pb']
                 m.points.append(Point(*map_P_pa[:3]))
                 m.points.append(Point(*map_P_pb[:3]))
                 m.colors.append(self.red)
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 import os
+import tempfile
 from collections import OrderedDict, defaultdict
 from itertools import product
 from threading import Lock
-from typing import List, Union, Dict, Tuple
+from typing import List, Union, Dict, Tuple, Optional, Sequence
 import numpy as np
 import matplotlib.colors as mcolors
 import pylab as plt
@@ -24,47 +25,193 @@ plot_lock = Lock()
 
 
 class Trajectory:
-    _points: Dict[int, JointStates]
+    """
+    Stores joint states in one array of shape (time, joint, derivative), with an index for the times and joint names.
+    Appending copies the values of a JointStates with one numpy assignment, the array grows by doubling.
+    If the array gets bigger than spill_threshold bytes, it is moved into a memory mapped temporary file in
+    spill_folder.
+    A mask of shape (time, joint) remembers which joints were part of the point at each time, missing joints are
+    left out of the JointStates returned by get_exact, items and values.
+    get_exact creates a new JointStates from the values on every call, changing it doesn't change the trajectory.
+    """
+    initial_capacity = 64
+    # in bytes, None to always keep the trajectory in memory
+    spill_threshold: Optional[int] = None
+    # None for the default temp folder
+    spill_folder: Optional[str] = None
 
     def __init__(self):
         self.clear()
 
     def clear(self):
-        self._points = OrderedDict()
+        self._data = np.zeros((self.initial_capacity, 0, len(Derivatives)))
+        self._present = np.zeros((self.initial_capacity, 0), dtype=bool)
+        self._times = np.zeros(self.initial_capacity, dtype=int)
+        self._length = 0
+        self._time_to_row: Dict[int, int] = {}
+        self._columns: Dict[PrefixName, int] = {}
+        # columns for the rows of the last appended JointStates
+        self._source: Optional[JointStates] = None
+        self._source_layout = None
+        self._source_columns: Optional[np.ndarray] = None
+        # changes whenever the array is replaced or rows are moved, see GodMap.unsafe_get_values
+        self.layout_version = 0
 
-    def get_exact(self, time):
-        return self._points[time]
+    @property
+    def data(self) -> np.ndarray:
+        """
+        The used part of the trajectory, a view of shape (time, joint, derivative).
+        """
+        return self._data[:self._length, :len(self._columns)]
+
+    @property
+    def flat_buffer(self) -> np.ndarray:
+        return self._data.reshape(-1)
+
+    @property
+    def joint_names(self) -> List[PrefixName]:
+        return list(self._columns)
+
+    def flat_buffer_index(self, identifier: Sequence) -> Optional[int]:
+        """
+        :param identifier: e.g. ('get_exact', (time,), joint_name, derivative)
+        :return: index of the value in flat_buffer or None, if it is not in the buffer
+        """
+        if len(identifier) != 4 or identifier[0] != 'get_exact':
+            return None
+        try:
+            row = self._time_to_row[identifier[1][0]]
+        except (KeyError, IndexError, TypeError):
+            return None
+        if identifier[2] not in self._columns:
+            return None
+        derivative = identifier[3]
+        try:
+            if isinstance(derivative, str):
+                derivative = Derivatives[derivative]
+            derivative = Derivatives(derivative)
+        except (KeyError, ValueError):
+            return None
+        return (row * self._data.shape[1] + self._columns[identifier[2]]) * self._data.shape[2] + derivative
+
+    def _allocate(self, shape: Tuple[int, int, int]) -> np.ndarray:
+        if self.spill_threshold is not None and np.prod(shape) * 8 > self.spill_threshold:
+            # the file is deleted when it is closed, the mapping stays valid until the array is garbage collected
+            with tempfile.NamedTemporaryFile(dir=self.spill_folder, prefix='trajectory_', suffix='.dat') as f:
+                return np.memmap(f, dtype=float, mode='w+', shape=shape)
+        return np.zeros(shape)
+
+    def _reserve(self, num_rows: int, num_columns: int):
+        rows, columns, derivatives = self._data.shape
+        if num_rows <= rows and num_columns <= columns:
+            return
+        while rows < num_rows:
+            rows *= 2
+        while columns < num_columns:
+            columns = max(columns * 2, 8)
+        data = self._allocate((rows, columns, derivatives))
+        data[:self._length, :len(self._columns)] = self.data
+        self._data = data
+        present = np.zeros((rows, columns), dtype=bool)
+        present[:self._length, :len(self._columns)] = self._present[:self._length, :len(self._columns)]
+        self._present = present
+        if rows > len(self._times):
+            times = np.zeros(rows, dtype=int)
+            times[:self._length] = self._times[:self._length]
+            self._times = times
+        self.layout_version += 1
+
+    def _column(self, joint_name: PrefixName) -> int:
+        if joint_name not in self._columns:
+            self._reserve(self._length, len(self._columns) + 1)
+            self._columns[joint_name] = len(self._columns)
+        return self._columns[joint_name]
+
+    def _columns_of(self, point: JointStates) -> np.ndarray:
+        """
+        :return: the column for each row of point.data
+        """
+        layout = (point.layout_version, len(point))
+        if point is not self._source or layout != self._source_layout:
+            joint_names = list(point.keys())
+            columns = np.empty(len(joint_names), dtype=int)
+            columns[point.rows(joint_names)] = [self._column(joint_name) for joint_name in joint_names]
+            self._source = point
+            self._source_layout = layout
+            self._source_columns = columns
+        return self._source_columns
+
+    def get_exact(self, time: int) -> JointStates:
+        return self._make_point(self._time_to_row[time])
+
+    def _make_point(self, row: int) -> JointStates:
+        point = JointStates()
+        present = self._present[row]
+        for joint_name, column in self._columns.items():
+            if present[column]:
+                point[joint_name].state[:] = self._data[row, column]
+        return point
 
     def set(self, time: int, point: JointStates):
-        if len(self._points) > 0 and list(self._points.keys())[-1] > time:
+        if self._length > 0 and self._times[self._length - 1] > time:
             raise KeyError('Cannot append a trajectory point that is before the current end time of the trajectory.')
-        self._points[time] = point
+        if time in self._time_to_row:
+            row = self._time_to_row[time]
+            # the new point replaces the old one, joints that are not in it are removed
+            self._data[row] = 0
+            self._present[row] = False
+        else:
+            row = self._length
+            self._reserve(row + 1, len(self._columns))
+            self._times[row] = time
+            self._time_to_row[time] = row
+            self._length += 1
+        if isinstance(point, JointStates):
+            # before indexing _data, because new columns can replace it
+            columns = self._columns_of(point)
+            self._data[row, columns] = point.data
+            self._present[row, columns] = True
+        else:
+            for joint_name, joint_state in point.items():
+                column = self._column(joint_name)
+                self._data[row, column] = joint_state.state
+                self._present[row, column] = True
 
     def __len__(self) -> int:
-        return len(self._points)
+        return self._length
 
     def get_joint_names(self):
         if len(self) == 0:
             raise IndexError(f'Trajectory is empty and therefore does not contain any joints.')
-        return list(self.get_exact(0).keys())
+        return [joint_name for joint_name, column in self._columns.items() if self._present[0, column]]
 
     def delete(self, time):
-        del self._points[time]
+        row = self._time_to_row.pop(time)
+        self.layout_version += 1
+        if row != self._length - 1:
+            self._data[row:self._length - 1] = self._data[row + 1:self._length].copy()
+            self._present[row:self._length - 1] = self._present[row + 1:self._length].copy()
+            self._times[row:self._length - 1] = self._times[row + 1:self._length]
+            for moved_row in range(row, self._length - 1):
+                self._time_to_row[int(self._times[moved_row])] = moved_row
+        self._length -= 1
+        self._data[self._length] = 0
+        self._present[self._length] = False
 
     def delete_last(self):
-        self.delete(list(self._points.keys())[-1])
+        self.delete(int(self._times[self._length - 1]))
 
     def get_last(self):
-        return list(self._points.values())[-1]
+        return self.get_exact(int(self._times[self._length - 1]))
 
-    def items(self):
-        return self._points.items()
+    def items(self) -> List[Tuple[int, JointStates]]:
+        return [(time, self._make_point(row)) for row, time in enumerate(self.keys())]
 
-    def keys(self):
-        return self._points.keys()
+    def keys(self) -> List[int]:
+        return self._times[:self._length].tolist()
 
-    def values(self):
-        return self._points.values()
+    def values(self) -> List[JointStates]:
+        return [self._make_point(row) for row in range(self._length)]
 
     def to_msg(self, sample_period: float, start_time: Union[rospy.Duration, float], joints: List[MovableJoint],
                fill_velocity_values: bool = True) -> JointTrajectory:
@@ -73,46 +220,88 @@ class Trajectory:
         trajectory_msg = JointTrajectory()
         trajectory_msg.header.stamp = start_time
         trajectory_msg.joint_names = []
-        for i, (time, traj_point) in enumerate(self.items()):
+        if len(self) == 0:
+            return trajectory_msg
+        columns = []
+        for joint in joints:
+            for free_variable in joint.get_free_variable_names():
+                if free_variable not in self._columns \
+                        or not self._present[:self._length, self._columns[free_variable]].all():
+                    raise NotImplementedError('generated traj does not contain all joints')
+                columns.append(self._columns[free_variable])
+                joint_name = free_variable
+                if isinstance(joint_name, PrefixName):
+                    joint_name = joint_name.short_name
+                trajectory_msg.joint_names.append(joint_name)
+        positions = self._data[:self._length, columns, Derivatives.position].tolist()
+        velocities = self._data[:self._length, columns, Derivatives.velocity].tolist()
+        times = (self._times[:self._length] * sample_period).tolist()
+        for i, time in enumerate(times):
             p = JointTrajectoryPoint()
-            p.time_from_start = rospy.Duration(time * sample_period)
-            for joint in joints:
-                free_variables = joint.get_free_variable_names()
-                for free_variable in free_variables:
-                    if free_variable in traj_point:
-                        if i == 0:
-                            joint_name = free_variable
-                            if isinstance(joint_name, PrefixName):
-                                joint_name = joint_name.short_name
-                            trajectory_msg.joint_names.append(joint_name)
-                        p.positions.append(traj_point[free_variable].position)
-                        if fill_velocity_values:
-                            p.velocities.append(traj_point[free_variable].velocity)
-                    else:
-                        raise NotImplementedError('generated traj does not contain all joints')
+            p.time_from_start = rospy.Duration(time)
+            p.positions = positions[i]
+            if fill_velocity_values:
+                p.velocities = velocities[i]
             trajectory_msg.points.append(p)
         return trajectory_msg
 
     def to_dict(self, normalize_position: bool = False, filter_0_vel: bool = True) -> Dict[
         Derivatives, Dict[PrefixName, np.ndarray]]:
-        data = defaultdict(lambda: defaultdict(list))
-        for time, joint_states in self.items():
-            for free_variable, joint_state in joint_states.items():
-                for derivative, state in enumerate(joint_state.state):
-                    data[derivative][free_variable].append(state)
-        for derivative, d_data in data.items():
-            for free_variable, trajectory in d_data.items():
-                d_data[free_variable] = np.array(trajectory)
-                if normalize_position and derivative == Derivatives.position:
-                    d_data[free_variable] -= (d_data[free_variable].max() + d_data[free_variable].min()) / 2
-        if filter_0_vel:
-            for free_variable, trajectory in list(data[Derivatives.velocity].items()):
-                if abs(trajectory.max() - trajectory.min()) < 1e-5:
-                    for derivative, d_data in list(data.items()):
-                        del d_data[free_variable]
-        for derivative, d_data in data.items():
-            data[derivative] = SortedDict(sorted(d_data.items()))
-        return data
+        result = {derivative: {} for derivative in range(self._data.shape[2])}
+        for joint_name, column in self._columns.items():
+            # like the points, the arrays only contain the times at which the joint was present
+            data = self._data[:self._length, column][self._present[:self._length, column]]
+            if len(data) == 0:
+                continue
+            if filter_0_vel:
+                velocities = data[:, Derivatives.velocity]
+                if abs(velocities.max() - velocities.min()) < 1e-5:
+                    continue
+            if normalize_position:
+                positions = data[:, Derivatives.position]
+                positions -= (positions.max() + positions.min()) / 2
+            for derivative, d_data in result.items():
+                d_data[joint_name] = data[:, derivative]
+        for derivative, d_data in result.items():
+            result[derivative] = SortedDict(sorted(d_data.items()))
+        return result
+
+    def to_arrays(self) -> Tuple[np.ndarray, List[PrefixName], np.ndarray]:
+        """
+        :return: copies of the times, joint names and values of shape (time, joint, derivative),
+                 values of joints that are missing at a time are nan
+        """
+        data = np.array(self.data)
+        data[~self._present[:self._length, :len(self._columns)]] = np.nan
+        return self._times[:self._length].copy(), self.joint_names, data
+
+    @classmethod
+    def from_arrays(cls, times: np.ndarray, joint_names: List[PrefixName], data: np.ndarray) -> Trajectory:
+        trajectory = cls()
+        data = np.array(data, dtype=float)
+        trajectory._present = ~np.isnan(data).all(axis=2)
+        trajectory._data = np.nan_to_num(data, nan=0)
+        trajectory._times = np.array(times, dtype=int)
+        trajectory._length = len(times)
+        trajectory._time_to_row = {int(time): row for row, time in enumerate(trajectory._times)}
+        trajectory._columns = {joint_name: column for column, joint_name in enumerate(joint_names)}
+        if trajectory._data.shape[0] == 0:
+            trajectory._data = np.zeros((cls.initial_capacity, len(joint_names), len(Derivatives)))
+            trajectory._present = np.zeros((cls.initial_capacity, len(joint_names)), dtype=bool)
+            trajectory._times = np.zeros(cls.initial_capacity, dtype=int)
+        return trajectory
+
+    def save(self, file_name: str):
+        """
+        Saves the trajectory as npz, use Trajectory.load to read it.
+        """
+        times, joint_names, data = self.to_arrays()
+        np.savez(file_name, times=times, joint_names=np.array([str(x) for x in joint_names]), data=data)
+
+    @classmethod
+    def load(cls, file_name: str) -> Trajectory:
+        with np.load(file_name) as f:
+            return cls.from_arrays(f['times'], f['joint_names'].tolist(), f['data'])
 
     @profile
     def plot_trajectory(self,
@@ -128,7 +317,8 @@ class Trajectory:
                         legend: bool = True,
                         hspace: float = 1,
                         y_limits: bool = None,
-                        filter_0_vel: bool = True):
+                        filter_0_vel: bool = True,
+                        max_derivative: Optional[Derivatives] = None):
         """
         :type tj: Trajectory
         :param controlled_joints: only joints in this list will be added to the plot
@@ -137,11 +327,13 @@ class Trajectory:
         :param cm_per_second: determines how much the x axis is scaled with the length(time) of the trajectory
         :param normalize_position: centers the joint positions around 0 on the y axis
         :param tick_stride: the distance between ticks in the plot. if tick_stride <= 0 pyplot determines the ticks automatically
+        :param max_derivative: taken from the god map, if None
         """
         cm_per_second = cm_to_inch(cm_per_second)
         height_per_derivative = cm_to_inch(height_per_derivative)
         hspace = cm_to_inch(hspace)
-        max_derivative = GodMap().get_data(identifier.max_derivative)
+        if max_derivative is None:
+            max_derivative = GodMap().get_data(identifier.max_derivative)
         with plot_lock:
             def ceil(val, base=0.0, stride=1.0):
                 base = base % stride
@@ -151,7 +343,7 @@ class Trajectory:
                 base = base % stride
                 return np.floor((float)(val - base) / stride) * stride + base
 
-            if len(self._points) <= 0:
+            if len(self) <= 0:
                 return
             colors = list(mcolors.TABLEAU_COLORS.keys())
             colors.append('k')
@@ -223,3 +415,10 @@ class Trajectory:
                         pass
             plt.savefig(file_name, bbox_inches="tight")
             logging.loginfo(f'saved {file_name}')
+
+
+def plot_trajectory_arrays(times: np.ndarray, joint_names: List[PrefixName], data: np.ndarray, **kwargs):
+    """
+    Plots a trajectory that was converted with Trajectory.to_arrays, used to plot in the BackgroundWorker.
+    """
+    Trajectory.from_arrays(times, joint_names, data).plot_trajectory(**kwargs)
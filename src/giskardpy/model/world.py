@@ -14,15 +14,14 @@ from geometry_msgs.msg import PoseStamped, Pose, PointStamped, Point, Vector3Sta
 from std_msgs.msg import ColorRGBA
 from tf2_msgs.msg import TFMessage
 
-import giskardpy.utils.math as mymath
 from giskard_msgs.msg import WorldBody
 from giskardpy import casadi_wrapper as w, identifier
-from giskardpy.casadi_wrapper import CompiledFunction
 from giskardpy.data_types import JointStates
 from giskardpy.exceptions import DuplicateNameException, UnknownGroupException, UnknownLinkException, \
     PhysicsWorldException, GiskardException
 from giskardpy.god_map import GodMap
 from giskardpy.god_map_user import GodMapWorshipper
+from giskardpy.model.fk import IncrementalFKComputer
 from giskardpy.model.joints import Joint, FixedJoint, PrismaticJoint, RevoluteJoint, OmniDrive, DiffDrive, \
     urdf_to_joint, VirtualFreeVariables, MovableJoint, Joint6DOF
 from giskardpy.model.links import Link, MeshGeometry
@@ -34,7 +33,8 @@ from giskardpy.qp.next_command import NextCommands
 from giskardpy.utils import logging
 from giskardpy.utils.tfwrapper import homo_matrix_to_pose, np_to_pose, msg_to_homogeneous_matrix, make_transform
 from giskardpy.utils.utils import suppress_stderr, clear_cached_properties
-from giskardpy.utils.decorators import memoize, copy_memoize, clear_memo
+from giskardpy.utils.decorators import memoize, clear_memo, view_memoize
+from giskardpy.utils.profiling import Profiler
 
 
 class TravelCompanion:
@@ -162,6 +162,7 @@ class WorldTree(WorldTreeInterface, GodMapWorshipper):
         self.god_map.set_data(identifier.world, self)
         self.connection_prefix = 'connection'
         self.fast_all_fks = None
+        self._fk_computer = IncrementalFKComputer(self)
         self._state_version = 0
         self._model_version = 0
         self._clear()
@@ -338,6 +339,7 @@ class WorldTree(WorldTreeInterface, GodMapWorshipper):
         clear_memo(self.compute_split_chain)
         clear_memo(self.are_linked)
         clear_memo(self.compose_fk_expression)
+        clear_memo(self.compose_fk_expression_from_ancestor)
         clear_memo(self.compute_chain)
         clear_memo(self.is_link_controlled)
         for free_variable in self.free_variables.values():
@@ -558,9 +560,11 @@ class WorldTree(WorldTreeInterface, GodMapWorshipper):
 
     def update_state(self, next_commands: NextCommands, dt: float):
         max_derivative = self.god_map.get_data(identifier.max_derivative)
-        for free_variable_name, command in next_commands.free_variable_data.items():
-            self.state[free_variable_name][:max_derivative] += command * dt
-            self.state[free_variable_name][max_derivative] = command[-1]
+        if next_commands.free_variable_data:
+            rows = self.state.rows(list(next_commands.free_variable_data.keys()))
+            commands = np.array(list(next_commands.free_variable_data.values()))
+            self.state.data[rows, :max_derivative] += commands * dt
+            self.state.data[rows, max_derivative] = commands[:, -1]
         for joint in self.joints.values():
             if isinstance(joint, VirtualFreeVariables):
                 joint.update_state(dt)
@@ -1187,7 +1191,7 @@ class WorldTree(WorldTreeInterface, GodMapWorshipper):
     def reset_joint_state_context(self):
         return ResetJointStateContextManager(self)
 
-    @copy_memoize
+    @view_memoize
     @profile
     def compose_fk_expression(self, root_link: PrefixName, tip_link: PrefixName) -> w.TransMatrix:
         """
@@ -1196,17 +1200,26 @@ class WorldTree(WorldTreeInterface, GodMapWorshipper):
         :param tip_link:
         :return: 4x4 homogenous transformation matrix
         """
-        fk = w.TransMatrix()
-        root_chain, _, tip_chain = self.compute_split_chain(root_link, tip_link, add_joints=True, add_links=False,
-                                                            add_fixed_joints=True, add_non_controlled_joints=True)
-        for joint_name in root_chain:
-            a = self.joints[joint_name].parent_T_child
-            ai = a.inverse()
-            fk = fk.dot(ai)
-        for joint_name in tip_chain:
-            a = self.joints[joint_name].parent_T_child
-            fk = fk.dot(a)
-        return fk
+        if root_link == tip_link:
+            return w.TransMatrix()
+        _, connection, _ = self.compute_split_chain(root_link, tip_link, add_joints=False, add_links=True,
+                                                    add_fixed_joints=True, add_non_controlled_joints=True)
+        connection_T_tip = self.compose_fk_expression_from_ancestor(connection[0], tip_link)
+        if connection[0] == root_link:
+            return connection_T_tip
+        connection_T_root = self.compose_fk_expression_from_ancestor(connection[0], root_link)
+        return connection_T_root.inverse().dot(connection_T_tip)
+
+    @memoize
+    def compose_fk_expression_from_ancestor(self, ancestor_link: PrefixName, link: PrefixName) -> w.TransMatrix:
+        """
+        ancestor_link_T_link, the chains of all links below ancestor_link share their common prefixes.
+        The result is cached, don't modify it.
+        """
+        if link == ancestor_link:
+            return w.TransMatrix()
+        joint = self.joints[self.links[link].parent_joint_name]
+        return self.compose_fk_expression_from_ancestor(ancestor_link, joint.parent_link_name).dot(joint.parent_T_child)
 
     @memoize
     def compute_fk_pose(self, root: my_string, tip: my_string) -> PoseStamped:
@@ -1259,80 +1272,26 @@ class WorldTree(WorldTreeInterface, GodMapWorshipper):
 
     @profile
     def compute_all_collision_fks(self):
-        params = self.god_map.unsafe_get_values(self._fk_computer.fast_collision_fks.str_params)
-        return self._fk_computer.fast_collision_fks.fast_call(params)
+        with Profiler().section('phase/collision_fk'):
+            return self._fk_computer.compute_all_collision_fks()
+
+    def compute_collision_fks_batch(self, free_variable_names: List[PrefixName], positions: np.ndarray) -> np.ndarray:
+        """
+        compute_all_collision_fks for a batch of joint states, without changing the state of the world.
+        :param free_variable_names: the other free variables keep their current position
+        :param positions: shape (number of joint states, len(free_variable_names))
+        :return: shape (number of joint states, 4 * number of links with collisions, 4)
+        """
+        return self._fk_computer.compute_collision_fks_batch(free_variable_names, positions)
 
     @profile
     def init_all_fks(self):
-        class ExpressionCompanion(TravelCompanion):
-            idx_start: Dict[PrefixName, int]
-            fast_collision_fks: CompiledFunction
-            fast_all_fks: CompiledFunction
-            str_params: List[str]
-
-            def __init__(self, world: WorldTree):
-                self.world = world
-                self.god_map = GodMap()
-                self.fks = {self.world.root_link_name: w.TransMatrix()}
-
-            @profile
-            def joint_call(self, joint_name: my_string) -> bool:
-                joint = self.world.joints[joint_name]
-                map_T_parent = self.fks[joint.parent_link_name]
-                self.fks[joint.child_link_name] = map_T_parent.dot(joint.parent_T_child)
-                return False
-
-            @profile
-            def compile_fks(self):
-                all_fks = w.vstack([self.fks[link_name] for link_name in self.world.link_names_as_set])
-                collision_fks = []
-                # collision_ids = []
-                for link_name in sorted(self.world.link_names_with_collisions):
-                    if link_name == self.world.root_link_name:
-                        continue
-                    # link = self.world.links[link_name]
-                    # for collision_id, geometry in enumerate(link.collisions):
-                    #     link_name_with_id = link.name_with_collision_id(collision_id)
-                    collision_fks.append(self.fks[link_name])
-                    # collision_ids.append(link_name_with_id)
-                collision_fks = w.vstack(collision_fks)
-                # self.collision_link_order = list(collision_ids)
-                params = set()
-                params.update(all_fks.free_symbols())
-                params.update(collision_fks.free_symbols())
-                params = list(params)
-                self.str_params = [str(v) for v in params]
-                self.fast_all_fks = all_fks.compile(parameters=params)
-                self.fast_collision_fks = collision_fks.compile(parameters=params)
-                self.idx_start = {link_name: i * 4 for i, link_name in enumerate(self.world.link_names_as_set)}
-
-            @profile
-            def recompute(self):
-                self.compute_fk_np.memo.clear()
-                self.fks = self.fast_all_fks.fast_call(self.god_map.unsafe_get_values(self.fast_all_fks.str_params))
-
-            @memoize
-            @profile
-            def compute_fk_np(self, root, tip):
-                if root == self.world.root_link_name:
-                    map_T_root = np.eye(4)
-                else:
-                    map_T_root = self.fks[self.idx_start[root]:self.idx_start[root] + 4]
-                if tip == self.world.root_link_name:
-                    map_T_tip = np.eye(4)
-                else:
-                    map_T_tip = self.fks[self.idx_start[tip]:self.idx_start[tip] + 4]
-                root_T_map = mymath.inverse_frame(map_T_root)
-                root_T_tip = np.dot(root_T_map, map_T_tip)
-                return root_T_tip
-
-        self._fk_computer = ExpressionCompanion(self)
-        self.travel_branch(self.root_link_name, self._fk_computer)
-        self._fk_computer.compile_fks()
+        self._fk_computer.update()
 
     @profile
     def _recompute_fks(self):
-        self._fk_computer.recompute()
+        with Profiler().section('phase/fk'):
+            self._fk_computer.recompute()
 
     @profile
     def compute_fk_np(self, root: PrefixName, tip: PrefixName) -> np.ndarray:
@@ -0,0 +1,309 @@
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+from enum import Enum
+from typing import List, Optional, Dict, Any, Type, Callable, Tuple
+
+import numpy as np
+
+import giskardpy.casadi_wrapper as cas
+from giskardpy.my_types import Derivatives, PrefixName
+from giskardpy.qp.constraint import EqualityConstraint, InequalityConstraint, DerivativeInequalityConstraint
+from giskardpy.qp.free_variable import FreeVariable
+from giskardpy.qp.qp_solver import QPSolver
+from giskardpy.utils import logging
+from giskardpy.utils.singleton import SingletonMeta
+from giskardpy.utils.utils import create_path
+
+
+class CachedController:
+    """
+    Everything QPProblemBuilder.compile produces, that can't be cheaply recomputed from the goals.
+    """
+
+    def __init__(self, qp_solver: QPSolver, names: Dict[str, Dict[str, np.ndarray]]):
+        self.qp_solver = qp_solver
+        self.names = names
+
+
+class ControllerCache(metaclass=SingletonMeta):
+    """
+    LRU cache for compiled qp controllers, keyed by the structure of the qp problem.
+    Entries are kept pickled in memory and optionally also on disk, such that they survive restarts.
+    The casadi functions are stored serialized, see CompiledFunction.__getstate__.
+    """
+    file_extension = '.controller'
+
+    def __init__(self):
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self.max_size = 10
+        self.max_disk_size = 100
+        self.cache_dir: Optional[str] = None
+        self.reset_stats()
+
+    def configure(self, max_size: int, cache_dir: Optional[str] = None, max_disk_size: int = 100):
+        """
+        :param max_size: number of controllers kept in memory, 0 disables the cache.
+        :param cache_dir: controllers are also saved here, None to only use the memory cache.
+        :param max_disk_size: number of controllers kept in cache_dir.
+        """
+        self.max_size = max_size
+        self.max_disk_size = max_disk_size
+        self.cache_dir = cache_dir
+        self._evict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def reset_stats(self):
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def clear(self, disk: bool = False):
+        self._memory.clear()
+        if disk and self.cache_dir is not None and os.path.isdir(self.cache_dir):
+            for file_name in self._disk_entries():
+                os.remove(file_name)
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'entries': len(self._memory)}
+
+    def __len__(self):
+        return len(self._memory)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._memory or (self._disk_path(key) is not None and os.path.isfile(self._disk_path(key)))
+
+    @profile
+    def get(self, key: str) -> Optional[CachedController]:
+        if not self.enabled:
+            return None
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return pickle.loads(self._memory[key])
+        data = self._load_from_disk(key)
+        if data is not None:
+            self._memory[key] = data
+            self._evict()
+            self.hits += 1
+            self.disk_hits += 1
+            return pickle.loads(data)
+        self.misses += 1
+        return None
+
+    @profile
+    def put(self, key: str, entry: CachedController):
+        if not self.enabled:
+            return
+        try:
+            data = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logging.logwarn(f'Failed to pickle controller, it will not be cached: {e}')
+            return
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        self._save_to_disk(key, data)
+        self._evict()
+
+    def _evict(self):
+        while len(self._memory) > max(self.max_size, 0):
+            self._memory.popitem(last=False)
+        if self.cache_dir is not None and os.path.isdir(self.cache_dir):
+            files = sorted(self._disk_entries(), key=os.path.getmtime)
+            for file_name in files[:max(len(files) - self.max_disk_size, 0)]:
+                os.remove(file_name)
+
+    def _disk_entries(self) -> List[str]:
+        return [os.path.join(self.cache_dir, f) for f in os.listdir(self.cache_dir)
+                if f.endswith(self.file_extension)]
+
+    def _disk_path(self, key: str) -> Optional[str]:
+        if self.cache_dir is None:
+            return None
+        return os.path.join(self.cache_dir, f'{key}{self.file_extension}')
+
+    def _load_from_disk(self, key: str) -> Optional[bytes]:
+        path = self._disk_path(key)
+        if path is None or not os.path.isfile(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # touch, such that the disk eviction is lru as well
+            os.utime(path)
+            return data
+        except OSError as e:
+            logging.logwarn(f'Failed to load controller from cache: {e}')
+            return None
+
+    def _save_to_disk(self, key: str, data: bytes):
+        path = self._disk_path(key)
+        if path is None:
+            return
+        try:
+            create_path(path)
+            tmp_path = f'{path}.tmp{os.getpid()}'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.logwarn(f'Failed to save controller to cache: {e}')
+
+    @profile
+    def problem_key(self,
+                    solver_class: Type[QPSolver],
+                    free_variables: List[FreeVariable],
+                    equality_constraints: List[EqualityConstraint],
+                    inequality_constraints: List[InequalityConstraint],
+                    derivative_constraints: List[DerivativeInequalityConstraint],
+                    sample_period: float,
+                    prediction_horizon: int,
+                    max_derivative: Derivatives,
+                    default_limits: bool,
+                    code_generation: bool = False) -> str:
+        """
+        Hashes everything that goes into QPProblemBuilder.compile.
+        Free variable limits and weights are evaluated during compilation, so their values are part of the key.
+        :raises TypeError: if a constraint contains something, that can't be hashed reliably
+        """
+        h = hashlib.sha256()
+        update = lambda thing: _hash_thing(h, thing)
+        update(f'{solver_class.__module__}.{solver_class.__name__}')
+        update((sample_period, prediction_horizon, int(max_derivative), default_limits, code_generation))
+        for v in free_variables:
+            update(v.position_name)
+            for derivative in Derivatives.range(Derivatives.position, max_derivative):
+                for get_limit in (v.get_lower_limit, v.get_upper_limit):
+                    try:
+                        update(get_limit(derivative, evaluated=True))
+                    except KeyError:
+                        update(None)
+            update(sorted((int(d), v.god_map.evaluate_expr(w)) for d, w in v.quadratic_weights.items()))
+            update(sorted((int(d), f) for d, f in v.horizon_functions.items()))
+        for constraints in (equality_constraints, inequality_constraints, derivative_constraints):
+            update(len(constraints))
+            for c in constraints:
+                update(type(c).__name__)
+                update(sorted(vars(c).items()))
+        return h.hexdigest()
+
+
+class ConstraintBlockCache(metaclass=SingletonMeta):
+    """
+    LRU cache for the parts of a qp problem that only depend on a single constraint or on the problem dimensions,
+    e.g. the jacobian rows of a constraint or the derivative link model.
+    Used to rebuild controllers incrementally, when only a few goals changed since the last controller.
+    Entries are casadi expressions and only kept in memory.
+    """
+
+    def __init__(self):
+        self._blocks: OrderedDict[Any, Any] = OrderedDict()
+        self.max_size = 10000
+        self.reset_stats()
+
+    def configure(self, max_size: int):
+        """
+        :param max_size: number of blocks kept in memory, 0 disables the cache.
+        """
+        self.max_size = max_size
+        self._evict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self._blocks.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._blocks)}
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def get(self, key: Any, factory: Callable[[], Any]) -> Any:
+        """
+        :return: the block saved under key, factory() is used to create it, if there is none.
+        """
+        if key in self._blocks:
+            self._blocks.move_to_end(key)
+            self.hits += 1
+            return self._blocks[key]
+        self.misses += 1
+        block = factory()
+        if self.enabled:
+            self._blocks[key] = block
+            self._evict()
+        return block
+
+    @profile
+    def constraint_jacobian(self,
+                            expression: cas.Expression,
+                            symbols: Dict[str, cas.Symbol],
+                            dt: float) -> List[Tuple[str, cas.ca.SX]]:
+        """
+        :param expression: of a constraint
+        :param symbols: all symbols the expression should be derived by
+        :return: (symbol name, derivative * dt) for every symbol in symbols, whose derivative is not 0.
+        """
+        expression = cas.Expression(expression)
+        used_symbols = sorted(str(s) for s in expression.free_symbols() if str(s) in symbols)
+        h = hashlib.sha256()
+        h.update(expression.s.serialize().encode())
+        key = ('constraint_jacobian', h.hexdigest(), tuple(used_symbols), dt)
+
+        def factory():
+            if len(used_symbols) == 0:
+                return []
+            J = cas.jacobian(expressions=expression, symbols=[symbols[s] for s in used_symbols]) * dt
+            return [(symbol_name, J.s[0, i]) for i, symbol_name in enumerate(used_symbols)
+                    if not J.s[0, i].is_zero()]
+
+        return self.get(key, factory)
+
+    def _evict(self):
+        while len(self._blocks) > max(self.max_size, 0):
+            self._blocks.popitem(last=False)
+
+
+def _hash_thing(h: 'hashlib._Hash', thing: Any):
+    if isinstance(thing, cas.Symbol_):
+        thing = thing.s
+    if isinstance(thing, cas.ca.SX):
+        h.update(b'SX')
+        h.update(thing.serialize().encode())
+    elif isinstance(thing, (list, tuple)):
+        h.update(f'[{len(thing)}'.encode())
+        for x in thing:
+            _hash_thing(h, x)
+        h.update(b']')
+    elif isinstance(thing, dict):
+        _hash_thing(h, sorted(thing.items()))
+    elif isinstance(thing, np.ndarray):
+        h.update(thing.tobytes())
+    elif callable(thing) and hasattr(thing, '__code__'):
+        h.update(thing.__qualname__.encode())
+        h.update(thing.__code__.co_code)
+        if thing.__closure__ is not None:
+            _hash_thing(h, [cell.cell_contents for cell in thing.__closure__])
+    elif isinstance(thing, np.generic):
+        _hash_thing(h, thing.item())
+    elif thing is None or isinstance(thing, (bool, int, float, str, Enum, PrefixName)):
+        # type name, such that e.g. 1, 1.0, True and '1' produce different keys
+        h.update(f'{type(thing).__name__}:{thing!r}'.encode())
+    else:
+        # repr of other objects may contain memory addresses, which would make the keys differ between processes
+        raise TypeError(f'Can\'t hash object of type \'{type(thing).__name__}\' for the controller cache.')
@@ -62,8 +62,27 @@ def compute_projected_vel_profile(current_vel, current_acc, target_vel_profile,
     return cas.Expression(vel_profile), acc_profile, jerk_profile
 
 
+def b_profile_mpc_batch(pos_limits: np.ndarray, vel_limits: np.ndarray, acc_limits: np.ndarray,
+                        jerk_limits: np.ndarray, dt: float, ph: int) -> np.ndarray:
+    """
+    Computes the mpc profiles used by b_profile for many joints at once.
+    :param pos_limits: one row of (lower, upper) per joint, the other limits are the same
+    :return: one row per joint, to be used as mpc_profile in b_profile
+    """
+    pos_limits = np.asarray(pos_limits, dtype=float).reshape(-1, 2)
+    vel_limits = np.asarray(vel_limits, dtype=float).reshape(-1, 2)
+    pos_range = pos_limits[:, 1] - pos_limits[:, 0]
+    vel_limit = np.minimum(vel_limits[:, 1] * dt, pos_range / 2) / dt
+    acc_limit = np.asarray(acc_limits, dtype=float).reshape(-1, 2)[:, 1]
+    jerk_limit = np.asarray(jerk_limits, dtype=float).reshape(-1, 2)[:, 1]
+    return gm.simple_mpc_batch(vel_limit, acc_limit, jerk_limit, vel_limit, 0, dt, ph, (0, 0, 0), (-1, 0, 0))
+
+
 def b_profile(current_pos, current_vel, current_acc,
-              pos_limits, vel_limits, acc_limits, jerk_limits, dt, ph, eps=0.00001):
+              pos_limits, vel_limits, acc_limits, jerk_limits, dt, ph, eps=0.00001, mpc_profile=None):
+    """
+    :param mpc_profile: result of b_profile_mpc_batch for this joint, computed here if None
+    """
     vel_limit = vel_limits[1]
     acc_limit = acc_limits[1]
     jerk_limit = jerk_limits[1]
@@ -71,7 +90,10 @@ def b_profile(current_pos, current_vel, current_acc,
     pos_limit_lb = pos_limits[0]
     pos_limit_ub = pos_limits[1]
     vel_limit = min(vel_limit * dt, pos_range / 2) / dt
-    profile = gm.simple_mpc(vel_limit, acc_limit, jerk_limit, vel_limit, 0, dt, ph, (0, 0, 0), (-1, 0, 0))
+    if mpc_profile is None:
+        profile = gm.simple_mpc(vel_limit, acc_limit, jerk_limit, vel_limit, 0, dt, ph, (0, 0, 0), (-1, 0, 0))
+    else:
+        profile = mpc_profile
     vel_profile_mpc = profile[:ph]
     acc_profile_mpc = profile[ph:ph * 2]
     pos_error_lb = pos_limit_lb - current_pos
@@ -4,10 +4,12 @@ import os
 from abc import ABC
 from collections import defaultdict
 from copy import deepcopy
+from time import perf_counter
 from typing import List, Dict, Tuple, Type, Union, Optional, DefaultDict
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
+import scipy.sparse as sp
 
 import giskardpy.casadi_wrapper as cas
 from giskardpy import identifier
@@ -19,12 +21,16 @@ from giskardpy.god_map_user import GodMapWorshipper
 from giskardpy.model.world import WorldTree
 from giskardpy.my_types import Derivatives
 from giskardpy.qp.constraint import InequalityConstraint, EqualityConstraint, DerivativeInequalityConstraint
+from giskardpy.qp.controller_cache import ControllerCache, CachedController, ConstraintBlockCache
 from giskardpy.qp.free_variable import FreeVariable
 from giskardpy.qp.next_command import NextCommands
-from giskardpy.qp.pos_in_vel_limits import b_profile
+from giskardpy.qp.pos_in_vel_limits import b_profile, b_profile_mpc_batch
 from giskardpy.qp.qp_solver import QPSolver
-from giskardpy.utils import logging
-from giskardpy.utils.utils import create_path, get_all_classes_in_package
+from giskardpy.qp.solver_registry import SolverRegistry
+from giskardpy.qp.solver_selection import SolverBenchmark, SolverSelectionTable, problem_dimensions
+from giskardpy.utils import logging, codegen
+from giskardpy.utils.background_worker import BackgroundWorker
+from giskardpy.utils.utils import create_path
 from giskardpy.utils.decorators import memoize
 import giskardpy.utils.math as giskard_math
 
@@ -32,23 +38,15 @@ import giskardpy.utils.math as giskard_math
 date_str = datetime.datetime.now().strftime('%Yy-%mm-%dd--%Hh-%Mm-%Ss')
 
 
-def save_pandas(dfs, names, path, time: float, folder_name: Optional[str] = None):
+def save_debug_data(data: Dict[str, np.ndarray], path: str, time: int, folder_name: Optional[str] = None):
+    """
+    Saves the arrays of QPProblemBuilder.debug_data as one uncompressed npz file, load them with np.load.
+    """
     if folder_name is None:
         folder_name = ''
-    folder_name = f'{path}/pandas/{folder_name}_{date_str}/{time}/'
-    create_path(folder_name)
-    for df, name in zip(dfs, names):
-        csv_string = 'name\n'
-        with pd.option_context('display.max_rows', None, 'display.max_columns', None):
-            if df.shape[1] > 1:
-                for column_name, column in df.T.items():
-                    zero_filtered_column = column.replace(0, pd.np.nan).dropna(how='all').replace(pd.np.nan, 0)
-                    csv_string += zero_filtered_column.add_prefix(column_name + '||').to_csv(float_format='%.4f')
-            else:
-                csv_string += df.to_csv(float_format='%.4f')
-        file_name2 = f'{folder_name}{name}.csv'
-        with open(file_name2, 'w') as f:
-            f.write(csv_string)
+    file_name = f'{path}/qp_data/{folder_name}_{date_str}/{time}.npz'
+    create_path(file_name)
+    np.savez(file_name, **data)
 
 
 class ProblemDataPart(ABC):
@@ -65,6 +63,8 @@ class ProblemDataPart(ABC):
     sample_period: float
     prediction_horizon: int
     max_derivative: Derivatives
+    # if set, blocks are reused from previous controllers, see QPProblemBuilder.incremental_compilation
+    block_cache: Optional[ConstraintBlockCache] = None
 
     def __init__(self,
                  free_variables: List[FreeVariable],
@@ -96,6 +96,75 @@ class ProblemDataPart(ABC):
     def get_derivative_constraints(self, derivative: Derivatives) -> List[DerivativeInequalityConstraint]:
         return [c for c in self.derivative_constraints if c.derivative == derivative]
 
+    @profile
+    def constraint_model_from_blocks(self, constraints: List[Union[EqualityConstraint, InequalityConstraint]]) \
+            -> cas.Expression:
+        """
+        Same model as in EqualityModel.equality_constraint_model, but assembled from the jacobian of each
+        constraint individually. These are cached in block_cache, such that only new constraints have to be derived.
+        """
+        num_free_variables = self.number_of_free_variables
+        horizontal_offset = num_free_variables * self.prediction_horizon
+        symbols = {}
+        symbol_columns = {}
+        for derivative in Derivatives.range(Derivatives.position, self.max_derivative - 1):
+            for i, v in enumerate(self.free_variables):
+                symbol = v.get_symbol(derivative)
+                symbols[str(symbol)] = symbol
+                symbol_columns[str(symbol)] = horizontal_offset * derivative + i
+        rows = []
+        columns = []
+        entries = []
+        for row, c in enumerate(sorted(constraints, key=lambda c: c.name)):
+            for symbol_name, entry in self.block_cache.constraint_jacobian(c.expression, symbols, self.dt):
+                for t in range(c.control_horizon):
+                    rows.append(row)
+                    columns.append(symbol_columns[symbol_name] + t * num_free_variables)
+                    entries.append(entry)
+        num_columns = num_free_variables * self.prediction_horizon * self.max_derivative
+        if len(entries) == 0:
+            return cas.sparse_zeros(len(constraints), num_columns)
+        return cas.Expression(cas.ca.SX.triplet(rows, columns, cas.ca.vertcat(*entries), len(constraints),
+                                                num_columns))
+
+    @profile
+    def sparse_constraint_model(self, jacobians: Dict[int, cas.Expression], control_horizons: List[int],
+                                one_row_per_time_step: bool) -> cas.Expression:
+        """
+        Assembles a constraint model from the nonzeros of the jacobians, instead of filling a dense matrix.
+        :param jacobians: column block (0 for velocity columns, 1 for acceleration, ...) -> jacobian with one row
+                            per constraint and one column per free variable
+        :param control_horizons: of each constraint, nothing is added for time steps after it
+        :param one_row_per_time_step: False: one row per constraint, the jacobian is repeated for every time step.
+                                      True: one row per constraint and time step, sorted by time step, the jacobian is
+                                            on the block diagonal.
+        """
+        num_free_variables = self.number_of_free_variables
+        horizontal_offset = num_free_variables * self.prediction_horizon
+        num_columns = horizontal_offset * self.max_derivative
+        control_horizons = np.array(control_horizons, dtype=int)
+        if one_row_per_time_step:
+            # row of each constraint at each time step
+            active = np.arange(self.prediction_horizon)[:, None] < control_horizons[None, :]
+            row_ids = np.full(active.shape, -1)
+            row_ids[active] = np.arange(np.count_nonzero(active))
+            num_rows = np.count_nonzero(active)
+        else:
+            num_rows = len(control_horizons)
+        rows = []
+        columns = []
+        entries = []
+        for column_block, jacobian in jacobians.items():
+            jacobian_rows, jacobian_columns = jacobian.s.sparsity().get_triplet()
+            for row, column, entry in zip(jacobian_rows, jacobian_columns, jacobian.s.nonzeros()):
+                for t in range(control_horizons[row]):
+                    rows.append(row_ids[t, row] if one_row_per_time_step else row)
+                    columns.append(horizontal_offset * column_block + t * num_free_variables + column)
+                    entries.append(entry)
+        if len(entries) == 0:
+            return cas.sparse_zeros(num_rows, num_columns)
+        return cas.Expression(cas.ca.SX.triplet(rows, columns, cas.ca.vertcat(*entries), num_rows, num_columns))
+
     @abc.abstractmethod
     def construct_expression(self) -> Union[cas.Expression, Tuple[cas.Expression, cas.Expression]]:
         pass
@@ -262,7 +331,35 @@ class FreeVariableBounds(ProblemDataPart):
                          max_derivative=max_derivative)
         self.evaluated = True
 
-    def velocity_limit(self, v: FreeVariable):
+    def b_profile_limits(self, v: FreeVariable) -> Tuple[Tuple[float, float], ...]:
+        """
+        :return: position, velocity, acceleration and jerk limits of v, as (lower, upper) tuples
+        """
+        return tuple((v.get_lower_limit(derivative, evaluated=True), v.get_upper_limit(derivative, evaluated=True))
+                     for derivative in Derivatives.range(Derivatives.position, Derivatives.jerk))
+
+    def mpc_profiles(self) -> Dict[str, np.ndarray]:
+        """
+        Computes the mpc profiles of b_profile for all free variables with position limits in one go.
+        :return: free variable name -> profile, empty if the batch failed, in which case velocity_limit computes
+                 them one by one to report the free variable that caused the problem.
+        """
+        variables = [v for v in self.free_variables if v.has_position_limits()]
+        if len(variables) == 0:
+            return {}
+        limits = np.array([self.b_profile_limits(v) for v in variables])
+        try:
+            profiles = b_profile_mpc_batch(pos_limits=limits[:, Derivatives.position],
+                                           vel_limits=limits[:, Derivatives.velocity],
+                                           acc_limits=limits[:, Derivatives.acceleration],
+                                           jerk_limits=limits[:, Derivatives.jerk],
+                                           dt=self.dt,
+                                           ph=self.prediction_horizon)
+        except InfeasibleException:
+            return {}
+        return {v.name: profile for v, profile in zip(variables, profiles)}
+
+    def velocity_limit(self, v: FreeVariable, mpc_profile: Optional[np.ndarray] = None):
         current_position = v.get_symbol(Derivatives.position)
         lower_velocity_limit = v.get_lower_limit(Derivatives.velocity, evaluated=True)
         upper_velocity_limit = v.get_upper_limit(Derivatives.velocity, evaluated=True)
@@ -295,7 +392,8 @@ class FreeVariableBounds(ProblemDataPart):
                                acc_limits=(lower_acc_limit, upper_acc_limit),
                                jerk_limits=(lower_jerk_limit, upper_jerk_limit),
                                dt=self.dt,
-                               ph=self.prediction_horizon)
+                               ph=self.prediction_horizon,
+                               mpc_profile=mpc_profile)
         except InfeasibleException as e:
             max_reachable_vel = giskard_math.max_velocity_from_horizon_and_jerk(self.prediction_horizon,
                                                                                 upper_jerk_limit, self.dt)
@@ -315,8 +413,9 @@ class FreeVariableBounds(ProblemDataPart):
             -> Tuple[List[Dict[str, cas.symbol_expr_float]], List[Dict[str, cas.symbol_expr_float]]]:
         lb: DefaultDict[Derivatives, Dict[str, cas.symbol_expr_float]] = defaultdict(dict)
         ub: DefaultDict[Derivatives, Dict[str, cas.symbol_expr_float]] = defaultdict(dict)
+        mpc_profiles = self.mpc_profiles()
         for v in self.free_variables:
-            lb_, ub_ = self.velocity_limit(v)
+            lb_, ub_ = self.velocity_limit(v, mpc_profiles.get(v.name))
             for t in range(self.prediction_horizon):
                 for derivative in Derivatives.range(Derivatives.velocity, min(v.order, self.max_derivative)):
                     if t >= self.prediction_horizon - (self.max_derivative - derivative):
@@ -605,41 +704,31 @@ class EqualityModel(ProblemDataPart):
         x_n - xd_n * dt = x_c
         - x_c + x_n - xd_n * dt = 0
         """
-        num_rows = self.number_of_free_variables * self.prediction_horizon * (self.max_derivative - 1)
-        num_columns = self.number_of_free_variables * self.prediction_horizon * self.max_derivative
-        derivative_link_model = cas.zeros(num_rows, num_columns)
-
-        x_n = cas.eye(num_rows)
-        derivative_link_model[:, :x_n.shape[0]] += x_n
-
-        xd_n = -cas.eye(num_rows) * self.dt
-        h_offset = self.number_of_free_variables * self.prediction_horizon
-        derivative_link_model[:, h_offset:] += xd_n
-
-        x_c_height = self.number_of_free_variables * (self.prediction_horizon - 1)
-        x_c = -cas.eye(x_c_height)
-        offset_v = 0
-        offset_h = 0
-        for derivative in Derivatives.range(Derivatives.velocity, self.max_derivative - 1):
-            offset_v += self.number_of_free_variables
-            derivative_link_model[offset_v:offset_v + x_c_height, offset_h:offset_h + x_c_height] += x_c
-            offset_v += x_c_height
-            offset_h += self.prediction_horizon * self.number_of_free_variables
-        derivative_link_model = self._remove_rows_columns_where_variables_are_zero(derivative_link_model)
-        return derivative_link_model
-
-    def _remove_rows_columns_where_variables_are_zero(self, derivative_link_model: cas.Expression) -> cas.Expression:
-        if np.prod(derivative_link_model.shape) == 0:
-            return derivative_link_model
+        if self.block_cache is not None:
+            key = ('derivative_link_model', self.number_of_free_variables, self.prediction_horizon,
+                   self.max_derivative, self.dt)
+            derivative_link_model = self.block_cache.get(key, self._derivative_link_model)
+            # copy, because the result gets modified in place later on
+            return cas.Expression(cas.ca.SX(derivative_link_model.s))
+        return self._derivative_link_model()
+
+    def _derivative_link_model(self) -> cas.Expression:
+        return cas.Expression(cas.ca.SX(cas.ca.DM(self.derivative_link_model_csc())))
+
+    def derivative_link_model_csc(self) -> sp.csc_matrix:
+        """
+        The derivative link model is constant. It is the model of a single free variable, without the rows of
+        derivatives that are zero at the end of the horizon, expanded to all free variables with a kronecker product.
+        """
+        single_free_variable_model = giskard_math.derivative_link_model(self.dt, self.prediction_horizon,
+                                                                        self.max_derivative)
         row_ids = []
-        end = 0
         for derivative in Derivatives.range(Derivatives.velocity, self.max_derivative - 1):
             last_non_zero_variable = self.prediction_horizon - (self.max_derivative - derivative - 1)
-            start = end + self.number_of_free_variables * last_non_zero_variable
-            end += self.number_of_free_variables * self.prediction_horizon
-            row_ids.extend(range(start, end))
-        derivative_link_model.remove(row_ids, [])
-        return derivative_link_model
+            start = (derivative - 1) * self.prediction_horizon
+            row_ids.extend(range(start, start + last_non_zero_variable))
+        return sp.kron(sp.csc_matrix(single_free_variable_model[row_ids]), sp.eye(self.number_of_free_variables),
+                       format='csc')
 
     @profile
     def equality_constraint_model(self) -> Tuple[cas.Expression, cas.Expression]:
@@ -650,18 +739,17 @@ class EqualityModel(ProblemDataPart):
         |  J1*sp |  J1*sp |  J2*sp |  J2*sp |  J3*sp | J3*sp  | sp*ch  | sp*ch  |
         |-----------------------------------------------------------------------|
         """
+        if len(self.equality_constraints) > 0 and self.block_cache is not None:
+            model = self.constraint_model_from_blocks(self.equality_constraints)
+            slack_model = cas.diag(cas.Expression([self.dt * c.control_horizon for c in self.equality_constraints]))
+            return model, slack_model
         if len(self.equality_constraints) > 0:
-            model = cas.zeros(len(self.equality_constraints), self.number_of_non_slack_columns)
-            for derivative in Derivatives.range(Derivatives.position, self.max_derivative - 1):
-                J_eq = cas.jacobian(expressions=cas.Expression(self.equality_constraint_expressions()),
-                                    symbols=self.get_free_variable_symbols(derivative)) * self.dt
-                J_hstack = cas.hstack([J_eq for _ in range(self.prediction_horizon)])
-                # set jacobian entry to 0 if control horizon shorter than prediction horizon
-                for i, c in enumerate(self.equality_constraints):
-                    # offset = vertical_offset + i
-                    J_hstack[i, c.control_horizon * len(self.free_variables):] = 0
-                horizontal_offset = J_hstack.shape[1]
-                model[:, horizontal_offset * derivative:horizontal_offset * (derivative + 1)] = J_hstack
+            expressions = cas.Expression(self.equality_constraint_expressions())
+            jacobians = {derivative: cas.jacobian(expressions=expressions,
+                                                  symbols=self.get_free_variable_symbols(derivative)) * self.dt
+                         for derivative in Derivatives.range(Derivatives.position, self.max_derivative - 1)}
+            control_horizons = self._sorter({c.name: c.control_horizon for c in self.equality_constraints})[0]
+            model = self.sparse_constraint_model(jacobians, control_horizons, one_row_per_time_step=False)
 
             # slack variable for total error
             slack_model = cas.diag(cas.Expression([self.dt * c.control_horizon for c in self.equality_constraints]))
@@ -683,8 +771,8 @@ class EqualityModel(ProblemDataPart):
         model = cas.vstack(model_parts)
         slack_model = cas.vstack(slack_model_parts)
 
-        slack_model = cas.vstack([cas.zeros(derivative_link_model.shape[0],
-                                            slack_model.shape[1]),
+        slack_model = cas.vstack([cas.sparse_zeros(derivative_link_model.shape[0],
+                                                   slack_model.shape[1]),
                                   slack_model])
         model = self._remove_columns_columns_where_variables_are_zero(model)
         return model, slack_model
@@ -725,6 +813,13 @@ class InequalityModel(ProblemDataPart):
     def get_free_variable_symbols(self, order: Derivatives):
         return self._sorter({v.position_name: v.get_symbol(order) for v in self.free_variables})[0]
 
+    def get_derivative_control_horizons(self, derivative: Derivatives) -> List[int]:
+        """
+        :return: control horizons in the same order as get_derivative_constraint_expressions
+        """
+        return self._sorter({c.name: c.control_horizon for c in self.derivative_constraints
+                             if c.derivative == derivative})[0]
+
     def velocity_constraint_model(self) -> Tuple[cas.Expression, cas.Expression]:
         """
         model
@@ -752,22 +847,12 @@ class InequalityModel(ProblemDataPart):
         number_of_vel_rows = len(self.velocity_constraints) * self.prediction_horizon
         if number_of_vel_rows > 0:
             expressions = cas.Expression(self.get_derivative_constraint_expressions(Derivatives.velocity))
-            model = cas.zeros(number_of_vel_rows, self.number_of_non_slack_columns)
-            for derivative in Derivatives.range(Derivatives.position, self.max_derivative - 1):
-                J_vel = cas.jacobian(expressions=expressions,
-                                     symbols=self.get_free_variable_symbols(derivative)) * self.dt
-                J_vel_limit_block = cas.kron(cas.eye(self.prediction_horizon), J_vel)
-                horizontal_offset = self.number_of_free_variables * self.prediction_horizon
-                model[:, horizontal_offset * derivative:horizontal_offset * (derivative + 1)] = J_vel_limit_block
-
-            # delete rows if control horizon of constraint shorter than prediction horizon
-            rows_to_delete = []
-            for t in range(self.prediction_horizon):
-                for i, c in enumerate(self.velocity_constraints):
-                    v_index = i + (t * len(self.velocity_constraints))
-                    if t + 1 > c.control_horizon:
-                        rows_to_delete.append(v_index)
-            model.remove(rows_to_delete, [])
+            jacobians = {derivative: cas.jacobian(expressions=expressions,
+                                                  symbols=self.get_free_variable_symbols(derivative)) * self.dt
+                         for derivative in Derivatives.range(Derivatives.position, self.max_derivative - 1)}
+            # no rows if control horizon of constraint shorter than prediction horizon
+            model = self.sparse_constraint_model(jacobians, self.get_derivative_control_horizons(Derivatives.velocity),
+                                                 one_row_per_time_step=True)
 
             # constraint slack
             num_slack_variables = sum(c.control_horizon for c in self.velocity_constraints)
@@ -785,7 +870,6 @@ class InequalityModel(ProblemDataPart):
         if number_of_acc_rows > 0:
             expressions = cas.Expression(self.get_derivative_constraint_expressions(Derivatives.acceleration))
             assert self.max_derivative >= Derivatives.jerk
-            model = cas.zeros(number_of_acc_rows, self.number_of_non_slack_columns)
             J_q = cas.jacobian(expressions=expressions,
                                symbols=self.get_free_variable_symbols(Derivatives.position)) * self.dt
             Jd_q = cas.jacobian_dot(expressions=expressions,
@@ -797,22 +881,12 @@ class InequalityModel(ProblemDataPart):
                                      symbols=self.get_free_variable_symbols(Derivatives.velocity),
                                      symbols_dot=self.get_free_variable_symbols(
                                          Derivatives.acceleration)) * self.dt
-            J_vel_block = cas.kron(cas.eye(self.prediction_horizon), Jd_q)
-            J_acc_block = cas.kron(cas.eye(self.prediction_horizon), J_q + Jd_qd)
-            J_jerk_block = cas.kron(cas.eye(self.prediction_horizon), J_qd)
-            horizontal_offset = self.number_of_free_variables * self.prediction_horizon
-            model[:, :horizontal_offset] = J_vel_block
-            model[:, horizontal_offset:horizontal_offset * 2] = J_acc_block
-            model[:, horizontal_offset * 2:horizontal_offset * 3] = J_jerk_block
-
-            # delete rows if control horizon of constraint shorter than prediction horizon
-            rows_to_delete = []
-            for t in range(self.prediction_horizon):
-                for i, c in enumerate(self.velocity_constraints):
-                    v_index = i + (t * len(self.velocity_constraints))
-                    if t + 1 > c.control_horizon:
-                        rows_to_delete.append(v_index)
-            model.remove(rows_to_delete, [])
+            jacobians = {0: Jd_q,
+                         1: J_q + Jd_qd,
+                         2: J_qd}
+            model = self.sparse_constraint_model(jacobians,
+                                                 self.get_derivative_control_horizons(Derivatives.acceleration),
+                                                 one_row_per_time_step=True)
 
             # slack model
             num_slack_variables = sum(c.control_horizon for c in self.acceleration_constraints)
@@ -830,7 +904,6 @@ class InequalityModel(ProblemDataPart):
         if number_of_jerk_rows > 0:
             expressions = cas.Expression(self.get_derivative_constraint_expressions(Derivatives.jerk))
             assert self.max_derivative >= Derivatives.snap
-            model = cas.zeros(number_of_jerk_rows, self.number_of_non_slack_columns)
             J_q = self.dt * cas.jacobian(expressions=expressions,
                                          symbols=self.get_free_variable_symbols(Derivatives.position))
             Jd_q = self.dt * cas.jacobian_dot(expressions=expressions,
@@ -849,24 +922,12 @@ class InequalityModel(ProblemDataPart):
                                                  symbols=self.get_free_variable_symbols(Derivatives.velocity),
                                                  symbols_dot=self.get_free_variable_symbols(Derivatives.acceleration),
                                                  symbols_ddot=self.get_free_variable_symbols(Derivatives.jerk))
-            J_vel_block = cas.kron(cas.eye(self.prediction_horizon), Jdd_q)
-            J_acc_block = cas.kron(cas.eye(self.prediction_horizon), 2 * Jd_q + Jdd_qd)
-            J_jerk_block = cas.kron(cas.eye(self.prediction_horizon), J_q + 2 * Jd_qd)
-            J_snap_block = cas.kron(cas.eye(self.prediction_horizon), J_qd)
-            horizontal_offset = self.number_of_free_variables * self.prediction_horizon
-            model[:, :horizontal_offset] = J_vel_block
-            model[:, horizontal_offset:horizontal_offset * 2] = J_acc_block
-            model[:, horizontal_offset * 2:horizontal_offset * 3] = J_jerk_block
-            model[:, horizontal_offset * 3:horizontal_offset * 4] = J_snap_block
-
-            # delete rows if control horizon of constraint shorter than prediction horizon
-            rows_to_delete = []
-            for t in range(self.prediction_horizon):
-                for i, c in enumerate(self.velocity_constraints):
-                    v_index = i + (t * len(self.velocity_constraints))
-                    if t + 1 > c.control_horizon:
-                        rows_to_delete.append(v_index)
-            model.remove(rows_to_delete, [])
+            jacobians = {0: Jdd_q,
+                         1: 2 * Jd_q + Jdd_qd,
+                         2: J_q + 2 * Jd_qd,
+                         3: J_qd}
+            model = self.sparse_constraint_model(jacobians, self.get_derivative_control_horizons(Derivatives.jerk),
+                                                 one_row_per_time_step=True)
 
             # slack model
             num_slack_variables = sum(c.control_horizon for c in self.jerk_constraints)
@@ -883,17 +944,17 @@ class InequalityModel(ProblemDataPart):
         |  J1*sp |  J1*sp |  J2*sp |  J2*sp |  J3*sp | J3*sp  | sp*ch  | sp*ch  |
         |-----------------------------------------------------------------------|
         """
+        if len(self.inequality_constraints) > 0 and self.block_cache is not None:
+            model = self.constraint_model_from_blocks(self.inequality_constraints)
+            slack_model = cas.diag(cas.Expression([self.dt * c.control_horizon for c in self.inequality_constraints]))
+            return model, slack_model
         if len(self.inequality_constraints) > 0:
-            model = cas.zeros(len(self.inequality_constraints), self.number_of_non_slack_columns)
-            for derivative in Derivatives.range(Derivatives.position, self.max_derivative - 1):
-                J_neq = cas.jacobian(expressions=cas.Expression(self.inequality_constraint_expressions()),
-                                     symbols=self.get_free_variable_symbols(derivative)) * self.dt
-                J_hstack = cas.hstack([J_neq for _ in range(self.prediction_horizon)])
-                # set jacobian entry to 0 if control horizon shorter than prediction horizon
-                for i, c in enumerate(self.inequality_constraints):
-                    J_hstack[i, c.control_horizon * len(self.free_variables):] = 0
-                horizontal_offset = J_hstack.shape[1]
-                model[:, horizontal_offset * derivative:horizontal_offset * (derivative + 1)] = J_hstack
+            expressions = cas.Expression(self.inequality_constraint_expressions())
+            jacobians = {derivative: cas.jacobian(expressions=expressions,
+                                                  symbols=self.get_free_variable_symbols(derivative)) * self.dt
+                         for derivative in Derivatives.range(Derivatives.position, self.max_derivative - 1)}
+            control_horizons = self._sorter({c.name: c.control_horizon for c in self.inequality_constraints})[0]
+            model = self.sparse_constraint_model(jacobians, control_horizons, one_row_per_time_step=False)
 
             # slack variable for total error
             slack_model = cas.diag(cas.Expression([self.dt * c.control_horizon for c in self.inequality_constraints]))
@@ -927,25 +988,15 @@ class InequalityModel(ProblemDataPart):
         return combined_model, combined_slack_model
 
 
-available_solvers: Dict[SupportedQPSolver, Type[QPSolver]] = {}
+# solvers are imported when they are first requested
+available_solvers = SolverRegistry()
 
 
 def detect_solvers():
-    global available_solvers
-    solver_name: str
-    qp_solver_class: Type[QPSolver]
-    for solver_name, qp_solver_class in get_all_classes_in_package('giskardpy.qp', QPSolver, silent=True).items():
-        try:
-            available_solvers[qp_solver_class.solver_id] = qp_solver_class
-        except Exception:
-            pass
-    solver_names = [str(solver_name).split('.')[1] for solver_name in available_solvers.keys()]
+    solver_names = [solver_id.name for solver_id in available_solvers.keys()]
     logging.loginfo(f'Found these qp solvers: {solver_names}')
 
 
-detect_solvers()
-
-
 class QPProblemBuilder(GodMapWorshipper):
     """
     Wraps around QP Solver. Builds the required matrices from constraints.
@@ -975,7 +1026,14 @@ class QPProblemBuilder(GodMapWorshipper):
                  debug_expressions: Dict[str, Union[cas.Symbol, float]] = None,
                  retries_with_relaxed_constraints: int = 0,
                  retry_added_slack: float = 100,
-                 retry_weight_factor: float = 100):
+                 retry_weight_factor: float = 100,
+                 controller_cache_size: int = 0,
+                 controller_cache_dir: Optional[str] = None,
+                 code_generation: bool = False,
+                 warm_start: bool = False,
+                 incremental_compilation: bool = False,
+                 reuse_buffers: bool = False,
+                 solver_selection_file: Optional[str] = None):
         self.free_variables = []
         self.equality_constraints = []
         self.inequality_constraints = []
@@ -988,6 +1046,14 @@ class QPProblemBuilder(GodMapWorshipper):
         self.retry_weight_factor = retry_weight_factor
         self.evaluated_debug_expressions = {}
         self.xdot_full = None
+        self.debug_data: Optional[Dict[str, np.ndarray]] = None
+        self.code_generation = code_generation
+        self.warm_start = warm_start
+        self.incremental_compilation = incremental_compilation
+        self.reuse_buffers = reuse_buffers
+        self.controller_cache = ControllerCache()
+        self.controller_cache.configure(max_size=controller_cache_size, cache_dir=controller_cache_dir)
+        self.solver_benchmark: Optional[SolverBenchmark] = None
         if free_variables is not None:
             self.add_free_variables(free_variables)
         if inequality_constraints is not None:
@@ -999,7 +1065,8 @@ class QPProblemBuilder(GodMapWorshipper):
         if debug_expressions is not None:
             self.add_debug_expressions(debug_expressions)
 
-        if solver_id is not None:
+        auto_select_solver = solver_id == SupportedQPSolver.auto
+        if solver_id is not None and not auto_select_solver:
             self.qp_solver_class = available_solvers[solver_id]
         else:
             for solver_id in SupportedQPSolver:
@@ -1012,6 +1079,31 @@ class QPProblemBuilder(GodMapWorshipper):
         logging.loginfo(f'Using QP Solver \'{solver_id.name}\'')
         logging.loginfo(f'Prediction horizon: \'{self.prediction_horizon}\'')
         self.qp_solver = self.compile(self.qp_solver_class)
+        if auto_select_solver:
+            SolverSelectionTable().configure(solver_selection_file)
+            self._select_solver(solver_id)
+
+    def _select_solver(self, default_solver_id: SupportedQPSolver):
+        """
+        Switches to the solver that was the fastest for problems of the same size,
+        or starts a benchmark of all installed solvers, if there is no such solver yet.
+        """
+        dimensions = problem_dimensions(self.qp_solver)
+        selected_solver_id = SolverSelectionTable().get(dimensions)
+        if selected_solver_id in available_solvers:
+            if selected_solver_id != default_solver_id:
+                logging.loginfo(f'Using QP Solver \'{selected_solver_id.name}\' from solver selection table')
+                self.qp_solver_class = available_solvers[selected_solver_id]
+                self.qp_solver = self.compile(self.qp_solver_class)
+            return
+        candidates = [solver_id for solver_id in SupportedQPSolver if solver_id in available_solvers]
+        if len(candidates) > 1:
+            logging.loginfo(f'Benchmarking qp solvers {[solver_id.name for solver_id in candidates]}')
+            # compile all candidates now, such that the benchmark doesn't compile during control cycles
+            solvers = {solver_id: self.qp_solver if solver_id == default_solver_id
+                                  else self.compile(available_solvers[solver_id])
+                       for solver_id in candidates}
+            self.solver_benchmark = SolverBenchmark(dimensions=dimensions, solvers=solvers)
 
     def add_free_variables(self, free_variables: list):
         if len(free_variables) == 0:
@@ -1079,6 +1171,31 @@ class QPProblemBuilder(GodMapWorshipper):
         self.equality_bounds = EqualityBounds(**kwargs)
         self.inequality_model = InequalityModel(**kwargs)
         self.inequality_bounds = InequalityBounds(default_limits=default_limits, **kwargs)
+        if self.incremental_compilation:
+            self.equality_model.block_cache = ConstraintBlockCache()
+            self.inequality_model.block_cache = ConstraintBlockCache()
+
+        cache_key = None
+        if self.controller_cache.enabled:
+            try:
+                cache_key = self.controller_cache.problem_key(solver_class=solver_class,
+                                                              default_limits=default_limits,
+                                                              code_generation=self.code_generation,
+                                                              **kwargs)
+            except TypeError as e:
+                logging.logwarn(f'Controller can\'t be cached: {e}')
+        if cache_key is not None:
+            cached_controller = self.controller_cache.get(cache_key)
+            if cached_controller is not None:
+                for part_name, names in cached_controller.names.items():
+                    getattr(self, part_name).__dict__.update(names)
+                qp_solver = cached_controller.qp_solver
+                logging.loginfo(f'Loaded controller from cache {self.controller_cache.stats()}:')
+                self._log_controller_dimensions(qp_solver)
+                self._compile_debug_expressions()
+                self._setup_warm_start(qp_solver)
+                self._setup_buffer_reuse(qp_solver)
+                return qp_solver
 
         weights, g = self.weights.construct_expression()
         lb, ub = self.free_variable_bounds.construct_expression()
@@ -1087,16 +1204,61 @@ class QPProblemBuilder(GodMapWorshipper):
         E, E_slack = self.equality_model.construct_expression()
         bE = self.equality_bounds.construct_expression()
 
-        qp_solver = solver_class(weights=weights, g=g, lb=lb, ub=ub,
-                                 E=E, E_slack=E_slack, bE=bE,
-                                 A=A, A_slack=A_slack, lbA=lbA, ubA=ubA)
+        with codegen.code_generation(self.code_generation):
+            qp_solver = solver_class(weights=weights, g=g, lb=lb, ub=ub,
+                                     E=E, E_slack=E_slack, bE=bE,
+                                     A=A, A_slack=A_slack, lbA=lbA, ubA=ubA)
+        if cache_key is not None:
+            self.controller_cache.put(cache_key, CachedController(qp_solver, self._get_problem_data_part_names()))
         logging.loginfo('Done compiling controller:')
-        logging.loginfo(f'  #free variables: {weights.shape[0]}')
-        logging.loginfo(f'  #equality constraints: {bE.shape[0]}')
-        logging.loginfo(f'  #inequality constraints: {lbA.shape[0]}')
+        if self.incremental_compilation:
+            logging.loginfo(f'  reused blocks: {ConstraintBlockCache().stats()}')
+        self._log_controller_dimensions(qp_solver)
         self._compile_debug_expressions()
+        self._setup_warm_start(qp_solver)
+        self._setup_buffer_reuse(qp_solver)
         return qp_solver
 
+    def _setup_buffer_reuse(self, qp_solver: QPSolver):
+        if self.reuse_buffers:
+            qp_solver.enable_buffer_reuse()
+
+    def _setup_warm_start(self, qp_solver: QPSolver):
+        if self.warm_start:
+            qp_solver.enable_warm_start(primal_shift=self._horizon_shift(self.free_variable_bounds.names),
+                                        eq_shift=self._horizon_shift(self.equality_bounds.names),
+                                        neq_shift=self._horizon_shift(self.inequality_bounds.names))
+
+    @staticmethod
+    def _horizon_shift(names: np.ndarray) -> np.ndarray:
+        """
+        Names of entries that are repeated over the horizon start with 't<time step>/'.
+        :return: for each entry, the index of the same entry one time step later, or its own index if there is none.
+        """
+        name_to_index = {name: i for i, name in enumerate(names)}
+        shift = np.arange(len(names))
+        for i, name in enumerate(names):
+            if name.startswith('t') and name[1:4].isdigit() and name[4:5] == '/':
+                next_name = f't{int(name[1:4]) + 1:03}{name[4:]}'
+                shift[i] = name_to_index.get(next_name, i)
+        return shift
+
+    def _log_controller_dimensions(self, qp_solver: QPSolver):
+        logging.loginfo(f'  #free variables: {qp_solver.num_free_variable_constraints}')
+        logging.loginfo(f'  #equality constraints: {qp_solver.num_eq_constraints}')
+        logging.loginfo(f'  #inequality constraints: {qp_solver.num_neq_constraints}')
+
+    def _get_problem_data_part_names(self) -> Dict[str, Dict[str, np.ndarray]]:
+        """
+        construct_expression sets the row and column names of each part, they are needed to restore cached controllers.
+        """
+        names = {}
+        for part_name in ['weights', 'free_variable_bounds', 'equality_model', 'equality_bounds',
+                          'inequality_model', 'inequality_bounds']:
+            part = getattr(self, part_name)
+            names[part_name] = {k: v for k, v in part.__dict__.items() if k.startswith('names')}
+        return names
+
     def get_parameter_names(self):
         return self.qp_solver.free_symbols_str
 
@@ -1112,27 +1274,16 @@ class QPProblemBuilder(GodMapWorshipper):
         if num_debug_expressions > 0:
             logging.loginfo(f'  #debug expressions: {len(self.compiled_debug_expressions)}')
 
-    def save_all_pandas(self, folder_name: Optional[str] = None):
-        if hasattr(self, 'p_xdot') and self.p_xdot is not None:
-            save_pandas(
-                [self.p_weights, self.p_lb, self.p_ub,
-                 self.p_E, self.p_bE,
-                 self.p_A, self.p_lbA, self.p_ubA,
-                 self.p_debug, self.p_xdot],
-                ['weights', 'lb', 'ub', 'E', 'bE', 'A', 'lbA', 'ubA', 'debug', 'xdot'],
-                self.god_map.get_data(identifier.tmp_folder),
-                self.god_map.get_data(identifier.time),
-                folder_name)
-        else:
-            save_pandas(
-                [self.p_weights, self.p_lb, self.p_ub,
-                 self.p_E, self.p_bE,
-                 self.p_A, self.p_lbA, self.p_ubA,
-                 self.p_debug],
-                ['weights', 'lb', 'ub', 'E', 'bE', 'A', 'lbA', 'ubA', 'debug'],
-                self.god_map.get_data(identifier.tmp_folder),
-                self.god_map.get_data(identifier.time),
-                folder_name)
+    def save_debug_data(self, folder_name: Optional[str] = None):
+        """
+        Saves the qp of the last control cycle in <path_to_data_folder>/qp_data/ in the BackgroundWorker.
+        """
+        self._collect_debug_data(self.qp_solver)
+        BackgroundWorker().submit('failed to save qp data', save_debug_data,
+                                  self.debug_data,
+                                  self.god_map.get_data(identifier.tmp_folder),
+                                  self.god_map.get_data(identifier.time),
+                                  folder_name)
 
     def _print_pandas_array(self, array):
         import pandas as pd
@@ -1158,12 +1309,22 @@ class QPProblemBuilder(GodMapWorshipper):
         Uses substitutions for each symbol to compute the next commands for each joint.
         """
         try:
-            self.xdot_full = self.qp_solver.solve_and_retry(substitutions=substitutions)
+            if self.solver_benchmark is not None:
+                self.qp_solver = self.solver_benchmark.current_solver()
+                start_time = perf_counter()
+                self.xdot_full = self.qp_solver.solve_and_retry(substitutions=substitutions)
+                self.solver_benchmark.record(perf_counter() - start_time)
+                if self.solver_benchmark.done:
+                    self.qp_solver = self.solver_benchmark.selected_solver
+                    self.qp_solver_class = self.qp_solver.__class__
+                    self.solver_benchmark = None
+            else:
+                self.xdot_full = self.qp_solver.solve_and_retry(substitutions=substitutions)
             # self._create_debug_pandas(self.qp_solver)
             return NextCommands(self.free_variables, self.xdot_full, self.order, self.prediction_horizon)
         except InfeasibleException as e_original:
             self.xdot_full = None
-            self._create_debug_pandas(self.qp_solver)
+            self._collect_debug_data(self.qp_solver)
             self._has_nan()
             self._print_iis()
             if isinstance(e_original, HardConstraintsViolatedException):
@@ -1173,23 +1334,24 @@ class QPProblemBuilder(GodMapWorshipper):
             raise
 
     def _has_nan(self):
-        nan_entries = self.p_A.isnull().stack()
-        row_col_names = nan_entries[nan_entries].index.tolist()
+        rows, columns = np.nonzero(np.isnan(self.debug_data['A']))
+        row_col_names = list(zip(self.debug_data['inequality_constraint_names'][rows],
+                                 self.debug_data['free_variable_names'][columns]))
         pass
 
     def _are_hard_limits_violated(self, error_message):
-        self._create_debug_pandas(self.qp_solver)
+        self._collect_debug_data(self.qp_solver)
         try:
-            lower_violations = self.p_lb[self.qp_solver.lb_filter]
-            upper_violations = self.p_ub[self.qp_solver.ub_filter]
+            lower_violations = self.debug_data['free_variable_names'][self.qp_solver.lb_filter]
+            upper_violations = self.debug_data['free_variable_names'][self.qp_solver.ub_filter]
             if len(upper_violations) > 0 or len(lower_violations) > 0:
                 error_message += '\n'
                 if len(upper_violations) > 0:
                     error_message += 'upper slack bounds of following constraints might be too low: {}\n'.format(
-                        list(upper_violations.index))
+                        list(upper_violations))
                 if len(lower_violations) > 0:
                     error_message += 'lower slack bounds of following constraints might be too high: {}'.format(
-                        list(lower_violations.index))
+                        list(lower_violations))
                 raise HardConstraintsViolatedException(error_message)
         except AttributeError:
             pass
@@ -1241,12 +1403,36 @@ class QPProblemBuilder(GodMapWorshipper):
         plt.savefig('tmp_data/mpc/mpc_{}_{}.png'.format(joint_name, file_count))
 
     @profile
-    def _create_debug_pandas(self, qp_solver: QPSolver):
+    def _collect_debug_data(self, qp_solver: QPSolver):
+        """
+        Copies the filtered qp of the last control cycle into debug_data.
+        Only numpy arrays are created, pandas frames are only built in _create_debug_pandas, when they are needed.
+        """
         weights, g, lb, ub, E, bE, A, lbA, ubA, weight_filter, bE_filter, bA_filter = qp_solver.get_problem_data()
-        sample_period = self.sample_period
         self.free_variable_names = self.free_variable_bounds.names[weight_filter]
         self.equality_constr_names = self.equality_bounds.names[bE_filter]
         self.inequality_constr_names = self.inequality_bounds.names[bA_filter]
+        if sp.issparse(E):
+            E = E.toarray()
+        if sp.issparse(A):
+            A = A.toarray()
+        self.debug_data = {'weights': np.array(weights), 'g': np.array(g), 'lb': np.array(lb), 'ub': np.array(ub),
+                           'E': np.array(E), 'bE': np.array(bE), 'A': np.array(A),
+                           'lbA': np.array(lbA), 'ubA': np.array(ubA),
+                           'free_variable_names': np.array(self.free_variable_names, dtype=str),
+                           'equality_constraint_names': np.array(self.equality_constr_names, dtype=str),
+                           'inequality_constraint_names': np.array(self.inequality_constr_names, dtype=str)}
+        if self.xdot_full is not None:
+            self.debug_data['xdot'] = np.array(self.xdot_full)
+        for name, value in self.evaluated_debug_expressions.items():
+            self.debug_data[f'debug|{name}'] = np.array(value)
+
+    @profile
+    def _create_debug_pandas(self, qp_solver: QPSolver):
+        self._collect_debug_data(qp_solver)
+        weights, g, lb, ub = (self.debug_data[x] for x in ['weights', 'g', 'lb', 'ub'])
+        E, bE, A, lbA, ubA = (self.debug_data[x] for x in ['E', 'bE', 'A', 'lbA', 'ubA'])
+        sample_period = self.sample_period
         num_vel_constr = len(self.derivative_constraints) * (self.prediction_horizon - 2)
         num_neq_constr = len(self.inequality_constraints)
         num_eq_constr = len(self.equality_constraints)
@@ -1330,6 +1516,7 @@ class QPProblemBuilder(GodMapWorshipper):
             return
         lb_ids, ub_ids, eq_ids, lbA_ids, ubA_ids = result
         b_ids = lb_ids | ub_ids
+        self._create_debug_pandas(self.qp_solver)
         with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', None):
             logging.loginfo('Irreducible Infeasible Subsystem:')
             logging.loginfo('  Free variable bounds')
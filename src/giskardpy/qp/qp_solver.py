@@ -2,7 +2,7 @@ import abc
 from abc import ABC
 from collections import defaultdict
 from functools import wraps
-from time import time
+from time import perf_counter
 from typing import Tuple, List, Iterable, Optional, Sequence, Union, Dict
 import scipy.sparse as sp
 import numpy as np
@@ -12,17 +12,20 @@ from giskardpy.configs.qp_controller_config import SupportedQPSolver
 from giskardpy.exceptions import HardConstraintsViolatedException, InfeasibleException, QPSolverException
 from giskardpy.utils import logging
 from giskardpy.utils.decorators import memoize
+from giskardpy.utils.profiling import Profiler, Histogram
 
 
 def record_solver_call_time(function):
-    return function
+    profiler = Profiler()
 
     @wraps(function)
     def wrapper(*args, **kwargs):
+        if not profiler.enabled:
+            return function(*args, **kwargs)
         self: QPSolver = args[0]
-        start_time = time()
+        start_time = perf_counter()
         result = function(*args, **kwargs)
-        time_delta = time() - start_time
+        time_delta = perf_counter() - start_time
         if not ('relax_hard_constraints' in kwargs and kwargs['relax_hard_constraints']):
             key = (len(self.weights),
                    self.num_free_variable_constraints,
@@ -31,7 +34,8 @@ def record_solver_call_time(function):
                    self.num_eq_slack_variables,
                    self.num_neq_slack_variables,
                    self.num_slack_variables)
-            self._times[key].append(time_delta)
+            self._times[key].add(time_delta)
+            profiler.record(f'qp_solver/{self.__class__.__name__}', time_delta)
         else:
             logging.loginfo('skipped record time because hard constraints were violated')
         return result
@@ -39,6 +43,45 @@ def record_solver_call_time(function):
     return wrapper
 
 
+class QPSolverStats:
+    """
+    Iterations and solve times of a QPSolver, separated by whether the solver was warm started.
+    Solve times are collected in histograms, so memory doesn't grow in closed loop or endless mode.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.iterations: Dict[str, int] = {'cold': 0, 'warm': 0}
+        self.solve_times: Dict[str, Histogram] = {'cold': Histogram(), 'warm': Histogram()}
+
+    def add(self, iterations: int, solve_time: float, warm_started: bool):
+        name = 'warm' if warm_started else 'cold'
+        self.iterations[name] += iterations
+        self.solve_times[name].add(solve_time)
+
+    def __len__(self):
+        return sum(len(solve_times) for solve_times in self.solve_times.values())
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        :return: number of solves, average iterations and average solve time for cold and warm started solves
+        """
+        result = {}
+        for name, solve_times in self.solve_times.items():
+            if solve_times.count > 0:
+                result[name] = {'solves': solve_times.count,
+                                'avg_iterations': self.iterations[name] / solve_times.count,
+                                'avg_solve_time': solve_times.mean}
+        return result
+
+    def __str__(self):
+        return ', '.join(f'{name}: {data["solves"]} solves, {data["avg_iterations"]:.1f} iterations, '
+                         f'{data["avg_solve_time"] * 1000:.3f}ms'
+                         for name, data in self.summary().items())
+
+
 class QPSolver(ABC):
     free_symbols_str: List[str]
     solver_id: SupportedQPSolver
@@ -48,18 +91,37 @@ class QPSolver(ABC):
     retry_weight_factor = 100
     retries_with_relaxed_constraints = 5
     _nAi_Ai_cache: dict = {}
+    _sparse_filter_cache: dict
+    sparse_filter_cache_size: int = 100
+    # if True, filtering and problem formatting write into persistent buffers, see enable_buffer_reuse
+    reuse_buffers: bool = False
+    _buffers: Dict[str, np.ndarray]
+    _sparse_buffers: dict
     sparse: bool = False
     compute_nI_I: bool = True
     num_eq_constraints: int
     num_neq_constraints: int
     num_free_variable_constraints: int
-    _times: Dict[Tuple[int, int, int, int], list]
+    _times: Dict[Tuple[int, int, int, int, int, int, int], Histogram]
+    stats: QPSolverStats
+    warm_start: bool = False
+    # index maps that shift the solution of the last solve by one time step, see enable_warm_start
+    primal_shift: Optional[np.ndarray] = None
+    dual_shift: Optional[np.ndarray] = None
+    # warm start for the current solver_call, None means cold start
+    x0: Optional[np.ndarray] = None
+    y0: Optional[np.ndarray] = None
+    # dual solution of the last solver_call, if the solver provides it
+    y: Optional[np.ndarray] = None
 
     @abc.abstractmethod
     def __init__(self, weights: cas.Expression, g: cas.Expression, lb: cas.Expression, ub: cas.Expression,
                  A: cas.Expression, A_slack: cas.Expression, lbA: cas.Expression, ubA: cas.Expression,
                  E: cas.Expression, E_slack: cas.Expression, bE: cas.Expression):
-        pass
+        # per solver, each one has its own filters and problem dimensions
+        self._sparse_filter_cache = {}
+        self._buffers = {}
+        self._sparse_buffers = {}
 
     @classmethod
     def get_solver_times(self) -> dict:
@@ -70,22 +132,191 @@ class QPSolver(ABC):
     def analyze_infeasibility(self):
         pass
 
+    def enable_warm_start(self, primal_shift: np.ndarray, eq_shift: np.ndarray, neq_shift: np.ndarray):
+        """
+        Use the solution of the last solve as initial guess for the next one.
+        Consecutive mpc problems are almost identical, except that the horizon moved by one time step, therefore
+        the solutions are shifted before they are used.
+        :param primal_shift: for each free variable (including slack), the index of the same variable one time step
+                             later, or its own index for the last time step and variables without horizon.
+        :param eq_shift: same for the equality constraints
+        :param neq_shift: same for the inequality constraints
+        """
+        self.warm_start = True
+        self.primal_shift = primal_shift
+        self.dual_shift = np.concatenate((primal_shift,
+                                          eq_shift + len(primal_shift),
+                                          neq_shift + len(primal_shift) + len(eq_shift))).astype(int)
+        self.reset_warm_start()
+
+    def enable_buffer_reuse(self):
+        """
+        Filtered problem data is written into buffers that are allocated once, instead of new arrays every solve.
+        Consequently, the arrays returned by problem_data_to_qp_format are overwritten by the next solve.
+        """
+        self.reuse_buffers = True
+        self._buffers = {}
+        self._sparse_buffers = {}
+        self._sparse_filter_cache = {}
+
+    def _buffer(self, name: str, shape: Union[int, Tuple[int, ...]], dtype: type = float) -> np.ndarray:
+        """
+        :return: a new array of zeros, or if reuse_buffers is True, a view with the given shape on a persistent buffer.
+                 The buffer is only reallocated, if it is too small, which only happens in the first solves,
+                 because filtering only shrinks the problem.
+        """
+        if not self.reuse_buffers:
+            return np.zeros(shape, dtype=dtype)
+        if isinstance(shape, int):
+            shape = (shape,)
+        size = int(np.prod(shape))
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape[0] < size or buffer.dtype != dtype:
+            buffer = np.zeros(size, dtype=dtype)
+            self._buffers[name] = buffer
+        return buffer[:size].reshape(shape)
+
+    def _filter_vector(self, name: str, vector: np.ndarray, vector_filter: np.ndarray) -> np.ndarray:
+        """
+        Same as vector[vector_filter], but the result is written into _buffer(name).
+        """
+        return np.compress(vector_filter, vector,
+                           out=self._buffer(name, np.count_nonzero(vector_filter), vector.dtype.type))
+
+    def _concatenate(self, name: str, arrays: Sequence[np.ndarray]) -> np.ndarray:
+        """
+        Same as np.concatenate(arrays), but the result is written into _buffer(name).
+        """
+        return np.concatenate(arrays, out=self._buffer(name, sum(array.shape[0] for array in arrays)))
+
+    def _dense_diagonal(self, name: str, diagonal: np.ndarray) -> np.ndarray:
+        """
+        Same as np.diag(diagonal), but the result is written into _buffer(name).
+        """
+        matrix = self._buffer(name, (diagonal.shape[0], diagonal.shape[0]))
+        if self.reuse_buffers:
+            matrix.fill(0)
+        np.fill_diagonal(matrix, diagonal)
+        return matrix
+
+    @profile
+    def _vstack_sparse(self, name: str, top: sp.csc_matrix, bottom: sp.csc_matrix) -> sp.csc_matrix:
+        """
+        Same as sp.vstack((top, bottom)), but if reuse_buffers is True, the sparsity of the result is cached and only
+        the nonzeros of bottom are copied into it. top has to be constant, e.g. nAi_Ai.
+        """
+        if not self.reuse_buffers:
+            return sp.vstack((top, bottom))
+        cached = self._sparse_buffers.get(name)
+        # the references to top and bottom are kept, to make sure that their ids are not reused
+        if cached is None or cached[0] is not top or cached[1] is not bottom:
+            # positions of the nonzeros of top are encoded as negative, the ones of bottom as positive numbers
+            nonzero_positions = sp.vstack((sp.csc_matrix((-np.arange(1, top.nnz + 1, dtype=float),
+                                                          top.indices, top.indptr), shape=top.shape),
+                                           sp.csc_matrix((np.arange(1, bottom.nnz + 1, dtype=float),
+                                                          bottom.indices, bottom.indptr), shape=bottom.shape)),
+                                          format='csc')
+            top_filter = nonzero_positions.data < 0
+            bottom_filter = ~top_filter
+            stacked = nonzero_positions.copy()
+            stacked.data[np.where(top_filter)[0]] = top.data[(-nonzero_positions.data[top_filter]).astype(int) - 1]
+            bottom_positions = np.empty(bottom.nnz, dtype=int)
+            bottom_positions[nonzero_positions.data[bottom_filter].astype(int) - 1] = np.where(bottom_filter)[0]
+            cached = (top, bottom, stacked, bottom_positions)
+            self._sparse_buffers[name] = cached
+        _, _, stacked, bottom_positions = cached
+        stacked.data[bottom_positions] = bottom.data
+        return stacked
+
+    @profile
+    def _sparse_diagonal(self, name: str, diagonal: np.ndarray) -> sp.csc_matrix:
+        """
+        Same as sp.diags(diagonal), but reuses the matrix if reuse_buffers is True.
+        """
+        if not self.reuse_buffers:
+            return sp.diags(diagonal)
+        cached = self._sparse_buffers.get(name)
+        if cached is None or cached.shape[0] != diagonal.shape[0]:
+            cached = sp.identity(diagonal.shape[0], format='csc')
+            self._sparse_buffers[name] = cached
+        np.copyto(cached.data, diagonal)
+        return cached
+
+    def reset_warm_start(self):
+        self.x_full: Optional[np.ndarray] = None
+        self.y_full: Optional[np.ndarray] = None
+        self.x0 = None
+        self.y0 = None
+
+    @profile
+    def update_warm_start(self):
+        """
+        Computes x0 and y0 for the next solver_call from the last solution and the current filters.
+        """
+        if not self.warm_start or self.x_full is None:
+            self.x0 = None
+            self.y0 = None
+            return
+        x_shifted = np.take(self.x_full, self.primal_shift, out=self._buffer('x_shifted', self.x_full.shape[0]))
+        self.x0 = self._filter_vector('x0', x_shifted, self.weight_filter)
+        if self.y_full is not None:
+            y_shifted = np.take(self.y_full, self.dual_shift, out=self._buffer('y_shifted', self.y_full.shape[0]))
+            self.y0 = self._filter_vector('y0', y_shifted, self.dual_filter)
+        else:
+            self.y0 = None
+
+    @profile
+    def store_solution(self, xdot: np.ndarray, y: Optional[np.ndarray] = None):
+        """
+        Saves the solution in the unfiltered variable/constraint space, because the filters change between solves.
+        """
+        if not self.warm_start:
+            return
+        self.x_full = self._buffer('x_full', self.weight_filter.shape[0])
+        self.x_full.fill(0)
+        self.x_full[self.weight_filter] = xdot
+        if y is not None and self.dual_filter is not None:
+            self.y_full = self._buffer('y_full', self.dual_filter.shape[0])
+            self.y_full.fill(0)
+            self.y_full[self.dual_filter] = y
+        else:
+            self.y_full = None
+
+    @property
+    def dual_filter(self) -> Optional[np.ndarray]:
+        """
+        Maps from the unfiltered constraint space, [free variable bounds, equality constraints,
+        inequality constraints], to the rows of the dual solution. None if the solver doesn't support dual warm starts.
+        """
+        return None
+
     @record_solver_call_time
     @profile
     def solve(self, substitutions: np.ndarray, relax_hard_constraints: bool = False) -> np.ndarray:
-        self.evaluate_functions(substitutions)
-        self.update_filters()
-        self.apply_filters()
+        profiler = Profiler()
+        with profiler.section('phase/function_evaluation'):
+            self.evaluate_functions(substitutions)
+        with profiler.section('phase/filtering'):
+            self.update_filters()
+            self.apply_filters()
 
         if relax_hard_constraints:
+            # the relaxed problem is quite different, a warm start would only hurt
+            self.x0 = None
+            self.y0 = None
             problem_data = self.relaxed_problem_data_to_qp_format()
             try:
-                return self.solver_call(*problem_data)
+                with profiler.section('phase/solver_call'):
+                    return self.solver_call(*problem_data)
             except InfeasibleException as e:
                 raise HardConstraintsViolatedException(str(e))
         else:
             problem_data = self.problem_data_to_qp_format()
-            return self.solver_call(*problem_data)
+            self.update_warm_start()
+            with profiler.section('phase/solver_call'):
+                xdot = self.solver_call(*problem_data)
+            self.store_solution(xdot, self.y)
+            return xdot
 
     @staticmethod
     def to_inf_filter(casadi_array):
@@ -108,6 +339,7 @@ class QPSolver(ABC):
         try:
             return self.solve(substitutions)
         except QPSolverException as e:
+            self.reset_warm_start()
             try:
                 logging.loginfo(f'{e}; retrying with relaxed constraints.')
                 return self.solve(substitutions, relax_hard_constraints=True)
@@ -131,7 +363,7 @@ class QPSolver(ABC):
         if Ai_inf_filter is None:
             key = hash(dimensions_after_zero_filter)
         else:
-            key = hash((dimensions_after_zero_filter, Ai_inf_filter.tostring()))
+            key = hash((dimensions_after_zero_filter, Ai_inf_filter.tobytes()))
         if key not in self._nAi_Ai_cache:
             nI_I = self._cached_eyes(dimensions_after_zero_filter, nAi_Ai)
             if Ai_inf_filter is None:
@@ -140,6 +372,34 @@ class QPSolver(ABC):
                 self._nAi_Ai_cache[key] = nI_I[Ai_inf_filter]
         return self._nAi_Ai_cache[key]
 
+    @profile
+    def _filter_sparse(self, name: str, matrix: Union[np.ndarray, sp.csc_matrix], row_filter: np.ndarray,
+                       column_filter: np.ndarray) -> Union[np.ndarray, sp.csc_matrix]:
+        """
+        Same as matrix[row_filter, :][:, column_filter].
+        The sparsity of the output of a CompiledFunction never changes, therefore the sparsity of the filtered
+        matrix and the positions of its nonzeros in matrix.data are computed once per filter combination.
+        Afterwards, filtering only gathers the remaining nonzeros.
+        :param name: identifies the compiled function that produced matrix
+        """
+        if not sp.issparse(matrix):
+            return matrix[row_filter, :][:, column_filter]
+        key = (name, row_filter.tobytes(), column_filter.tobytes())
+        if key not in self._sparse_filter_cache:
+            if len(self._sparse_filter_cache) >= self.sparse_filter_cache_size:
+                self._sparse_filter_cache.clear()
+            nonzero_positions = sp.csc_matrix((np.arange(1, matrix.nnz + 1, dtype=float),
+                                               matrix.indices, matrix.indptr), shape=matrix.shape)
+            filtered = nonzero_positions[row_filter, :][:, column_filter].tocsc()
+            selection = filtered.data.astype(int) - 1
+            self._sparse_filter_cache[key] = (selection, filtered)
+        selection, filtered = self._sparse_filter_cache[key]
+        if not self.reuse_buffers:
+            return sp.csc_matrix((matrix.data[selection], filtered.indices, filtered.indptr), shape=filtered.shape)
+        # the filtered matrix is reused, such that the result of _vstack_sparse stays cached as well
+        np.take(matrix.data, selection, out=filtered.data)
+        return filtered
+
     @memoize
     def _cached_eyes(self, dimensions: int, nAi_Ai: bool = False) -> Union[np.ndarray, sp.csc_matrix]:
         if self.sparse:
@@ -221,6 +481,8 @@ class QPSWIFTFormatter(QPSolver):
         s.t.  Ex = b
               Ax <= lb/ub
         """
+        super().__init__(weights=weights, g=g, lb=lb, ub=ub, A=A, A_slack=A_slack, lbA=lbA, ubA=ubA,
+                         E=E, E_slack=E_slack, bE=bE)
         self.num_eq_constraints = bE.shape[0]
         self.num_neq_constraints = lbA.shape[0]
         self.num_free_variable_constraints = lb.shape[0]
@@ -246,12 +508,12 @@ class QPSWIFTFormatter(QPSolver):
         self.len_lbA = nlbA_without_inf.shape[0]
         self.len_ubA = ubA_without_inf.shape[0]
 
-        combined_E = cas.hstack([E, E_slack, cas.zeros(E_slack.shape[0], A_slack.shape[1])])
+        combined_E = cas.hstack([E, E_slack, cas.sparse_zeros(E_slack.shape[0], A_slack.shape[1])])
         combined_nA = cas.hstack([nA_without_inf,
-                                  cas.zeros(nA_slack_without_inf.shape[0], E_slack.shape[1]),
+                                  cas.sparse_zeros(nA_slack_without_inf.shape[0], E_slack.shape[1]),
                                   nA_slack_without_inf])
         combined_A = cas.hstack([A_without_inf,
-                                 cas.zeros(A_slack_without_inf.shape[0], E_slack.shape[1]),
+                                 cas.sparse_zeros(A_slack_without_inf.shape[0], E_slack.shape[1]),
                                  A_slack_without_inf])
         nA_A = cas.vstack([combined_nA, combined_A])
         nlbA_ubA = cas.vstack([nlbA_without_inf, ubA_without_inf])
@@ -280,6 +542,8 @@ class QPSWIFTFormatter(QPSolver):
 
         if self.compute_nI_I:
             self._nAi_Ai_cache = {}
+        self.stats = QPSolverStats()
+        self.reset_warm_start()
 
     @profile
     def evaluate_functions(self, substitutions):
@@ -291,12 +555,12 @@ class QPSWIFTFormatter(QPSolver):
     @profile
     def problem_data_to_qp_format(self) \
             -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
-        H = np.diag(self.weights)
-        if np.product(self.nA_A.shape) > 0:
-            A = sp.vstack((self.nAi_Ai, self.nA_A))
+        H = self._dense_diagonal('H', self.weights)
+        if np.prod(self.nA_A.shape) > 0:
+            A = self._vstack_sparse('nAi_Ai_nA_A', self.nAi_Ai, self.nA_A)
         else:
             A = self.nAi_Ai
-        nlb_ub_nlbA_ubA = np.concatenate((self.nlb, self.ub, self.nlbA_ubA))
+        nlb_ub_nlbA_ubA = self._concatenate('nlb_ub_nlbA_ubA', (self.nlb, self.ub, self.nlbA_ubA))
         return H, self.g, self.E, self.bE, A, nlb_ub_nlbA_ubA
 
     @profile
@@ -355,29 +619,35 @@ class QPSWIFTFormatter(QPSolver):
 
     @profile
     def update_filters(self):
-        self.weight_filter = self.weights != 0
+        self.weight_filter = np.not_equal(self.weights, 0,
+                                          out=self._buffer('weight_filter', self.weights.shape[0], bool))
         self.weight_filter[:-self.num_slack_variables] = True
         slack_part = self.weight_filter[-(self.num_eq_slack_variables + self.num_neq_slack_variables):]
         bE_part = slack_part[:self.num_eq_slack_variables]
         self.bA_part = slack_part[self.num_eq_slack_variables:]
 
-        self.bE_filter = np.ones(self.E.shape[0], dtype=bool)
-        self.num_filtered_eq_constraints = np.count_nonzero(np.invert(bE_part))
+        self.bE_filter = self._buffer('bE_filter', self.E.shape[0], bool)
+        self.bE_filter.fill(True)
+        self.num_filtered_eq_constraints = len(bE_part) - np.count_nonzero(bE_part)
         if self.num_filtered_eq_constraints > 0:
             self.bE_filter[-len(bE_part):] = bE_part
 
         # self.num_filtered_neq_constraints = np.count_nonzero(np.invert(self.bA_part))
-        self.nlbA_filter_half = np.ones(self.num_neq_constraints, dtype=bool)
-        self.ubA_filter_half = np.ones(self.num_neq_constraints, dtype=bool)
-        if len(self.bA_part) > 0:
-            self.nlbA_filter_half[-len(self.bA_part):] = self.bA_part
-            self.ubA_filter_half[-len(self.bA_part):] = self.bA_part
-            self.nlbA_filter_half = self.nlbA_filter_half[self.nlbA_inf_filter]
-            self.ubA_filter_half = self.ubA_filter_half[self.ubA_inf_filter]
-        self.bA_filter = np.concatenate((self.nlbA_filter_half, self.ubA_filter_half))
+        self.bA_filter = self._buffer('bA_filter', self.len_lbA + self.len_ubA, bool)
+        self.nlbA_filter_half = self.bA_filter[:self.len_lbA]
+        self.ubA_filter_half = self.bA_filter[self.len_lbA:]
+        if self.num_neq_constraints > 0:
+            neq_filter = self._buffer('neq_filter', self.num_neq_constraints, bool)
+            neq_filter.fill(True)
+            if len(self.bA_part) > 0:
+                neq_filter[-len(self.bA_part):] = self.bA_part
+            np.compress(self.nlbA_inf_filter, neq_filter, out=self.nlbA_filter_half)
+            np.compress(self.ubA_inf_filter, neq_filter, out=self.ubA_filter_half)
         if self.compute_nI_I:
-            self.nAi_Ai_filter = np.concatenate((self.lb_inf_filter[self.weight_filter],
-                                                 self.ub_inf_filter[self.weight_filter]))
+            num_weights = np.count_nonzero(self.weight_filter)
+            self.nAi_Ai_filter = self._buffer('nAi_Ai_filter', num_weights * 2, bool)
+            np.compress(self.weight_filter, self.lb_inf_filter, out=self.nAi_Ai_filter[:num_weights])
+            np.compress(self.weight_filter, self.ub_inf_filter, out=self.nAi_Ai_filter[num_weights:])
 
     @profile
     def filter_inf_entries(self):
@@ -393,19 +663,17 @@ class QPSWIFTFormatter(QPSolver):
 
     @profile
     def apply_filters(self):
-        self.weights = self.weights[self.weight_filter]
-        self.g = self.g[self.weight_filter]
-        self.nlb = self.nlb[self.weight_filter[self.lb_inf_filter]]
-        self.ub = self.ub[self.weight_filter[self.ub_inf_filter]]
-        if self.num_filtered_eq_constraints > 0:
-            self.E = self.E[self.bE_filter, :][:, self.weight_filter]
-        else:
-            # when no eq constraints were filtered, we can just cut off at the end, because that section is always all 0
-            self.E = self.E[:, :np.count_nonzero(self.weight_filter)]
-        self.bE = self.bE[self.bE_filter]
+        self.weights = self._filter_vector('weights', self.weights, self.weight_filter)
+        self.g = self._filter_vector('g', self.g, self.weight_filter)
+        self.nlb = self._filter_vector('nlb', self.nlb,
+                                       self._filter_vector('nlb_filter', self.weight_filter, self.lb_inf_filter))
+        self.ub = self._filter_vector('ub', self.ub,
+                                      self._filter_vector('ub_filter', self.weight_filter, self.ub_inf_filter))
+        self.E = self._filter_sparse('E', self.E, self.bE_filter, self.weight_filter)
+        self.bE = self._filter_vector('bE', self.bE, self.bE_filter)
         if len(self.nA_A.shape) > 1 and self.nA_A.shape[0] * self.nA_A.shape[1] > 0:
-            self.nA_A = self.nA_A[:, self.weight_filter][self.bA_filter, :]
-        self.nlbA_ubA = self.nlbA_ubA[self.bA_filter]
+            self.nA_A = self._filter_sparse('nA_A', self.nA_A, self.bA_filter, self.weight_filter)
+        self.nlbA_ubA = self._filter_vector('nlbA_ubA', self.nlbA_ubA, self.bA_filter)
         if self.compute_nI_I:
             # for constraints, both rows and columns are filtered, so I can start with weights dims
             # then only the rows need to be filtered for inf lb/ub
@@ -1,4 +1,5 @@
 from collections import defaultdict
+from time import perf_counter
 from typing import Iterable, Tuple, Dict
 
 import gurobipy
@@ -10,6 +11,7 @@ from scipy import sparse
 from giskardpy.configs.qp_controller_config import SupportedQPSolver
 from giskardpy.exceptions import QPSolverException, InfeasibleException, HardConstraintsViolatedException
 from giskardpy.qp.qp_solver import record_solver_call_time, QPSWIFTFormatter
+from giskardpy.utils.profiling import Histogram
 from giskardpy.utils import logging
 
 gurobipy.setParam('LogToConsole', False)
@@ -53,7 +55,7 @@ class QPSolverGurobi(QPSWIFTFormatter):
                          '__' not in name}
     sparse = True
     compute_nI_I = False
-    _times: Dict[Tuple[int, int, int], list] = defaultdict(list)
+    _times: Dict[Tuple[int, int, int, int, int, int, int], Histogram] = defaultdict(Histogram)
 
     @profile
     def init(self, H: np.ndarray, g: np.ndarray, E: np.ndarray, b: np.ndarray, A: np.ndarray, lb: np.ndarray,
@@ -103,7 +105,14 @@ class QPSolverGurobi(QPSWIFTFormatter):
     def solver_call(self, H: np.ndarray, g: np.ndarray, E: np.ndarray, b: np.ndarray, A: np.ndarray, lb: np.ndarray,
                     ub: np.ndarray, h: np.ndarray) -> np.ndarray:
         self.init(H, g, E, b, A, lb, ub, h)
+        warm_started = self.x0 is not None
+        if warm_started:
+            # only used by the simplex algorithms, the barrier algorithm ignores it
+            self.x.PStart = self.x0
+        start_time = perf_counter()
         self.qpProblem.optimize()
+        self.stats.add(self.qpProblem.IterCount + self.qpProblem.BarIterCount, perf_counter() - start_time,
+                       warm_started)
         success = self.qpProblem.status
         if success in {gurobipy.GRB.OPTIMAL, gurobipy.GRB.SUBOPTIMAL}:
             if success == gurobipy.GRB.SUBOPTIMAL:
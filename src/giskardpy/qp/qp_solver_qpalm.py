@@ -1,14 +1,15 @@
 from collections import defaultdict
 from enum import IntEnum
+from time import perf_counter
 from typing import Tuple, List, Dict
 
 import numpy as np
 import qpalm
-from scipy import sparse as sp
 
 from giskardpy.configs.qp_controller_config import SupportedQPSolver
 from giskardpy.exceptions import QPSolverException, InfeasibleException, HardConstraintsViolatedException
-from giskardpy.qp.qp_solver import QPSolver
+from giskardpy.qp.qp_solver import QPSolver, QPSolverStats
+from giskardpy.utils.profiling import Histogram
 
 import giskardpy.casadi_wrapper as cas
 
@@ -31,7 +32,7 @@ class QPSolverQPalm(QPSolver):
     s.t.  lb <= Ax <= ub
     https://github.com/kul-optec/QPALM
     """
-    _times: Dict[Tuple[int, int, int], list] = defaultdict(list)
+    _times: Dict[Tuple[int, int, int, int, int, int, int], Histogram] = defaultdict(Histogram)
     sparse = True
     compute_nI_I = True
     settings = qpalm.Settings()
@@ -51,6 +52,8 @@ class QPSolverQPalm(QPSolver):
         s.t.  lb <= Ax <= ub
         combined matrix format:
         """
+        super().__init__(weights=weights, g=g, lb=lb, ub=ub, A=A, A_slack=A_slack, lbA=lbA, ubA=ubA,
+                         E=E, E_slack=E_slack, bE=bE)
         self.num_eq_constraints = bE.shape[0]
         self.num_neq_constraints = lbA.shape[0]
         self.num_free_variable_constraints = lb.shape[0]
@@ -62,8 +65,8 @@ class QPSolverQPalm(QPSolver):
         if len(A) == 0:
             combined_A = cas.hstack([E, E_slack])
         else:
-            combined_A = cas.vstack([cas.hstack([E, E_slack, cas.zeros(E.shape[0], A_slack.shape[1])]),
-                                     cas.hstack([A, cas.zeros(A.shape[0], E_slack.shape[1]), A_slack])])
+            combined_A = cas.vstack([cas.hstack([E, E_slack, cas.sparse_zeros(E.shape[0], A_slack.shape[1])]),
+                                     cas.hstack([A, cas.sparse_zeros(A.shape[0], E_slack.shape[1]), A_slack])])
 
         free_symbols = set(weights.free_symbols())
         free_symbols.update(combined_A.free_symbols())
@@ -86,32 +89,44 @@ class QPSolverQPalm(QPSolver):
 
         if self.compute_nI_I:
             self._nAi_Ai_cache = {}
+        self.stats = QPSolverStats()
+        self.reset_warm_start()
+
+    @property
+    def dual_filter(self) -> np.ndarray:
+        return self.b_bE_bA_filter
 
     @profile
     def evaluate_functions(self, substitutions: np.ndarray):
         self.weights, self.lb, self.bE, self.lbA, self.lb_bE_lbA = self.w_lb_bE_lbA_f.fast_call(substitutions)
         self.ub, _, self.ubA, self.ub_bE_ubA = self.ub_bE_ubA_f.fast_call(substitutions)
-        self.g = np.zeros(self.weights.shape)
+        self.g = self._buffer('g', self.weights.shape[0])
         self.A = self.A_f.fast_call(substitutions)
 
     @profile
     def update_filters(self):
-        self.weight_filter = self.weights != 0
+        self.weight_filter = np.not_equal(self.weights, 0,
+                                          out=self._buffer('weight_filter', self.weights.shape[0], bool))
         self.weight_filter[:-self.num_slack_variables] = True
         self.slack_part = self.weight_filter[-(self.num_eq_slack_variables + self.num_neq_slack_variables):]
         self.bE_part = self.slack_part[:self.num_eq_slack_variables]
         self.bA_part = self.slack_part[self.num_eq_slack_variables:]
 
-        self.b_bE_bA_filter = np.ones(self.lb.shape[0] + self.bE.shape[0] + self.lbA.shape[0], dtype=bool)
+        self.b_bE_bA_filter = self._buffer('b_bE_bA_filter', self.lb.shape[0] + self.bE.shape[0] + self.lbA.shape[0],
+                                           bool)
+        self.b_bE_bA_filter.fill(True)
         self.b_zero_inf_filter_view = self.b_bE_bA_filter[:self.lb.shape[0]]
         self.bE_filter_view = self.b_bE_bA_filter[self.lb.shape[0]:self.lb.shape[0] + self.bE.shape[0]]
         self.bA_filter_view = self.b_bE_bA_filter[self.lb.shape[0] + self.bE.shape[0]:]
         self.bE_bA_filter = self.b_bE_bA_filter[self.lb.shape[0]:]
 
-        self.b_zero_filter = self.weight_filter.copy()
-        self.b_inf_filter = np.isfinite(self.lb) | np.isfinite(self.ub)
-        self.b_zero_inf_filter_view[::] = self.b_zero_filter & self.b_inf_filter
-        self.Ai_inf_filter = self.b_inf_filter[self.b_zero_filter]
+        self.b_zero_filter = self._buffer('b_zero_filter', self.weight_filter.shape[0], bool)
+        np.copyto(self.b_zero_filter, self.weight_filter)
+        self.b_inf_filter = np.isfinite(self.lb, out=self._buffer('b_inf_filter', self.lb.shape[0], bool))
+        ub_inf_filter = np.isfinite(self.ub, out=self._buffer('ub_inf_filter', self.ub.shape[0], bool))
+        np.logical_or(self.b_inf_filter, ub_inf_filter, out=self.b_inf_filter)
+        np.logical_and(self.b_zero_filter, self.b_inf_filter, out=self.b_zero_inf_filter_view)
+        self.Ai_inf_filter = self._filter_vector('Ai_inf_filter', self.b_inf_filter, self.b_zero_filter)
 
         if len(self.bE_part) > 0:
             self.bE_filter_view[-len(self.bE_part):] = self.bE_part
@@ -121,11 +136,12 @@ class QPSolverQPalm(QPSolver):
 
     @profile
     def apply_filters(self):
-        self.weights = self.weights[self.weight_filter]
-        self.g = np.zeros(*self.weights.shape)
-        self.lb_bE_lbA = self.lb_bE_lbA[self.b_bE_bA_filter]
-        self.ub_bE_ubA = self.ub_bE_ubA[self.b_bE_bA_filter]
-        self.A = self.A[:, self.weight_filter][self.bE_bA_filter, :]
+        self.weights = self._filter_vector('weights', self.weights, self.weight_filter)
+        # g is never written to, therefore the buffer stays 0
+        self.g = self._buffer('g', self.weights.shape[0])
+        self.lb_bE_lbA = self._filter_vector('lb_bE_lbA', self.lb_bE_lbA, self.b_bE_bA_filter)
+        self.ub_bE_ubA = self._filter_vector('ub_bE_ubA', self.ub_bE_ubA, self.b_bE_bA_filter)
+        self.A = self._filter_sparse('A', self.A, self.bE_bA_filter, self.weight_filter)
         if self.compute_nI_I:
             # for constraints, both rows and columns are filtered, so I can start with weights dims
             # then only the rows need to be filtered for inf lb/ub
@@ -143,9 +159,15 @@ class QPSolverQPalm(QPSolver):
         data.bmax = ubA
 
         solver = qpalm.Solver(data, self.settings)
+        warm_started = self.x0 is not None
+        if warm_started:
+            solver.warm_start(self.x0, self.y0)
+        start_time = perf_counter()
         solver.solve()
+        self.stats.add(solver.info.iter, perf_counter() - start_time, warm_started)
         if solver.info.status_val != QPALMInfo.SOLVED:
             raise InfeasibleException(f'Failed to solve qp: {str(QPALMInfo(solver.info.status_val))}')
+        self.y = solver.solution.y
         return solver.solution.x
 
     def default_interface_solver_call(self, H, g, lb, ub, E, bE, A, lbA, ubA) -> np.ndarray:
@@ -204,8 +226,8 @@ class QPSolverQPalm(QPSolver):
 
     @profile
     def problem_data_to_qp_format(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
-        H = sp.diags(self.weights)
-        A = sp.vstack((self.Ai, self.A))
+        H = self._sparse_diagonal('H', self.weights)
+        A = self._vstack_sparse('Ai_A', self.Ai, self.A)
         return H, self.g, A, self.lb_bE_lbA, self.ub_bE_ubA
 
     def lb_ub_with_inf(self, nlb: np.ndarray, ub: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
@@ -1,6 +1,7 @@
 import abc
 from collections import defaultdict
 from enum import IntEnum
+from time import perf_counter
 from typing import Tuple, Iterable, List, Union, Optional, Dict
 
 import numpy as np
@@ -8,6 +9,7 @@ import numpy as np
 from giskardpy.configs.qp_controller_config import SupportedQPSolver
 from giskardpy.exceptions import QPSolverException, InfeasibleException, HardConstraintsViolatedException
 from giskardpy.qp.qp_solver import QPSolver, record_solver_call_time, QPSWIFTFormatter
+from giskardpy.utils.profiling import Histogram
 import qpSWIFT
 import giskardpy.casadi_wrapper as cas
 import scipy.sparse as sp
@@ -28,9 +30,10 @@ class QPSolverQPSwift(QPSWIFTFormatter):
     min_x 0.5 x^T P x + c^T x
     s.t.  Ax = b
           Gx <= h
+    qpSWIFT's interface doesn't accept an initial guess, warm_start has no effect.
     """
     solver_id = SupportedQPSolver.qpSWIFT
-    _times: Dict[Tuple[int, int, int], list] = defaultdict(list)
+    _times: Dict[Tuple[int, int, int, int, int, int, int], Histogram] = defaultdict(Histogram)
 
     opts = {
         'OUTPUT': 1,  # 0 = sol; 1 = sol + basicInfo; 2 = sol + basicInfo + advInfo
@@ -46,7 +49,9 @@ class QPSolverQPSwift(QPSWIFTFormatter):
                     h: np.ndarray) -> np.ndarray:
         A = A.toarray()
         E = E.toarray()
+        start_time = perf_counter()
         result = qpSWIFT.run(c=g, h=h, P=H, G=A, A=E, b=b, opts=self.opts)
+        self.stats.add(result['basicInfo']['Iterations'], perf_counter() - start_time, False)
         exit_flag = result['basicInfo']['ExitFlag']
         if exit_flag != 0:
             error_code = QPSWIFTExitFlags(exit_flag)
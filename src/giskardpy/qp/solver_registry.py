@@ -0,0 +1,134 @@
+import importlib
+import importlib.util
+import json
+import os
+import sys
+from typing import Dict, Tuple, Type, Optional, Iterator, List
+
+from giskardpy.configs.qp_controller_config import SupportedQPSolver
+from giskardpy.qp.qp_solver import QPSolver
+from giskardpy.utils import logging
+from giskardpy.utils.singleton import SingletonMeta
+from giskardpy.utils.utils import create_path, resolve_ros_iris
+
+
+class SolverRegistry(metaclass=SingletonMeta):
+    """
+    Maps SupportedQPSolver to QPSolver classes, like a dict.
+    Solver modules are only imported when they are requested. Whether the python package of a solver can be imported
+    is cached on disk, as long as the package doesn't change, such that missing or broken solvers don't have to be
+    imported in every process.
+    """
+    # solver id -> (module, class name, python package that the solver module needs)
+    solvers: Dict[SupportedQPSolver, Tuple[str, str, str]] = {
+        SupportedQPSolver.qpSWIFT: ('giskardpy.qp.qp_solver_qpswift', 'QPSolverQPSwift', 'qpSWIFT'),
+        SupportedQPSolver.qpalm: ('giskardpy.qp.qp_solver_qpalm', 'QPSolverQPalm', 'qpalm'),
+        SupportedQPSolver.gurobi: ('giskardpy.qp.qp_solver_gurobi', 'QPSolverGurobi', 'gurobipy'),
+    }
+    file_name = 'qp_solver_availability.json'
+
+    def __init__(self):
+        self.solvers = dict(self.solvers)
+        self._classes: Dict[SupportedQPSolver, Type[QPSolver]] = {}
+        self._available: Dict[SupportedQPSolver, bool] = {}
+        self._disk_cache: Optional[Dict[str, Dict]] = None
+        try:
+            self.cache_path: Optional[str] = os.path.join(resolve_ros_iris('package://giskardpy/tmp/'), self.file_name)
+        except Exception:
+            self.cache_path = None
+
+    def register(self, solver_id: SupportedQPSolver, module_name: str, class_name: str, dependency: str):
+        """
+        Makes an additional solver available.
+        :param dependency: python package that has to be importable for the solver to work
+        """
+        self.solvers[solver_id] = (module_name, class_name, dependency)
+        self._classes.pop(solver_id, None)
+        self._available.pop(solver_id, None)
+
+    def is_available(self, solver_id: SupportedQPSolver) -> bool:
+        if solver_id not in self._available:
+            self._available[solver_id] = self._probe(solver_id)
+        return self._available[solver_id]
+
+    def __contains__(self, solver_id: SupportedQPSolver) -> bool:
+        return solver_id in self.solvers and self.is_available(solver_id)
+
+    def __getitem__(self, solver_id: SupportedQPSolver) -> Type[QPSolver]:
+        if solver_id not in self:
+            raise KeyError(solver_id)
+        if solver_id not in self._classes:
+            module_name, class_name, _ = self.solvers[solver_id]
+            self._classes[solver_id] = getattr(importlib.import_module(module_name), class_name)
+        return self._classes[solver_id]
+
+    def __iter__(self) -> Iterator[SupportedQPSolver]:
+        return (solver_id for solver_id in sorted(self.solvers) if self.is_available(solver_id))
+
+    def __len__(self) -> int:
+        return len(list(iter(self)))
+
+    def keys(self) -> List[SupportedQPSolver]:
+        return list(iter(self))
+
+    def items(self) -> List[Tuple[SupportedQPSolver, Type[QPSolver]]]:
+        return [(solver_id, self[solver_id]) for solver_id in self]
+
+    def values(self) -> List[Type[QPSolver]]:
+        return [self[solver_id] for solver_id in self]
+
+    def get(self, solver_id: SupportedQPSolver, default: Optional[Type[QPSolver]] = None) -> Optional[Type[QPSolver]]:
+        if solver_id in self:
+            return self[solver_id]
+        return default
+
+    def _probe(self, solver_id: SupportedQPSolver) -> bool:
+        module_name, _, dependency = self.solvers[solver_id]
+        try:
+            spec = importlib.util.find_spec(dependency)
+        except (ImportError, ValueError):
+            spec = None
+        if spec is None:
+            return False
+        # the cached result is only valid for the same installation of the dependency
+        origin = spec.origin or str(spec.submodule_search_locations)
+        try:
+            stamp = [origin, os.path.getmtime(spec.origin)]
+        except (OSError, TypeError):
+            stamp = [origin, None]
+        key = f'{sys.executable}:{module_name}'
+        entry = self._load_disk_cache().get(key)
+        if entry is not None and entry['stamp'] == stamp:
+            return entry['available']
+        try:
+            importlib.import_module(module_name)
+            available = True
+        except Exception as e:
+            logging.loginfo(f'Qp solver \'{solver_id.name}\' is not available: {e}')
+            available = False
+        self._disk_cache[key] = {'stamp': stamp, 'available': available}
+        self._save_disk_cache()
+        return available
+
+    def _load_disk_cache(self) -> Dict[str, Dict]:
+        if self._disk_cache is None:
+            self._disk_cache = {}
+            if self.cache_path is not None and os.path.isfile(self.cache_path):
+                try:
+                    with open(self.cache_path, 'r') as f:
+                        self._disk_cache = json.load(f)
+                except (OSError, ValueError) as e:
+                    logging.logwarn(f'Failed to load qp solver availability cache: {e}')
+        return self._disk_cache
+
+    def _save_disk_cache(self):
+        if self.cache_path is None:
+            return
+        try:
+            create_path(self.cache_path)
+            tmp_path = f'{self.cache_path}.tmp{os.getpid()}'
+            with open(tmp_path, 'w') as f:
+                json.dump(self._disk_cache, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logging.logwarn(f'Failed to save qp solver availability cache: {e}')
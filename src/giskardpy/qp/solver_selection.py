@@ -0,0 +1,149 @@
+import json
+import os
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from giskardpy.configs.qp_controller_config import SupportedQPSolver
+from giskardpy.qp.qp_solver import QPSolver
+from giskardpy.utils import logging
+from giskardpy.utils.singleton import SingletonMeta
+from giskardpy.utils.utils import create_path
+
+
+def problem_dimensions(qp_solver: QPSolver) -> Tuple[int, int, int, int, int]:
+    """
+    Dimensions of the unfiltered problem, they don't depend on the solver.
+    """
+    return (qp_solver.num_free_variable_constraints,
+            qp_solver.num_eq_constraints,
+            qp_solver.num_neq_constraints,
+            qp_solver.num_eq_slack_variables,
+            qp_solver.num_neq_slack_variables)
+
+
+class SolverSelectionTable(metaclass=SingletonMeta):
+    """
+    Remembers which qp solver was the fastest for problems of a certain size.
+    The table is saved as json, such that the benchmark doesn't have to be repeated after restarts.
+    """
+
+    def __init__(self):
+        self._table: Dict[str, Dict] = {}
+        self.path: Optional[str] = None
+
+    def configure(self, path: Optional[str]):
+        """
+        :param path: json file, None to only keep the table in memory.
+        """
+        if path == self.path:
+            return
+        self.path = path
+        self._table = {}
+        if path is not None and os.path.isfile(path):
+            try:
+                with open(path, 'r') as f:
+                    self._table = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.logwarn(f'Failed to load qp solver selection table: {e}')
+
+    @staticmethod
+    def key(dimensions: Tuple[int, ...]) -> str:
+        return '/'.join(str(x) for x in dimensions)
+
+    def get(self, dimensions: Tuple[int, ...]) -> Optional[SupportedQPSolver]:
+        entry = self._table.get(self.key(dimensions))
+        if entry is None:
+            return None
+        try:
+            return SupportedQPSolver[entry['solver']]
+        except KeyError:
+            return None
+
+    def put(self, dimensions: Tuple[int, ...], solver_id: SupportedQPSolver,
+            solve_times: Dict[SupportedQPSolver, float]):
+        self._table[self.key(dimensions)] = {'solver': solver_id.name,
+                                             'solve_times': {s.name: t for s, t in solve_times.items()}}
+        self._save()
+
+    def __len__(self):
+        return len(self._table)
+
+    def __contains__(self, dimensions: Tuple[int, ...]) -> bool:
+        return self.key(dimensions) in self._table
+
+    def clear(self):
+        self._table = {}
+        self._save()
+
+    def _save(self):
+        if self.path is None:
+            return
+        try:
+            create_path(self.path)
+            tmp_path = f'{self.path}.tmp{os.getpid()}'
+            with open(tmp_path, 'w') as f:
+                json.dump(self._table, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.logwarn(f'Failed to save qp solver selection table: {e}')
+
+
+class SolverBenchmark:
+    """
+    Runs the first control cycles of a goal with every installed qp solver and picks the fastest.
+    Each solver gets ticks_per_solver consecutive cycles, the first one of each block is ignored,
+    because it includes warm up costs, e.g. of a changed warm start.
+    """
+    ticks_per_solver: int = 6
+
+    def __init__(self, dimensions: Tuple[int, ...], solvers: Dict[SupportedQPSolver, QPSolver]):
+        """
+        :param solvers: the current problem compiled for every candidate, such that only solve times are measured
+                        and no control cycle has to wait for a compilation.
+        """
+        self.dimensions = dimensions
+        self.candidates: List[SupportedQPSolver] = list(solvers)
+        self.solvers = solvers
+        self.solve_times: Dict[SupportedQPSolver, List[float]] = defaultdict(list)
+        self.tick = 0
+        self.winner: Optional[SupportedQPSolver] = None
+
+    @property
+    def done(self) -> bool:
+        return self.winner is not None
+
+    @property
+    def current_solver_id(self) -> SupportedQPSolver:
+        return self.candidates[self.tick // self.ticks_per_solver]
+
+    def current_solver(self) -> QPSolver:
+        solver_id = self.current_solver_id
+        if self.tick % self.ticks_per_solver == 0:
+            self.solvers[solver_id].reset_warm_start()
+        return self.solvers[solver_id]
+
+    def record(self, solve_time: float):
+        """
+        Saves the solve time of the solver returned by current_solver and moves on to the next control cycle.
+        """
+        if self.tick % self.ticks_per_solver != 0 or self.ticks_per_solver == 1:
+            self.solve_times[self.current_solver_id].append(solve_time)
+        self.tick += 1
+        if self.tick >= len(self.candidates) * self.ticks_per_solver:
+            self._finish()
+
+    def median_solve_times(self) -> Dict[SupportedQPSolver, float]:
+        return {solver_id: float(np.median(times)) for solver_id, times in self.solve_times.items()}
+
+    def _finish(self):
+        median_times = self.median_solve_times()
+        self.winner = min(median_times, key=median_times.get)
+        SolverSelectionTable().put(self.dimensions, self.winner, median_times)
+        times_str = ', '.join(f'{solver_id.name}: {t * 1000:.3f}ms' for solver_id, t in median_times.items())
+        logging.loginfo(f'Selected qp solver \'{self.winner.name}\' ({times_str})')
+
+    @property
+    def selected_solver(self) -> QPSolver:
+        return self.solvers[self.winner]
@@ -3,7 +3,6 @@ from py_trees import Status
 from visualization_msgs.msg import MarkerArray, Marker
 
 from giskardpy import identifier
-from giskardpy.model.collision_world_syncer import Collisions
 from giskardpy.tree.behaviors.plugin import GiskardBehavior
 from giskardpy.utils.decorators import record_time
 
@@ -34,7 +33,8 @@ class CleanUp(GiskardBehavior):
         self.god_map.set_data(identifier.goal_msg, None)
         self.world.fast_all_fks = None
         self.collision_scene.reset_cache()
-        self.god_map.set_data(identifier.closest_point, Collisions(1))
+        self.collision_scene.collision_buffer.reset()
+        self.god_map.set_data(identifier.closest_point, self.collision_scene.collision_buffer)
         # self.god_map.safe_set_data(identifier.closest_point, None)
         self.god_map.set_data(identifier.time, 1)
 
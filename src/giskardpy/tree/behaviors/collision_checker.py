@@ -4,9 +4,10 @@ from py_trees import Status
 
 import giskardpy.identifier as identifier
 from giskardpy.exceptions import SelfCollisionViolatedException
-from giskardpy.model.collision_world_syncer import Collisions
+from giskardpy.model.collision_world_syncer import CollisionBuffer
 from giskardpy.tree.behaviors.plugin import GiskardBehavior
 from giskardpy.utils.decorators import catch_and_raise_to_blackboard, record_time
+from giskardpy.utils.profiling import Profiler
 from giskardpy.utils.utils import raise_to_blackboard
 
 
@@ -38,21 +39,19 @@ class CollisionChecker(GiskardBehavior):
             self.collision_matrix = self.add_added_checks(self.collision_matrix)
             self.collision_list_size = sum([config.max_num_of_repeller()
                                             for config in self.collision_avoidance_configs.values()])
+            self.collision_scene.collision_buffer.configure(self.collision_list_size)
             self.collision_scene.sync()
             super().initialise()
         except Exception as e:
             raise_to_blackboard(e)
 
-    def are_self_collisions_violated(self, collsions: Collisions):
-        for key, self_collisions in collsions.self_collisions.items():
-            for self_collision in self_collisions[:-1]: # the last collision is always some default crap
-                if self_collision.link_b_hash == 0:
-                    continue # Fixme figure out why there are sometimes two default collision entries
-                distance = self_collision.contact_distance
-                if distance < 0.0:
-                    raise SelfCollisionViolatedException(f'{self_collision.original_link_a} and '
-                                                         f'{self_collision.original_link_b} violate distance threshold:'
-                                                         f'{self_collision.contact_distance} < {0}')
+    def are_self_collisions_violated(self, collisions: CollisionBuffer):
+        rows, is_external = collisions.active_rows()
+        for self_collision in rows[~is_external & (rows['contact_distance'] < 0.0)]:
+            link_a = collisions.link_names[int(self_collision['original_link_a_id'])]
+            link_b = collisions.link_names[int(self_collision['original_link_b_id'])]
+            raise SelfCollisionViolatedException(f'{link_a} and {link_b} violate distance threshold:'
+                                                 f'{self_collision["contact_distance"]} < {0}')
 
     @catch_and_raise_to_blackboard
     @record_time
@@ -61,8 +60,9 @@ class CollisionChecker(GiskardBehavior):
         """
         Computes closest point info for all robot links and safes it to the god map.
         """
-        self.collision_scene.sync()
-        collisions = self.collision_scene.check_collisions(self.collision_matrix, self.collision_list_size)
+        with Profiler().section('phase/collision_check'):
+            self.collision_scene.sync()
+            collisions = self.collision_scene.update_collision_buffer(self.collision_matrix, self.collision_list_size)
         self.are_self_collisions_violated(collisions)
         self.god_map.set_data(identifier.closest_point, collisions)
         return Status.RUNNING
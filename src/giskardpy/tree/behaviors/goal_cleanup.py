@@ -3,7 +3,9 @@ from py_trees import Status
 
 import giskardpy.identifier as identifier
 from giskardpy.tree.behaviors.plugin import GiskardBehavior
+from giskardpy.utils import logging
 from giskardpy.utils.decorators import record_time, catch_and_raise_to_blackboard
+from giskardpy.utils.profiling import Profiler
 
 
 class GoalCleanUp(GiskardBehavior):
@@ -11,4 +13,7 @@ class GoalCleanUp(GiskardBehavior):
     def update(self):
         for goal in self.god_map.get_data(identifier.goals).values():
             goal.clean_up()
+        file_name = Profiler().end_goal()
+        if file_name is not None:
+            logging.loginfo(f'Saved profiling data in {file_name}.')
         return Status.SUCCESS
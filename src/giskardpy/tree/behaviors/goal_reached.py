@@ -28,6 +28,8 @@ class GoalReached(GiskardBehavior):
         self.thresholds = self.make_velocity_threshold()
         self.number_of_controlled_joints = len(self.thresholds)
         self.endless_mode = self.god_map.get_data(identifier.endless_mode)
+        self._abs_velocities = np.zeros(self.number_of_controlled_joints)
+        self._below_threshold = np.zeros(self.number_of_controlled_joints, dtype=bool)
 
     @record_time
     @profile
@@ -36,9 +38,10 @@ class GoalReached(GiskardBehavior):
             return Status.RUNNING
         planning_time = self.god_map.get_data(identifier.time)
         if planning_time - self.above_threshold_time >= self.window_size:
-            velocities = np.array(list(self.god_map.get_data(identifier.qp_solver_solution).xdot_velocity))
-            below_threshold = np.all(np.abs(velocities) < self.thresholds)
-            if below_threshold:
+            velocities = self.god_map.get_data(identifier.qp_solver_solution).xdot_velocity
+            np.abs(velocities, out=self._abs_velocities)
+            np.less(self._abs_velocities, self.thresholds, out=self._below_threshold)
+            if self._below_threshold.all():
                 run_time = self.get_runtime()
                 logging.loginfo('Velocities went below threshold.')
                 logging.loginfo(f'Found goal trajectory with length '
@@ -1,5 +1,6 @@
+import os
 from itertools import chain
-from typing import Dict
+from typing import Dict, Optional
 
 from py_trees import Status
 
@@ -34,11 +35,25 @@ class InitQPController(GiskardBehavior):
                 identifier.retries_with_relaxed_constraints),
             retry_added_slack=self.god_map.unsafe_get_data(identifier.retry_added_slack),
             retry_weight_factor=self.god_map.unsafe_get_data(identifier.retry_weight_factor),
+            controller_cache_size=self.god_map.unsafe_get_data(identifier.controller_cache_size),
+            controller_cache_dir=self.controller_cache_dir,
+            code_generation=self.god_map.unsafe_get_data(identifier.code_generation),
+            warm_start=self.god_map.unsafe_get_data(identifier.warm_start),
+            incremental_compilation=self.god_map.unsafe_get_data(identifier.incremental_compilation),
+            reuse_buffers=self.god_map.unsafe_get_data(identifier.reuse_buffers),
+            solver_selection_file=os.path.join(self.god_map.unsafe_get_data(identifier.tmp_folder),
+                                               'qp_solver_selection.json'),
         )
         self.god_map.set_data(identifier.qp_controller, qp_controller)
 
         return Status.SUCCESS
 
+    @property
+    def controller_cache_dir(self) -> Optional[str]:
+        if self.god_map.unsafe_get_data(identifier.persistent_controller_cache):
+            return os.path.join(self.god_map.unsafe_get_data(identifier.tmp_folder), 'controller_cache')
+        return None
+
     @profile
     def get_constraints_from_goals(self):
         eq_constraints = {}
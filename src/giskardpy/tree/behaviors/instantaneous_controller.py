@@ -3,7 +3,9 @@ from py_trees import Status
 import giskardpy.identifier as identifier
 from giskardpy.qp.qp_controller import QPProblemBuilder
 from giskardpy.tree.behaviors.plugin import GiskardBehavior
+from giskardpy.utils import logging
 from giskardpy.utils.decorators import catch_and_raise_to_blackboard, record_time
+from giskardpy.utils.profiling import Profiler
 
 
 class ControllerPlugin(GiskardBehavior):
@@ -19,10 +21,17 @@ class ControllerPlugin(GiskardBehavior):
     @profile
     def update(self):
         parameters = self.controller.get_parameter_names()
-        substitutions = self.god_map.get_values(parameters)
+        with Profiler().section('phase/substitution'):
+            substitutions = self.god_map.get_values(parameters)
 
         next_cmds = self.controller.get_cmd(substitutions)
         self.god_map.set_data(identifier.qp_solver_solution, next_cmds)
 
         return Status.RUNNING
 
+    def terminate(self, new_status):
+        if self.controller is not None and len(self.controller.qp_solver.stats) > 0:
+            logging.loginfo(f'QP solver stats: {self.controller.qp_solver.stats}')
+            self.controller.qp_solver.stats.reset()
+        super().terminate(new_status)
+
@@ -29,15 +29,14 @@ class LogDebugExpressionsPlugin(GiskardBehavior):
                 last_mjs = self.trajectory.get_exact(time-1)
             js = JointStates()
             for name, value in debug_data.items():
-                if len(value) > 1:
+                if np.size(value) > 1:
                     continue
+                # joint states only hold floats, values are usually arrays of shape (1,) or (1, 1)
+                value = float(np.asarray(value).item())
                 if last_mjs is not None:
                     velocity = value - last_mjs[name].position
                 else:
-                    if isinstance(value, np.ndarray):
-                        velocity = np.zeros(value.shape)
-                    else:
-                        velocity = 0
+                    velocity = 0
                 js[name].position = value
                 js[name].velocity = velocity/self.sample_period
             self.trajectory.set(time, js)
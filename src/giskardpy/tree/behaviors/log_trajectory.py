@@ -1,5 +1,3 @@
-from copy import deepcopy
-
 from py_trees import Status
 
 from giskardpy import identifier
@@ -11,9 +9,9 @@ class LogTrajPlugin(GiskardBehavior):
     @record_time
     @profile
     def update(self):
-        current_js = deepcopy(self.world.state)
         time = self.god_map.get_data(identifier.time)
         trajectory = self.god_map.get_data(identifier.trajectory)
-        trajectory.set(time, current_js)
+        # the values are copied into the trajectory
+        trajectory.set(time, self.world.state)
         self.god_map.set_data(identifier.trajectory, trajectory)
         return Status.RUNNING
@@ -1,9 +1,11 @@
 from collections import defaultdict
 
+import numpy as np
 from py_trees import Status
 
 import giskardpy.identifier as identifier
 from giskardpy.data_types import JointStates
+from giskardpy.my_types import Derivatives
 from giskardpy.tree.behaviors.plugin import GiskardBehavior
 from giskardpy.utils import logging
 from giskardpy.utils.decorators import record_time
@@ -28,6 +30,7 @@ class LoopDetector(GiskardBehavior):
         for name, threshold in self.velocity_limits.items():
             if threshold < 0.001:
                 self.velocity_limits[name] = 0.001
+        self._layout = None
 
     @record_time
     @profile
@@ -45,5 +48,25 @@ class LoopDetector(GiskardBehavior):
         self.past_joint_states.add(rounded_js)
         return Status.RUNNING
 
-    def round_js(self, js: JointStates) -> tuple:
-        return tuple(round(state.position / self.velocity_limits[name], self.precision) for name, state in js.items())
+    def round_js(self, js: JointStates) -> bytes:
+        """
+        Positions divided by the velocity limits, rounded to precision digits.
+        Instead of a tuple of rounded floats, the rounded vector is used as bytes, which are much cheaper to build and
+        to hash.
+        """
+        if self._layout != (js.layout_version, len(js)):
+            self._update_layout(js)
+        np.take(js.data[:, Derivatives.position], self._rows, out=self._rounded)
+        self._rounded /= self._velocity_limits
+        self._rounded *= 10 ** self.precision
+        np.rint(self._rounded, out=self._rounded)
+        # turns -0. into 0.
+        self._rounded += 0.
+        return self._rounded.tobytes()
+
+    def _update_layout(self, js: JointStates):
+        joint_names = list(js.keys())
+        self._rows = js.rows(joint_names)
+        self._velocity_limits = np.array([self.velocity_limits[name] for name in joint_names])
+        self._rounded = np.zeros(len(joint_names))
+        self._layout = (js.layout_version, len(js))
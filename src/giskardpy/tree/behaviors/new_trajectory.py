@@ -1,5 +1,3 @@
-from copy import deepcopy
-
 from py_trees import Status
 
 from giskardpy import identifier
@@ -12,9 +10,8 @@ class NewTrajectory(GiskardBehavior):
     @record_time
     @profile
     def initialise(self):
-        current_js = deepcopy(self.god_map.get_data(identifier.joint_states))
         trajectory = Trajectory()
-        trajectory.set(0, current_js)
+        trajectory.set(0, self.god_map.get_data(identifier.joint_states))
         self.god_map.set_data(identifier.trajectory, trajectory)
         trajectory = Trajectory()
         self.god_map.set_data(identifier.debug_trajectory, trajectory)
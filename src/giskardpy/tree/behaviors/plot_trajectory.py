@@ -1,15 +1,22 @@
-from threading import Thread
+from concurrent.futures import Future
+from typing import Optional, List
 
 from py_trees import Status
 
 from giskardpy import identifier
+from giskardpy.model.trajectory import plot_trajectory_arrays
 from giskardpy.tree.behaviors.plugin import GiskardBehavior
+from giskardpy.utils.background_worker import BackgroundWorker
 from giskardpy.utils.decorators import record_time
-from giskardpy.utils.logging import logwarn
 
 
 class PlotTrajectory(GiskardBehavior):
-    plot_thread: Thread
+    """
+    Plots the trajectory in the BackgroundWorker, such that the result of a goal doesn't have to wait for the plot.
+    """
+    plot_job: Optional[Future]
+    trajectory_identifier = identifier.trajectory
+    error_message = 'failed to save trajectory.pdf'
 
     @profile
     def __init__(self, name, wait=False, joint_filter=None, normalize_position: bool = False, **kwargs):
@@ -21,25 +28,31 @@ class PlotTrajectory(GiskardBehavior):
 
     @profile
     def initialise(self):
-        self.plot_thread = Thread(target=self.plot)
-        self.plot_thread.start()
-
-    def plot(self):
-        trajectory = self.god_map.get_data(identifier.trajectory)
-        if trajectory:
-            sample_period = self.god_map.get_data(identifier.sample_period)
-            try:
-                trajectory.plot_trajectory(path_to_data_folder=self.path_to_data_folder,
-                                           sample_period=sample_period,
-                                           normalize_position=self.normalize_position,
-                                           **self.kwargs)
-            except Exception as e:
-                logwarn(e)
-                logwarn('failed to save trajectory.pdf')
+        self.plot_job = self.plot()
+
+    def plot(self) -> Optional[Future]:
+        trajectory = self.god_map.get_data(self.trajectory_identifier)
+        if not trajectory:
+            return None
+        times, joint_names, data = trajectory.to_arrays()
+        joint_names = self.plot_names(joint_names)
+        kwargs = {'path_to_data_folder': self.path_to_data_folder,
+                  'sample_period': self.god_map.get_data(identifier.sample_period),
+                  'normalize_position': self.normalize_position,
+                  'max_derivative': self.god_map.get_data(identifier.max_derivative)}
+        kwargs.update(self.kwargs)
+        return BackgroundWorker().submit(self.error_message, plot_trajectory_arrays, times, joint_names, data,
+                                         **kwargs)
+
+    def plot_names(self, joint_names: List[str]) -> List[str]:
+        """
+        :return: the labels of the joints in the plot
+        """
+        return joint_names
 
     @record_time
     @profile
     def update(self):
-        if self.wait and self.plot_thread.is_alive():
+        if self.wait and self.plot_job is not None and not self.plot_job.done():
             return Status.RUNNING
         return Status.SUCCESS
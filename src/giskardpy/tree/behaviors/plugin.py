@@ -13,6 +13,10 @@ from giskardpy.utils.utils import has_blackboard_exception, get_blackboard_excep
 
 
 class GiskardBehavior(Behaviour, GodMapWorshipper):
+    # used by AsyncBehavior, in Hz, None means every cycle
+    rate: Optional[float] = None
+    # used by AsyncBehavior, maximum time of one tick in s
+    deadline: Optional[float] = None
 
     def __init__(self, name: Optional[str] = None):
         if name is None:
@@ -18,7 +18,7 @@ from giskardpy.goals.goal import Goal
 from giskardpy.my_types import PrefixName
 from giskardpy.tree.behaviors.get_goal import GetGoal
 from giskardpy.utils.logging import loginfo
-from giskardpy.utils.utils import convert_dictionary_to_ros_message, get_all_classes_in_package, raise_to_blackboard
+from giskardpy.utils.utils import convert_dictionary_to_ros_message, LazyClassRegistry, raise_to_blackboard
 from giskardpy.utils.decorators import catch_and_raise_to_blackboard, record_time
 
 
@@ -28,9 +28,8 @@ class RosMsgToGoal(GetGoal):
     def __init__(self, name, as_name):
         GetGoal.__init__(self, name, as_name)
         goal_package_paths = self.god_map.get_data(identifier.goal_package_paths)
-        self.allowed_constraint_types = {}
-        for path in goal_package_paths:
-            self.allowed_constraint_types.update(get_all_classes_in_package(path, Goal))
+        # goal modules are imported when a goal of them is used for the first time
+        self.allowed_constraint_types = LazyClassRegistry(Goal, goal_package_paths)
         self.robot_names = self.collision_scene.robot_names
 
     @record_time
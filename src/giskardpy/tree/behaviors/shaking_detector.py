@@ -1,4 +1,3 @@
-import matplotlib.pyplot as plt
 import numpy as np
 from py_trees import Status
 
@@ -7,6 +6,7 @@ from giskardpy.exceptions import ShakingException
 from giskardpy.tree.behaviors.plugin import GiskardBehavior
 from giskardpy.utils import logging
 from giskardpy.utils.decorators import record_time
+from giskardpy.utils.ring_buffer import RingBuffer, SlidingDFT
 
 
 # fast
@@ -38,7 +38,6 @@ class WiggleCancel(GiskardBehavior):
     @profile
     def initialise(self):
         super().initialise()
-        self.js_samples = []
         self.sample_period = self.god_map.get_data(identifier.sample_period)
         self.max_detectable_freq = 1 / (2 * self.sample_period)
         self.min_wiggle_frequency = self.frequency_range * self.max_detectable_freq
@@ -60,7 +59,59 @@ class WiggleCancel(GiskardBehavior):
         self.key_set = set(self.keys)
         self.thresholds = np.array(self.thresholds)
         self.velocity_limits = np.array(self.velocity_limits)
-        self.js_samples = [[] for _ in range(len(self.keys))]
+        self.init_buffers()
+
+    def init_buffers(self):
+        """
+        Velocities and their differences are stored in ring buffers over the joint vector and the spectrum of the
+        differences is updated with a sliding dft, such that a tick doesn't have to redo the whole fft.
+        """
+        num_joints = len(self.keys)
+        self.N = self.num_samples_in_fft - 1
+        self.velocity_samples = RingBuffer(self.num_samples_in_fft, num_joints)
+        self.velocity_diffs = RingBuffer(self.N, num_joints)
+        self.dft = SlidingDFT(self.N, num_joints)
+        self.freq = np.fft.rfftfreq(self.N, d=self.sample_period)
+        # index in frequency list where frequency >= min_wiggle_frequency
+        self.freq_idx = int(np.argmax(self.freq >= self.min_wiggle_frequency))
+        if self.freq[self.freq_idx] < self.min_wiggle_frequency:
+            self.freq_idx = None
+        # number of samples in the window above the moving threshold, per joint
+        self.num_moving_samples = np.zeros(num_joints, dtype=int)
+        self.amplitude_thresholds = self.velocity_limits * self.amplitude_threshold
+        num_bins = self.dft.num_bins - (self.freq_idx or 0)
+        self._velocities = np.zeros(num_joints)
+        self._diff = np.zeros(num_joints)
+        self._oldest_diff = np.zeros(num_joints)
+        self._moving = np.zeros(num_joints, dtype=bool)
+        self._amplitudes = np.zeros((num_joints, num_bins))
+        self._violations = np.zeros((num_joints, num_bins), dtype=bool)
+        self._window = np.zeros((self.N, num_joints))
+
+    def add_sample(self, velocities: np.ndarray):
+        """
+        O(number of joints * number of frequency bins) and allocation free.
+        """
+        was_full = self.velocity_samples.full
+        if self.velocity_samples.size > 0:
+            np.subtract(velocities, self.velocity_samples.newest, out=self._diff)
+            if self.velocity_diffs.full:
+                self._oldest_diff[:] = self.velocity_diffs.oldest
+                self.velocity_diffs.append(self._diff)
+                if self.dft.needs_resync:
+                    self.dft.reset(self.velocity_diffs.ordered(out=self._window))
+                else:
+                    self.dft.slide(self._oldest_diff, self._diff)
+            else:
+                self.velocity_diffs.append(self._diff)
+        if was_full:
+            np.greater(self.velocity_samples.oldest, self.thresholds, out=self._moving)
+            self.num_moving_samples -= self._moving
+        self.velocity_samples.append(velocities)
+        np.greater(velocities, self.thresholds, out=self._moving)
+        self.num_moving_samples += self._moving
+        if not was_full and self.velocity_samples.full:
+            self.dft.reset(self.velocity_diffs.ordered(out=self._window))
 
     @record_time
     @profile
@@ -71,20 +122,14 @@ class WiggleCancel(GiskardBehavior):
         latest_points = self.god_map.get_data(identifier.joint_states)
 
         for i, key in enumerate(self.keys):
-            self.js_samples[i].append(latest_points[key].velocity)
+            self._velocities[i] = latest_points[key].velocity
+        self.add_sample(self._velocities)
 
-        if len(self.js_samples[0]) < self.num_samples_in_fft:
+        if not self.velocity_samples.full:
             return Status.RUNNING
 
-        if len(self.js_samples[0]) > self.num_samples_in_fft:
-            for i in range(len(self.js_samples)):
-                self.js_samples[i].pop(0)
-
-        js_samples_array = np.array(self.js_samples)
-        plot = False
         try:
-            self.detect_shaking(js_samples_array, self.sample_period, self.min_wiggle_frequency,
-                                self.amplitude_threshold, self.thresholds, self.velocity_limits, plot)
+            self.detect_shaking()
         except ShakingException as e:
             if self.god_map.get_data(identifier.cut_off_shaking):
                 trajectory = self.god_map.get_data(identifier.trajectory)
@@ -100,64 +145,28 @@ class WiggleCancel(GiskardBehavior):
 
         return Status.RUNNING
 
-    def make_mask(self, js_samples, moving_thresholds):
-        return np.any(js_samples.T > moving_thresholds, axis=0)
-
-    def detect_shaking(self, js_samples, sample_period, min_wiggle_frequency, amplitude_threshold, moving_thresholds,
-                       velocity_limits, plot=False):
-        N = len(js_samples[0]) - 1
-        # remove joints that arent moving
-        mask = self.make_mask(js_samples, moving_thresholds)
-        velocity_limits = velocity_limits[mask]
-        amplitude_thresholds = velocity_limits * amplitude_threshold  # acceleration limit is basically vel*2
-        joints_filtered = js_samples[mask]
-        joints_filtered = np.diff(joints_filtered)
-        # joints_filtered = (joints_filtered.T - joints_filtered.mean(axis=1)).T
-
-        if len(joints_filtered) == 0:
-            return False
-
-        freq = np.fft.rfftfreq(N, d=sample_period)
-
-        # find index in frequency list where frequency >= min_wiggle_frequency
-        try:
-            freq_idx = next(i for i, v in enumerate(freq) if v >= min_wiggle_frequency)
-        except StopIteration:
+    def detect_shaking(self) -> bool:
+        """
+        Checks the amplitudes of frequencies above min_wiggle_frequency of all joints that moved in the window.
+        :raises ShakingException:
+        """
+        if self.freq_idx is None or not np.any(self.num_moving_samples):
             return False
-
-        fft = np.fft.rfft(joints_filtered, axis=1)
-        fft = [2.0 * np.abs(i)/N for i in fft]
-        if plot:
-            y = joints_filtered
-
-            x = np.linspace(0, N * sample_period, N)
-            y = np.array(y)
-            fig, ax = plt.subplots()
-            for yy in y:
-                ax.plot(x, yy)
-            plt.show()
-
-            fig, ax = plt.subplots()
-            for i, yy in enumerate(y):
-                yf = fft[i]
-                # yf = np.fft.rfft(yy)
-                xf = np.fft.rfftfreq(N, d=sample_period)
-                plt.plot(xf, np.abs(yf.real), label='real')
-                # plt.plot(xf, np.abs(yf.imag), label='img')
-            plt.show()
-
-        fft = (velocity_limits * np.array(fft).T).T
-        violations = fft[:, freq_idx:].T > amplitude_thresholds
-        if np.any(violations):
-            filtered_keys = self.keys[mask]
+        np.abs(self.dft.spectrum[:, self.freq_idx:], out=self._amplitudes)
+        self._amplitudes *= 2.0
+        self._amplitudes /= self.N
+        self._amplitudes *= self.velocity_limits[:, None]
+        np.greater(self._amplitudes, self.amplitude_thresholds[:, None], out=self._violations)
+        self._violations[self.num_moving_samples == 0] = False
+        if np.any(self._violations):
             violation_str = ''
-            for i in range(violations.shape[1]):
-                if np.any(violations[:, i]):
-                    joint = filtered_keys[i]
-                    velocity_limit = velocity_limits[i]
-                    hertz_str = ', '.join('{} hertz: {} > {}'.format(freq[freq_idx:][j],
-                                                                     fft[:, freq_idx:].T[:, i][j] / velocity_limit,
-                                                                     amplitude_threshold) for j, x in
-                                         enumerate(violations[:, i]) if x)
-                    violation_str += '\nshaking of joint: \'{}\' at '.format(joint) + hertz_str
-            raise ShakingException('endless wiggling detected' + violation_str)
\ No newline at end of file
+            for i in np.flatnonzero(np.any(self._violations, axis=1)):
+                joint = self.keys[i]
+                velocity_limit = self.velocity_limits[i]
+                hertz_str = ', '.join('{} hertz: {} > {}'.format(self.freq[self.freq_idx:][j],
+                                                                 self._amplitudes[i, j] / velocity_limit,
+                                                                 self.amplitude_threshold)
+                                      for j in np.flatnonzero(self._violations[i]))
+                violation_str += '\nshaking of joint: \'{}\' at '.format(joint) + hertz_str
+            raise ShakingException('endless wiggling detected' + violation_str)
+        return False
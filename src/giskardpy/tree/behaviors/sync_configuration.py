@@ -1,12 +1,13 @@
 from queue import Queue, Empty
 from typing import Optional
 
+import numpy as np
 import rospy
 from py_trees import Status
 from rospy import ROSException
 from sensor_msgs.msg import JointState
 
-from giskardpy.data_types import JointStates
+from giskardpy.my_types import Derivatives
 from giskardpy.tree.behaviors.plugin import GiskardBehavior
 from giskardpy.utils import logging
 from giskardpy.utils.decorators import record_time
@@ -21,7 +22,8 @@ class SyncConfiguration(GiskardBehavior):
         if not self.joint_state_topic.startswith('/'):
             self.joint_state_topic = '/' + self.joint_state_topic
         super().__init__(str(self))
-        self.mjs: Optional[JointStates] = None
+        self.msg: Optional[JointState] = None
+        self.positions: Optional[np.ndarray] = None
         self.group_name = group_name
         self.lock = Queue(maxsize=1)
 
@@ -49,15 +51,18 @@ class SyncConfiguration(GiskardBehavior):
     @profile
     def update(self):
         try:
-            if self.mjs is None:
+            if self.msg is None:
                 js = self.lock.get()
             else:
                 js = self.lock.get_nowait()
-            self.mjs = JointStates.from_msg(js, self.group_name)
+            self.msg = js
+            self.positions = np.array(js.position, dtype=float)
         except Empty:
             pass
 
-        self.world.state.update(self.mjs)
+        rows = self.world.state.msg_rows(self.msg.name, self.group_name)
+        self.world.state.data[rows] = 0
+        self.world.state.data[rows, Derivatives.position] = self.positions
         self.world.notify_state_change()
         return Status.SUCCESS
 
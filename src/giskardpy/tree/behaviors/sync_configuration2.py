@@ -8,7 +8,7 @@ from sensor_msgs.msg import JointState
 import giskardpy.utils.tfwrapper as tf
 from giskardpy.data_types import JointStates
 from giskardpy.model.world import WorldBranch
-from giskardpy.my_types import PrefixName, Derivatives
+from giskardpy.my_types import Derivatives
 from giskardpy.tree.behaviors.plugin import GiskardBehavior
 from giskardpy.utils.decorators import record_time
 
@@ -55,8 +55,7 @@ class SyncConfiguration2(GiskardBehavior):
     @record_time
     @profile
     def update(self):
-        for joint_name, position in zip(self.msg.name, self.msg.position):
-            joint_name = PrefixName(joint_name, self.group_name)
-            self.world.state[joint_name][Derivatives.position] = position
+        rows = self.world.state.msg_rows(self.msg.name, self.group_name)
+        self.world.state.data[rows, Derivatives.position] = self.msg.position
 
         return Status.RUNNING
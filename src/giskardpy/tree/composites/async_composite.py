@@ -1,12 +1,13 @@
 import traceback
 from threading import RLock, Thread
-from time import time
+from time import time, perf_counter
 
 import rospy
 from py_trees import Status, Composite
 
 from giskardpy import identifier
 from giskardpy.tree.behaviors.plugin import GiskardBehavior
+from giskardpy.tree.scheduler import MultiRateScheduler
 from giskardpy.utils.utils import raise_to_blackboard
 
 
@@ -22,9 +23,11 @@ class AsyncBehavior(GiskardBehavior, Composite):
             self.sleeper = rospy.Rate(hz)
         else:
             self.sleeper = None
+        self.scheduler = MultiRateScheduler()
 
     def initialise(self):
         self.looped_once = False
+        self.scheduler.reset(self.children, 1 / self.god_map.get_data(identifier.sample_period))
         self.update_thread = Thread(target=self.loop_over_plugins)
         self.update_thread.start()
         super().initialise()
@@ -42,6 +45,7 @@ class AsyncBehavior(GiskardBehavior, Composite):
             # logging.logwarn('terminate was called before init')
             pass
         self.stop_children()
+        self.scheduler.report(self.name)
         super().terminate(new_status)
 
     def stop_children(self):
@@ -70,13 +74,18 @@ class AsyncBehavior(GiskardBehavior, Composite):
                     with self.status_lock:
                         if not self.is_running():
                             return
+                        if not self.scheduler.is_due(child):
+                            continue
+                        start = perf_counter()
                         for node in child.tick():
                             status = node.status
+                        self.scheduler.record(child, start, perf_counter())
                         if status is not None:
                             self.set_status(status)
                         assert self.status is not None, f'{child.name} did not return a status'
                         if not self.is_running():
                             return
+                self.scheduler.next_cycle()
                 self.looped_once = True
                 if self.sleeper:
                     a = rospy.get_rostime()
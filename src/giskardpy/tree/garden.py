@@ -476,6 +476,18 @@ class TreeManager(ABC):
     def get_nodes_of_type(self, node_type: Type[GiskardBehavior_]) -> List[GiskardBehavior_]:
         return [node.node for node in self.tree_nodes.values() if behavior_is_instance_of(node.node, node_type)]
 
+    def set_behavior_rate(self, node_type: Type[GiskardBehavior], rate: Optional[float] = None,
+                          deadline: Optional[float] = None):
+        """
+        Changes how often all nodes of node_type are ticked, if they are children of an AsyncBehavior.
+        :param rate: in Hz, None to tick them in every control cycle
+        :param deadline: maximum time of one tick in s, ticks that take longer are reported
+        """
+        for node in self.get_nodes_of_type(node_type):
+            node = getattr(node, 'original', node)
+            node.rate = rate
+            node.deadline = deadline
+
     def insert_node_behind_every_node_of_type(self, node_type: Type[GiskardBehavior],
                                               node_to_be_added: GiskardBehavior):
         nodes = self.get_nodes_of_type(node_type)
@@ -627,8 +639,8 @@ def generate_pydot_graph(root, visibility_level):
                     for function_name in function_names:
                         if function_name in time_dict:
                             times = time_dict[function_name]
-                            average_time = np.average(times)
-                            total_time = np.sum(times)
+                            average_time = times.mean
+                            total_time = times.total
                             if total_time > 1:
                                 color = 'red'
                             proposed_dot_name += f'\n{function_name.ljust(function_name_padding, "-")}' \
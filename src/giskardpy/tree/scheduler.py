@@ -0,0 +1,122 @@
+from typing import Dict, Optional, Iterable
+
+from giskardpy.utils import logging
+from giskardpy.utils.profiling import Histogram
+
+
+def behavior_rate(behavior) -> Optional[float]:
+    """
+    Rate in Hz, that a behavior declared, None if it should be ticked in every cycle.
+    """
+    return getattr(getattr(behavior, 'original', behavior), 'rate', None)
+
+
+def behavior_deadline(behavior) -> Optional[float]:
+    """
+    Maximum time in s, that one tick of a behavior should take, None if there is no deadline.
+    """
+    return getattr(getattr(behavior, 'original', behavior), 'deadline', None)
+
+
+class BehaviorTiming:
+    """
+    Schedule and timing statistics of one child of an AsyncBehavior.
+    """
+
+    def __init__(self, name: str, period: int, deadline: Optional[float]):
+        """
+        :param period: the behavior is ticked every period cycles
+        :param deadline: in s
+        """
+        self.name = name
+        self.period = period
+        self.deadline = deadline
+        self.durations = Histogram()
+        self.intervals = Histogram()
+        self.missed_deadlines = 0
+        self.last_start: Optional[float] = None
+
+    def record(self, start: float, end: float):
+        duration = end - start
+        self.durations.add(duration)
+        if self.last_start is not None:
+            self.intervals.add(start - self.last_start)
+        self.last_start = start
+        if self.deadline is not None and duration > self.deadline:
+            if self.missed_deadlines == 0:
+                logging.logwarn(f'\'{self.name}\' missed its deadline of {self.deadline * 1000:.3f}ms, '
+                                f'it took {duration * 1000:.3f}ms.')
+            self.missed_deadlines += 1
+
+    @property
+    def jitter(self) -> float:
+        """
+        Standard deviation of the time between the starts of two consecutive ticks in s.
+        """
+        return self.intervals.std
+
+    def __str__(self):
+        if self.durations.count == 0:
+            return f'{self.name}: not ticked'
+        s = f'{self.name}: every {self.period} cycle(s), {self.durations.count} ticks, ' \
+            f'duration avg {self.durations.mean * 1000:.3f}ms p99 {self.durations.percentile(99) * 1000:.3f}ms ' \
+            f'max {self.durations.max * 1000:.3f}ms, ' \
+            f'jitter {self.jitter * 1000:.3f}ms'
+        if self.deadline is not None:
+            s += f', {self.missed_deadlines} missed deadline(s) of {self.deadline * 1000:.3f}ms'
+        return s
+
+
+class MultiRateScheduler:
+    """
+    Decides which children of an AsyncBehavior are ticked in a control cycle.
+    Rates are converted into multiples of the control cycle, such that e.g. a collision checker with 10Hz runs in every
+    second cycle of a 20Hz controller. All behaviors are ticked in the first cycle.
+    Cycles are counted instead of measuring the wall time, because in stand alone mode the control loop runs faster
+    than real time.
+    """
+
+    def __init__(self):
+        self.timings: Dict[str, BehaviorTiming] = {}
+        self.cycle = 0
+
+    def reset(self, behaviors: Iterable, control_rate: float):
+        """
+        :param behaviors: children of the AsyncBehavior
+        :param control_rate: in Hz
+        """
+        self.cycle = 0
+        self.timings = {}
+        for behavior in behaviors:
+            rate = behavior_rate(behavior)
+            if rate is None or rate >= control_rate:
+                period = 1
+            else:
+                period = max(1, int(round(control_rate / rate)))
+            self.timings[behavior.name] = BehaviorTiming(behavior.name, period, behavior_deadline(behavior))
+
+    def is_due(self, behavior) -> bool:
+        timing = self.timings.get(behavior.name)
+        return timing is None or self.cycle % timing.period == 0
+
+    def record(self, behavior, start: float, end: float):
+        if behavior.name not in self.timings:
+            self.timings[behavior.name] = BehaviorTiming(behavior.name, 1, behavior_deadline(behavior))
+        self.timings[behavior.name].record(start, end)
+
+    def next_cycle(self):
+        self.cycle += 1
+
+    @property
+    def missed_deadlines(self) -> int:
+        return sum(timing.missed_deadlines for timing in self.timings.values())
+
+    def report(self, name: str):
+        if self.cycle == 0:
+            return
+        lines = '\n'.join(str(timing) for timing in self.timings.values())
+        msg = f'Timing of \'{name}\' after {self.cycle} cycles:\n{lines}'
+        if self.missed_deadlines > 0:
+            logging.loginfo(msg)
+        else:
+            logging.logdebug(msg)
@@ -0,0 +1,87 @@
+import atexit
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+from typing import Callable, Optional
+
+from giskardpy.utils import logging
+from giskardpy.utils.singleton import SingletonMeta
+
+
+class BackgroundWorker(metaclass=SingletonMeta):
+    """
+    A separate process for slow jobs that shouldn't block the behavior tree or compete with it for the GIL,
+    e.g. plotting or saving debug data.
+    The process is started with the first job and reused. Jobs are executed one after another in the order in which
+    they were submitted. They have to be module level functions and their arguments have to be picklable.
+    If the process dies, it is restarted and the jobs that were running or waiting in it are submitted once more.
+    """
+
+    def __init__(self):
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = Lock()
+
+    def _start(self):
+        # forking a process with ros threads is not safe
+        self._executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+
+    def _restart(self, broken_executor: ProcessPoolExecutor):
+        with self._lock:
+            # every job of a broken executor fails, only the first one restarts it
+            if self._executor is broken_executor:
+                logging.logwarn('Background worker died, restarting it.')
+                broken_executor.shutdown(wait=False)
+                self._start()
+
+    def submit(self, error_message: str, function: Callable, *args, **kwargs) -> Future:
+        """
+        :param error_message: logged, if the job raises an exception
+        :return: done, when the job is finished
+        """
+        future = Future()
+        self._submit(future, True, error_message, function, *args, **kwargs)
+        return future
+
+    def _submit(self, future: Future, retry: bool, error_message: str, function: Callable, *args, **kwargs):
+        with self._lock:
+            if self._executor is None:
+                self._start()
+                atexit.register(self.shutdown)
+            executor = self._executor
+            try:
+                job = executor.submit(function, *args, **kwargs)
+            except BrokenProcessPool:
+                job = None
+        if job is None:
+            self._restart(executor)
+            self._submit(future, retry, error_message, function, *args, **kwargs)
+            return
+
+        def on_done(f: Future):
+            if future.cancelled():
+                return
+            if f.cancelled():
+                future.cancel()
+                return
+            exception = f.exception()
+            if isinstance(exception, BrokenProcessPool) and retry:
+                self._restart(executor)
+                self._submit(future, False, error_message, function, *args, **kwargs)
+            elif exception is not None:
+                logging.logwarn(f'{error_message}: {exception}')
+                future.set_exception(exception)
+            else:
+                future.set_result(f.result())
+
+        job.add_done_callback(on_done)
+
+    def shutdown(self, wait: bool = True):
+        """
+        :param wait: wait until all submitted jobs are done
+        """
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=wait)
@@ -0,0 +1,80 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from typing import Optional
+
+import casadi as ca  # type: ignore
+
+from giskardpy.utils import logging
+
+compiler_flags = ['-O2', '-fPIC', '-shared']
+cache_dir = os.path.join(tempfile.gettempdir(), 'giskardpy_codegen')
+enabled = False
+_compiler: Optional[str] = None
+_compiler_searched = False
+
+
+def find_compiler() -> Optional[str]:
+    global _compiler, _compiler_searched
+    if not _compiler_searched:
+        _compiler_searched = True
+        for candidate in [os.environ.get('CC'), 'gcc', 'clang', 'cc']:
+            if candidate is not None and shutil.which(candidate) is not None:
+                _compiler = shutil.which(candidate)
+                break
+        else:
+            logging.logwarn('No C compiler found, falling back to interpreted casadi functions.')
+    return _compiler
+
+
+@contextmanager
+def code_generation(enable: bool = True):
+    """
+    All CompiledFunctions created within this context are compiled to C, if enable is True.
+    """
+    global enabled
+    old_value = enabled
+    enabled = enable
+    try:
+        yield
+    finally:
+        enabled = old_value
+
+
+def function_hash(f: ca.Function) -> str:
+    return hashlib.sha256(f.serialize().encode()).hexdigest()[:32]
+
+
+@profile
+def compile_function(f: ca.Function) -> ca.Function:
+    """
+    Generates C code for f, compiles it into a shared library and loads it.
+    Libraries are cached in cache_dir by the hash of f, such that the same function is only compiled once.
+    :return: the compiled function, or f if no compiler is available or compilation failed.
+    """
+    compiler = find_compiler()
+    if compiler is None:
+        return f
+    try:
+        name = f'giskardpy_{function_hash(f)}'
+        library_path = os.path.join(cache_dir, f'{name}.so')
+        if not os.path.isfile(library_path):
+            os.makedirs(cache_dir, exist_ok=True)
+            with tempfile.TemporaryDirectory(dir=cache_dir) as build_dir:
+                c_file_name = f'{name}.c'
+                code_generator = ca.CodeGenerator(c_file_name, {'with_header': False})
+                code_generator.add(f)
+                code_generator.generate(f'{build_dir}/')
+                tmp_library_path = os.path.join(build_dir, f'{name}.so')
+                subprocess.run([compiler, *compiler_flags, os.path.join(build_dir, c_file_name),
+                                '-o', tmp_library_path],
+                               check=True, capture_output=True)
+                # rename is atomic, so parallel processes never load half written libraries
+                os.replace(tmp_library_path, library_path)
+        return ca.external(f.name(), library_path)
+    except (OSError, RuntimeError, subprocess.CalledProcessError) as e:
+        logging.logwarn(f'Code generation failed, falling back to interpreted casadi function: {e}')
+        return f
@@ -15,7 +15,7 @@ from collections import OrderedDict, defaultdict
 from contextlib import contextmanager
 from copy import deepcopy
 from functools import wraps
-from time import time
+from time import perf_counter
 from typing import Type, Optional, Dict
 
 import numpy as np
@@ -38,6 +38,7 @@ from giskardpy.exceptions import DontPrintStackTrace
 from giskardpy.god_map import GodMap
 from giskardpy.my_types import PrefixName
 from giskardpy.utils import logging
+from giskardpy.utils.profiling import Profiler, Histogram
 from giskardpy.utils.time_collector import TimeCollector
 from giskardpy.utils.utils import has_blackboard_exception, raise_to_blackboard
 
@@ -85,18 +86,24 @@ def memoize_with_counter(reset_after: int):
 
 
 def record_time(function):
-    # return function
+    """
+    Records the run times of a behavior method in self.__times[function name] and, if the Profiler is enabled,
+    in the section 'behavior/<behavior name>/<function name>'.
+    """
     function_name = function.__name__
+    profiler = Profiler()
 
     @wraps(function)
     def wrapper(*args, **kwargs):
         self = args[0]
         if not hasattr(self, '__times'):
-            setattr(self, '__times', defaultdict(list))
-        start_time = time()
+            setattr(self, '__times', defaultdict(Histogram))
+        start_time = perf_counter()
         result = function(*args, **kwargs)
-        time_delta = time() - start_time
-        self.__times[function_name].append(time_delta)
+        time_delta = perf_counter() - start_time
+        self.__times[function_name].add(time_delta)
+        if profiler.enabled:
+            profiler.record(f'behavior/{getattr(self, "name", type(self).__name__)}/{function_name}', time_delta)
         return result
 
     return wrapper
@@ -123,6 +130,25 @@ def copy_memoize(function):
     return wrapper
 
 
+def view_memoize(function):
+    """
+    Like copy_memoize, but for casadi expressions, which are not copied but handed out as views, see Symbol_.view.
+    """
+    memo = function.memo = {}
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        key = (args, frozenset(kwargs.items()))
+        try:
+            return memo[key].view()
+        except KeyError:
+            rv = function(*args, **kwargs)
+            memo[key] = rv
+            return rv.view()
+
+    return wrapper
+
+
 def catch_and_raise_to_blackboard(function):
     @wraps(function)
     def wrapper(*args, **kwargs):
@@ -1,12 +1,14 @@
+from collections import OrderedDict
 from typing import Tuple, Union, Dict, List, Type, Optional
 
 import numpy as np
 from geometry_msgs.msg import Quaternion, Point
 from tf.transformations import quaternion_multiply, quaternion_conjugate, quaternion_matrix, quaternion_from_matrix
 
+from giskardpy.configs.qp_controller_config import SupportedQPSolver
 from giskardpy.my_types import Derivatives
 from giskardpy.qp.qp_solver import QPSolver
-from giskardpy.qp.qp_solver_qpalm import QPSolverQPalm
+from giskardpy.qp.solver_registry import SolverRegistry
 
 
 def qv_mult(quaternion, vector):
@@ -154,7 +156,7 @@ def mpc(upper_limits: Dict[Derivatives, List[float]],
         lin_weight: Tuple[float],
         solver_class: Optional[Type[QPSolver]] = None) -> np.ndarray:
     if solver_class is None:
-        solver = QPSolverQPalm.empty()
+        solver = SolverRegistry()[SupportedQPSolver.qpalm].empty()
         # solver = QPSolverQPSwift.empty()
         # solver = QPSolverGurobi.empty()
     else:
@@ -169,11 +171,9 @@ def mpc(upper_limits: Dict[Derivatives, List[float]],
             lb[-1] = 0
             ub[-1] = 0
     model = derivative_link_model(dt, ph, max_d)
-    lbA = np.zeros(model.shape[0])
-    ubA = np.zeros(model.shape[0])
+    bE = np.zeros(model.shape[0])
     for derivative, current_value in sorted(current_values.items()):
-        ubA[ph * (derivative - 1)] = current_value
-        lbA[ph * (derivative - 1)] = current_value
+        bE[ph * (derivative - 1)] = current_value
     w = np.zeros(len(lb))
     w[:ph] = q_weight[0]
     w[ph:ph*2] = q_weight[1]
@@ -184,28 +184,64 @@ def mpc(upper_limits: Dict[Derivatives, List[float]],
     g[ph:ph*2] = lin_weight[1]
     g[-ph:] = lin_weight[2]
     empty = np.eye(0)
-    lb = np.array(lb)
-    ub = np.array(ub)
-    result = solver.default_interface_solver_call(H=H, g=g, lb=lb, ub=ub,
-                                                  E=model, bE=ubA,
-                                                  A=empty, lbA=np.array([]), ubA=np.array([]))
-    return result
+    return solver.default_interface_solver_call(H=H, g=g, lb=np.array(lb), ub=np.array(ub),
+                                                E=model, bE=bE,
+                                                A=empty, lbA=np.array([]), ubA=np.array([]))
+
+
+# results of simple_mpc, keyed by all its arguments, the least recently used ones are dropped above the size limit
+simple_mpc_cache_size = 1024
+_simple_mpc_cache: OrderedDict[tuple, np.ndarray] = OrderedDict()
 
 
 def simple_mpc(vel_limit, acc_limit, jerk_limit, current_vel, current_acc, dt, ph, q_weight, lin_weight, solver_class = None):
-    upper_limits = {
-        Derivatives.velocity: np.ones(ph) * vel_limit,
-        Derivatives.acceleration: np.ones(ph) * acc_limit,
-        Derivatives.jerk: np.ones(ph) * jerk_limit
-    }
-    lower_limits = {
-        Derivatives.velocity: np.ones(ph) * -vel_limit,
-        Derivatives.acceleration: np.ones(ph) * -acc_limit,
-        Derivatives.jerk: np.ones(ph) * -jerk_limit
-    }
-    return mpc(upper_limits, lower_limits,
-               {Derivatives.velocity: current_vel,
-                Derivatives.acceleration: current_acc}, dt, ph, q_weight, lin_weight, solver_class=solver_class)
+    return simple_mpc_batch(np.array([vel_limit]), np.array([acc_limit]), np.array([jerk_limit]),
+                            np.array([current_vel]), np.array([current_acc]),
+                            dt, ph, q_weight, lin_weight, solver_class)[0]
+
+
+def simple_mpc_batch(vel_limits: np.ndarray, acc_limits: np.ndarray, jerk_limits: np.ndarray,
+                     current_vels: np.ndarray, current_accs: np.ndarray, dt: float, ph: int,
+                     q_weight: Tuple[float, float, float], lin_weight: Tuple[float, float, float],
+                     solver_class: Optional[Type[QPSolver]] = None) -> np.ndarray:
+    """
+    simple_mpc for many joints at once.
+    Results are cached, only unique combinations of limits and current values, that were not solved before, are solved.
+    Each of them is solved as its own qp, such that a result only depends on its own arguments and not on the other
+    cases of a batch. Solving them as one block diagonal qp would change them within the solver tolerance and isn't
+    faster for these small problems.
+    :return: one row per joint with the result of simple_mpc
+    """
+    cases = np.stack(np.broadcast_arrays(vel_limits, acc_limits, jerk_limits, current_vels, current_accs),
+                     axis=1).astype(float)
+    unique_cases, inverse = np.unique(cases, axis=0, return_inverse=True)
+    keys = [(*case, dt, ph, tuple(q_weight), tuple(lin_weight), solver_class) for case in unique_cases.tolist()]
+    # a batch can have more cases than the cache
+    results = {}
+    for key, (vel_limit, acc_limit, jerk_limit, current_vel, current_acc) in zip(keys, unique_cases):
+        if key in _simple_mpc_cache:
+            _simple_mpc_cache.move_to_end(key)
+            results[key] = _simple_mpc_cache[key]
+            continue
+        upper_limits = {
+            Derivatives.velocity: np.ones(ph) * vel_limit,
+            Derivatives.acceleration: np.ones(ph) * acc_limit,
+            Derivatives.jerk: np.ones(ph) * jerk_limit
+        }
+        lower_limits = {
+            Derivatives.velocity: np.ones(ph) * -vel_limit,
+            Derivatives.acceleration: np.ones(ph) * -acc_limit,
+            Derivatives.jerk: np.ones(ph) * -jerk_limit
+        }
+        results[key] = mpc(upper_limits, lower_limits,
+                           {Derivatives.velocity: current_vel,
+                            Derivatives.acceleration: current_acc},
+                           dt, ph, q_weight, lin_weight, solver_class=solver_class)
+        _simple_mpc_cache[key] = results[key]
+        if len(_simple_mpc_cache) > simple_mpc_cache_size:
+            _simple_mpc_cache.popitem(last=False)
+    return np.array([results[key] for key in keys])[inverse.reshape(-1)]
+
 
 def mpc_velocities(upper_limits: Dict[Derivatives, List[float]],
                    lower_limits: Dict[Derivatives, List[float]],
@@ -241,20 +277,15 @@ def derivative_link_model(dt, ph, max_derivative):
 
 
 def mpc_velocity_integral(limits: Dict[Derivatives, float], dt: float, ph: int) -> float:
-    upper_limits = {
-        Derivatives.velocity: np.ones(ph) * limits[Derivatives.velocity],
-        Derivatives.acceleration: np.ones(ph) * limits[Derivatives.acceleration],
-        Derivatives.jerk: np.ones(ph) * limits[Derivatives.jerk]
-    }
-    lower_limits = {
-        Derivatives.velocity: np.ones(ph) * -limits[Derivatives.velocity],
-        Derivatives.acceleration: np.ones(ph) * -limits[Derivatives.acceleration],
-        Derivatives.jerk: np.ones(ph) * -limits[Derivatives.jerk]
-    }
-    return np.sum(mpc_velocities(upper_limits, lower_limits,
-                                 {Derivatives.velocity: limits[Derivatives.velocity] + limits[
-                                     Derivatives.jerk] * dt ** 2,
-                                  Derivatives.acceleration: 0}, dt, ph)) * dt
+    return np.sum(simple_mpc(vel_limit=limits[Derivatives.velocity],
+                             acc_limit=limits[Derivatives.acceleration],
+                             jerk_limit=limits[Derivatives.jerk],
+                             current_vel=limits[Derivatives.velocity] + limits[Derivatives.jerk] * dt ** 2,
+                             current_acc=0,
+                             dt=dt,
+                             ph=ph,
+                             q_weight=(1, 1, 1),
+                             lin_weight=(0, 0, 0))) * dt
 
 
 def mpc_velocity_integral2(limits: Dict[Derivatives, float], dt: float, ph: int) -> float:
@@ -0,0 +1,227 @@
+import json
+import os
+from collections import defaultdict
+from functools import wraps
+from time import perf_counter
+from typing import Dict, Optional, Callable, Any
+
+import numpy as np
+
+from giskardpy.utils.singleton import SingletonMeta
+
+profile_environment_variable = 'GISKARDPY_PROFILE'
+
+
+class Histogram:
+    """
+    Timing histogram with fixed, logarithmic bins between 100ns and 10s, so memory doesn't grow with the number of
+    samples. Percentiles are approximated with the upper bin edges.
+    """
+    bin_edges = np.logspace(-7, 1, 81)
+
+    def __init__(self):
+        self.counts = np.zeros(len(self.bin_edges) + 1, dtype=int)
+        self.count = 0
+        self.total = 0.0
+        self.total_squared = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def add(self, duration: float):
+        self.counts[np.searchsorted(self.bin_edges, duration)] += 1
+        self.count += 1
+        self.total += duration
+        self.total_squared += duration * duration
+        if duration < self.min:
+            self.min = duration
+        if duration > self.max:
+            self.max = duration
+
+    def merge(self, other: 'Histogram'):
+        self.counts += other.counts
+        self.count += other.count
+        self.total += other.total
+        self.total_squared += other.total_squared
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def mean(self) -> float:
+        if self.count == 0:
+            return 0.0
+        return self.total / self.count
+
+    @property
+    def std(self) -> float:
+        if self.count == 0:
+            return 0.0
+        return float(np.sqrt(max(self.total_squared / self.count - self.mean ** 2, 0)))
+
+    def percentile(self, q: float) -> float:
+        """
+        :param q: in [0, 100]
+        """
+        if self.count == 0:
+            return 0.0
+        bin_id = int(np.searchsorted(np.cumsum(self.counts), q / 100 * self.count))
+        if bin_id >= len(self.bin_edges):
+            return self.max
+        return float(min(self.bin_edges[bin_id], self.max))
+
+    def to_dict(self) -> Dict[str, Any]:
+        used_bins = np.flatnonzero(self.counts)
+        return {'count': self.count,
+                'total': self.total,
+                'mean': self.mean,
+                'std': self.std,
+                'min': self.min if self.count > 0 else 0.0,
+                'max': self.max if self.count > 0 else 0.0,
+                'p50': self.percentile(50),
+                'p90': self.percentile(90),
+                'p99': self.percentile(99),
+                # upper bin edge -> number of samples, the last bin has no upper edge
+                'histogram': {('inf' if i == len(self.bin_edges) else f'{self.bin_edges[i]:.3g}'): int(self.counts[i])
+                              for i in used_bins}}
+
+    def __str__(self):
+        return f'{self.count} samples, mean {self.mean * 1000:.3f}ms, std {self.std * 1000:.3f}ms, ' \
+               f'p99 {self.percentile(99) * 1000:.3f}ms'
+
+    def __repr__(self):
+        return str(self)
+
+
+class _NullSection:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+_null_section = _NullSection()
+
+
+class _Section:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.histogram.add(perf_counter() - self.start)
+
+
+class Profiler(metaclass=SingletonMeta):
+    """
+    Collects timing histograms of named sections, e.g. 'phase/solver_call' or 'behavior/<name>/update'.
+    Disabled by default, when disabled, sections cost one attribute lookup.
+    With sample_rate n, only every n-th call of a section is timed.
+    """
+
+    def __init__(self):
+        self.enabled = profile_environment_variable in os.environ
+        self.sample_rate = 1
+        self.dump_folder: Optional[str] = None
+        self.number_of_dumps = 0
+        self.reset()
+
+    def configure(self, enabled: bool = True, sample_rate: int = 1, dump_folder: Optional[str] = None):
+        """
+        :param sample_rate: only every sample_rate-th call of a section is timed
+        :param dump_folder: histograms are saved here at the end of every goal, None to disable
+        """
+        self.enabled = enabled
+        self.sample_rate = max(int(sample_rate), 1)
+        self.dump_folder = dump_folder
+
+    def reset(self):
+        self.histograms: Dict[str, Histogram] = defaultdict(Histogram)
+        self._calls: Dict[str, int] = defaultdict(int)
+
+    def section(self, name: str):
+        """
+        Times the with block:
+            with Profiler().section('phase/fk'):
+                ...
+        """
+        if not self.enabled:
+            return _null_section
+        if self.sample_rate > 1:
+            self._calls[name] += 1
+            if self._calls[name] % self.sample_rate != 0:
+                return _null_section
+        return _Section(self.histograms[name])
+
+    def record(self, name: str, duration: float):
+        """
+        Adds a duration that was measured elsewhere, sampling is up to the caller.
+        """
+        if self.enabled:
+            self.histograms[name].add(duration)
+
+    def timed(self, name: Optional[str] = None) -> Callable[[Callable], Callable]:
+        """
+        Decorator that times every call of a function in a section, called like the function, if name is None.
+        """
+
+        def decorator(function: Callable) -> Callable:
+            section_name = name or f'{function.__module__}.{function.__qualname__}'
+
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.section(section_name):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def query(self, prefix: str = '') -> Dict[str, Dict[str, Any]]:
+        """
+        :return: summary of all histograms whose name starts with prefix
+        """
+        return {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())
+                if name.startswith(prefix)}
+
+    def dump(self, file_name: Optional[str] = None) -> Optional[str]:
+        """
+        Saves all histograms as json.
+        :param file_name: default is profile_<number of dumps>.json in dump_folder
+        :return: the file name, None if there was nothing to save
+        """
+        if file_name is None:
+            if self.dump_folder is None:
+                return None
+            file_name = os.path.join(self.dump_folder, f'profile_{self.number_of_dumps:04}.json')
+        os.makedirs(os.path.dirname(os.path.abspath(file_name)), exist_ok=True)
+        with open(file_name, 'w') as f:
+            json.dump({'sample_rate': self.sample_rate, 'sections': self.query()}, f, indent=2)
+        self.number_of_dumps += 1
+        return file_name
+
+    def end_goal(self) -> Optional[str]:
+        """
+        Dumps the histograms of the current goal, if enabled and dump_folder is set, and starts new ones.
+        """
+        if not self.enabled or self.dump_folder is None or len(self.histograms) == 0:
+            return None
+        file_name = self.dump()
+        self.reset()
+        return file_name
+
+
+def profile(function: Callable) -> Callable:
+    """
+    Replacement for line_profiler's @profile, that times every call in a section named after the function.
+    Only installed as builtins.profile, if GISKARDPY_PROFILE is set when giskardpy is imported, otherwise @profile is
+    a pass-through and costs nothing.
+    """
+    return Profiler().timed()(function)
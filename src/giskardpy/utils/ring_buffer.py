@@ -0,0 +1,100 @@
+from typing import Optional
+
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Preallocated array with capacity rows of a fixed width. Appending overwrites the oldest row, once it is full.
+    """
+
+    def __init__(self, capacity: int, width: int):
+        self.capacity = capacity
+        self.data = np.zeros((capacity, width))
+        self.index = 0
+        self.size = 0
+
+    def clear(self):
+        self.index = 0
+        self.size = 0
+
+    @property
+    def full(self) -> bool:
+        return self.size == self.capacity
+
+    @property
+    def oldest(self) -> np.ndarray:
+        """
+        View of the oldest row, it is overwritten by the next append, if the buffer is full.
+        """
+        if self.full:
+            return self.data[self.index]
+        return self.data[0]
+
+    @property
+    def newest(self) -> np.ndarray:
+        return self.data[self.index - 1]
+
+    def append(self, row: np.ndarray):
+        self.data[self.index] = row
+        self.index += 1
+        if self.index == self.capacity:
+            self.index = 0
+        if self.size < self.capacity:
+            self.size += 1
+
+    def ordered(self, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        :return: the rows from oldest to newest
+        """
+        if not self.full:
+            rows = self.data[:self.size]
+            if out is None:
+                return rows.copy()
+            out[:] = rows
+            return out
+        if out is None:
+            out = np.empty_like(self.data)
+        tail = self.capacity - self.index
+        out[:tail] = self.data[self.index:]
+        out[tail:] = self.data[:self.index]
+        return out
+
+
+class SlidingDFT:
+    """
+    The bins of np.fft.rfft over the last window_size samples of width signals.
+    Each new sample updates all bins in O(width * bins) without recomputing the transform.
+    The spectrum is recomputed from the window every resync_interval samples, to remove accumulated rounding errors.
+    """
+
+    def __init__(self, window_size: int, width: int, resync_interval: Optional[int] = None):
+        self.window_size = window_size
+        self.num_bins = window_size // 2 + 1
+        self.spectrum = np.zeros((width, self.num_bins), dtype=complex)
+        self.twiddle = np.exp(2j * np.pi * np.arange(self.num_bins) / window_size)
+        self._delta = np.zeros(width)
+        if resync_interval is None:
+            resync_interval = window_size
+        self.resync_interval = resync_interval
+        self.samples_since_resync = 0
+
+    def reset(self, window: np.ndarray):
+        """
+        :param window: shape (window_size, width), oldest sample first
+        """
+        self.spectrum[:] = np.fft.rfft(window, axis=0).T
+        self.samples_since_resync = 0
+
+    @property
+    def needs_resync(self) -> bool:
+        return self.samples_since_resync >= self.resync_interval
+
+    def slide(self, oldest: np.ndarray, newest: np.ndarray):
+        """
+        Removes oldest from the window and adds newest.
+        """
+        np.subtract(newest, oldest, out=self._delta)
+        self.spectrum += self._delta[:, None]
+        self.spectrum *= self.twiddle
+        self.samples_since_resync += 1
@@ -1,21 +1,22 @@
 from collections import defaultdict
-from typing import Dict, Tuple, List
-
-import numpy as np
+from typing import Dict, Tuple, Optional
 
 from giskardpy import identifier
 from giskardpy.god_map import GodMap
+from giskardpy.utils.profiling import Histogram, Profiler
 
 
 class TimeCollector:
-    qp_solver_times: Dict[Tuple[str, int, int], List[float]] = defaultdict(list)
+    qp_solver_times: Dict[Tuple[str, int, int], Histogram] = defaultdict(Histogram)
     separator = ';'
 
     def __init__(self):
         self.god_map = GodMap()
+        self.profiler = Profiler()
 
     def add_qp_solve_time(self, class_name, number_variables, number_constraints, time):
-        self.qp_solver_times[class_name, number_variables, number_constraints].append(time)
+        self.qp_solver_times[class_name, number_variables, number_constraints].add(time)
+        self.profiler.record(f'qp_solver/{class_name}', time)
 
     def print_qp_solver_times(self):
         print('solver, variables, constraints, avg, std, samples')
@@ -23,11 +24,25 @@ class TimeCollector:
             print(self.separator.join([str(dims[0].split(".")[1]),
                                        str(dims[1]),
                                        str(dims[2]),
-                                       str(np.average(times)),
-                                       str(np.std(times)),
-                                       str(times)]))
+                                       str(times.mean),
+                                       str(times.std),
+                                       str(times.count)]))
+
+    def print_profiler_sections(self, filter: Optional[str] = None):
+        print('section, samples, avg, std, p50, p99, max')
+        for name, summary in self.profiler.query(filter or '').items():
+            print(self.separator.join([name,
+                                       str(summary['count']),
+                                       str(summary['mean']),
+                                       str(summary['std']),
+                                       str(summary['p50']),
+                                       str(summary['p99']),
+                                       str(summary['max'])]))
 
     def pretty_print(self, filter=None):
         print('-------------------------------------------------')
         self.print_qp_solver_times()
         print('-------------------------------------------------')
+        if self.profiler.enabled:
+            self.print_profiler_sections(filter)
+            print('-------------------------------------------------')
@@ -4,7 +4,10 @@ import hashlib
 # fails on github actions
 import urdf_parser_py.urdf as up
 
+import ast
 import errno
+import importlib
+import importlib.util
 import inspect
 import json
 import os
@@ -13,7 +16,7 @@ import sys
 from collections import OrderedDict
 from contextlib import contextmanager
 from functools import cached_property
-from typing import Type, Optional, Dict, Any
+from typing import Type, Optional, Dict, Any, Iterable, Iterator, List, Tuple
 
 import numpy as np
 import roslaunch
@@ -91,6 +94,102 @@ def get_all_classes_in_package(package_name: str, parent_class: Optional[Type] =
     return classes
 
 
+class LazyClassRegistry:
+    """
+    Like get_all_classes_in_package, but only parses the source files of the packages to find the names of
+    subclasses of parent_class. A module is imported when one of its classes is requested for the first time.
+    """
+
+    def __init__(self, parent_class: Type, package_names: Iterable[str] = ()):
+        self.parent_class = parent_class
+        # class name -> (module name, names of base classes)
+        self._definitions: Dict[str, Tuple[str, List[str]]] = {}
+        self._class_names: Dict[str, str] = {}
+        self._classes: Dict[str, Type] = {}
+        self.package_names: List[str] = []
+        for package_name in package_names:
+            self.add_package(package_name)
+
+    def add_package(self, package_name: str) -> List[str]:
+        """
+        :param package_name: e.g. giskardpy.goals
+        :return: names of the subclasses of parent_class that were found in the package
+        """
+        if package_name in self.package_names:
+            return [name for name, module_name in self._class_names.items()
+                    if module_name.startswith(f'{package_name}.')]
+        spec = importlib.util.find_spec(package_name)
+        if spec is None or spec.submodule_search_locations is None:
+            raise ImportError(f'\'{package_name}\' is not a package.')
+        self.package_names.append(package_name)
+        for module_info in pkgutil.iter_modules(spec.submodule_search_locations):
+            if module_info.ispkg:
+                continue
+            module_name = f'{package_name}.{module_info.name}'
+            file_name = os.path.join(module_info.module_finder.path, f'{module_info.name}.py')
+            try:
+                with open(file_name, 'r') as f:
+                    tree = ast.parse(f.read(), file_name)
+            except (OSError, SyntaxError, ValueError, AttributeError):
+                logging.loginfo(f'Failed to parse {module_name}')
+                continue
+            for node in tree.body:
+                if isinstance(node, ast.ClassDef):
+                    self._definitions.setdefault(node.name, (module_name, [self._base_name(b) for b in node.bases]))
+        old_names = set(self._class_names)
+        self._update_class_names()
+        return [name for name in self._class_names if name not in old_names]
+
+    @staticmethod
+    def _base_name(node: ast.expr) -> str:
+        if isinstance(node, ast.Name):
+            return node.id
+        if isinstance(node, ast.Attribute):
+            return node.attr
+        if isinstance(node, ast.Subscript):
+            return LazyClassRegistry._base_name(node.value)
+        return ''
+
+    def _update_class_names(self):
+        """
+        Base classes are only known by name, a class counts as subclass, if one of its bases is parent_class or one
+        of the classes that were found before.
+        """
+        subclass_names = {self.parent_class.__name__}
+        changed = True
+        while changed:
+            changed = False
+            for name, (_, bases) in self._definitions.items():
+                if name not in subclass_names and subclass_names.intersection(bases):
+                    subclass_names.add(name)
+                    changed = True
+        self._class_names = {name: module_name for name, (module_name, _) in self._definitions.items()
+                             if name in subclass_names}
+
+    def __getitem__(self, class_name: str) -> Type:
+        if class_name not in self._classes:
+            if class_name not in self._class_names:
+                raise KeyError(class_name)
+            module = importlib.import_module(self._class_names[class_name])
+            cls = getattr(module, class_name, None)
+            if not (inspect.isclass(cls) and issubclass(cls, self.parent_class)):
+                raise KeyError(class_name)
+            self._classes[class_name] = cls
+        return self._classes[class_name]
+
+    def __contains__(self, class_name: str) -> bool:
+        return class_name in self._class_names
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._class_names)
+
+    def __len__(self) -> int:
+        return len(self._class_names)
+
+    def keys(self) -> List[str]:
+        return list(self._class_names)
+
+
 def limits_from_urdf_joint(urdf_joint):
     lower_limits = {}
     upper_limits = {}
@@ -419,7 +518,7 @@ def trajectory_to_np(tj, joint_names):
     :type tj: Trajectory
     :return:
     """
-    names = list(sorted([i for i in tj._points[0.0].keys() if i in joint_names]))
+    names = list(sorted([i for i in tj.get_exact(0).keys() if i in joint_names]))
     position = []
     velocity = []
     times = []
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from giskardpy.data_types import JointStates
+from giskardpy.model.trajectory import Trajectory, plot_trajectory_arrays
+from giskardpy.my_types import Derivatives
+from giskardpy.utils.background_worker import BackgroundWorker
+
+
+def add(a, b):
+    return a + b
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+def exit_once(marker_file: str) -> str:
+    """
+    Kills the worker process during the first call.
+    """
+    if not os.path.exists(marker_file):
+        open(marker_file, 'w').close()
+        os._exit(1)
+    return 'recovered'
+
+
+class TestBackgroundWorker(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        BackgroundWorker().shutdown()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_submit(self):
+        future = BackgroundWorker().submit('failed to add', add, 1, b=2)
+        self.assertEqual(future.result(timeout=60), 3)
+        self.assertTrue(future.done())
+        future = BackgroundWorker().submit('failed as expected', fail, 'muh')
+        with self.assertRaises(ValueError):
+            future.result(timeout=60)
+
+    def test_plot(self):
+        trajectory = Trajectory()
+        for time in range(20):
+            point = JointStates()
+            point['joint'].position = np.sin(time / 5)
+            point['joint'].velocity = np.cos(time / 5)
+            trajectory.set(time, point)
+        future = BackgroundWorker().submit('failed to plot', plot_trajectory_arrays, *trajectory.to_arrays(),
+                                           path_to_data_folder=self.tmp_dir + '/',
+                                           sample_period=0.05,
+                                           max_derivative=Derivatives.jerk)
+        future.result(timeout=60)
+        self.assertTrue(os.path.isfile(os.path.join(self.tmp_dir, 'trajectory.pdf')))
+
+    def test_restart_after_worker_died(self):
+        marker_file = os.path.join(self.tmp_dir, 'exited')
+        future = BackgroundWorker().submit('worker died', exit_once, marker_file)
+        self.assertEqual(future.result(timeout=60), 'recovered')
+        self.assertTrue(os.path.isfile(marker_file))
+        self.assertEqual(BackgroundWorker().submit('failed to add', add, 1, 2).result(timeout=60), 3)
+
+    def test_worker_dies_every_time(self):
+        # the job is only submitted once more, after that the future fails
+        future = BackgroundWorker().submit('worker died', os._exit, 1)
+        with self.assertRaises(BrokenProcessPool):
+            future.result(timeout=60)
+        self.assertEqual(BackgroundWorker().submit('failed to add', add, 1, 2).result(timeout=60), 3)
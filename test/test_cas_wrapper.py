@@ -1,4 +1,6 @@
 import math
+import pickle
+import tempfile
 import unittest
 from copy import deepcopy
 from datetime import timedelta
@@ -17,6 +19,8 @@ from giskardpy import casadi_wrapper as w
 from giskardpy.qp import pos_in_vel_limits as cas2
 import giskardpy.utils.math as giskard_math
 from giskardpy.my_types import Derivatives
+from giskardpy.utils import codegen
+from giskardpy.utils.decorators import view_memoize
 from giskardpy.utils.math import compare_orientations, axis_angle_from_quaternion, rotation_matrix_from_quaternion
 from utils_for_tests import float_no_nan_no_inf, unit_vector, quaternion, vector, \
     pykdl_frame_to_numpy, lists_of_same_length, random_angle, compare_axis_angle, angle_positive, sq_matrix, \
@@ -108,6 +112,22 @@ class TestExpression(unittest.TestCase):
         expected = e_np[filter_]
         np.testing.assert_array_almost_equal(actual, expected)
 
+    def test_pickle_compiled_function(self):
+        a = w.Symbol('a')
+        b = w.Symbol('b')
+        e = w.Expression([[a * b, 0], [0, w.sin(a)]])
+        args = np.array([1., 2.])
+        for sparse in [True, False]:
+            f = e.compile(sparse=sparse)
+            expected = deepcopy(f.fast_call(args))
+            f2 = pickle.loads(pickle.dumps(f))
+            actual = f2.fast_call(args)
+            if sparse:
+                actual = actual.toarray()
+                expected = expected.toarray()
+            assert f2.str_params == f.str_params
+            np.testing.assert_array_almost_equal(actual, expected)
+
     @given(float_no_nan_no_inf(), float_no_nan_no_inf())
     def test_add(self, f1, f2):
         expected = f1 + f2
@@ -619,6 +639,83 @@ class TestCASWrapper(unittest.TestCase):
         np.testing.assert_array_almost_equal(f(), expected)
         np.testing.assert_array_almost_equal(f.fast_call(np.array([])), expected)
 
+    def test_code_generation(self):
+        if codegen.find_compiler() is None:
+            self.skipTest('no C compiler found')
+        a, b = w.Symbol('a'), w.Symbol('b')
+        # compiling a sparse function modifies the expression
+        expression = lambda: w.Expression([[w.sin(a) * b, 0, 1],
+                                           [a ** 2, w.cos(b), a + b]])
+        args = np.array([0.3, -1.2])
+        old_cache_dir = codegen.cache_dir
+        with tempfile.TemporaryDirectory() as cache_dir:
+            codegen.cache_dir = cache_dir
+            try:
+                for sparse in [False, True]:
+                    f = expression().compile(parameters=[a, b], sparse=sparse)
+                    with codegen.code_generation():
+                        f_c = expression().compile(parameters=[a, b], sparse=sparse)
+                    self.assertIsNot(f_c.compiled_f, f_c.expression_f)
+                    expected = f.fast_call(args)
+                    actual = f_c.fast_call(args)
+                    if sparse:
+                        expected, actual = expected.toarray(), actual.toarray()
+                    np.testing.assert_array_almost_equal(actual, expected)
+                    f_c2 = pickle.loads(pickle.dumps(f_c))
+                    actual = f_c2.fast_call(args)
+                    if sparse:
+                        actual = actual.toarray()
+                    np.testing.assert_array_almost_equal(actual, expected)
+            finally:
+                codegen.cache_dir = old_cache_dir
+
+    def test_sparse_constant_and_parametric_nonzeros(self):
+        a, b = w.Symbol('a'), w.Symbol('b')
+        # compiling a sparse function modifies the expression
+        expression = lambda: w.Expression([[a * b, 0, 1, w.sin(a)],
+                                           [2.5, b, 0, w.cos(0.3)],
+                                           [0, a + b, -1, 0]])
+        sparse_f = expression().compile(parameters=[a, b], sparse=True)
+        dense_f = expression().compile(parameters=[a, b], sparse=False)
+        self.assertEqual(len(sparse_f.parametric_indices), 4)
+        self.assertEqual(len(sparse_f.constant_data), 8)
+        for args in [[0.3, -1.2], [0., 0.], [2., 0.], [-0.7, 5.]]:
+            args = np.array(args)
+            actual = sparse_f.fast_call(args)
+            np.testing.assert_array_almost_equal(actual.toarray(), dense_f.fast_call(args))
+            np.testing.assert_array_almost_equal(sparse_f(a=args[0], b=args[1]).toarray(), dense_f.fast_call(args))
+        # the sparsity stays the same, even if parametric nonzeros evaluate to 0
+        self.assertEqual(sparse_f.fast_call(np.array([0., 0.])).nnz, 8)
+
+    def test_view(self):
+        a = w.Symbol('a')
+        m = w.TransMatrix.from_xyz_rpy(x=a, yaw=a)
+        v = m.view()
+        self.assertIs(v.s, m.s)
+        v[0, 3] = 23
+        self.assertIsNot(v.s, m.s)
+        args = np.array([0.5])
+        np.testing.assert_array_almost_equal(m.compile().fast_call(args),
+                                             w.TransMatrix.from_xyz_rpy(x=a, yaw=a).compile().fast_call(args))
+        self.assertEqual(v.compile().fast_call(args)[0, 3], 23)
+        m[1, 3] = 5
+        self.assertEqual(v.compile().fast_call(args)[1, 3], 0)
+
+    def test_view_memoize(self):
+        calls = []
+
+        @view_memoize
+        def f(x):
+            calls.append(x)
+            return w.Expression([x, 2 * x])
+
+        e1 = f(1.)
+        e1[0] = 23
+        e2 = f(1.)
+        self.assertEqual(calls, [1.])
+        np.testing.assert_array_equal(e1.evaluate().reshape(-1), [23, 2])
+        np.testing.assert_array_equal(e2.evaluate().reshape(-1), [1, 2])
+
     def test_add(self):
         s2 = 'muh'
         f = 1.0
@@ -0,0 +1,67 @@
+import unittest
+
+import numpy as np
+
+from giskardpy.model.collision_world_syncer import CollisionBuffer, Collision, SortedCollisionResults
+from giskardpy.my_types import PrefixName
+
+
+class TestCollisionBuffer(unittest.TestCase):
+    def test_release_removed_links(self):
+        buffer = CollisionBuffer(collision_list_size=3)
+        robot_links = [PrefixName(f'link{i}', 'robot') for i in range(3)]
+        for i in range(10):
+            box = PrefixName('box', f'box{i}')
+            layout_version = buffer.layout_version
+            buffer.slot(buffer.external, robot_links[0])
+            buffer.slot(buffer.self_, (robot_links[1], robot_links[2]))
+            box_slot = buffer.slot(buffer.self_, (robot_links[1], box))
+            buffer.slot(buffer.long_key, (robot_links[0], box))
+            buffer.link_id(robot_links[0])
+            buffer.link_id(box)
+            buffer.data['contact_distance'][box_slot] = 0.1
+            buffer.release_removed_links(set(robot_links))
+            self.assertGreater(buffer.layout_version, layout_version)
+            self.assertEqual(buffer.data['contact_distance'][box_slot], buffer.default_row['contact_distance'])
+            self.assertNotIn((robot_links[1], box), buffer.slots[buffer.self_])
+            self.assertNotIn(box, buffer.link_ids)
+        # the slots and ids of the deleted boxes are reused
+        self.assertEqual(buffer.number_of_rows, 3 * 3 + 1)
+        self.assertEqual(len(buffer.link_names), 2)
+        self.assertIn(robot_links[0], buffer.slots[buffer.external])
+        self.assertIn((robot_links[1], robot_links[2]), buffer.slots[buffer.self_])
+
+    def test_release_nothing(self):
+        buffer = CollisionBuffer(collision_list_size=3)
+        robot_links = [PrefixName(f'link{i}', 'robot') for i in range(2)]
+        buffer.slot(buffer.self_, tuple(robot_links))
+        layout_version = buffer.layout_version
+        buffer.release_removed_links(set(robot_links))
+        self.assertEqual(buffer.layout_version, layout_version)
+
+
+class TestSortedCollisionResults(unittest.TestCase):
+    def test_keeps_closest(self):
+        rng = np.random.default_rng(23)
+        for max_size in [1, 5, 20, 100, None]:
+            # rounded, such that some distances are equal
+            distances = np.round(rng.uniform(-0.1, 0.5, 60), 2)
+            collisions = [Collision(f'a{i}', f'b{i}', distance) for i, distance in enumerate(distances)]
+            results = SortedCollisionResults(max_size)
+            for collision in collisions:
+                results.add(collision)
+            expected = sorted(collisions, key=lambda c: c.contact_distance)[:max_size]
+            self.assertEqual(len(results), len(expected))
+            for i, collision in enumerate(expected):
+                self.assertIs(results[i], collision)
+            self.assertIs(results[len(expected)], SortedCollisionResults.default_result)
+
+    def test_add_return_value(self):
+        results = SortedCollisionResults(2)
+        self.assertTrue(results.add(Collision('a', 'b', 0.3)))
+        self.assertTrue(results.add(Collision('a', 'c', 0.1)))
+        self.assertFalse(results.add(Collision('a', 'd', 0.4)))
+        # equal distances keep the insertion order, therefore the new one is not kept
+        self.assertFalse(results.add(Collision('a', 'e', 0.3)))
+        self.assertTrue(results.add(Collision('a', 'f', 0.2)))
+        self.assertEqual([c.link_b for c in results.data], ['c', 'f'])
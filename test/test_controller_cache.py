@@ -0,0 +1,237 @@
+import hashlib
+import threading
+import unittest
+
+import numpy as np
+
+import giskardpy.casadi_wrapper as cas
+from giskardpy import identifier
+from giskardpy.configs.qp_controller_config import QPControllerConfig
+from giskardpy.god_map import GodMap
+from giskardpy.my_types import Derivatives, PrefixName
+from giskardpy.qp.constraint import EqualityConstraint, InequalityConstraint, DerivativeInequalityConstraint
+from giskardpy.qp.controller_cache import ControllerCache, ConstraintBlockCache, _hash_thing
+from giskardpy.qp.free_variable import FreeVariable
+from giskardpy.qp.qp_controller import EqualityModel, InequalityModel
+
+
+def hash_thing(thing) -> str:
+    h = hashlib.sha256()
+    _hash_thing(h, thing)
+    return h.hexdigest()
+
+
+class TestControllerCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = ControllerCache()
+        self.cache.configure(max_size=10)
+        self.cache.clear()
+        self.cache.reset_stats()
+
+    def test_hash_thing(self):
+        a = cas.Symbol('a')
+        thing = [PrefixName('joint', 'robot'), Derivatives.velocity, 1, 1.0, np.float64(0.5), None, 'muh',
+                 {'b': True}, a * 2, np.arange(3)]
+        self.assertEqual(hash_thing(thing), hash_thing(thing))
+        self.assertEqual(hash_thing(np.float64(0.5)), hash_thing(0.5))
+        self.assertNotEqual(hash_thing(1), hash_thing(1.0))
+        self.assertNotEqual(hash_thing(1), hash_thing('1'))
+        self.assertNotEqual(hash_thing(a * 2), hash_thing(a * 3))
+
+    def test_hash_thing_rejects_unknown_types(self):
+        with self.assertRaises(TypeError):
+            hash_thing(object())
+        with self.assertRaises(TypeError):
+            hash_thing([1, threading.Lock()])
+
+    def test_put_unpicklable(self):
+        self.cache.put('muh', threading.Lock())
+        self.assertEqual(len(self.cache), 0)
+        self.assertIsNone(self.cache.get('muh'))
+
+
+class TestConstraintBlockCache(unittest.TestCase):
+    def setUp(self):
+        qp_controller_config = QPControllerConfig(prediction_horizon=7)
+        qp_controller_config.set_defaults()
+        GodMap().set_data(identifier.giskard, {'qp_controller_config': qp_controller_config})
+        self.cache = ConstraintBlockCache()
+        self.cache.configure(max_size=100)
+        self.cache.clear()
+        self.cache.reset_stats()
+
+    def assert_expressions_equal(self, actual: cas.Expression, expected: cas.Expression):
+        self.assertEqual(actual.shape, expected.shape)
+        parameters = sorted(set(actual.free_symbols()) | set(expected.free_symbols()), key=str)
+        args = np.random.default_rng(23).uniform(-1, 1, len(parameters))
+        np.testing.assert_array_almost_equal(actual.compile(parameters).fast_call(args),
+                                             expected.compile(parameters).fast_call(args))
+
+    def test_constraint_jacobian(self):
+        a, b, c = cas.Symbol('a'), cas.Symbol('b'), cas.Symbol('c')
+        symbols = {'a': a, 'b': b}
+        expression = cas.sin(a) * b + c
+        for i in range(2):
+            blocks = dict(self.cache.constraint_jacobian(expression, symbols, 0.05))
+            self.assertEqual(set(blocks), {'a', 'b'})
+            self.assert_expressions_equal(cas.Expression(blocks['a']), cas.cos(a) * b * 0.05)
+            self.assert_expressions_equal(cas.Expression(blocks['b']), cas.sin(a) * 0.05)
+        self.assertEqual(self.cache.stats(), {'hits': 1, 'misses': 1, 'entries': 1})
+        self.assertEqual(self.cache.constraint_jacobian(c * 2, symbols, 0.05), [])
+
+    def test_incremental_models(self):
+        free_variables = [FreeVariable(PrefixName(f'joint{i}', 'robot'),
+                                       lower_limits={Derivatives.velocity: -1},
+                                       upper_limits={Derivatives.velocity: 1},
+                                       quadratic_weights={Derivatives.velocity: 0.01,
+                                                          Derivatives.acceleration: 0,
+                                                          Derivatives.jerk: 0.01})
+                          for i in range(3)]
+        q = [v.get_symbol(Derivatives.position) for v in free_variables]
+        goal = cas.Symbol('goal')
+        equality_constraints = [EqualityConstraint(name='eq0', expression=cas.sin(q[0]) * q[1] + goal,
+                                                   derivative_goal=0.1, velocity_limit=1, quadratic_weight=1,
+                                                   control_horizon=5),
+                                EqualityConstraint(name='eq1', expression=q[2] * 2,
+                                                   derivative_goal=0.1, velocity_limit=1, quadratic_weight=1,
+                                                   control_horizon=3)]
+        inequality_constraints = [InequalityConstraint(name='ineq0', expression=q[0] * q[2],
+                                                       lower_error=-0.1, upper_error=0.1, velocity_limit=1,
+                                                       quadratic_weight=1, control_horizon=5),
+                                  InequalityConstraint(name='ineq1', expression=goal * 2,
+                                                       lower_error=-0.1, upper_error=0.1, velocity_limit=1,
+                                                       quadratic_weight=1, control_horizon=5)]
+        kwargs = dict(free_variables=free_variables,
+                      equality_constraints=equality_constraints,
+                      inequality_constraints=inequality_constraints,
+                      derivative_constraints=[],
+                      sample_period=0.05,
+                      prediction_horizon=7,
+                      max_derivative=Derivatives.jerk)
+        for model_class in [EqualityModel, InequalityModel]:
+            plain_model = model_class(**kwargs)
+            incremental_model = model_class(**kwargs)
+            incremental_model.block_cache = self.cache
+            # the second time, the blocks come from the cache
+            for i in range(2):
+                for actual, expected in zip(incremental_model.construct_expression(),
+                                            plain_model.construct_expression()):
+                    self.assert_expressions_equal(actual, expected)
+        self.assertGreater(self.cache.hits, 0)
+
+
+class TestSparseConstraintModels(unittest.TestCase):
+    """
+    Compares the constraint models, that are assembled from sparse triplets, with a dense assembly.
+    """
+    prediction_horizon = 7
+    dt = 0.05
+
+    def setUp(self):
+        qp_controller_config = QPControllerConfig(prediction_horizon=self.prediction_horizon)
+        qp_controller_config.set_defaults()
+        GodMap().set_data(identifier.giskard, {'qp_controller_config': qp_controller_config})
+        self.free_variables = [FreeVariable(PrefixName(f'joint{i}', 'robot'),
+                                            lower_limits={Derivatives.velocity: -1},
+                                            upper_limits={Derivatives.velocity: 1},
+                                            quadratic_weights={Derivatives.velocity: 0.01,
+                                                               Derivatives.acceleration: 0,
+                                                               Derivatives.jerk: 0.01})
+                               for i in range(3)]
+        q = [v.get_symbol(Derivatives.position) for v in self.free_variables]
+        qd = [v.get_symbol(Derivatives.velocity) for v in self.free_variables]
+        equality_constraints = [EqualityConstraint(name='eq0', expression=cas.sin(q[0]) * q[1],
+                                                   derivative_goal=0.1, velocity_limit=1, quadratic_weight=1,
+                                                   control_horizon=5),
+                                EqualityConstraint(name='eq1', expression=q[2] * 2,
+                                                   derivative_goal=0.1, velocity_limit=1, quadratic_weight=1,
+                                                   control_horizon=3)]
+        derivative_constraints = [DerivativeInequalityConstraint(name='vel0', derivative=Derivatives.velocity,
+                                                                 expression=q[0] * q[2] + qd[1],
+                                                                 lower_limit=-1, upper_limit=1, quadratic_weight=1,
+                                                                 normalization_factor=None, lower_slack_limit=-1,
+                                                                 upper_slack_limit=1, control_horizon=5),
+                                  DerivativeInequalityConstraint(name='vel1', derivative=Derivatives.velocity,
+                                                                 expression=cas.cos(q[1]),
+                                                                 lower_limit=-1, upper_limit=1, quadratic_weight=1,
+                                                                 normalization_factor=None, lower_slack_limit=-1,
+                                                                 upper_slack_limit=1, control_horizon=2)]
+        self.kwargs = dict(free_variables=self.free_variables,
+                           equality_constraints=equality_constraints,
+                           inequality_constraints=[],
+                           derivative_constraints=derivative_constraints,
+                           sample_period=self.dt,
+                           prediction_horizon=self.prediction_horizon,
+                           max_derivative=Derivatives.jerk)
+        self.parameters = sorted({s for v in self.free_variables
+                                  for s in [v.get_symbol(Derivatives.position), v.get_symbol(Derivatives.velocity)]},
+                                 key=str)
+        self.args = np.random.default_rng(23).uniform(-1, 1, len(self.parameters))
+
+    def evaluate(self, expression: cas.Expression) -> np.ndarray:
+        return np.array(expression.compile(self.parameters).fast_call(self.args), ndmin=2)
+
+    def jacobians(self, model, expressions: cas.Expression):
+        return {derivative: self.evaluate(cas.jacobian(expressions=expressions,
+                                                       symbols=model.get_free_variable_symbols(derivative)) * self.dt)
+                for derivative in Derivatives.range(Derivatives.position, model.max_derivative - 1)}
+
+    def test_derivative_link_model(self):
+        model = EqualityModel(**self.kwargs)
+        n = len(self.free_variables)
+        ph = self.prediction_horizon
+        max_derivative = model.max_derivative
+        num_rows = n * ph * (max_derivative - 1)
+        expected = np.zeros((num_rows, n * ph * max_derivative))
+        expected[:, :num_rows] += np.eye(num_rows)
+        expected[:, n * ph:] -= np.eye(num_rows) * self.dt
+        x_c_height = n * (ph - 1)
+        offset_v = 0
+        offset_h = 0
+        for derivative in Derivatives.range(Derivatives.velocity, max_derivative - 1):
+            offset_v += n
+            expected[offset_v:offset_v + x_c_height, offset_h:offset_h + x_c_height] -= np.eye(x_c_height)
+            offset_v += x_c_height
+            offset_h += ph * n
+        rows_to_delete = []
+        end = 0
+        for derivative in Derivatives.range(Derivatives.velocity, max_derivative - 1):
+            last_non_zero_variable = ph - (max_derivative - derivative - 1)
+            start = end + n * last_non_zero_variable
+            end += n * ph
+            rows_to_delete.extend(range(start, end))
+        expected = np.delete(expected, rows_to_delete, axis=0)
+        np.testing.assert_array_almost_equal(model.derivative_link_model_csc().toarray(), expected)
+        np.testing.assert_array_almost_equal(self.evaluate(model.derivative_link_model()), expected)
+
+    def test_equality_constraint_model(self):
+        model = EqualityModel(**self.kwargs)
+        n = len(self.free_variables)
+        ph = self.prediction_horizon
+        control_horizons = [5, 3]
+        expected = np.zeros((len(control_horizons), model.number_of_non_slack_columns))
+        expressions = cas.Expression(model.equality_constraint_expressions())
+        for derivative, jacobian in self.jacobians(model, expressions).items():
+            block = np.hstack([jacobian] * ph)
+            for i, control_horizon in enumerate(control_horizons):
+                block[i, control_horizon * n:] = 0
+            expected[:, n * ph * derivative:n * ph * (derivative + 1)] = block
+        actual, _ = model.equality_constraint_model()
+        np.testing.assert_array_almost_equal(self.evaluate(actual), expected)
+
+    def test_velocity_constraint_model(self):
+        model = InequalityModel(**self.kwargs)
+        n = len(self.free_variables)
+        ph = self.prediction_horizon
+        control_horizons = [5, 2]
+        expressions = cas.Expression(model.get_derivative_constraint_expressions(Derivatives.velocity))
+        expected = np.zeros((len(control_horizons) * ph, model.number_of_non_slack_columns))
+        for derivative, jacobian in self.jacobians(model, expressions).items():
+            expected[:, n * ph * derivative:n * ph * (derivative + 1)] = np.kron(np.eye(ph), jacobian)
+        rows_to_delete = [i + t * len(control_horizons)
+                          for t in range(ph)
+                          for i, control_horizon in enumerate(control_horizons)
+                          if t + 1 > control_horizon]
+        expected = np.delete(expected, rows_to_delete, axis=0)
+        actual, _ = model.velocity_constraint_model()
+        np.testing.assert_array_almost_equal(self.evaluate(actual), expected)
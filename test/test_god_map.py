@@ -10,7 +10,9 @@ from geometry_msgs.msg import PoseStamped
 from hypothesis import given, assume
 import hypothesis.strategies as st
 from giskardpy import casadi_wrapper as w
+from giskardpy.data_types import JointStates
 from giskardpy.god_map import GodMap
+from giskardpy.model.collision_world_syncer import CollisionBuffer
 from utils_for_tests import variable_name, keys_values, lists_of_same_length
 
 
@@ -368,3 +370,49 @@ class TestGodMap(unittest.TestCase):
         assert gm.evaluate_expr(expr)[0] == data[0]
         assert gm.evaluate_expr(expr)[1] == data[1]
         assert gm.evaluate_expr(expr)[2] == data[2]
+
+    def test_get_values_joint_states(self):
+        gm = GodMap()
+        gm.clear()
+        js = JointStates()
+        for i in range(20):
+            js[f'joint{i}'].position = i
+            js[f'joint{i}'].velocity = -i
+        gm.set_data(['js'], js)
+        gm.set_data(['muh'], 23)
+        keys = [str(gm.to_symbol(['js', f'joint{i}', d])) for i in range(20) for d in range(2)]
+        keys.append(str(gm.to_symbol(['muh'])))
+        keys.append(str(gm.to_symbol(['js', 'joint3', 'position'])))
+        expected = [v for i in range(20) for v in (i, -i)] + [23, 3]
+        np.testing.assert_array_equal(gm.get_values(keys), expected)
+        # layout changes invalidate the gather plan
+        del js['joint0']
+        js['joint0'].position = 5
+        js['joint3'].position = 42
+        expected[0] = 5
+        expected[6] = expected[-1] = 42
+        np.testing.assert_array_equal(gm.get_values(keys), expected)
+
+    def test_get_values_collision_buffer(self):
+        gm = GodMap()
+        gm.clear()
+        collisions = CollisionBuffer(2)
+        gm.set_data(['cpi'], collisions)
+        identifiers = [['cpi', 'get_external_collisions', ('a',), 1, 'new_a_P_pa', 0],
+                       ['cpi', 'get_number_of_external_collisions', ('a',)],
+                       ['cpi', 'get_self_collisions', ('a', 'b'), 0, 'contact_distance'],
+                       ['cpi', 'get_external_collisions_long_key', ('a', 'c'), 'link_b_hash']]
+        keys = [str(gm.to_symbol(identifier)) for identifier in identifiers]
+        np.testing.assert_array_equal(gm.get_values(keys), [0, 0, 100, 0])
+        collisions.get_external_collisions('a')[1]['new_a_P_pa'] = [1, 2, 3, 1]
+        collisions.get_external_collisions('a')[0]['number_of_collisions'] = 2
+        collisions.get_self_collisions('a', 'b')[0]['contact_distance'] = 0.1
+        for i in range(20):
+            # new slots may move the buffer, but not the rows
+            collisions.get_external_collisions(f'link{i}')
+        collisions.get_external_collisions_long_key('a', 'c')['link_b_hash'] = 23
+        expected = [1, 2, 0.1, 23]
+        np.testing.assert_array_equal(gm.get_values(keys), expected)
+        np.testing.assert_array_equal([gm.get_data(identifier) for identifier in identifiers], expected)
+        collisions.reset()
+        np.testing.assert_array_equal(gm.get_values(keys), [0, 0, 100, 0])
@@ -3825,6 +3825,15 @@ class TestInfoServices:
         assert set(result.controlled_joints) == expected
 
 
+def assert_collision_fks_equal_fk_np(world: WorldTree):
+    collision_fks = world.compute_all_collision_fks()
+    link_names = [link_name for link_name in sorted(world.link_names_with_collisions)
+                  if link_name != world.root_link_name]
+    for i, link_name in enumerate(link_names):
+        np.testing.assert_array_almost_equal(collision_fks[i * 4:i * 4 + 4],
+                                             world.compute_fk_np(world.root_link_name, link_name))
+
+
 class TestWorld:
     def test_compute_self_collision_matrix(self, world_setup: WorldTree):
         disabled_links = {world_setup.search_for_link_name('br_caster_l_wheel_link'),
@@ -3838,6 +3847,85 @@ class TestWorld:
         assert actual_reasons == reference_reasons
         assert reference_disabled_links == disabled_links
 
+    def test_compute_self_collision_matrix_in_parallel(self, world_setup: WorldTree):
+        collision_scene: CollisionWorldSynchronizer = world_setup.god_map.get_data(identifier.collision_scene)
+        sequential_reasons = collision_scene.compute_self_collision_matrix('pr2',
+                                                                          number_of_tries_never=500,
+                                                                          save_to_tmp=False,
+                                                                          number_of_processes=1)
+        parallel_reasons = collision_scene.compute_self_collision_matrix('pr2',
+                                                                        number_of_tries_never=500,
+                                                                        save_to_tmp=False,
+                                                                        number_of_processes=3)
+        assert parallel_reasons == sequential_reasons
+
+    def test_incremental_collision_sync(self, world_setup: WorldTree):
+        def collision_poses(collision_scene: BetterPyBulletSyncer):
+            poses = {}
+            for link_name in world_setup.link_names_with_collisions:
+                for collision_id in range(len(world_setup.links[link_name].collisions)):
+                    pose = collision_scene.get_map_T_geometry(link_name, collision_id)
+                    poses[link_name, collision_id] = np.array([pose.position.x, pose.position.y, pose.position.z,
+                                                               pose.orientation.x, pose.orientation.y,
+                                                               pose.orientation.z, pose.orientation.w])
+            return poses
+
+        collision_scene: BetterPyBulletSyncer = world_setup.god_map.get_data(identifier.collision_scene)
+        collision_scene.sync()
+        objects = dict(collision_scene.object_name_to_id)
+        old_poses = collision_poses(collision_scene)
+
+        moved_joint = world_setup.search_for_joint_name('r_shoulder_pan_joint')
+        world_setup.state[moved_joint].position = 0.7
+        world_setup.notify_state_change()
+        collision_scene.sync()
+        moved_links, _ = world_setup.search_branch(link_name=world_setup.joints[moved_joint].child_link_name,
+                                                   collect_link_when=world_setup.has_link_collisions)
+        new_poses = collision_poses(collision_scene)
+        changed_links = {key[0] for key, pose in new_poses.items() if not np.allclose(pose, old_poses[key])}
+        assert changed_links == set(moved_links)
+        # a joint state change only moves the objects
+        assert collision_scene.object_name_to_id == objects
+
+        reference_collision_scene = BetterPyBulletSyncer()
+        reference_collision_scene.sync()
+        reference_poses = collision_poses(reference_collision_scene)
+        for key, pose in new_poses.items():
+            np.testing.assert_array_almost_equal(pose, reference_poses[key])
+
+    def test_collision_objects_reused_after_attach(self, world_setup: WorldTree):
+        collision_scene: BetterPyBulletSyncer = world_setup.god_map.get_data(identifier.collision_scene)
+        collision_scene.sync()
+        robot_objects = dict(collision_scene.object_name_to_id)
+        assert not any(collision_scene.is_object_outdated(link_name) for link_name in robot_objects)
+
+        box_name = 'boxy'
+        pose = Pose()
+        pose.orientation.w = 1
+        world_setup.add_world_body(group_name=box_name,
+                                   msg=make_world_body_box(),
+                                   pose=pose,
+                                   parent_link_name=world_setup.root_link_name)
+        box_link_name = world_setup.search_for_link_name(box_name)
+        collision_scene.sync()
+        box_object = collision_scene.object_name_to_id[box_link_name]
+        assert set(collision_scene.object_name_to_id) == set(robot_objects) | {box_link_name}
+        assert all(collision_scene.object_name_to_id[link_name] is o for link_name, o in robot_objects.items())
+
+        # reparented links keep their shapes
+        world_setup.move_group(box_name, world_setup.search_for_link_name('r_gripper_tool_frame'))
+        assert not collision_scene.is_object_outdated(box_link_name)
+        collision_scene.sync()
+        assert collision_scene.object_name_to_id[box_link_name] is box_object
+        assert all(collision_scene.object_name_to_id[link_name] is o for link_name, o in robot_objects.items())
+        assert collision_scene.link_names_in_order == sorted(world_setup.link_names_with_collisions)
+
+        world_setup.delete_group(box_name)
+        assert collision_scene.is_object_outdated(box_link_name)
+        collision_scene.sync()
+        assert collision_scene.object_name_to_id == robot_objects
+        assert collision_scene.link_names_in_order == sorted(world_setup.link_names_with_collisions)
+
     def test_compute_chain_reduced_to_controlled_joints(self, world_setup: WorldTree):
         r_gripper_tool_frame = world_setup.search_for_link_name('r_gripper_tool_frame')
         l_gripper_tool_frame = world_setup.search_for_link_name('l_gripper_tool_frame')
@@ -3890,6 +3978,84 @@ class TestWorld:
         assert world_setup.robot_names[0] not in world_setup.groups[world_setup.robot_names[0]].groups
         assert box_name not in world_setup.minimal_group_names
 
+    def test_collision_fks_after_attach(self, world_setup: WorldTree):
+        box_name = 'boxy'
+        pose = Pose()
+        pose.position.x = 1
+        pose.position.y = 0.5
+        pose.orientation.w = 1
+        world_setup.add_world_body(group_name=box_name,
+                                   msg=make_world_body_box(),
+                                   pose=pose,
+                                   parent_link_name=world_setup.root_link_name)
+        assert_collision_fks_equal_fk_np(world_setup)
+        world_setup.move_group(box_name, world_setup.search_for_link_name('r_gripper_tool_frame'))
+        assert_collision_fks_equal_fk_np(world_setup)
+        world_setup.state[world_setup.search_for_joint_name('r_shoulder_pan_joint')].position = 0.7
+        world_setup.notify_state_change()
+        assert_collision_fks_equal_fk_np(world_setup)
+
+    def test_compose_fk_expression(self, world_setup: WorldTree):
+        rng = np.random.default_rng(23)
+        for free_variable_name in world_setup.free_variables:
+            world_setup.state[free_variable_name].position = rng.uniform(-1, 1)
+        world_setup.notify_state_change()
+        link_names = sorted(world_setup.link_names, key=str)[::9]
+        for root, tip in combinations(link_names, 2):
+            fk = world_setup.compose_fk_expression(root, tip)
+            # the result is a view of the cached expression, modifying it must not change the cache
+            fk[0, 3] = 23
+            fk = world_setup.compose_fk_expression(root, tip).compile()
+            actual = fk.fast_call(world_setup.god_map.get_values(fk.str_params))
+            np.testing.assert_array_almost_equal(actual, world_setup.compute_fk_np(root, tip))
+
+    def test_fk_np_full_update(self, world_setup: WorldTree):
+        rng = np.random.default_rng(23)
+        for i in range(10):
+            for free_variable_name in world_setup.free_variables:
+                world_setup.state[free_variable_name].position = rng.uniform(-2, 2)
+            world_setup.notify_state_change()
+            assert_collision_fks_equal_fk_np(world_setup)
+
+    def test_fk_np_partial_update(self, world_setup: WorldTree):
+        rng = np.random.default_rng(23)
+        free_variable_names = list(world_setup.free_variables)
+        for i in range(20):
+            free_variable_name = free_variable_names[rng.integers(len(free_variable_names))]
+            world_setup.state[free_variable_name].position = rng.uniform(-2, 2)
+            world_setup.notify_state_change()
+            assert_collision_fks_equal_fk_np(world_setup)
+
+    def test_collision_fks_batch(self, world_setup: WorldTree):
+        rng = np.random.default_rng(23)
+        free_variable_names = list(world_setup.free_variables)[::2]
+        positions = rng.uniform(-1, 1, (5, len(free_variable_names)))
+        batch = world_setup.compute_collision_fks_batch(free_variable_names, positions)
+        for sample, collision_fks in zip(positions, batch):
+            for free_variable_name, position in zip(free_variable_names, sample):
+                world_setup.state[free_variable_name].position = position
+            world_setup.notify_state_change()
+            np.testing.assert_array_almost_equal(world_setup.compute_all_collision_fks(), collision_fks)
+
+    def test_collision_fks_after_detach(self, world_setup: WorldTree):
+        box_name = 'boxy'
+        pose = Pose()
+        pose.position.z = 0.1
+        pose.orientation.w = 1
+        world_setup.add_world_body(group_name=box_name,
+                                   msg=make_world_body_box(),
+                                   pose=pose,
+                                   parent_link_name=world_setup.search_for_link_name('r_gripper_tool_frame'))
+        assert_collision_fks_equal_fk_np(world_setup)
+        world_setup.move_group(box_name, world_setup.root_link_name)
+        world_setup.state[world_setup.search_for_joint_name('r_shoulder_pan_joint')].position = -0.7
+        world_setup.notify_state_change()
+        assert_collision_fks_equal_fk_np(world_setup)
+        world_setup.delete_group(box_name)
+        assert_collision_fks_equal_fk_np(world_setup)
+        batch = world_setup.compute_collision_fks_batch([], np.zeros((1, 0)))
+        np.testing.assert_array_almost_equal(world_setup.compute_all_collision_fks(), batch[0])
+
     def test_group_pr2_hand(self, world_setup: WorldTree):
         world_setup.register_group('r_hand', world_setup.search_for_link_name('r_wrist_roll_link'))
         assert set(world_setup.groups['r_hand'].joint_names) == {
@@ -0,0 +1,63 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from giskardpy.configs.giskard import Giskard
+from giskardpy.goals.goal import Goal
+from giskardpy.goals.joint_goals import JointPositionList
+from giskardpy.utils.utils import LazyClassRegistry
+
+custom_goals_source = '''
+from giskardpy.goals.joint_goals import JointPositionList
+
+
+class MyJointGoal(JointPositionList):
+    pass
+
+
+class MyOtherJointGoal(MyJointGoal):
+    pass
+
+
+class NoGoal:
+    pass
+'''
+
+
+class TestLazyClassRegistry(unittest.TestCase):
+    package_name = 'my_custom_goals'
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        package_path = os.path.join(self.tmp_dir, self.package_name)
+        os.mkdir(package_path)
+        open(os.path.join(package_path, '__init__.py'), 'w').close()
+        with open(os.path.join(package_path, 'goals.py'), 'w') as f:
+            f.write(custom_goals_source)
+        sys.path.insert(0, self.tmp_dir)
+
+    def tearDown(self):
+        sys.path.remove(self.tmp_dir)
+        for module_name in list(sys.modules):
+            if module_name.split('.')[0] == self.package_name:
+                del sys.modules[module_name]
+        shutil.rmtree(self.tmp_dir)
+
+    def test_goals_derived_from_builtin_goals(self):
+        registry = LazyClassRegistry(Goal, ['giskardpy.goals'])
+        self.assertIn('JointPositionList', registry)
+        new_goals = registry.add_package(self.package_name)
+        self.assertEqual(set(new_goals), {'MyJointGoal', 'MyOtherJointGoal'})
+        self.assertNotIn('NoGoal', registry)
+        self.assertTrue(issubclass(registry['MyOtherJointGoal'], JointPositionList))
+        self.assertEqual(set(registry.add_package(self.package_name)), {'MyJointGoal', 'MyOtherJointGoal'})
+
+    def test_add_goal_package_name(self):
+        giskard = Giskard.__new__(Giskard)
+        giskard.goal_package_paths = {'giskardpy.goals'}
+        giskard.add_goal_package_name(self.package_name)
+        self.assertEqual(giskard.goal_package_paths, {'giskardpy.goals', self.package_name})
+        registry = LazyClassRegistry(Goal, giskard.goal_package_paths)
+        self.assertIn('MyJointGoal', registry)
@@ -34,3 +34,75 @@ class TestMath(unittest.TestCase):
         actual = giskard_math.mpc_velocity_integral(limits, 0.05, 9)
         expected = giskard_math.mpc_velocity_integral2(limits, 0.05, 9)
         self.assertAlmostEqual(actual, expected)
+
+    def test_simple_mpc_batch(self):
+        dt = 0.05
+        ph = 9
+        vel_limits = np.array([1, 0.5, 1, 1.2])
+        acc_limits = np.array([5, 5, 5, 8])
+        jerk_limits = np.array([30, 30, 30, 40])
+        actual = giskard_math.simple_mpc_batch(vel_limits, acc_limits, jerk_limits, vel_limits, 0, dt, ph,
+                                               (0, 0, 0), (-1, 0, 0))
+        for vel_limit, acc_limit, jerk_limit, profile in zip(vel_limits, acc_limits, jerk_limits, actual):
+            upper_limits = {Derivatives.velocity: np.ones(ph) * vel_limit,
+                            Derivatives.acceleration: np.ones(ph) * acc_limit,
+                            Derivatives.jerk: np.ones(ph) * jerk_limit}
+            lower_limits = {derivative: -limits for derivative, limits in upper_limits.items()}
+            expected = giskard_math.mpc(upper_limits, lower_limits,
+                                        {Derivatives.velocity: vel_limit, Derivatives.acceleration: 0},
+                                        dt, ph, (0, 0, 0), (-1, 0, 0))
+            np.testing.assert_array_almost_equal(profile[:ph * 2], expected[:ph * 2])
+        # results don't depend on the other cases that were solved with them
+        giskard_math._simple_mpc_cache.clear()
+        single = giskard_math.simple_mpc_batch(vel_limits[1:2], acc_limits[1:2], jerk_limits[1:2], vel_limits[1:2], 0,
+                                               dt, ph, (0, 0, 0), (-1, 0, 0))
+        np.testing.assert_array_equal(single[0], actual[1])
+
+    def test_simple_mpc_cache_size(self):
+        dt = 0.05
+        ph = 9
+        old_cache_size = giskard_math.simple_mpc_cache_size
+        giskard_math.simple_mpc_cache_size = 3
+        giskard_math._simple_mpc_cache.clear()
+        try:
+            vel_limits = np.array([0.5, 0.6, 0.7, 0.8, 0.9])
+            # more cases than fit into the cache in one batch
+            actual = giskard_math.simple_mpc_batch(vel_limits, 5, 30, vel_limits, 0, dt, ph, (0, 0, 0), (-1, 0, 0))
+            self.assertEqual(len(actual), len(vel_limits))
+            self.assertEqual(len(giskard_math._simple_mpc_cache), 3)
+            cached_vel_limits = [key[0] for key in giskard_math._simple_mpc_cache]
+            self.assertEqual(cached_vel_limits, [0.7, 0.8, 0.9])
+            # hits are moved to the end, such that the least recently used case is dropped
+            giskard_math.simple_mpc(0.7, 5, 30, 0.7, 0, dt, ph, (0, 0, 0), (-1, 0, 0))
+            giskard_math.simple_mpc(0.5, 5, 30, 0.5, 0, dt, ph, (0, 0, 0), (-1, 0, 0))
+            cached_vel_limits = [key[0] for key in giskard_math._simple_mpc_cache]
+            self.assertEqual(cached_vel_limits, [0.9, 0.7, 0.5])
+        finally:
+            giskard_math.simple_mpc_cache_size = old_cache_size
+            giskard_math._simple_mpc_cache.clear()
+
+    def test_velocity_integral_equals_mpc_velocities(self):
+        dt = 0.05
+        ph = 9
+        for vel_limit, acc_limit, jerk_limit in [(1, np.inf, 21.1),
+                                                 (0.8, np.inf, 30),
+                                                 (0.5, 3, 40),
+                                                 (2, 10, 100)]:
+            limits = {Derivatives.velocity: vel_limit,
+                      Derivatives.acceleration: acc_limit,
+                      Derivatives.jerk: jerk_limit}
+            upper_limits = {derivative: np.ones(ph) * limit for derivative, limit in limits.items()}
+            lower_limits = {derivative: -limits for derivative, limits in upper_limits.items()}
+            expected = np.sum(giskard_math.mpc_velocities(upper_limits, lower_limits,
+                                                          {Derivatives.velocity: vel_limit + jerk_limit * dt ** 2,
+                                                           Derivatives.acceleration: 0},
+                                                          dt, ph)) * dt
+            self.assertAlmostEqual(giskard_math.mpc_velocity_integral(limits, dt, ph), expected)
+            for current_vel, current_acc in [(0, 0), (vel_limit / 2, 0), (-vel_limit / 2, 1)]:
+                expected = giskard_math.mpc_velocities(upper_limits, lower_limits,
+                                                       {Derivatives.velocity: current_vel,
+                                                        Derivatives.acceleration: current_acc},
+                                                       dt, ph)
+                actual = giskard_math.simple_mpc(vel_limit, acc_limit, jerk_limit, current_vel, current_acc, dt, ph,
+                                                 (1, 1, 1), (0, 0, 0))
+                np.testing.assert_array_almost_equal(actual, expected)
@@ -0,0 +1,128 @@
+import unittest
+from collections import defaultdict
+
+import numpy as np
+
+from giskardpy.data_types import JointStates
+from giskardpy.exceptions import ShakingException
+from giskardpy.tree.behaviors.loop_detector import LoopDetector
+from giskardpy.tree.behaviors.shaking_detector import WiggleCancel
+from giskardpy.utils.ring_buffer import RingBuffer, SlidingDFT
+
+
+def reference_shaking(js_samples, sample_period, min_wiggle_frequency, amplitude_threshold, moving_thresholds,
+                      velocity_limits):
+    """
+    The previous implementation of WiggleCancel.detect_shaking, which did a full fft every tick.
+    """
+    N = len(js_samples[0]) - 1
+    mask = np.any(js_samples.T > moving_thresholds, axis=0)
+    velocity_limits = velocity_limits[mask]
+    amplitude_thresholds = velocity_limits * amplitude_threshold
+    joints_filtered = np.diff(js_samples[mask])
+    if len(joints_filtered) == 0:
+        return False
+    freq = np.fft.rfftfreq(N, d=sample_period)
+    try:
+        freq_idx = next(i for i, v in enumerate(freq) if v >= min_wiggle_frequency)
+    except StopIteration:
+        return False
+    fft = np.fft.rfft(joints_filtered, axis=1)
+    fft = [2.0 * np.abs(i) / N for i in fft]
+    fft = (velocity_limits * np.array(fft).T).T
+    return bool(np.any(fft[:, freq_idx:].T > amplitude_thresholds))
+
+
+class TestRingBuffer(unittest.TestCase):
+    def test_ordered(self):
+        buffer = RingBuffer(5, 2)
+        rows = []
+        for i in range(13):
+            row = np.array([i, -i])
+            buffer.append(row)
+            rows.append(row)
+            np.testing.assert_array_equal(buffer.ordered(), rows[-5:])
+            np.testing.assert_array_equal(buffer.newest, row)
+        np.testing.assert_array_equal(buffer.oldest, rows[-5])
+
+    def test_sliding_dft(self):
+        np.random.seed(1)
+        window_size = 20
+        signal = np.random.rand(200, 3)
+        dft = SlidingDFT(window_size, 3)
+        dft.reset(signal[:window_size])
+        for i in range(window_size, len(signal)):
+            dft.slide(signal[i - window_size], signal[i])
+            expected = np.fft.rfft(signal[i - window_size + 1:i + 1], axis=0).T
+            np.testing.assert_allclose(dft.spectrum, expected, atol=1e-9)
+
+
+class TestMonitors(unittest.TestCase):
+    def make_wiggle_cancel(self, num_joints):
+        wiggle_cancel = WiggleCancel.__new__(WiggleCancel)
+        wiggle_cancel.num_samples_in_fft = 21
+        wiggle_cancel.sample_period = 0.05
+        wiggle_cancel.min_wiggle_frequency = 0.5 * 1 / (2 * wiggle_cancel.sample_period)
+        wiggle_cancel.amplitude_threshold = 0.55
+        wiggle_cancel.keys = np.array([f'joint{i}' for i in range(num_joints)])
+        wiggle_cancel.thresholds = np.full(num_joints, 0.01)
+        wiggle_cancel.velocity_limits = np.linspace(0.5, 2, num_joints)
+        wiggle_cancel.init_buffers()
+        return wiggle_cancel
+
+    def test_wiggle_cancel_decisions(self):
+        np.random.seed(2)
+        num_joints = 4
+        wiggle_cancel = self.make_wiggle_cancel(num_joints)
+        t = np.arange(300) * wiggle_cancel.sample_period
+        velocities = np.random.normal(0, 0.02, (len(t), num_joints))
+        # oscillation at 8Hz of one joint in the middle of the trajectory
+        velocities[100:160, 2] += 0.6 * np.sin(2 * np.pi * 8 * t[100:160])
+        velocities[200:, :] = 0
+        samples = []
+        decisions = []
+        expected_decisions = []
+        for velocity in velocities:
+            wiggle_cancel.add_sample(velocity)
+            samples.append(velocity)
+            if len(samples) < wiggle_cancel.num_samples_in_fft:
+                continue
+            window = np.array(samples[-wiggle_cancel.num_samples_in_fft:]).T
+            expected_decisions.append(reference_shaking(window, wiggle_cancel.sample_period,
+                                                        wiggle_cancel.min_wiggle_frequency,
+                                                        wiggle_cancel.amplitude_threshold,
+                                                        wiggle_cancel.thresholds,
+                                                        wiggle_cancel.velocity_limits))
+            try:
+                decisions.append(wiggle_cancel.detect_shaking())
+            except ShakingException:
+                decisions.append(True)
+        self.assertEqual(decisions, expected_decisions)
+        self.assertTrue(any(decisions))
+        self.assertFalse(all(decisions))
+
+    def test_loop_detector_decisions(self):
+        np.random.seed(3)
+        joint_names = [f'joint{i}' for i in range(6)]
+        loop_detector = LoopDetector.__new__(LoopDetector)
+        loop_detector.precision = 4
+        loop_detector.velocity_limits = defaultdict(lambda: 1.)
+        loop_detector.velocity_limits.update({joint_name: 0.5 + i for i, joint_name in enumerate(joint_names[:4])})
+        loop_detector._layout = None
+        js = JointStates()
+        past_keys = set()
+        past_tuples = set()
+        # a random walk that revisits the same states and crosses 0
+        steps = np.random.choice([-1e-4, 0, 1e-4], size=(400, len(joint_names)))
+        positions = np.cumsum(steps, axis=0) - 2e-4
+        for position in positions:
+            for joint_name, p in zip(joint_names, position):
+                js[joint_name].position = p
+            expected_key = tuple(round(state.position / loop_detector.velocity_limits[name], 4)
+                                 for name, state in js.items())
+            key = loop_detector.round_js(js)
+            self.assertEqual(key in past_keys, expected_key in past_tuples)
+            past_keys.add(key)
+            past_tuples.add(expected_key)
+        self.assertEqual(len(past_keys), len(past_tuples))
+        self.assertLess(len(past_keys), len(positions))
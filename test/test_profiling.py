@@ -0,0 +1,57 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from giskardpy.utils.profiling import Histogram, Profiler
+
+
+class TestProfiling(unittest.TestCase):
+    def tearDown(self):
+        Profiler().configure(enabled=False)
+        Profiler().reset()
+
+    def test_histogram(self):
+        times = np.random.default_rng(23).uniform(1e-4, 1e-2, 1000)
+        histogram = Histogram()
+        for t in times:
+            histogram.add(t)
+        self.assertEqual(histogram.count, 1000)
+        self.assertAlmostEqual(histogram.mean, np.mean(times))
+        self.assertAlmostEqual(histogram.std, np.std(times))
+        self.assertEqual(histogram.max, np.max(times))
+        # percentiles are rounded up to the next bin edge
+        self.assertGreaterEqual(histogram.percentile(50), np.percentile(times, 50))
+        self.assertLess(histogram.percentile(50), np.percentile(times, 50) * 1.3)
+
+    def test_sections(self):
+        profiler = Profiler()
+        profiler.reset()
+        with profiler.section('disabled'):
+            pass
+        self.assertEqual(profiler.query(), {})
+        profiler.configure(enabled=True, sample_rate=3)
+
+        @profiler.timed('phase/muh')
+        def muh():
+            return 23
+
+        for i in range(9):
+            self.assertEqual(muh(), 23)
+        self.assertEqual(profiler.query('phase/')['phase/muh']['count'], 3)
+
+    def test_end_goal(self):
+        profiler = Profiler()
+        profiler.reset()
+        with tempfile.TemporaryDirectory() as dump_folder:
+            profiler.configure(enabled=True, dump_folder=dump_folder)
+            with profiler.section('muh'):
+                pass
+            file_name = profiler.end_goal()
+            with open(file_name) as f:
+                self.assertEqual(json.load(f)['sections']['muh']['count'], 1)
+            self.assertEqual(profiler.query(), {})
+            self.assertIsNone(profiler.end_goal())
+            self.assertEqual(len(os.listdir(dump_folder)), 1)
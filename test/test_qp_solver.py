@@ -0,0 +1,74 @@
+import unittest
+
+import numpy as np
+import scipy.sparse as sp
+
+import giskardpy.casadi_wrapper as cas
+from giskardpy.qp.qp_solver_qpalm import QPSolverQPalm
+
+
+def make_solver() -> QPSolverQPalm:
+    w0, w1, w2, w_eq, w_neq, a, b, c = cas.create_symbols(['w0', 'w1', 'w2', 'w_eq', 'w_neq', 'a', 'b', 'c'])
+    weights = cas.Expression([w0, w1, w2, w_eq, w_neq])
+    g = cas.Expression([0, 0, 0, 0, 0])
+    lb = cas.Expression([-1, -1, -np.inf, -10, -10])
+    ub = cas.Expression([1, c, np.inf, 10, 10])
+    E = cas.Expression([[1, a, 0]])
+    E_slack = cas.Expression([[1]])
+    bE = cas.Expression([b])
+    A = cas.Expression([[0, 1, -1],
+                        [a, 0, 1]])
+    A_slack = cas.Expression([[1],
+                              [0]])
+    lbA = cas.Expression([-0.5, -np.inf])
+    ubA = cas.Expression([0.5, c])
+    return QPSolverQPalm(weights=weights, g=g, lb=lb, ub=ub, E=E, E_slack=E_slack, bE=bE,
+                         A=A, A_slack=A_slack, lbA=lbA, ubA=ubA)
+
+
+def to_dense(matrix):
+    if sp.issparse(matrix):
+        return matrix.toarray()
+    return np.array(matrix)
+
+
+class TestQPSolver(unittest.TestCase):
+    def test_buffers_are_not_shared(self):
+        solver1 = make_solver()
+        solver2 = make_solver()
+        solver1.enable_buffer_reuse()
+        self.assertIsNot(solver1._buffers, solver2._buffers)
+        self.assertIsNot(solver1._sparse_buffers, solver2._sparse_buffers)
+        self.assertIsNot(solver1._sparse_filter_cache, solver2._sparse_filter_cache)
+
+    def test_reuse_buffers(self):
+        solver = make_solver()
+        reusing_solver = make_solver()
+        reusing_solver.enable_buffer_reuse()
+        ticks = [
+            {'w0': 1, 'w1': 1, 'w2': 1, 'w_eq': 100, 'w_neq': 100, 'a': 0.5, 'b': 0.3, 'c': 1},
+            # the slack variables of the equality constraints are filtered
+            {'w0': 1, 'w1': 2, 'w2': 1, 'w_eq': 0, 'w_neq': 100, 'a': 0.4, 'b': 0.2, 'c': 0.8},
+            {'w0': 1, 'w1': 2, 'w2': 1, 'w_eq': 0, 'w_neq': 0, 'a': 0.3, 'b': 0.1, 'c': 0.6},
+            {'w0': 2, 'w1': 1, 'w2': 3, 'w_eq': 100, 'w_neq': 0, 'a': -0.5, 'b': -0.3, 'c': 0.9},
+            {'w0': 1, 'w1': 1, 'w2': 1, 'w_eq': 100, 'w_neq': 100, 'a': 0.5, 'b': 0.3, 'c': 1},
+        ]
+        for tick in ticks:
+            results = []
+            for s in [solver, reusing_solver]:
+                # the order of the parameters can differ between solvers
+                substitutions = np.array([tick[name] for name in s.free_symbols_str], dtype=float)
+                s.evaluate_functions(substitutions)
+                s.update_filters()
+                s.apply_filters()
+                # copies, because the buffers are overwritten by the next solve
+                problem_data = [to_dense(x).copy() for x in s.problem_data_to_qp_format()]
+                filters = [s.weight_filter.copy(), s.b_bE_bA_filter.copy()]
+                xdot = s.solve(substitutions)
+                results.append((problem_data, filters, xdot))
+            (problem_data, filters, xdot), (reused_problem_data, reused_filters, reused_xdot) = results
+            for expected, actual in zip(problem_data, reused_problem_data):
+                np.testing.assert_array_equal(actual, expected)
+            for expected, actual in zip(filters, reused_filters):
+                np.testing.assert_array_equal(actual, expected)
+            np.testing.assert_array_almost_equal(reused_xdot, xdot)
@@ -0,0 +1,85 @@
+import unittest
+from types import SimpleNamespace
+
+from giskardpy.tree.scheduler import MultiRateScheduler
+
+
+def make_behavior(name: str, rate=None, deadline=None) -> SimpleNamespace:
+    return SimpleNamespace(name=name, rate=rate, deadline=deadline)
+
+
+class TestMultiRateScheduler(unittest.TestCase):
+    def run_cycles(self, scheduler: MultiRateScheduler, behaviors, number_of_cycles: int):
+        """
+        :return: behavior name -> cycles in which it was due
+        """
+        due_cycles = {behavior.name: [] for behavior in behaviors}
+        for cycle in range(number_of_cycles):
+            for behavior in behaviors:
+                if scheduler.is_due(behavior):
+                    due_cycles[behavior.name].append(cycle)
+            scheduler.next_cycle()
+        return due_cycles
+
+    def test_is_due(self):
+        behaviors = [make_behavior('10Hz', rate=10),
+                     make_behavior('20Hz', rate=20),
+                     make_behavior('100Hz', rate=100),
+                     make_behavior('every cycle'),
+                     make_behavior('3Hz', rate=3)]
+        scheduler = MultiRateScheduler()
+        scheduler.reset(behaviors, control_rate=20)
+        due_cycles = self.run_cycles(scheduler, behaviors, 20)
+        self.assertEqual(due_cycles['10Hz'], list(range(0, 20, 2)))
+        self.assertEqual(due_cycles['20Hz'], list(range(20)))
+        self.assertEqual(due_cycles['100Hz'], list(range(20)))
+        self.assertEqual(due_cycles['every cycle'], list(range(20)))
+        self.assertEqual(due_cycles['3Hz'], [0, 7, 14])
+
+    def test_is_due_wrapped_and_unknown(self):
+        wrapped = SimpleNamespace(name='wrapped', original=make_behavior('wrapped', rate=5))
+        unknown = make_behavior('unknown', rate=5)
+        scheduler = MultiRateScheduler()
+        scheduler.reset([wrapped], control_rate=20)
+        due_cycles = self.run_cycles(scheduler, [wrapped, unknown], 8)
+        self.assertEqual(due_cycles['wrapped'], [0, 4])
+        # behaviors that were added after the reset are ticked in every cycle
+        self.assertEqual(due_cycles['unknown'], list(range(8)))
+
+    def test_deadlines(self):
+        behaviors = [make_behavior('strict', deadline=0.01),
+                     make_behavior('relaxed')]
+        scheduler = MultiRateScheduler()
+        scheduler.reset(behaviors, control_rate=20)
+        durations = [0.005, 0.02, 0.011, 0.001]
+        start = 0.
+        for duration in durations:
+            for behavior in behaviors:
+                scheduler.record(behavior, start, start + duration)
+            scheduler.next_cycle()
+            start += 0.05
+        self.assertEqual(scheduler.timings['strict'].missed_deadlines, 2)
+        self.assertEqual(scheduler.timings['relaxed'].missed_deadlines, 0)
+        self.assertEqual(scheduler.missed_deadlines, 2)
+        timing = scheduler.timings['strict']
+        self.assertEqual(timing.durations.count, len(durations))
+        self.assertAlmostEqual(timing.durations.max, 0.02)
+        self.assertAlmostEqual(timing.durations.mean, sum(durations) / len(durations))
+        self.assertEqual(timing.intervals.count, len(durations) - 1)
+        self.assertAlmostEqual(timing.jitter, 0)
+
+    def test_reset(self):
+        behavior = make_behavior('10Hz', rate=10, deadline=0.01)
+        scheduler = MultiRateScheduler()
+        scheduler.reset([behavior], control_rate=20)
+        scheduler.next_cycle()
+        scheduler.record(behavior, 0, 0.02)
+        self.assertFalse(scheduler.is_due(behavior))
+        self.assertEqual(scheduler.missed_deadlines, 1)
+
+        scheduler.reset([behavior], control_rate=40)
+        self.assertEqual(scheduler.cycle, 0)
+        self.assertEqual(scheduler.missed_deadlines, 0)
+        self.assertEqual(scheduler.timings['10Hz'].durations.count, 0)
+        self.assertEqual(scheduler.timings['10Hz'].period, 4)
+        self.assertTrue(scheduler.is_due(behavior))
@@ -0,0 +1,163 @@
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from typing import Dict
+
+import numpy as np
+
+from giskardpy import identifier
+from giskardpy.data_types import JointStates
+from giskardpy.god_map import GodMap
+from giskardpy.model.trajectory import Trajectory
+from giskardpy.my_types import Derivatives
+from giskardpy.tree.behaviors.log_debug_expressions import LogDebugExpressionsPlugin
+from giskardpy.tree.behaviors.plot_debug_expressions import PlotDebugExpressions
+
+
+class TestLogDebugExpressions(unittest.TestCase):
+    def test_log_debug_expressions(self):
+        god_map = GodMap()
+        qp_controller = SimpleNamespace(evaluated_debug_expressions={})
+        god_map.set_data(identifier.giskard, {'qp_controller': qp_controller})
+        trajectory = Trajectory()
+        plugin = LogDebugExpressionsPlugin.__new__(LogDebugExpressionsPlugin)
+        plugin.sample_period = 0.05
+        plugin.trajectory = trajectory
+        values = [1., 1.5, 1.2]
+        for time, value in enumerate(values, start=1):
+            god_map.set_data(identifier.time, time)
+            qp_controller.evaluated_debug_expressions = {'scalar': np.array([value]),
+                                                         'matrix': np.array([[value * 2]]),
+                                                         'vector': np.array([value, value])}
+            plugin.update()
+        self.assertEqual(trajectory.keys(), [0, 1, 2])
+        for time, value in enumerate(values):
+            point = trajectory.get_exact(time)
+            self.assertEqual(set(point.keys()), {'scalar', 'matrix'})
+            self.assertEqual(point['scalar'].position, value)
+            self.assertEqual(point['matrix'].position, value * 2)
+        self.assertAlmostEqual(trajectory.get_exact(0)['scalar'].velocity, 0)
+        self.assertAlmostEqual(trajectory.get_exact(1)['scalar'].velocity, 0.5 / 0.05)
+        self.assertAlmostEqual(trajectory.get_exact(2)['matrix'].velocity, -0.6 / 0.05)
+
+    def test_plot_names(self):
+        god_map = GodMap()
+        qp_controller = SimpleNamespace(evaluated_debug_expressions={'scalar': np.array([1.]),
+                                                                     'matrix': np.array([[1.]]),
+                                                                     'float': 1.})
+        god_map.set_data(identifier.giskard, {'qp_controller': qp_controller})
+        plugin = PlotDebugExpressions.__new__(PlotDebugExpressions)
+        self.assertEqual(plugin.plot_names(['scalar', 'matrix', 'float']), ['scalar|0', 'matrix|0_0', 'float'])
+
+
+def make_point(**positions) -> JointStates:
+    point = JointStates()
+    for joint_name, position in positions.items():
+        point[joint_name].position = position
+        point[joint_name].velocity = position / 10
+    return point
+
+
+class TestTrajectory(unittest.TestCase):
+    def assert_points_equal(self, actual: JointStates, expected: JointStates):
+        self.assertEqual(set(actual.keys()), set(expected.keys()))
+        for joint_name, joint_state in expected.items():
+            np.testing.assert_array_equal(actual[joint_name].state, joint_state.state)
+
+    def make_trajectory(self, points: Dict[int, JointStates]) -> Trajectory:
+        trajectory = Trajectory()
+        for time, point in points.items():
+            trajectory.set(time, point)
+        return trajectory
+
+    def test_set_get_exact(self):
+        points = {time: make_point(a=time, b=-time) for time in range(100)}
+        trajectory = self.make_trajectory(points)
+        self.assertEqual(len(trajectory), 100)
+        self.assertEqual(trajectory.keys(), list(points))
+        for time, point in points.items():
+            self.assert_points_equal(trajectory.get_exact(time), point)
+        self.assert_points_equal(trajectory.get_last(), points[99])
+        with self.assertRaises(KeyError):
+            trajectory.set(50, make_point(a=1))
+
+    def test_get_exact_returns_copy(self):
+        trajectory = self.make_trajectory({0: make_point(a=1)})
+        point = trajectory.get_exact(0)
+        point['a'].position = 5
+        point['c'].position = 3
+        self.assert_points_equal(trajectory.get_exact(0), make_point(a=1))
+        self.assertIsNot(trajectory.get_exact(0), trajectory.get_exact(0))
+
+    def test_overwrite(self):
+        trajectory = self.make_trajectory({0: make_point(a=1), 1: make_point(a=2, b=3)})
+        trajectory.set(1, make_point(a=4))
+        self.assertEqual(len(trajectory), 2)
+        self.assert_points_equal(trajectory.get_exact(1), make_point(a=4))
+        trajectory.set(2, make_point(b=5))
+        self.assert_points_equal(trajectory.get_exact(2), make_point(b=5))
+
+    def test_delete_last(self):
+        trajectory = self.make_trajectory({0: make_point(a=1), 1: make_point(a=2, b=3)})
+        trajectory.delete_last()
+        self.assertEqual(trajectory.keys(), [0])
+        self.assert_points_equal(trajectory.get_last(), make_point(a=1))
+        trajectory.set(1, make_point(a=4))
+        self.assert_points_equal(trajectory.get_exact(1), make_point(a=4))
+        trajectory.delete(0)
+        self.assertEqual(trajectory.keys(), [1])
+        self.assert_points_equal(trajectory.get_exact(1), make_point(a=4))
+
+    def test_joints_missing_at_some_times(self):
+        points = {0: make_point(a=1),
+                  1: make_point(a=2, b=3),
+                  2: make_point(b=4)}
+        trajectory = self.make_trajectory(points)
+        self.assertEqual(trajectory.get_joint_names(), ['a'])
+        for (time, point), (expected_time, expected_point) in zip(trajectory.items(), points.items()):
+            self.assertEqual(time, expected_time)
+            self.assert_points_equal(point, expected_point)
+        for point, expected_point in zip(trajectory.values(), points.values()):
+            self.assert_points_equal(point, expected_point)
+        data = trajectory.to_dict(filter_0_vel=False)
+        np.testing.assert_array_equal(data[Derivatives.position]['a'], [1, 2])
+        np.testing.assert_array_equal(data[Derivatives.position]['b'], [3, 4])
+        joint_a = SimpleNamespace(get_free_variable_names=lambda: ['a'])
+        with self.assertRaises(NotImplementedError):
+            trajectory.to_msg(0.05, 0, [joint_a])
+
+        loaded = Trajectory.from_arrays(*trajectory.to_arrays())
+        for (time, point), (expected_time, expected_point) in zip(loaded.items(), points.items()):
+            self.assertEqual(time, expected_time)
+            self.assert_points_equal(point, expected_point)
+
+    def test_to_msg(self):
+        points = {time: make_point(a=time, b=-time, c=2 * time) for time in range(5)}
+        trajectory = self.make_trajectory(points)
+        joints = [SimpleNamespace(get_free_variable_names=lambda: ['b', 'a'])]
+        msg = trajectory.to_msg(0.05, 0, joints)
+        self.assertEqual(msg.joint_names, ['b', 'a'])
+        self.assertEqual(len(msg.points), len(points))
+        for p, (time, point) in zip(msg.points, points.items()):
+            self.assertAlmostEqual(p.time_from_start.to_sec(), time * 0.05)
+            self.assertEqual(list(p.positions), [point['b'].position, point['a'].position])
+            self.assertEqual(list(p.velocities), [point['b'].velocity, point['a'].velocity])
+
+    def test_spill_to_memmap(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            trajectory = Trajectory()
+            trajectory.spill_threshold = 1000
+            trajectory.spill_folder = tmp_dir
+            points = {time: make_point(a=time, b=-time) for time in range(200)}
+            for time, point in points.items():
+                trajectory.set(time, point)
+            self.assertIsInstance(trajectory._data, np.memmap)
+            for time, point in points.items():
+                self.assert_points_equal(trajectory.get_exact(time), point)
+            # the temporary files are deleted right away
+            self.assertEqual(os.listdir(tmp_dir), [])
+        finally:
+            shutil.rmtree(tmp_dir)